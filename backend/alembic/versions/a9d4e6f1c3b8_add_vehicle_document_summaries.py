@@ -0,0 +1,53 @@
+"""add vehicle document summaries
+
+Revision ID: a9d4e6f1c3b8
+Revises: f2a8d5c1e9b7
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+from pgvector.sqlalchemy import VECTOR
+
+
+# revision identifiers, used by Alembic.
+revision: str = "a9d4e6f1c3b8"
+down_revision: Union[str, Sequence[str], None] = "f2a8d5c1e9b7"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # A few dozen nodes per document, always filtered by vehicle, so no vector index.
+    op.create_table(
+        "vehicledocumentsummary",
+        sa.Column("document_id", sa.Integer(), nullable=False),
+        sa.Column("vehicle_id", sa.Integer(), nullable=False),
+        sa.Column("level", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column("parent_id", sa.Integer(), nullable=True),
+        sa.Column("position", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("title", sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+        sa.Column("page_start", sa.Integer(), nullable=True),
+        sa.Column("page_end", sa.Integer(), nullable=True),
+        sa.Column("content", sa.Text(), nullable=False),
+        sa.Column("embedding", VECTOR(256), nullable=False),
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["document_id"], ["vehicledocument.id"]),
+        sa.ForeignKeyConstraint(["vehicle_id"], ["vehicle.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(op.f("ix_vehicledocumentsummary_document_id"), "vehicledocumentsummary", ["document_id"], unique=False)
+    op.create_index(op.f("ix_vehicledocumentsummary_vehicle_id"), "vehicledocumentsummary", ["vehicle_id"], unique=False)
+    op.create_index(op.f("ix_vehicledocumentsummary_level"), "vehicledocumentsummary", ["level"], unique=False)
+    op.create_index(op.f("ix_vehicledocumentsummary_parent_id"), "vehicledocumentsummary", ["parent_id"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_vehicledocumentsummary_parent_id"), table_name="vehicledocumentsummary")
+    op.drop_index(op.f("ix_vehicledocumentsummary_level"), table_name="vehicledocumentsummary")
+    op.drop_index(op.f("ix_vehicledocumentsummary_vehicle_id"), table_name="vehicledocumentsummary")
+    op.drop_index(op.f("ix_vehicledocumentsummary_document_id"), table_name="vehicledocumentsummary")
+    op.drop_table("vehicledocumentsummary")
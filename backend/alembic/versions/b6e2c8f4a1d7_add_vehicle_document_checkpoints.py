@@ -0,0 +1,29 @@
+"""add vehicle document processing checkpoints
+
+Revision ID: b6e2c8f4a1d7
+Revises: a9d4e6f1c3b8
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b6e2c8f4a1d7"
+down_revision: Union[str, Sequence[str], None] = "a9d4e6f1c3b8"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("vehicledocument", sa.Column("checkpoint_stage", sqlmodel.sql.sqltypes.AutoString(), nullable=True))
+    op.add_column("vehicledocument", sa.Column("parsed_pages", sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("vehicledocument", "parsed_pages")
+    op.drop_column("vehicledocument", "checkpoint_stage")
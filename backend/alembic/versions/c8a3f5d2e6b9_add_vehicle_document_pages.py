@@ -0,0 +1,169 @@
+"""add vehicle document pages and store chunks as page offsets
+
+Revision ID: c8a3f5d2e6b9
+Revises: b6e2c8f4a1d7
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+import hashlib
+import re
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c8a3f5d2e6b9"
+down_revision: Union[str, Sequence[str], None] = "b6e2c8f4a1d7"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+PAGE_MARKER = re.compile(r"(?:^|\n\n)\[Page (\d+)\]\n")
+
+
+def _split_pages(extracted_text: str, parsed_pages) -> dict[int, str]:
+    """Normalized page texts, from the parsing checkpoint when present, else the [Page N] blob."""
+    if parsed_pages:
+        raw = [(int(item["page_number"]), item["text"]) for item in parsed_pages]
+    else:
+        parts = PAGE_MARKER.split(extracted_text or "")
+        raw = [(int(parts[index]), parts[index + 1]) for index in range(1, len(parts) - 1, 2)]
+    pages: dict[int, str] = {}
+    for page_number, text in raw:
+        normalized = re.sub(r"\s+", " ", text).strip()
+        if normalized:
+            pages.setdefault(page_number, normalized)
+    return pages
+
+
+def _move_chunk_text_to_pages() -> None:
+    bind = op.get_bind()
+    documents = bind.execute(sa.text("SELECT id, extracted_text, parsed_pages FROM vehicledocument")).all()
+    for document_id, extracted_text, parsed_pages in documents:
+        pages = _split_pages(extracted_text, parsed_pages)
+        page_ids = {
+            page_number: bind.execute(
+                sa.text(
+                    "INSERT INTO vehicledocumentpage (document_id, page_number, text, text_hash) "
+                    "VALUES (:document_id, :page_number, :text, :text_hash) RETURNING id"
+                ),
+                {
+                    "document_id": document_id,
+                    "page_number": page_number,
+                    "text": text,
+                    "text_hash": hashlib.sha256(text.encode("utf-8")).hexdigest(),
+                },
+            ).scalar_one()
+            for page_number, text in pages.items()
+        }
+        chunks = bind.execute(
+            sa.text("SELECT id, page_number, content FROM vehicledocumentchunk WHERE document_id = :document_id ORDER BY chunk_index"),
+            {"document_id": document_id},
+        ).all()
+        located = []
+        search_from: dict[int, int] = {}
+        for chunk_id, page_number, content in chunks:
+            text = pages.get(page_number)
+            start = text.find(content, search_from.get(page_number, 0)) if text is not None else -1
+            if start == -1:
+                break
+            # Chunks overlap, so the next one starts after this one's start, not its end.
+            search_from[page_number] = start + 1
+            located.append((chunk_id, page_ids[page_number], start, start + len(content)))
+        if len(located) == len(chunks):
+            for chunk_id, page_id, start, end in located:
+                bind.execute(
+                    sa.text(
+                        "UPDATE vehicledocumentchunk SET page_id = :page_id, start_offset = :start, end_offset = :end "
+                        "WHERE id = :chunk_id"
+                    ),
+                    {"chunk_id": chunk_id, "page_id": page_id, "start": start, "end": end},
+                )
+            continue
+        # Chunks that no longer match the stored text cannot be mapped; the document is reindexed.
+        bind.execute(sa.text("DELETE FROM vehicledocumentchunk WHERE document_id = :document_id"), {"document_id": document_id})
+        bind.execute(
+            sa.text(
+                """
+                UPDATE vehicledocument
+                SET status = 'failed',
+                    chunk_count = 0,
+                    checkpoint_stage = NULL,
+                    processing_stage = 'failed',
+                    error_message = 'Reindex required after the page storage migration.',
+                    updated_at = NOW()
+                WHERE id = :document_id
+                """
+            ),
+            {"document_id": document_id},
+        )
+
+
+def upgrade() -> None:
+    op.create_table(
+        "vehicledocumentpage",
+        sa.Column("document_id", sa.Integer(), nullable=False),
+        sa.Column("page_number", sa.Integer(), nullable=False),
+        sa.Column("text", sa.Text(), nullable=False),
+        sa.Column("text_hash", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["document_id"], ["vehicledocument.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(op.f("ix_vehicledocumentpage_document_id"), "vehicledocumentpage", ["document_id"], unique=False)
+    op.create_index(op.f("ix_vehicledocumentpage_page_number"), "vehicledocumentpage", ["page_number"], unique=False)
+
+    op.add_column("vehicledocumentchunk", sa.Column("page_id", sa.Integer(), nullable=True))
+    op.add_column("vehicledocumentchunk", sa.Column("start_offset", sa.Integer(), nullable=True))
+    op.add_column("vehicledocumentchunk", sa.Column("end_offset", sa.Integer(), nullable=True))
+    _move_chunk_text_to_pages()
+    op.alter_column("vehicledocumentchunk", "page_id", nullable=False)
+    op.alter_column("vehicledocumentchunk", "start_offset", nullable=False)
+    op.alter_column("vehicledocumentchunk", "end_offset", nullable=False)
+    op.create_foreign_key(
+        op.f("vehicledocumentchunk_page_id_fkey"), "vehicledocumentchunk", "vehicledocumentpage", ["page_id"], ["id"]
+    )
+    op.create_index(op.f("ix_vehicledocumentchunk_page_id"), "vehicledocumentchunk", ["page_id"], unique=False)
+    op.drop_column("vehicledocumentchunk", "content")
+    op.drop_column("vehicledocument", "extracted_text")
+    op.drop_column("vehicledocument", "parsed_pages")
+
+
+def downgrade() -> None:
+    op.add_column("vehicledocument", sa.Column("parsed_pages", sa.JSON(), nullable=True))
+    op.add_column("vehicledocument", sa.Column("extracted_text", sa.Text(), nullable=True))
+    op.add_column("vehicledocumentchunk", sa.Column("content", sa.Text(), nullable=True))
+    op.execute(
+        """
+        UPDATE vehicledocumentchunk c
+        SET content = substr(p.text, c.start_offset + 1, c.end_offset - c.start_offset)
+        FROM vehicledocumentpage p
+        WHERE p.id = c.page_id
+        """
+    )
+    op.execute(
+        """
+        UPDATE vehicledocument d
+        SET extracted_text = pages.extracted_text,
+            parsed_pages = pages.parsed_pages
+        FROM (
+            SELECT document_id,
+                string_agg('[Page ' || page_number || ']' || E'\\n' || text, E'\\n\\n' ORDER BY page_number) AS extracted_text,
+                json_agg(json_build_object('page_number', page_number, 'text', text) ORDER BY page_number) AS parsed_pages
+            FROM vehicledocumentpage
+            GROUP BY document_id
+        ) pages
+        WHERE d.id = pages.document_id
+        """
+    )
+    op.alter_column("vehicledocumentchunk", "content", nullable=False)
+    op.drop_index(op.f("ix_vehicledocumentchunk_page_id"), table_name="vehicledocumentchunk")
+    op.drop_constraint(op.f("vehicledocumentchunk_page_id_fkey"), "vehicledocumentchunk", type_="foreignkey")
+    op.drop_column("vehicledocumentchunk", "end_offset")
+    op.drop_column("vehicledocumentchunk", "start_offset")
+    op.drop_column("vehicledocumentchunk", "page_id")
+    op.drop_index(op.f("ix_vehicledocumentpage_page_number"), table_name="vehicledocumentpage")
+    op.drop_index(op.f("ix_vehicledocumentpage_document_id"), table_name="vehicledocumentpage")
+    op.drop_table("vehicledocumentpage")
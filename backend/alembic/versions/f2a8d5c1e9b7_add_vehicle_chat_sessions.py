@@ -0,0 +1,47 @@
+"""add vehicle chat sessions
+
+Revision ID: f2a8d5c1e9b7
+Revises: d6a2f0e3b1c4
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = "f2a8d5c1e9b7"
+down_revision: Union[str, Sequence[str], None] = "d6a2f0e3b1c4"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "vehiclechatsession",
+        sa.Column("vehicle_id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("title", sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+        sa.Column("source_scope", sqlmodel.sql.sqltypes.AutoString(), nullable=False, server_default="all_documents"),
+        sa.Column("include_invoice_docs", sa.Boolean(), nullable=False, server_default=sa.true()),
+        sa.Column("summary", sa.Text(), nullable=True),
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("turns", sa.JSON(), nullable=False),
+        sa.Column("sources", sa.JSON(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["vehicle_id"], ["vehicle.id"]),
+        sa.ForeignKeyConstraint(["user_id"], ["user.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(op.f("ix_vehiclechatsession_vehicle_id"), "vehiclechatsession", ["vehicle_id"], unique=False)
+    op.create_index(op.f("ix_vehiclechatsession_user_id"), "vehiclechatsession", ["user_id"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_vehiclechatsession_user_id"), table_name="vehiclechatsession")
+    op.drop_index(op.f("ix_vehiclechatsession_vehicle_id"), table_name="vehiclechatsession")
+    op.drop_table("vehiclechatsession")
@@ -4,19 +4,21 @@ from datetime import datetime
 from typing import Any, Literal, Optional
 
 from fastapi import APIRouter, BackgroundTasks, Depends, File, Form, HTTPException, Query, UploadFile
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 from sqlmodel import Session, select
 
 from app.api import deps
-from app.core.storage import StorageService
+from app.core.config import settings
+from app.core.deadline import Deadline
 from app.database import get_db_context
-from app.models import User, Vehicle, VehicleDocument, VehicleKnowledgeFact
+from app.models import User, Vehicle, VehicleChatSession, VehicleDocument, VehicleKnowledgeFact
 from app.services.vehicle_document_rag_service import VehicleDocumentRAGService
 
 router = APIRouter()
 
-storage_service = StorageService(upload_dir="media/vehicle-documents")
 rag_service = VehicleDocumentRAGService()
+storage_service = rag_service.storage_service
 
 
 class VehicleDocumentUpdate(BaseModel):
@@ -40,11 +42,18 @@ class VehicleDocumentResponse(BaseModel):
     processing_progress: int
     processing_stage: Optional[str] = None
     processing_detail: Optional[str] = None
+    checkpoint_stage: Optional[str] = None
     indexed_at: Optional[datetime] = None
     created_at: datetime
     updated_at: datetime
 
 
+class VehicleDocumentPageResponse(BaseModel):
+    document_id: int
+    page_number: int
+    text: str
+
+
 class VehicleKnowledgeFactUpdate(BaseModel):
     title: Optional[str] = None
     category: Optional[str] = None
@@ -70,6 +79,7 @@ class VehicleChatAskRequest(BaseModel):
     question: str = Field(min_length=3, max_length=4000)
     source_scope: Literal["all_documents", "manuals_only"] = "all_documents"
     include_invoice_docs: bool = True
+    session_id: Optional[int] = None
 
 
 class VehicleChatCitationResponse(BaseModel):
@@ -93,11 +103,93 @@ class VehicleChatAskResponse(BaseModel):
     citations: list[VehicleChatCitationResponse]
     used_documents: list[VehicleChatUsedDocumentResponse]
     confidence_note: str
+    answer_type: Literal["generated", "structured", "extractive"] = "generated"
+    session_id: Optional[int] = None
+
+
+class VehicleChatWarmResponse(BaseModel):
+    in_memory: bool
+    cached_chunks: int
+
+
+class VehicleChatBatchRequest(BaseModel):
+    vehicle_ids: list[int] = Field(min_length=1)
+    questions: list[str] = Field(min_length=1)
+    source_scope: Literal["all_documents", "manuals_only"] = "all_documents"
+    include_invoice_docs: bool = True
+
+
+class VehicleChatBatchItemResponse(VehicleChatAskResponse):
+    index: int
+    vehicle_id: int
+    question: str
+
+
+class VehicleChatBatchResponse(BaseModel):
+    results: list[VehicleChatBatchItemResponse]
+
+
+class VehicleChatFleetRequest(BaseModel):
+    question: str = Field(min_length=3, max_length=4000)
+    # None asks across every vehicle.
+    vehicle_ids: Optional[list[int]] = Field(default=None, min_length=1)
+    source_scope: Literal["all_documents", "manuals_only"] = "all_documents"
+    include_invoice_docs: bool = True
 
 
-def process_vehicle_document_background(document_id: int, gemini_api_key: str) -> None:
+class VehicleChatFleetVehicleResponse(BaseModel):
+    vehicle_id: int
+    vehicle_label: str
+    answer: str
+    answer_type: Literal["generated", "structured", "extractive", "no_sources"]
+    citations: list[VehicleChatCitationResponse]
+
+
+class VehicleChatFleetResponse(BaseModel):
+    answer: str
+    confidence_note: str
+    answer_type: Literal["generated", "extractive"]
+    vehicles: list[VehicleChatFleetVehicleResponse]
+
+
+class VehicleChatSessionCreate(BaseModel):
+    title: Optional[str] = Field(default=None, max_length=160)
+
+
+class VehicleChatTurnResponse(BaseModel):
+    question: str
+    answer: str
+    answer_type: str = "generated"
+    confidence_note: str = ""
+    citations: list[VehicleChatCitationResponse] = []
+    created_at: Optional[datetime] = None
+
+
+class VehicleChatSessionResponse(BaseModel):
+    id: int
+    vehicle_id: int
+    title: Optional[str] = None
+    turn_count: int
+    created_at: datetime
+    updated_at: datetime
+
+
+class VehicleChatSessionDetailResponse(VehicleChatSessionResponse):
+    turns: list[VehicleChatTurnResponse]
+
+
+def process_vehicle_document_background(
+    document_id: int,
+    gemini_api_key: str,
+    restart_from: Optional[str] = None,
+) -> None:
     with get_db_context() as session:
-        rag_service.process_document(session=session, document_id=document_id, gemini_api_key=gemini_api_key)
+        rag_service.process_document(
+            session=session,
+            document_id=document_id,
+            gemini_api_key=gemini_api_key,
+            restart_from=restart_from,
+        )
 
 
 @router.get("/vehicles/{vehicle_id}/documents", response_model=list[VehicleDocumentResponse])
@@ -179,6 +271,8 @@ def update_vehicle_document(
     db.add(document)
     db.commit()
     db.refresh(document)
+    if payload.included_in_rag is not None or payload.document_type is not None:
+        rag_service.invalidate_embedding_cache(document.vehicle_id)
     return _serialize_document(document)
 
 
@@ -200,6 +294,7 @@ def delete_vehicle_document(
     document.updated_at = datetime.utcnow()
     db.add(document)
     db.commit()
+    rag_service.invalidate_embedding_cache(document.vehicle_id)
 
     rag_service.delete_document_artifacts(session=db, document_id=document_id)
     document = db.get(VehicleDocument, document_id)
@@ -212,10 +307,31 @@ def delete_vehicle_document(
     return {"message": "Vehicle document deleted successfully"}
 
 
+@router.get("/vehicle-documents/{document_id}/pages/{page_number}", response_model=VehicleDocumentPageResponse)
+def get_vehicle_document_page(
+    *,
+    document_id: int,
+    page_number: int,
+    db: Session = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_active_user),
+) -> Any:
+    document = db.get(VehicleDocument, document_id)
+    if not document:
+        raise HTTPException(status_code=404, detail="Vehicle document not found")
+    page = rag_service.get_document_page(session=db, document_id=document_id, page_number=page_number)
+    if not page:
+        raise HTTPException(status_code=404, detail="Vehicle document page not found")
+    return VehicleDocumentPageResponse(document_id=document_id, page_number=page.page_number, text=page.text)
+
+
 @router.post("/vehicle-documents/{document_id}/reindex", response_model=VehicleDocumentResponse)
 def reindex_vehicle_document(
     *,
     document_id: int,
+    from_stage: Optional[Literal["parsing", "chunking", "summarizing", "knowledge"]] = Query(
+        default=None,
+        description="Rerun from this stage; by default a failed or interrupted run resumes after its last checkpoint.",
+    ),
     db: Session = Depends(deps.get_db),
     current_user: User = Depends(deps.get_current_active_user),
     background_tasks: BackgroundTasks,
@@ -236,7 +352,7 @@ def reindex_vehicle_document(
     db.commit()
     db.refresh(document)
 
-    background_tasks.add_task(process_vehicle_document_background, document.id, gemini_key)
+    background_tasks.add_task(process_vehicle_document_background, document.id, gemini_key, from_stage)
     return _serialize_document(document)
 
 
@@ -335,6 +451,18 @@ def delete_vehicle_knowledge(
     return {"message": "Vehicle knowledge fact deleted successfully"}
 
 
+@router.post("/vehicles/{vehicle_id}/chat/warm", response_model=VehicleChatWarmResponse)
+def warm_vehicle_document_chat(
+    *,
+    vehicle_id: int,
+    db: Session = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_active_user),
+) -> Any:
+    _ensure_vehicle_exists(db=db, vehicle_id=vehicle_id)
+    cached_chunks = rag_service.warm_embedding_cache(session=db, vehicle_id=vehicle_id)
+    return VehicleChatWarmResponse(in_memory=cached_chunks is not None, cached_chunks=cached_chunks or 0)
+
+
 @router.post("/vehicles/{vehicle_id}/chat/ask", response_model=VehicleChatAskResponse)
 def ask_vehicle_document_chat(
     *,
@@ -343,20 +471,197 @@ def ask_vehicle_document_chat(
     db: Session = Depends(deps.get_db),
     current_user: User = Depends(deps.get_current_active_user),
 ) -> Any:
+    deadline = Deadline(settings.RAG_CHAT_DEADLINE_SECONDS)
     vehicle = _ensure_vehicle_exists(db=db, vehicle_id=vehicle_id)
     gemini_key = rag_service.resolve_gemini_api_key(current_user)
     if not gemini_key:
         raise HTTPException(status_code=400, detail="Gemini API key not configured")
 
+    conversation = None
+    if payload.session_id is not None:
+        chat_session = _get_chat_session_or_404(
+            db=db,
+            vehicle_id=vehicle_id,
+            session_id=payload.session_id,
+            current_user=current_user,
+        )
+        conversation = rag_service.load_conversation(
+            chat_session,
+            source_scope=payload.source_scope,
+            include_invoice_docs=payload.include_invoice_docs,
+        )
+
+    # The request session is shared with auth; return its connection to the pool
+    # before the model calls. Retrieval opens its own short-lived session.
+    db.close()
     response = rag_service.answer_question(
-        session=db,
         vehicle=vehicle,
         question=payload.question.strip(),
         source_scope=payload.source_scope,
         include_invoice_docs=payload.include_invoice_docs,
         api_key=gemini_key,
+        deadline=deadline,
+        conversation=conversation,
     )
-    return VehicleChatAskResponse(**response)
+    if conversation is not None:
+        with get_db_context() as session:
+            chat_session = session.get(VehicleChatSession, payload.session_id)
+            # Deleted while the answer was generated; the answer is still returned.
+            if chat_session is not None:
+                rag_service.store_conversation(chat_session, conversation)
+                session.add(chat_session)
+    return VehicleChatAskResponse(**response, session_id=payload.session_id)
+
+
+@router.post("/vehicle-chat/batch", response_model=VehicleChatBatchResponse)
+def ask_vehicle_document_chat_batch(
+    *,
+    payload: VehicleChatBatchRequest,
+    stream: bool = Query(default=False),
+    db: Session = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_active_user),
+) -> Any:
+    """Asks every question for every vehicle. With ``stream=true`` the results are sent as
+    newline-delimited JSON in completion order; otherwise they are returned together in request order."""
+    deadline = Deadline(settings.RAG_CHAT_BATCH_DEADLINE_SECONDS)
+    vehicle_ids = list(dict.fromkeys(payload.vehicle_ids))
+    questions = [question.strip() for question in payload.questions]
+    if any(not 3 <= len(question) <= 4000 for question in questions):
+        raise HTTPException(status_code=422, detail="Each question must have between 3 and 4000 characters")
+    if len(vehicle_ids) * len(questions) > settings.RAG_CHAT_BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=422,
+            detail=f"A batch can hold at most {settings.RAG_CHAT_BATCH_MAX_ITEMS} vehicle/question pairs",
+        )
+    vehicles_by_id = {vehicle.id: vehicle for vehicle in db.exec(select(Vehicle).where(Vehicle.id.in_(vehicle_ids))).all()}
+    if len(vehicles_by_id) != len(vehicle_ids):
+        raise HTTPException(status_code=404, detail="Vehicle not found")
+    gemini_key = rag_service.resolve_gemini_api_key(current_user)
+    if not gemini_key:
+        raise HTTPException(status_code=400, detail="Gemini API key not configured")
+
+    # Same as /chat/ask: the batch opens its own session for lookups and retrieval only.
+    db.close()
+    results = rag_service.answer_questions_batch(
+        vehicles=[vehicles_by_id[vehicle_id] for vehicle_id in vehicle_ids],
+        questions=questions,
+        source_scope=payload.source_scope,
+        include_invoice_docs=payload.include_invoice_docs,
+        api_key=gemini_key,
+        deadline=deadline,
+    )
+    if stream:
+        return StreamingResponse(
+            (VehicleChatBatchItemResponse(**result).model_dump_json() + "\n" for result in results),
+            media_type="application/x-ndjson",
+        )
+    ordered = sorted(results, key=lambda result: result["index"])
+    return VehicleChatBatchResponse(results=[VehicleChatBatchItemResponse(**result) for result in ordered])
+
+
+@router.post("/vehicle-chat/fleet", response_model=VehicleChatFleetResponse)
+def ask_fleet_document_chat(
+    *,
+    payload: VehicleChatFleetRequest,
+    db: Session = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_active_user),
+) -> Any:
+    deadline = Deadline(settings.RAG_CHAT_FLEET_DEADLINE_SECONDS)
+    max_vehicles = settings.RAG_CHAT_FLEET_MAX_VEHICLES
+    too_many_vehicles = HTTPException(
+        status_code=422,
+        detail=f"A fleet question can cover at most {max_vehicles} vehicles",
+    )
+    statement = select(Vehicle).order_by(Vehicle.id)
+    if payload.vehicle_ids is not None:
+        vehicle_ids = list(dict.fromkeys(payload.vehicle_ids))
+        # Checked before querying: the limited query below would report extra ids as missing.
+        if len(vehicle_ids) > max_vehicles:
+            raise too_many_vehicles
+        statement = statement.where(Vehicle.id.in_(vehicle_ids))
+    vehicles = db.exec(statement.limit(max_vehicles + 1)).all()
+    if payload.vehicle_ids is not None and len(vehicles) != len(vehicle_ids):
+        raise HTTPException(status_code=404, detail="Vehicle not found")
+    if not vehicles:
+        raise HTTPException(status_code=404, detail="No vehicles to ask about")
+    if len(vehicles) > max_vehicles:
+        raise too_many_vehicles
+    gemini_key = rag_service.resolve_gemini_api_key(current_user)
+    if not gemini_key:
+        raise HTTPException(status_code=400, detail="Gemini API key not configured")
+
+    db.close()
+    response = rag_service.answer_fleet_question(
+        vehicles=list(vehicles),
+        question=payload.question.strip(),
+        source_scope=payload.source_scope,
+        include_invoice_docs=payload.include_invoice_docs,
+        api_key=gemini_key,
+        deadline=deadline,
+    )
+    return VehicleChatFleetResponse(**response)
+
+
+@router.post("/vehicles/{vehicle_id}/chat/sessions", response_model=VehicleChatSessionDetailResponse)
+def create_vehicle_chat_session(
+    *,
+    vehicle_id: int,
+    payload: VehicleChatSessionCreate,
+    db: Session = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_active_user),
+) -> Any:
+    _ensure_vehicle_exists(db=db, vehicle_id=vehicle_id)
+    chat_session = VehicleChatSession(
+        vehicle_id=vehicle_id,
+        user_id=current_user.id,
+        title=payload.title.strip()[:160] if payload.title and payload.title.strip() else None,
+    )
+    db.add(chat_session)
+    db.commit()
+    db.refresh(chat_session)
+    return _serialize_chat_session(chat_session, include_turns=True)
+
+
+@router.get("/vehicles/{vehicle_id}/chat/sessions", response_model=list[VehicleChatSessionResponse])
+def list_vehicle_chat_sessions(
+    *,
+    vehicle_id: int,
+    db: Session = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_active_user),
+) -> Any:
+    _ensure_vehicle_exists(db=db, vehicle_id=vehicle_id)
+    chat_sessions = db.exec(
+        select(VehicleChatSession)
+        .where(VehicleChatSession.vehicle_id == vehicle_id, VehicleChatSession.user_id == current_user.id)
+        .order_by(VehicleChatSession.updated_at.desc())
+    ).all()
+    return [_serialize_chat_session(chat_session, include_turns=False) for chat_session in chat_sessions]
+
+
+@router.get("/vehicles/{vehicle_id}/chat/sessions/{session_id}", response_model=VehicleChatSessionDetailResponse)
+def get_vehicle_chat_session(
+    *,
+    vehicle_id: int,
+    session_id: int,
+    db: Session = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_active_user),
+) -> Any:
+    chat_session = _get_chat_session_or_404(db=db, vehicle_id=vehicle_id, session_id=session_id, current_user=current_user)
+    return _serialize_chat_session(chat_session, include_turns=True)
+
+
+@router.delete("/vehicles/{vehicle_id}/chat/sessions/{session_id}")
+def delete_vehicle_chat_session(
+    *,
+    vehicle_id: int,
+    session_id: int,
+    db: Session = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_active_user),
+) -> Any:
+    chat_session = _get_chat_session_or_404(db=db, vehicle_id=vehicle_id, session_id=session_id, current_user=current_user)
+    db.delete(chat_session)
+    db.commit()
+    return {"message": "Chat session deleted successfully"}
 
 
 def _ensure_vehicle_exists(*, db: Session, vehicle_id: int) -> Vehicle:
@@ -366,6 +671,28 @@ def _ensure_vehicle_exists(*, db: Session, vehicle_id: int) -> Vehicle:
     return vehicle
 
 
+def _get_chat_session_or_404(*, db: Session, vehicle_id: int, session_id: int, current_user: User) -> VehicleChatSession:
+    chat_session = db.get(VehicleChatSession, session_id)
+    if not chat_session or chat_session.vehicle_id != vehicle_id or chat_session.user_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Chat session not found")
+    return chat_session
+
+
+def _serialize_chat_session(chat_session: VehicleChatSession, *, include_turns: bool) -> Any:
+    turns = chat_session.turns or []
+    fields = {
+        "id": chat_session.id or 0,
+        "vehicle_id": chat_session.vehicle_id,
+        "title": chat_session.title,
+        "turn_count": len(turns),
+        "created_at": chat_session.created_at,
+        "updated_at": chat_session.updated_at,
+    }
+    if not include_turns:
+        return VehicleChatSessionResponse(**fields)
+    return VehicleChatSessionDetailResponse(**fields, turns=[VehicleChatTurnResponse(**turn) for turn in turns])
+
+
 def _validate_document_type(value: str) -> None:
     allowed_types = {
         "owner_manual",
@@ -395,6 +722,7 @@ def _serialize_document(document: VehicleDocument) -> VehicleDocumentResponse:
         processing_progress=document.processing_progress,
         processing_stage=document.processing_stage,
         processing_detail=document.processing_detail,
+        checkpoint_stage=document.checkpoint_stage,
         indexed_at=document.indexed_at,
         created_at=document.created_at,
         updated_at=document.updated_at,
@@ -64,6 +64,92 @@ class Settings(BaseSettings):
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24  # 24 hours
     GOOGLE_CLIENT_ID: str = "" # override in .env
     GEMINI_API_KEY: str = "" # override in .env
+    # Uploaded Gemini files expire provider-side after 48h; keep reuse well below that.
+    GEMINI_FILE_CACHE_TTL_SECONDS: int = 46 * 60 * 60
+    # How long an unused upload is kept so chained/retried calls can reuse it.
+    GEMINI_FILE_CACHE_IDLE_SECONDS: int = 15 * 60
+    # Local downscale/grayscale/compression of images and scanned pages before multimodal calls.
+    GEMINI_MEDIA_PREPROCESSING_ENABLED: bool = True
+    GEMINI_MEDIA_TARGET_DPI: int = 150
+    GEMINI_MEDIA_JPEG_QUALITY: int = 80
+    GEMINI_MEDIA_GRAYSCALE: bool = True
+    # Process-wide cap on in-flight Gemini generation requests.
+    GEMINI_MAX_CONCURRENT_REQUESTS: int = 4
+    # Model backend: google (real API), fake (offline stand-in), record or replay (fixtures).
+    GEMINI_BACKEND: str = "google"
+    GEMINI_FIXTURES_DIR: str = "fixtures/gemini"
+    # Stand-in tuning: latency spec (fixed:ms, uniform:min,max, normal:mean,std, lognormal:median,sigma).
+    GEMINI_FAKE_LATENCY: str = "lognormal:800,0.4"
+    GEMINI_FAKE_RATE_LIMIT_RATIO: float = 0.0
+    GEMINI_FAKE_INVALID_JSON_RATIO: float = 0.0
+    GEMINI_FAKE_SEED: int = 0
+    # Local OCR for image documents and invoices: none (disabled) or tesseract (pip install .[ocr]).
+    # Runs in OCR_MAX_WORKERS processes (0 = calling thread); results at or above
+    # OCR_MIN_CONFIDENCE skip Gemini transcription and send invoices to the model as text.
+    OCR_BACKEND: str = "none"
+    OCR_LANGUAGES: str = "spa+eng"
+    OCR_MAX_WORKERS: int = 2
+    OCR_TIMEOUT_SECONDS: float = 60.0
+    OCR_MIN_CONFIDENCE: float = 0.85
+    # hnsw.ef_search for chunk retrieval; 0 keeps the server default (40). Pick it from scripts/tune_hnsw_index.py.
+    RAG_HNSW_EF_SEARCH: int = 0
+    # Index used for pgvector retrieval: vector (dense float4), halfvec, or binary (bit index + exact re-rank).
+    # Only that mode's index exists; switch with scripts/apply_vector_storage.py before changing this.
+    RAG_VECTOR_STORAGE: str = "vector"
+    # Binary mode fetches limit * factor Hamming candidates before exact cosine re-ranking.
+    RAG_BINARY_RERANK_FACTOR: int = 4
+    # Answer prompt context: token budget, max sources and MMR relevance/diversity trade-off (1.0 = relevance only).
+    RAG_CONTEXT_TOKEN_BUDGET: int = 1600
+    RAG_CONTEXT_MAX_SOURCES: int = 8
+    RAG_CONTEXT_MMR_LAMBDA: float = 0.7
+    # In-process per-vehicle embedding matrices for brute-force retrieval; larger corpora use pgvector.
+    RAG_EMBEDDING_CACHE_ENABLED: bool = True
+    RAG_EMBEDDING_CACHE_MAX_CHUNKS_PER_VEHICLE: int = 20000
+    RAG_EMBEDDING_CACHE_MAX_BYTES: int = 256 * 1024 * 1024
+    # Bounds staleness across worker processes, which do not see each other's invalidations.
+    RAG_EMBEDDING_CACHE_TTL_SECONDS: int = 300
+    # End-to-end /chat/ask budget. Expansion and each retrieval pass get these shares of it and
+    # generation the rest; when it runs out the answer quotes the top sources instead.
+    RAG_CHAT_DEADLINE_SECONDS: float = 25.0
+    RAG_CHAT_EXPANSION_SHARE: float = 0.25
+    RAG_CHAT_RETRIEVAL_SHARE: float = 0.15
+    # Answer spec lookups (oil, coolant, tyre size, battery, fuel, bolt torques) from VehicleSpecs
+    # and knowledge facts without retrieval or a model call.
+    RAG_STRUCTURED_ANSWERS_ENABLED: bool = True
+    # Query expansion: local (ES<->EN automotive dictionary, no model call) or llm (Gemini rewrite).
+    RAG_QUERY_EXPANSION: str = "local"
+    # With llm expansion, retrieve on the raw question while it runs; skip waiting for the
+    # expansion when the top chunk already contains this share of the question's terms.
+    RAG_SPECULATIVE_RETRIEVAL_ENABLED: bool = True
+    RAG_SPECULATIVE_SKIP_COVERAGE: float = 0.8
+    # Chat sessions keep this many recent turns and cached sources, and a rolling summary of at
+    # most this many characters. A follow-up is answered from the cached sources, without retrieval,
+    # when the best of them contains this share of its terms; questions with at most
+    # RAG_CHAT_FOLLOW_UP_MAX_TERMS terms are retrieved together with the previous question.
+    RAG_CHAT_SESSION_MAX_TURNS: int = 20
+    RAG_CHAT_SESSION_MAX_SOURCES: int = 24
+    RAG_CHAT_SESSION_SUMMARY_CHARS: int = 1200
+    RAG_CHAT_SESSION_REUSE_COVERAGE: float = 0.7
+    RAG_CHAT_FOLLOW_UP_MAX_TERMS: int = 6
+    # /vehicle-chat/batch: max (vehicle, question) pairs per request and the budget shared by all of them.
+    RAG_CHAT_BATCH_MAX_ITEMS: int = 100
+    RAG_CHAT_BATCH_DEADLINE_SECONDS: float = 120.0
+    # /vehicle-chat/fleet: vehicles per question, retrieved sources and context tokens per vehicle,
+    # vehicles answered per model call, and the overall budget.
+    RAG_CHAT_FLEET_MAX_VEHICLES: int = 200
+    RAG_CHAT_FLEET_SOURCES_PER_VEHICLE: int = 3
+    RAG_CHAT_FLEET_TOKENS_PER_VEHICLE: int = 500
+    RAG_CHAT_FLEET_VEHICLES_PER_CALL: int = 10
+    RAG_CHAT_FLEET_DEADLINE_SECONDS: float = 60.0
+    # Section -> chapter -> document summaries built at ingest: section size in characters and
+    # sections per chapter. Broad questions ("summarize the maintenance schedule") are answered
+    # from the broadest summary scoring at least RAG_SUMMARY_LEVEL_MARGIN of the closest one.
+    RAG_HIERARCHICAL_SUMMARIES_ENABLED: bool = True
+    RAG_SUMMARY_SECTION_CHARS: int = 12000
+    RAG_SUMMARY_SECTIONS_PER_CHAPTER: int = 8
+    RAG_SUMMARY_LEVEL_MARGIN: float = 0.8
+    # DOCX/XLSX/HTML/EPUB are parsed locally; pages are cut at format page breaks and at this size.
+    RAG_LOCAL_PARSER_PAGE_CHARS: int = 6000
     
     # Logging and Environment
     LOG_LEVEL: str = "INFO"  # Can be DEBUG, INFO, WARNING, ERROR
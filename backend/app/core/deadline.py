@@ -0,0 +1,35 @@
+from __future__ import annotations
+
+import time
+from typing import Callable, Optional
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a stage is started or still running after its deadline."""
+
+
+class Deadline:
+    """Monotonic time budget shared by the stages of one request.
+
+    ``child`` carves a stage budget out of the parent: it ends at the earlier of
+    the parent's expiry and ``seconds`` from now, so a slow stage cannot eat the
+    time reserved for later ones while a fast stage leaves its slack to them.
+    """
+
+    def __init__(self, seconds: float, *, clock: Callable[[], float] = time.monotonic, expires_at: Optional[float] = None) -> None:
+        self._clock = clock
+        self.expires_at = expires_at if expires_at is not None else clock() + max(0.0, seconds)
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - self._clock())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def child(self, seconds: float) -> "Deadline":
+        return Deadline(0, clock=self._clock, expires_at=min(self.expires_at, self._clock() + max(0.0, seconds)))
+
+    def check(self, stage: str) -> None:
+        if self.expired:
+            raise DeadlineExceeded(f"Deadline exceeded before {stage}")
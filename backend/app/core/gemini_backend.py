@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from typing import Any, Optional
+
+import google.generativeai as genai
+
+
+class GeminiBackend(ABC):
+    """Transport used by ``GeminiService`` to reach a Gemini-compatible model provider."""
+
+    name = "base"
+
+    @abstractmethod
+    def configure(self, *, api_key: str) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def generate_content(
+        self,
+        *,
+        model_name: str,
+        contents: list[Any],
+        temperature: float,
+        response_mime_type: Optional[str],
+        timeout: Optional[float] = None,
+        response_schema: Optional[dict[str, Any]] = None,
+    ) -> str:
+        raise NotImplementedError
+
+    @abstractmethod
+    def upload_file(self, file_path: str, *, mime_type: str) -> Any:
+        raise NotImplementedError
+
+
+class GoogleGeminiBackend(GeminiBackend):
+    """Backend calling the real Gemini API through ``google.generativeai``."""
+
+    name = "google"
+
+    def configure(self, *, api_key: str) -> None:
+        genai.configure(api_key=api_key)
+
+    def generate_content(
+        self,
+        *,
+        model_name: str,
+        contents: list[Any],
+        temperature: float,
+        response_mime_type: Optional[str],
+        timeout: Optional[float] = None,
+        response_schema: Optional[dict[str, Any]] = None,
+    ) -> str:
+        model = genai.GenerativeModel(model_name)
+        generation_config = genai.types.GenerationConfig(
+            temperature=temperature,
+            response_mime_type=response_mime_type,
+            response_schema=response_schema,
+        )
+        if timeout is None:
+            response = model.generate_content(contents, generation_config=generation_config)
+        else:
+            response = model.generate_content(
+                contents,
+                generation_config=generation_config,
+                request_options={"timeout": timeout},
+            )
+        return (response.text or "").strip()
+
+    def upload_file(self, file_path: str, *, mime_type: str) -> Any:
+        return genai.upload_file(file_path, mime_type=mime_type)
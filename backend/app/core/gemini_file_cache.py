@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+FileUploader = Callable[[], Any]
+
+
+@dataclass
+class CachedGeminiFile:
+    key: str
+    handle: Any
+    uploaded_at: float
+    refcount: int = 0
+    released_at: Optional[float] = None
+    hits: int = 0
+
+
+class GeminiFileCache:
+    """Process-wide cache of uploaded Gemini file handles keyed by content hash.
+
+    Handles are refcounted while a call is using them and kept for a short idle
+    window after the last release, so chained or retried calls on the same
+    document reuse one upload. Entries never outlive ``ttl_seconds``, which must
+    stay below the provider-side expiry of uploaded files.
+    """
+
+    HASH_CHUNK_SIZE = 1024 * 1024
+
+    def __init__(
+        self,
+        *,
+        ttl_seconds: float,
+        idle_seconds: float,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.idle_seconds = idle_seconds
+        self._clock = clock
+        self._entries: dict[str, CachedGeminiFile] = {}
+        self._retired: dict[int, CachedGeminiFile] = {}
+        # Per-key upload lock and the number of callers using it; dropped once unused and uncached.
+        self._key_locks: dict[str, list[Any]] = {}
+        self._lock = threading.Lock()
+
+    def build_key(self, *, file_path: str, mime_type: str, api_key: str) -> str:
+        digest = hashlib.sha256()
+        with Path(file_path).open("rb") as handle:
+            for block in iter(lambda: handle.read(self.HASH_CHUNK_SIZE), b""):
+                digest.update(block)
+        # Uploaded files belong to the API key's project, so scope reuse to it.
+        owner = hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+        return f"{owner}:{mime_type}:{digest.hexdigest()}"
+
+    def acquire(self, key: str, uploader: FileUploader) -> Any:
+        # Idle uploads are deleted here too, not only when another file is released.
+        self.purge_expired()
+        with self._lock:
+            slot = self._key_locks.setdefault(key, [threading.Lock(), 0])
+            slot[1] += 1
+
+        try:
+            # Serialize uploads per key so concurrent callers share one upload.
+            with slot[0]:
+                return self._acquire_locked(key, uploader)
+        finally:
+            with self._lock:
+                slot[1] -= 1
+                self._drop_key_lock(key)
+
+    def _acquire_locked(self, key: str, uploader: FileUploader) -> Any:
+        expired: Optional[CachedGeminiFile] = None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._is_expired(entry):
+                self._entries.pop(key, None)
+                if entry.refcount > 0:
+                    # Callers still hold this handle; delete it on their last release.
+                    self._retired[id(entry.handle)] = entry
+                else:
+                    expired = entry
+                entry = None
+            if entry is not None:
+                entry.refcount += 1
+                entry.hits += 1
+                entry.released_at = None
+                logger.info("Reusing cached Gemini file", extra={"cache_hits": entry.hits})
+                return entry.handle
+
+        if expired is not None:
+            self._delete_remote(expired)
+        handle = uploader()
+        with self._lock:
+            self._entries[key] = CachedGeminiFile(
+                key=key,
+                handle=handle,
+                uploaded_at=self._clock(),
+                refcount=1,
+            )
+        return handle
+
+    def release(self, key: str, handle: Any) -> None:
+        retired: Optional[CachedGeminiFile] = None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.handle is handle:
+                entry.refcount = max(0, entry.refcount - 1)
+                if entry.refcount == 0:
+                    entry.released_at = self._clock()
+            else:
+                retired = self._retired.get(id(handle))
+                if retired is not None:
+                    retired.refcount = max(0, retired.refcount - 1)
+                    if retired.refcount == 0:
+                        self._retired.pop(id(handle), None)
+                    else:
+                        retired = None
+            self._drop_key_lock(key)
+        if retired is not None:
+            self._delete_remote(retired)
+        self.purge_expired()
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            stale = [
+                entry
+                for entry in self._entries.values()
+                if entry.refcount == 0 and (self._is_expired(entry) or self._is_idle(entry))
+            ]
+            for entry in stale:
+                self._entries.pop(entry.key, None)
+                self._drop_key_lock(entry.key)
+        for entry in stale:
+            self._delete_remote(entry)
+        return len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            entries = [entry for entry in self._entries.values() if entry.refcount == 0]
+            for entry in entries:
+                self._entries.pop(entry.key, None)
+                self._drop_key_lock(entry.key)
+        for entry in entries:
+            self._delete_remote(entry)
+
+    def _drop_key_lock(self, key: str) -> None:
+        # Called with ``self._lock`` held.
+        slot = self._key_locks.get(key)
+        if slot is not None and slot[1] == 0 and key not in self._entries:
+            self._key_locks.pop(key, None)
+
+    def _is_expired(self, entry: CachedGeminiFile) -> bool:
+        return self._clock() - entry.uploaded_at >= self.ttl_seconds
+
+    def _is_idle(self, entry: CachedGeminiFile) -> bool:
+        return entry.released_at is not None and self._clock() - entry.released_at >= self.idle_seconds
+
+    def _delete_remote(self, entry: CachedGeminiFile) -> None:
+        try:
+            entry.handle.delete()
+        except Exception:
+            logger.warning("Failed to delete cached Gemini file", exc_info=True)
@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import copy
+from functools import lru_cache
+from typing import Any
+
+from pydantic import BaseModel
+
+# Schema keywords Gemini's structured output accepts; titles, defaults and bounds are dropped.
+PASSTHROUGH_KEYS = ("description", "enum")
+FORMAT_DESCRIPTIONS = {"date": "ISO 8601 date (YYYY-MM-DD).", "date-time": "ISO 8601 date and time."}
+
+
+def response_schema_for(model: type[BaseModel]) -> dict[str, Any]:
+    """Gemini ``response_schema`` for the JSON object ``model`` validates.
+
+    Pydantic's JSON schema is reduced to the OpenAPI subset Gemini supports:
+    ``$ref`` definitions are inlined and ``Optional`` fields become
+    ``nullable``. Unions of several concrete types are rejected.
+    """
+    return copy.deepcopy(_cached_schema(model))
+
+
+@lru_cache(maxsize=None)
+def _cached_schema(model: type[BaseModel]) -> dict[str, Any]:
+    json_schema = model.model_json_schema()
+    return _convert(json_schema, json_schema.get("$defs", {}))
+
+
+def _convert(node: dict[str, Any], definitions: dict[str, Any]) -> dict[str, Any]:
+    if "$ref" in node:
+        return _convert(definitions[node["$ref"].rsplit("/", 1)[-1]], definitions)
+    variants = node.get("anyOf")
+    if variants:
+        concrete = [variant for variant in variants if variant.get("type") != "null"]
+        if len(concrete) != 1:
+            raise ValueError(f"Unsupported union in Gemini response schema: {node}")
+        schema = _convert(concrete[0], definitions)
+        if len(concrete) < len(variants):
+            schema["nullable"] = True
+        if node.get("description"):
+            schema["description"] = node["description"]
+        return schema
+
+    schema: dict[str, Any] = {"type": node["type"]}
+    for key in PASSTHROUGH_KEYS:
+        if key in node:
+            schema[key] = node[key]
+    if node.get("format") in FORMAT_DESCRIPTIONS and "description" not in schema:
+        schema["description"] = FORMAT_DESCRIPTIONS[node["format"]]
+    if node["type"] == "object":
+        schema["properties"] = {
+            name: _convert(property_schema, definitions) for name, property_schema in node.get("properties", {}).items()
+        }
+        if node.get("required"):
+            schema["required"] = list(node["required"])
+    elif node["type"] == "array":
+        schema["items"] = _convert(node.get("items", {"type": "string"}), definitions)
+    return schema
@@ -2,30 +2,79 @@ from __future__ import annotations
 
 import json
 import logging
+import threading
+import time
 from contextlib import contextmanager
 from pathlib import Path
 from typing import Any, Callable, Iterator, Optional
 
-import google.generativeai as genai
 from PIL import Image
+from pydantic import BaseModel, ValidationError
+from pypdf import PdfReader
+
+from app.core.config import settings
+from app.core.deadline import Deadline, DeadlineExceeded
+from app.core.gemini_backend import GeminiBackend
+from app.core.gemini_file_cache import GeminiFileCache
+from app.core.gemini_response_schema import response_schema_for
+from app.core.gemini_stand_in import build_gemini_backend
+from app.core.json_repair import JsonRepairMetrics, repair_json
+from app.core.media_preprocessor import MediaPreprocessor, PreparedMedia
 
 logger = logging.getLogger(__name__)
 
 PayloadValidator = Callable[[dict[str, Any]], bool]
 FallbackResolver = Callable[[Exception], dict[str, Any]]
 
+default_file_cache = GeminiFileCache(
+    ttl_seconds=settings.GEMINI_FILE_CACHE_TTL_SECONDS,
+    idle_seconds=settings.GEMINI_FILE_CACHE_IDLE_SECONDS,
+)
+default_media_preprocessor = (
+    MediaPreprocessor(
+        target_dpi=settings.GEMINI_MEDIA_TARGET_DPI,
+        jpeg_quality=settings.GEMINI_MEDIA_JPEG_QUALITY,
+        grayscale=settings.GEMINI_MEDIA_GRAYSCALE,
+    )
+    if settings.GEMINI_MEDIA_PREPROCESSING_ENABLED
+    else None
+)
+default_request_limiter = threading.BoundedSemaphore(max(1, settings.GEMINI_MAX_CONCURRENT_REQUESTS))
+default_backend = build_gemini_backend(
+    mode=settings.GEMINI_BACKEND,
+    fixtures_dir=settings.GEMINI_FIXTURES_DIR,
+    latency=settings.GEMINI_FAKE_LATENCY,
+    rate_limit_ratio=settings.GEMINI_FAKE_RATE_LIMIT_RATIO,
+    invalid_json_ratio=settings.GEMINI_FAKE_INVALID_JSON_RATIO,
+    seed=settings.GEMINI_FAKE_SEED,
+)
+default_json_metrics = JsonRepairMetrics()
+
 
 class GeminiService:
     """Shared integration layer for Gemini generation and multimodal content."""
 
-    def __init__(self, default_api_key: Optional[str] = None):
+    def __init__(
+        self,
+        default_api_key: Optional[str] = None,
+        file_cache: Optional[GeminiFileCache] = None,
+        media_preprocessor: Optional[MediaPreprocessor] = None,
+        request_limiter: Optional[threading.Semaphore] = None,
+        backend: Optional[GeminiBackend] = None,
+        json_metrics: Optional[JsonRepairMetrics] = None,
+    ):
         self.default_api_key = default_api_key
+        self.file_cache = file_cache or default_file_cache
+        self.media_preprocessor = media_preprocessor or default_media_preprocessor
+        self.request_limiter = request_limiter or default_request_limiter
+        self.backend = backend or default_backend
+        self.json_metrics = json_metrics or default_json_metrics
 
     def configure(self, *, api_key: Optional[str] = None) -> None:
         resolved_api_key = api_key or self.default_api_key
         if not resolved_api_key:
             raise ValueError("Gemini API key not configured")
-        genai.configure(api_key=resolved_api_key)
+        self.backend.configure(api_key=resolved_api_key)
 
     @contextmanager
     def multimodal_content(
@@ -34,17 +83,39 @@ class GeminiService:
         file_path: str,
         api_key: str,
         mime_type: Optional[str] = None,
+        page_numbers: Optional[list[int]] = None,
     ) -> Iterator[list[Any]]:
+        """Yield Gemini content parts for a local file.
+
+        Images are downscaled and compressed locally. PDFs are rasterized to
+        ``page_numbers`` when given (in that order), otherwise uploaded whole.
+        """
         self.configure(api_key=api_key)
 
         suffix = Path(file_path).suffix.lower()
         resolved_mime_type = mime_type or ("application/pdf" if suffix == ".pdf" else "image/jpeg")
         uploaded_file = None
+        cache_key = None
         image = None
 
         try:
             if suffix == ".pdf":
-                uploaded_file = genai.upload_file(file_path, mime_type=resolved_mime_type)
+                prepared = self._rasterize_pdf_pages(file_path, page_numbers) if page_numbers else None
+            else:
+                prepared = self._prepare_image(file_path)
+            if prepared is not None:
+                yield prepared.parts
+            elif suffix == ".pdf":
+                # Reuse the same upload across model fallbacks, retries and chained calls.
+                cache_key = self.file_cache.build_key(
+                    file_path=file_path,
+                    mime_type=resolved_mime_type,
+                    api_key=api_key or self.default_api_key or "",
+                )
+                uploaded_file = self.file_cache.acquire(
+                    cache_key,
+                    lambda: self.backend.upload_file(file_path, mime_type=resolved_mime_type),
+                )
                 yield [uploaded_file]
             else:
                 image = Image.open(file_path)
@@ -55,11 +126,37 @@ class GeminiService:
                     image.close()
                 except Exception:
                     logger.warning("Failed to close local image", exc_info=True)
-            if uploaded_file is not None:
-                try:
-                    uploaded_file.delete()
-                except Exception:
-                    logger.warning("Failed to delete temporary Gemini file", exc_info=True)
+            if uploaded_file is not None and cache_key is not None:
+                self.file_cache.release(cache_key, uploaded_file)
+
+    def _prepare_image(self, file_path: str) -> Optional[PreparedMedia]:
+        if self.media_preprocessor is None:
+            return None
+        try:
+            prepared = self.media_preprocessor.prepare_image(file_path)
+        except Exception:
+            logger.warning("Image preprocessing failed, sending original image", exc_info=True)
+            return None
+        logger.info("Prepared image for Gemini", extra=prepared.as_log_extra())
+        return prepared
+
+    def _rasterize_pdf_pages(self, file_path: str, page_numbers: list[int]) -> Optional[PreparedMedia]:
+        if self.media_preprocessor is None:
+            return None
+        try:
+            total_pages = len(PdfReader(file_path).pages)
+            prepared = self.media_preprocessor.rasterize_pdf_pages(
+                file_path,
+                page_numbers,
+                total_pages=total_pages,
+            )
+        except Exception:
+            logger.warning("PDF rasterization failed, uploading the whole file", exc_info=True)
+            return None
+        if not prepared.parts:
+            return None
+        logger.info("Rasterized PDF pages for Gemini", extra=prepared.as_log_extra())
+        return prepared
 
     def generate_json_payload(
         self,
@@ -71,6 +168,9 @@ class GeminiService:
         temperature: float = 0.1,
         validator: Optional[PayloadValidator] = None,
         fallback_resolver: Optional[FallbackResolver] = None,
+        deadline: Optional[Deadline] = None,
+        response_model: Optional[type[BaseModel]] = None,
+        allow_partial_json: bool = True,
     ) -> dict[str, Any]:
         try:
             raw_text = self.generate_json_content(
@@ -79,6 +179,9 @@ class GeminiService:
                 models=models,
                 api_key=api_key,
                 temperature=temperature,
+                deadline=deadline,
+                response_model=response_model,
+                allow_partial_json=allow_partial_json,
             )
             payload = self.parse_json_payload(raw_text)
             if validator and not validator(payload):
@@ -98,6 +201,9 @@ class GeminiService:
         models: list[str],
         api_key: str,
         temperature: float = 0.1,
+        deadline: Optional[Deadline] = None,
+        response_model: Optional[type[BaseModel]] = None,
+        allow_partial_json: bool = True,
     ) -> str:
         return self._generate_content(
             prompt=prompt,
@@ -106,6 +212,9 @@ class GeminiService:
             api_key=api_key,
             temperature=temperature,
             expect_json=True,
+            deadline=deadline,
+            response_model=response_model,
+            allow_partial_json=allow_partial_json,
         )
 
     def generate_text_content(
@@ -135,28 +244,60 @@ class GeminiService:
         api_key: str,
         temperature: float,
         expect_json: bool,
+        deadline: Optional[Deadline] = None,
+        response_model: Optional[type[BaseModel]] = None,
+        allow_partial_json: bool = True,
     ) -> str:
+        """Tries ``models`` in order. With a ``deadline``, waiting for a request
+        slot and every model attempt share its remaining time, and
+        ``DeadlineExceeded`` is raised instead of moving on to the next model.
+
+        A ``response_model`` is sent as the structured-output schema. Invalid
+        JSON is repaired before moving on; a repaired payload must still
+        validate against ``response_model`` when one is given. Without
+        ``allow_partial_json``, a response cut off mid-answer is not repaired
+        but moves on like any other invalid JSON.
+        """
         self.configure(api_key=api_key)
+        response_schema = response_schema_for(response_model) if expect_json and response_model is not None else None
 
         last_error: Optional[Exception] = None
         for model_name in models:
             try:
-                model = genai.GenerativeModel(model_name)
-                generation_config = genai.types.GenerationConfig(
-                    temperature=temperature,
-                    response_mime_type="application/json" if expect_json else None,
-                )
-                response = model.generate_content(
-                    [prompt, *content],
-                    generation_config=generation_config,
+                with self._request_slot(deadline):
+                    started_at = time.perf_counter()
+                    raw_text = self.backend.generate_content(
+                        model_name=model_name,
+                        contents=[prompt, *content],
+                        temperature=temperature,
+                        response_mime_type="application/json" if expect_json else None,
+                        timeout=deadline.remaining() if deadline is not None else None,
+                        response_schema=response_schema,
+                    )
+                logger.info(
+                    "Gemini model responded",
+                    extra={
+                        "model": model_name,
+                        "backend": self.backend.name,
+                        "latency_ms": round((time.perf_counter() - started_at) * 1000, 1),
+                    },
                 )
-                raw_text = (response.text or "").strip()
                 if not raw_text:
                     raise ValueError("Gemini returned an empty response")
                 if expect_json:
-                    self.parse_json_payload(raw_text)
+                    return self._read_json_response(
+                        raw_text,
+                        model_name=model_name,
+                        response_model=response_model,
+                        allow_partial=allow_partial_json,
+                    )
                 return raw_text
+            except DeadlineExceeded:
+                raise
             except Exception as exc:
+                if deadline is not None and deadline.expired:
+                    logger.warning("Gemini model ran out of time", extra={"model": model_name, "error": str(exc)})
+                    raise DeadlineExceeded(f"Deadline exceeded while waiting for {model_name}") from exc
                 last_error = exc
                 if self._is_rate_limit_error(exc):
                     logger.warning("Gemini model rate limited", extra={"model": model_name, "error": str(exc)})
@@ -167,6 +308,64 @@ class GeminiService:
 
         raise ValueError(f"All Gemini models failed. Last error: {last_error}")
 
+    @contextmanager
+    def _request_slot(self, deadline: Optional[Deadline]) -> Iterator[None]:
+        if deadline is None:
+            with self.request_limiter:
+                yield
+            return
+        deadline.check("a Gemini request")
+        if not self.request_limiter.acquire(timeout=deadline.remaining()):
+            raise DeadlineExceeded("Deadline exceeded while waiting for a Gemini request slot")
+        try:
+            yield
+        finally:
+            self.request_limiter.release()
+
+    def _read_json_response(
+        self,
+        raw_text: str,
+        *,
+        model_name: str,
+        response_model: Optional[type[BaseModel]],
+        allow_partial: bool,
+    ) -> str:
+        """Returns ``raw_text`` when it parses, else the repaired JSON; raises the parse error when unrecoverable."""
+        try:
+            self.parse_json_payload(raw_text)
+        except ValueError:
+            payload, truncated = repair_json(raw_text)
+            if (
+                payload is None
+                or (truncated and not allow_partial)
+                or not self._matches_response_model(payload, response_model)
+            ):
+                self.json_metrics.record("unrecoverable")
+                raise
+            outcome = "partial" if truncated else "repaired"
+            outcome_total = self.json_metrics.record(outcome)
+            logger.info(
+                "Repaired invalid Gemini JSON instead of falling back",
+                extra={
+                    "model": model_name,
+                    "raw_chars": len(raw_text),
+                    "outcome": outcome,
+                    "outcome_total": outcome_total,
+                },
+            )
+            return json.dumps(payload, ensure_ascii=False)
+        self.json_metrics.record("parsed")
+        return raw_text
+
+    def _matches_response_model(self, payload: dict[str, Any], response_model: Optional[type[BaseModel]]) -> bool:
+        if response_model is None:
+            return True
+        try:
+            response_model.model_validate(payload)
+        except ValidationError:
+            return False
+        return True
+
     def parse_json_payload(self, raw_text: str) -> dict[str, Any]:
         candidate = raw_text.strip()
         if candidate.startswith("```json"):
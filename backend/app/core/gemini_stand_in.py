@@ -0,0 +1,336 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Optional
+
+from PIL import Image
+
+from app.core.gemini_backend import GeminiBackend, GoogleGeminiBackend
+
+logger = logging.getLogger(__name__)
+
+
+class LatencyDistribution:
+    """Latency model parsed from specs like ``fixed:500``, ``uniform:200,900``,
+    ``normal:800,150`` or ``lognormal:800,0.4`` (median ms, sigma). Values are in ms."""
+
+    def __init__(self, spec: str, *, rng: random.Random) -> None:
+        kind, _, raw_args = (spec or "fixed:0").partition(":")
+        self.kind = kind.strip().lower()
+        self.args = [float(value) for value in raw_args.split(",") if value.strip()]
+        self._rng = rng
+        if self.kind not in {"fixed", "uniform", "normal", "lognormal"}:
+            raise ValueError(f"Unsupported latency distribution: {spec}")
+
+    def sample_ms(self) -> float:
+        if self.kind == "fixed":
+            return self.args[0] if self.args else 0.0
+        if self.kind == "uniform":
+            return self._rng.uniform(self.args[0], self.args[1])
+        if self.kind == "normal":
+            return max(0.0, self._rng.gauss(self.args[0], self.args[1]))
+        median_ms, sigma = self.args
+        return self._rng.lognormvariate(0.0, sigma) * median_ms
+
+
+@dataclass
+class StandInFile:
+    """Uploaded-file handle returned by offline backends."""
+
+    name: str
+    sha256: str
+    mime_type: str
+    handle: Any = None
+
+    def delete(self) -> None:
+        if self.handle is not None:
+            self.handle.delete()
+
+
+class FakeGeminiBackend(GeminiBackend):
+    """Offline Gemini stand-in returning shape-valid payloads for the app's prompts.
+
+    Latency, 429 and invalid-JSON injection are configurable and seeded so load
+    tests and benchmarks are reproducible on a laptop.
+    """
+
+    name = "fake"
+
+    def __init__(
+        self,
+        *,
+        latency: str = "fixed:0",
+        rate_limit_ratio: float = 0.0,
+        invalid_json_ratio: float = 0.0,
+        seed: int = 0,
+    ) -> None:
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.latency = LatencyDistribution(latency, rng=self._rng)
+        self.rate_limit_ratio = rate_limit_ratio
+        self.invalid_json_ratio = invalid_json_ratio
+        self.calls = 0
+
+    def configure(self, *, api_key: str) -> None:
+        return None
+
+    def generate_content(
+        self,
+        *,
+        model_name: str,
+        contents: list[Any],
+        temperature: float,
+        response_mime_type: Optional[str],
+        timeout: Optional[float] = None,
+        response_schema: Optional[dict[str, Any]] = None,
+    ) -> str:
+        with self._lock:
+            self.calls += 1
+            delay_ms = self.latency.sample_ms()
+            rate_limited = self._rng.random() < self.rate_limit_ratio
+            invalid_json = self._rng.random() < self.invalid_json_ratio
+        if timeout is not None and delay_ms / 1000 > timeout:
+            time.sleep(timeout)
+            raise TimeoutError(f"Stand-in response took longer than the {timeout:.3f}s timeout")
+        time.sleep(delay_ms / 1000)
+        if rate_limited:
+            raise RuntimeError("429 ResourceExhausted: stand-in rate limit injected")
+
+        prompt = next((part for part in contents if isinstance(part, str)), "")
+        if response_mime_type != "application/json":
+            return "Stand-in transcription of the provided document."
+        raw_text = json.dumps(self._json_response(prompt=prompt, contents=contents[1:]), ensure_ascii=False)
+        if invalid_json:
+            # Cut off like a response that hit the output token limit.
+            return raw_text[: len(raw_text) * 2 // 3]
+        return raw_text
+
+    def upload_file(self, file_path: str, *, mime_type: str) -> Any:
+        digest = hash_file(file_path)
+        return StandInFile(name=f"files/stand-in-{digest[:12]}", sha256=digest, mime_type=mime_type)
+
+    def _json_response(self, *, prompt: str, contents: list[Any]) -> dict[str, Any]:
+        if '"pages"' in prompt:
+            return {"pages": [self._stand_in_page(number) for number in self._requested_pages(prompt, contents)]}
+        if '"facts"' in prompt:
+            return {
+                "facts": [
+                    {
+                        "title": "Engine oil",
+                        "category": "fluids",
+                        "content": "Use 5W-30 fully synthetic engine oil.",
+                        "source_excerpt": "Engine oil 5W-30",
+                        "confidence": 0.9,
+                    }
+                ]
+            }
+        if '"retrieval_query"' in prompt:
+            question = prompt.rsplit("Question:", 1)[-1].strip()
+            return {"retrieval_query": question, "detected_language": "en"}
+        if '"total_amount"' in prompt:
+            return {
+                "invoice_number": "STAND-IN-1",
+                "supplier_name": "Stand-in Garage",
+                "is_maintenance": True,
+                "is_parts_only": False,
+                "maintenances": [{"description": "Oil change", "labor_cost": 40.0, "parts": []}],
+                "parts_only": [],
+                "total_amount": 120.0,
+                "confidence": 0.9,
+            }
+        if '"answer"' in prompt:
+            source_ids = re.findall(r"^\[([^\]]+)\]", prompt, flags=re.MULTILINE)
+            return {
+                "answer": f"Stand-in answer grounded on {len(source_ids)} sources.",
+                "citations": [{"source_id": source_id, "quote": ""} for source_id in source_ids[:2]],
+                "confidence_note": "Generated by the local Gemini stand-in.",
+            }
+        return {}
+
+    def _requested_pages(self, prompt: str, contents: list[Any]) -> list[int]:
+        match = re.search(r"páginas ([\d, ]+) del documento", prompt)
+        if match:
+            return [int(value) for value in match.group(1).split(",") if value.strip()]
+        return list(range(1, max(1, len(contents)) + 1))
+
+    def _stand_in_page(self, page_number: int) -> dict[str, Any]:
+        return {
+            "page_number": page_number,
+            "text": (
+                f"Stand-in transcription of page {page_number}. Engine oil 5W-30, capacity 4.2 litres. "
+                f"Rear axle nut torque 120 Nm. Service interval 15000 km."
+            ),
+        }
+
+
+class RecordingGeminiBackend(GeminiBackend):
+    """Wraps a live backend and stores every response as a JSON fixture for replay."""
+
+    name = "record"
+
+    def __init__(self, inner: GeminiBackend, *, fixtures_dir: str) -> None:
+        self.inner = inner
+        self.fixtures_dir = Path(fixtures_dir)
+        self.fixtures_dir.mkdir(parents=True, exist_ok=True)
+
+    def configure(self, *, api_key: str) -> None:
+        self.inner.configure(api_key=api_key)
+
+    def generate_content(
+        self,
+        *,
+        model_name: str,
+        contents: list[Any],
+        temperature: float,
+        response_mime_type: Optional[str],
+        timeout: Optional[float] = None,
+        response_schema: Optional[dict[str, Any]] = None,
+    ) -> str:
+        key = request_fingerprint(
+            model_name=model_name,
+            contents=contents,
+            temperature=temperature,
+            response_mime_type=response_mime_type,
+            response_schema=response_schema,
+        )
+        inner_contents = [part.handle if isinstance(part, StandInFile) else part for part in contents]
+        fixture: dict[str, Any] = {"model": model_name, "prompt_preview": _prompt_preview(contents)}
+        try:
+            fixture["response"] = self.inner.generate_content(
+                model_name=model_name,
+                contents=inner_contents,
+                temperature=temperature,
+                response_mime_type=response_mime_type,
+                timeout=timeout,
+                response_schema=response_schema,
+            )
+            return fixture["response"]
+        except Exception as exc:
+            fixture["error"] = str(exc)
+            raise
+        finally:
+            (self.fixtures_dir / f"{key}.json").write_text(json.dumps(fixture, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    def upload_file(self, file_path: str, *, mime_type: str) -> Any:
+        handle = self.inner.upload_file(file_path, mime_type=mime_type)
+        digest = hash_file(file_path)
+        return StandInFile(name=getattr(handle, "name", digest), sha256=digest, mime_type=mime_type, handle=handle)
+
+
+class ReplayGeminiBackend(GeminiBackend):
+    """Serves responses captured by ``RecordingGeminiBackend`` without network access."""
+
+    name = "replay"
+
+    def __init__(self, *, fixtures_dir: str) -> None:
+        self.fixtures_dir = Path(fixtures_dir)
+
+    def configure(self, *, api_key: str) -> None:
+        return None
+
+    def generate_content(
+        self,
+        *,
+        model_name: str,
+        contents: list[Any],
+        temperature: float,
+        response_mime_type: Optional[str],
+        timeout: Optional[float] = None,
+        response_schema: Optional[dict[str, Any]] = None,
+    ) -> str:
+        key = request_fingerprint(
+            model_name=model_name,
+            contents=contents,
+            temperature=temperature,
+            response_mime_type=response_mime_type,
+            response_schema=response_schema,
+        )
+        fixture_path = self.fixtures_dir / f"{key}.json"
+        if not fixture_path.exists():
+            raise LookupError(f"No recorded Gemini fixture for request {key}")
+        fixture = json.loads(fixture_path.read_text(encoding="utf-8"))
+        if "error" in fixture:
+            raise RuntimeError(fixture["error"])
+        return fixture["response"]
+
+    def upload_file(self, file_path: str, *, mime_type: str) -> Any:
+        digest = hash_file(file_path)
+        return StandInFile(name=f"files/replay-{digest[:12]}", sha256=digest, mime_type=mime_type)
+
+
+def build_gemini_backend(
+    *,
+    mode: str,
+    fixtures_dir: str,
+    latency: str,
+    rate_limit_ratio: float,
+    invalid_json_ratio: float,
+    seed: int,
+) -> GeminiBackend:
+    normalized = mode.strip().lower()
+    if normalized == "google":
+        return GoogleGeminiBackend()
+    if normalized == "fake":
+        return FakeGeminiBackend(
+            latency=latency,
+            rate_limit_ratio=rate_limit_ratio,
+            invalid_json_ratio=invalid_json_ratio,
+            seed=seed,
+        )
+    if normalized == "record":
+        return RecordingGeminiBackend(GoogleGeminiBackend(), fixtures_dir=fixtures_dir)
+    if normalized == "replay":
+        return ReplayGeminiBackend(fixtures_dir=fixtures_dir)
+    raise ValueError(f"Unsupported GEMINI_BACKEND: {mode}")
+
+
+def request_fingerprint(
+    *,
+    model_name: str,
+    contents: list[Any],
+    temperature: float,
+    response_mime_type: Optional[str],
+    response_schema: Optional[dict[str, Any]] = None,
+) -> str:
+    digest = hashlib.sha256()
+    header: list[Any] = [model_name, round(temperature, 3), response_mime_type]
+    if response_schema is not None:
+        # Appended only when present so fixtures recorded without a schema keep their keys.
+        header.append(response_schema)
+    digest.update(json.dumps(header, sort_keys=True).encode("utf-8"))
+    for part in contents:
+        digest.update(_describe_part(part).encode("utf-8"))
+    return digest.hexdigest()[:32]
+
+
+def hash_file(file_path: str) -> str:
+    digest = hashlib.sha256()
+    with Path(file_path).open("rb") as handle:
+        for block in iter(lambda: handle.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _describe_part(part: Any) -> str:
+    if isinstance(part, str):
+        return f"text:{part}"
+    if isinstance(part, StandInFile):
+        return f"file:{part.sha256}"
+    if isinstance(part, dict) and isinstance(part.get("data"), bytes):
+        return f"blob:{part.get('mime_type')}:{hashlib.sha256(part['data']).hexdigest()}"
+    if isinstance(part, Image.Image):
+        return f"image:{hashlib.sha256(part.tobytes()).hexdigest()}"
+    return f"other:{type(part).__name__}"
+
+
+def _prompt_preview(contents: list[Any]) -> str:
+    prompt = next((part for part in contents if isinstance(part, str)), "")
+    return prompt.strip()[:200]
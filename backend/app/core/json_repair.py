@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+import json
+import re
+import threading
+from typing import Any, Optional
+
+LITERALS = {"true": "true", "false": "false", "null": "null", "True": "true", "False": "false", "None": "null"}
+CLOSERS = {"{": "}", "[": "]"}
+PARTIAL_UNICODE_ESCAPE = re.compile(r"\\u[0-9a-fA-F]{0,3}$")
+
+
+def repair_json(raw_text: str) -> tuple[Optional[dict[str, Any]], bool]:
+    """Recovers the JSON object in a model response that ``json.loads`` rejects.
+
+    The text is scanned once from its first ``{``, tracking the open
+    containers, so the common failures are fixed in place: prose or fences
+    around the object, trailing or missing commas, raw newlines inside
+    strings, Python literals and, above all, output cut off mid-answer. A
+    truncated string value is closed and kept; a dangling key or partial
+    number is dropped and every open container is closed. Returns ``None``
+    when the text is not recoverable or nothing survives the repair.
+
+    Also returns whether the text ended inside the object: such a repair is
+    partial, since whatever followed the cut is missing.
+    """
+    start = raw_text.find("{")
+    if start == -1:
+        return None, False
+    out: list[str] = []
+    # One [kind, state, safe before the opener, opener index] frame per open
+    # container. Objects move through key -> colon -> value -> after; arrays
+    # through value -> after.
+    stack: list[list[Any]] = []
+    # Length of ``out`` after the last complete value or opened container:
+    # cutting back to it and closing the open containers yields valid JSON.
+    safe = 0
+    in_string = False
+    string_is_key = False
+    escaped = False
+    token = ""
+    truncated = False
+
+    def value_done() -> None:
+        nonlocal safe
+        if stack:
+            stack[-1][1] = "after"
+        safe = len(out)
+
+    def flush_token() -> bool:
+        nonlocal token
+        if not token:
+            return True
+        if not stack or stack[-1][1] != "value":
+            return False
+        if token in LITERALS:
+            out.append(LITERALS[token])
+        else:
+            try:
+                number = json.loads(token)
+            except ValueError:
+                return False
+            if isinstance(number, bool) or not isinstance(number, (int, float)):
+                return False
+            out.append(token)
+        token = ""
+        value_done()
+        return True
+
+    def close_top() -> None:
+        kind, state = stack[-1][:2]
+        if state != "after":
+            del out[safe:]
+        out.append(CLOSERS[kind])
+        stack.pop()
+        value_done()
+
+    for char in raw_text[start:]:
+        if in_string:
+            if escaped:
+                escaped = False
+                out.append(char)
+            elif char == "\\":
+                escaped = True
+                out.append(char)
+            elif char == '"':
+                in_string = False
+                out.append(char)
+                if string_is_key:
+                    stack[-1][1] = "colon"
+                else:
+                    value_done()
+            elif char in "\n\r\t":
+                out.append({"\n": "\\n", "\r": "\\r", "\t": "\\t"}[char])
+            else:
+                out.append(char)
+            continue
+
+        if char.isspace() or char in '{}[],:"':
+            if not flush_token():
+                return None, False
+        else:
+            token += char
+            continue
+
+        if char.isspace():
+            out.append(char)
+        elif char in "{[":
+            if stack and stack[-1][1] == "after" and stack[-1][0] == "[":
+                out.append(",")
+                stack[-1][1] = "value"
+            if stack and stack[-1][1] != "value":
+                return None, False
+            stack.append([char, "key" if char == "{" else "value", safe, len(out)])
+            out.append(char)
+            safe = len(out)
+        elif char in "}]":
+            opener = "{" if char == "}" else "["
+            if not any(frame[0] == opener for frame in stack):
+                break
+            while stack[-1][0] != opener:
+                close_top()
+            close_top()
+            if not stack:
+                break
+        elif char == ":":
+            if not stack or stack[-1][1] != "colon":
+                return None, False
+            out.append(char)
+            stack[-1][1] = "value"
+        elif char == ",":
+            if stack and stack[-1][1] == "after":
+                out.append(char)
+                stack[-1][1] = "key" if stack[-1][0] == "{" else "value"
+        else:
+            # A missing comma between two members is inserted.
+            if stack[-1][1] == "after":
+                out.append(",")
+                stack[-1][1] = "key" if stack[-1][0] == "{" else "value"
+            if stack[-1][1] not in {"key", "value"}:
+                return None, False
+            string_is_key = stack[-1][0] == "{" and stack[-1][1] == "key"
+            in_string = True
+            out.append(char)
+    else:
+        truncated = bool(stack)
+
+    if in_string:
+        if string_is_key:
+            del out[safe:]
+        else:
+            tail = PARTIAL_UNICODE_ESCAPE.sub("", "".join(out[-6:]))
+            del out[-6:]
+            out.append(tail)
+            if escaped:
+                out[-1] = out[-1][:-1]
+            out.append('"')
+            value_done()
+    elif token and token in LITERALS:
+        flush_token()
+    while stack:
+        _, state, before, opened_at = stack[-1]
+        if state != "after" and safe == opened_at + 1:
+            # A container cut off before its first complete member is dropped, comma and key included.
+            del out[before:]
+            safe = before
+            stack.pop()
+            continue
+        close_top()
+
+    try:
+        payload = json.loads("".join(out))
+    except ValueError:
+        return None, False
+    if not isinstance(payload, dict) or not payload:
+        return None, False
+    return payload, truncated
+
+
+class JsonRepairMetrics:
+    """Thread-safe counts of how JSON model responses were read.
+
+    ``parsed`` responses were valid as returned, ``repaired`` ones were
+    recovered whole by ``repair_json`` (each is a model fallback or retry
+    avoided), ``partial`` ones were cut off and kept with their tail missing,
+    and ``unrecoverable`` ones still failed over to the next model.
+    """
+
+    OUTCOMES = ("parsed", "repaired", "partial", "unrecoverable")
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._counts = dict.fromkeys(self.OUTCOMES, 0)
+
+    def record(self, outcome: str) -> int:
+        with self._lock:
+            self._counts[outcome] += 1
+            return self._counts[outcome]
+
+    def snapshot(self) -> dict[str, int]:
+        with self._lock:
+            return dict(self._counts)
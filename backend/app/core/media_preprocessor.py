@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import math
+import time
+from dataclasses import dataclass, field
+from io import BytesIO
+from pathlib import Path
+from typing import Any, Iterable
+
+from pdf2image import convert_from_path
+from PIL import Image, ImageOps
+
+
+@dataclass
+class PreparedMedia:
+    parts: list[dict[str, Any]]
+    page_numbers: list[int] = field(default_factory=list)
+    original_bytes: int = 0
+    prepared_bytes: int = 0
+    original_tokens: int = 0
+    prepared_tokens: int = 0
+    preprocessing_ms: float = 0.0
+
+    def as_log_extra(self) -> dict[str, Any]:
+        return {
+            "pages": len(self.page_numbers) or len(self.parts),
+            "original_bytes": self.original_bytes,
+            "prepared_bytes": self.prepared_bytes,
+            "saved_bytes": self.original_bytes - self.prepared_bytes,
+            "original_tokens": self.original_tokens,
+            "prepared_tokens": self.prepared_tokens,
+            "saved_tokens": self.original_tokens - self.prepared_tokens,
+            "preprocessing_ms": round(self.preprocessing_ms, 1),
+        }
+
+
+class MediaPreprocessor:
+    """Downscales, grayscales and compresses images and PDF pages before multimodal calls."""
+
+    # Gemini bills images up to 384px per side as one unit and tiles larger ones in 768px tiles.
+    TOKENS_PER_TILE = 258
+    SMALL_IMAGE_EDGE = 384
+    TILE_EDGE = 768
+    # Page renders are sized against an A4 long edge so DPI means the same for photos and PDFs.
+    PAGE_LONG_EDGE_INCHES = 11.69
+
+    def __init__(
+        self,
+        *,
+        target_dpi: int = 150,
+        jpeg_quality: int = 80,
+        grayscale: bool = True,
+    ) -> None:
+        self.target_dpi = target_dpi
+        self.jpeg_quality = jpeg_quality
+        self.grayscale = grayscale
+
+    @property
+    def max_edge(self) -> int:
+        return int(round(self.PAGE_LONG_EDGE_INCHES * self.target_dpi))
+
+    def prepare_image(self, file_path: str) -> PreparedMedia:
+        started_at = time.perf_counter()
+        with Image.open(file_path) as image:
+            original_tokens = self.estimate_image_tokens(*image.size)
+            part, prepared_size = self._encode(image)
+        return PreparedMedia(
+            parts=[part],
+            original_bytes=Path(file_path).stat().st_size,
+            prepared_bytes=len(part["data"]),
+            original_tokens=original_tokens,
+            prepared_tokens=self.estimate_image_tokens(*prepared_size),
+            preprocessing_ms=(time.perf_counter() - started_at) * 1000,
+        )
+
+    def rasterize_pdf_pages(self, file_path: str, page_numbers: Iterable[int], *, total_pages: int) -> PreparedMedia:
+        started_at = time.perf_counter()
+        requested = sorted({page for page in page_numbers if 1 <= page <= total_pages})
+        parts: list[dict[str, Any]] = []
+        prepared_tokens = 0
+        for first_page, last_page in self.contiguous_ranges(requested):
+            images = convert_from_path(
+                file_path,
+                dpi=self.target_dpi,
+                first_page=first_page,
+                last_page=last_page,
+                grayscale=self.grayscale,
+            )
+            for image in images:
+                try:
+                    part, prepared_size = self._encode(image)
+                finally:
+                    image.close()
+                parts.append(part)
+                prepared_tokens += self.estimate_image_tokens(*prepared_size)
+
+        # Whole-PDF uploads are billed per page and sent in full regardless of the pages needed.
+        return PreparedMedia(
+            parts=parts,
+            page_numbers=requested,
+            original_bytes=Path(file_path).stat().st_size,
+            prepared_bytes=sum(len(part["data"]) for part in parts),
+            original_tokens=total_pages * self.TOKENS_PER_TILE,
+            prepared_tokens=prepared_tokens,
+            preprocessing_ms=(time.perf_counter() - started_at) * 1000,
+        )
+
+    def estimate_image_tokens(self, width: int, height: int) -> int:
+        if width <= self.SMALL_IMAGE_EDGE and height <= self.SMALL_IMAGE_EDGE:
+            return self.TOKENS_PER_TILE
+        tiles = math.ceil(width / self.TILE_EDGE) * math.ceil(height / self.TILE_EDGE)
+        return tiles * self.TOKENS_PER_TILE
+
+    @staticmethod
+    def contiguous_ranges(page_numbers: list[int]) -> list[tuple[int, int]]:
+        ranges: list[tuple[int, int]] = []
+        for page in page_numbers:
+            if ranges and page == ranges[-1][1] + 1:
+                ranges[-1] = (ranges[-1][0], page)
+            else:
+                ranges.append((page, page))
+        return ranges
+
+    def _encode(self, image: Image.Image) -> tuple[dict[str, Any], tuple[int, int]]:
+        prepared = ImageOps.exif_transpose(image)
+        prepared = prepared.convert("L" if self.grayscale else "RGB")
+        prepared.thumbnail((self.max_edge, self.max_edge), Image.Resampling.LANCZOS)
+        buffer = BytesIO()
+        prepared.save(buffer, format="JPEG", quality=self.jpeg_quality, optimize=True)
+        return {"mime_type": "image/jpeg", "data": buffer.getvalue()}, prepared.size
+
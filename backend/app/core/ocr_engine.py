@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+import logging
+import multiprocessing
+from abc import ABC, abstractmethod
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from PIL import Image, ImageOps
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+IMAGE_SUFFIXES = frozenset({".jpg", ".jpeg", ".png"})
+
+
+@dataclass(frozen=True)
+class OcrResult:
+    text: str
+    # Mean word confidence weighted by word length, 0-1.
+    confidence: float
+
+
+class OcrBackend(ABC):
+    """Engine used by ``OcrEngine`` to read the text of one image."""
+
+    name = "base"
+
+    @abstractmethod
+    def recognize(self, file_path: str) -> OcrResult:
+        raise NotImplementedError
+
+
+class TesseractOcrBackend(OcrBackend):
+    """Tesseract through ``pytesseract`` (``pip install .[ocr]`` plus the ``tesseract-ocr`` binary)."""
+
+    name = "tesseract"
+
+    def __init__(self, *, languages: str) -> None:
+        import pytesseract
+
+        self.pytesseract = pytesseract
+        self.languages = languages
+
+    def recognize(self, file_path: str) -> OcrResult:
+        with Image.open(file_path) as image:
+            prepared = ImageOps.exif_transpose(image).convert("L")
+        data = self.pytesseract.image_to_data(
+            prepared,
+            lang=self.languages,
+            output_type=self.pytesseract.Output.DICT,
+        )
+        lines: dict[tuple[int, int, int], list[str]] = {}
+        weighted_confidence = 0.0
+        characters = 0
+        for index, word in enumerate(data["text"]):
+            word = (word or "").strip()
+            confidence = float(data["conf"][index])
+            if not word or confidence < 0:
+                continue
+            key = (data["block_num"][index], data["par_num"][index], data["line_num"][index])
+            lines.setdefault(key, []).append(word)
+            weighted_confidence += confidence * len(word)
+            characters += len(word)
+        text = "\n".join(" ".join(words) for _, words in sorted(lines.items()))
+        return OcrResult(text=text, confidence=weighted_confidence / characters / 100 if characters else 0.0)
+
+
+def build_ocr_backend(name: str, *, languages: str) -> OcrBackend:
+    normalized = name.strip().lower()
+    if normalized == "tesseract":
+        return TesseractOcrBackend(languages=languages)
+    raise ValueError(f"Unsupported OCR_BACKEND: {name}")
+
+
+_worker_backend: Optional[OcrBackend] = None
+
+
+def _recognize_in_worker(backend_name: str, languages: str, file_path: str) -> OcrResult:
+    # Built once per worker process; the pool is spawned, so nothing is inherited from the server.
+    global _worker_backend
+    if _worker_backend is None:
+        _worker_backend = build_ocr_backend(backend_name, languages=languages)
+    return _worker_backend.recognize(file_path)
+
+
+class OcrEngine:
+    """Runs a local OCR backend in a process pool so CPU-bound recognition never blocks request threads.
+
+    ``recognize`` returns ``None`` instead of raising when the backend is
+    missing, fails or exceeds ``timeout_seconds``; callers then fall back to
+    Gemini. With ``max_workers=0`` recognition runs in the calling thread.
+    """
+
+    def __init__(
+        self,
+        *,
+        backend_name: str,
+        languages: str,
+        max_workers: int,
+        timeout_seconds: float,
+        min_confidence: float,
+    ) -> None:
+        self.backend_name = backend_name
+        self.languages = languages
+        self.max_workers = max(0, max_workers)
+        self.timeout_seconds = timeout_seconds
+        self.min_confidence = min_confidence
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def supports(self, file_path: str) -> bool:
+        return Path(file_path).suffix.lower() in IMAGE_SUFFIXES
+
+    def is_confident(self, result: Optional[OcrResult]) -> bool:
+        return result is not None and bool(result.text.strip()) and result.confidence >= self.min_confidence
+
+    def recognize(self, file_path: str) -> Optional[OcrResult]:
+        if not self.supports(file_path):
+            return None
+        try:
+            if self.max_workers == 0:
+                result = _recognize_in_worker(self.backend_name, self.languages, file_path)
+            else:
+                result = self._get_pool().submit(
+                    _recognize_in_worker, self.backend_name, self.languages, file_path
+                ).result(timeout=self.timeout_seconds)
+        except FutureTimeoutError:
+            logger.warning("Local OCR timed out", extra={"file_path": file_path, "timeout_seconds": self.timeout_seconds})
+            return None
+        except BrokenProcessPool:
+            logger.warning("Local OCR worker died; the pool will be restarted", extra={"file_path": file_path})
+            self._reset_pool()
+            return None
+        except Exception:
+            logger.warning("Local OCR failed", extra={"file_path": file_path}, exc_info=True)
+            return None
+        logger.info(
+            "Local OCR finished",
+            extra={"file_path": file_path, "confidence": round(result.confidence, 3), "chars": len(result.text)},
+        )
+        return result
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._pool
+
+    def _reset_pool(self) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+default_ocr_engine = (
+    OcrEngine(
+        backend_name=settings.OCR_BACKEND,
+        languages=settings.OCR_LANGUAGES,
+        max_workers=settings.OCR_MAX_WORKERS,
+        timeout_seconds=settings.OCR_TIMEOUT_SECONDS,
+        min_confidence=settings.OCR_MIN_CONFIDENCE,
+    )
+    if settings.OCR_BACKEND.strip().lower() != "none"
+    else None
+)
@@ -1,5 +1,6 @@
 import uuid
 from pathlib import Path
+from typing import Iterable, Optional
 from fastapi import UploadFile
 import mimetypes
 
@@ -12,8 +13,9 @@ class StorageService:
     ALLOWED_EXTENSIONS = {'.pdf', '.jpg', '.jpeg', '.png', '.txt', '.md'}
     CHUNK_SIZE = 1024 * 1024  # 1MB
 
-    def __init__(self, upload_dir: str = "media/invoices"):
+    def __init__(self, upload_dir: str = "media/invoices", allowed_extensions: Optional[Iterable[str]] = None):
         self.upload_dir = Path(upload_dir)
+        self.allowed_extensions = set(allowed_extensions) if allowed_extensions is not None else self.ALLOWED_EXTENSIONS
         self.upload_dir.mkdir(parents=True, exist_ok=True)
 
     async def save_file(self, file: UploadFile) -> tuple[str, str]:
@@ -31,8 +33,8 @@ class StorageService:
         """
         # Validar extensión
         file_ext = Path(file.filename or "").suffix.lower()
-        if file_ext not in self.ALLOWED_EXTENSIONS:
-            raise ValueError(f"File type not allowed: {file_ext}. Allowed: {', '.join(self.ALLOWED_EXTENSIONS)}")
+        if file_ext not in self.allowed_extensions:
+            raise ValueError(f"File type not allowed: {file_ext}. Allowed: {', '.join(sorted(self.allowed_extensions))}")
         
         # Generar nombre único
         unique_filename = f"{uuid.uuid4()}{file_ext}"
@@ -12,4 +12,7 @@ from .google_auth import GoogleAuthToken
 from .settings import Settings, SettingsCreate, SettingsRead, SettingsUpdate
 from .vehicle_document import VehicleDocument, VehicleDocumentRead, VehicleDocumentStatus, VehicleDocumentType
 from .vehicle_document_chunk import VehicleDocumentChunk
+from .vehicle_document_page import VehicleDocumentPage
+from .vehicle_document_summary import VehicleDocumentSummary
 from .vehicle_knowledge_fact import VehicleKnowledgeFact, VehicleKnowledgeFactRead
+from .vehicle_chat_session import VehicleChatSession
@@ -10,6 +10,7 @@ if TYPE_CHECKING:
     from .invoice import Invoice
     from .vehicle_document import VehicleDocument
     from .vehicle_knowledge_fact import VehicleKnowledgeFact
+    from .vehicle_chat_session import VehicleChatSession
 
 from .vehicle_specs import VehicleSpecsBase
 
@@ -45,6 +46,10 @@ class Vehicle(VehicleBase, table=True):
         back_populates="vehicle",
         sa_relationship_kwargs={"cascade": "all, delete-orphan"},
     )
+    chat_sessions: List["VehicleChatSession"] = Relationship(
+        back_populates="vehicle",
+        sa_relationship_kwargs={"cascade": "all, delete-orphan"},
+    )
 
 class VehicleRead(VehicleBase):
     id: int
@@ -0,0 +1,37 @@
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, List, Optional
+
+from sqlalchemy import JSON, Column, DateTime, Text
+from sqlmodel import Field, Relationship, SQLModel
+
+if TYPE_CHECKING:
+    from .vehicle import Vehicle
+
+
+class VehicleChatSessionBase(SQLModel):
+    vehicle_id: int = Field(foreign_key="vehicle.id", index=True)
+    user_id: int = Field(foreign_key="user.id", index=True)
+    title: Optional[str] = None
+    # Retrieval settings the cached sources were gathered with; a change resets the cache.
+    source_scope: str = Field(default="all_documents")
+    include_invoice_docs: bool = Field(default=True)
+    # Rolling summary sent to the model instead of the full transcript.
+    summary: Optional[str] = Field(default=None, sa_column=Column(Text))
+
+
+class VehicleChatSession(VehicleChatSessionBase, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    # Recent turns (question, answer, citations) for display, newest last.
+    turns: List[dict[str, Any]] = Field(default_factory=list, sa_column=Column(JSON, nullable=False))
+    # Serialized RetrievedSource entries reused and extended by follow-up questions.
+    sources: List[dict[str, Any]] = Field(default_factory=list, sa_column=Column(JSON, nullable=False))
+    created_at: datetime = Field(
+        default_factory=datetime.utcnow,
+        sa_column=Column(DateTime(timezone=False), nullable=False),
+    )
+    updated_at: datetime = Field(
+        default_factory=datetime.utcnow,
+        sa_column=Column(DateTime(timezone=False), nullable=False),
+    )
+
+    vehicle: Optional["Vehicle"] = Relationship(back_populates="chat_sessions")
@@ -8,6 +8,8 @@ from sqlmodel import Field, Relationship, SQLModel
 if TYPE_CHECKING:
     from .vehicle import Vehicle
     from .vehicle_document_chunk import VehicleDocumentChunk
+    from .vehicle_document_page import VehicleDocumentPage
+    from .vehicle_document_summary import VehicleDocumentSummary
     from .vehicle_knowledge_fact import VehicleKnowledgeFact
 
 
@@ -37,12 +39,13 @@ class VehicleDocumentBase(SQLModel):
     status: str = Field(default=VehicleDocumentStatus.UPLOADED.value, index=True)
     included_in_rag: bool = Field(default=True, index=True)
     deletion_requested: bool = Field(default=False)
-    extracted_text: Optional[str] = Field(default=None, sa_column=Column(Text))
     error_message: Optional[str] = Field(default=None, sa_column=Column(Text))
     chunk_count: int = Field(default=0)
     processing_progress: int = Field(default=0)
     processing_stage: Optional[str] = None
     processing_detail: Optional[str] = Field(default=None, sa_column=Column(Text))
+    # Last processing stage whose output is stored; a retry resumes with the stage after it.
+    checkpoint_stage: Optional[str] = None
     indexed_at: Optional[datetime] = Field(default=None, sa_column=Column(DateTime(timezone=False)))
 
 
@@ -58,6 +61,10 @@ class VehicleDocument(VehicleDocumentBase, table=True):
     )
 
     vehicle: Optional["Vehicle"] = Relationship(back_populates="documents")
+    pages: List["VehicleDocumentPage"] = Relationship(
+        back_populates="document",
+        sa_relationship_kwargs={"cascade": "all, delete-orphan"},
+    )
     chunks: List["VehicleDocumentChunk"] = Relationship(
         back_populates="document",
         sa_relationship_kwargs={"cascade": "all, delete-orphan"},
@@ -66,6 +73,10 @@ class VehicleDocument(VehicleDocumentBase, table=True):
         back_populates="document",
         sa_relationship_kwargs={"cascade": "all, delete-orphan"},
     )
+    summaries: List["VehicleDocumentSummary"] = Relationship(
+        back_populates="document",
+        sa_relationship_kwargs={"cascade": "all, delete-orphan"},
+    )
 
 
 class VehicleDocumentRead(VehicleDocumentBase):
@@ -1,11 +1,11 @@
 from typing import TYPE_CHECKING, Any, Optional
 
-from sqlalchemy import Column, Text
 from pgvector.sqlalchemy import VECTOR
 from sqlmodel import Field, Relationship, SQLModel
 
 if TYPE_CHECKING:
     from .vehicle_document import VehicleDocument
+    from .vehicle_document_page import VehicleDocumentPage
     from .vehicle import Vehicle
 
 
@@ -15,7 +15,10 @@ class VehicleDocumentChunkBase(SQLModel):
     chunk_index: int = Field(index=True)
     page_number: Optional[int] = None
     source_label: Optional[str] = None
-    content: str = Field(sa_column=Column(Text, nullable=False))
+    # The chunk's text is page.text[start_offset:end_offset].
+    page_id: int = Field(foreign_key="vehicledocumentpage.id", index=True)
+    start_offset: int
+    end_offset: int
     embedding: Any = Field(sa_type=VECTOR(256))
 
 
@@ -23,4 +26,5 @@ class VehicleDocumentChunk(VehicleDocumentChunkBase, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
 
     document: Optional["VehicleDocument"] = Relationship(back_populates="chunks")
+    page: Optional["VehicleDocumentPage"] = Relationship(back_populates="chunks")
     vehicle: Optional["Vehicle"] = Relationship()
@@ -0,0 +1,24 @@
+from typing import TYPE_CHECKING, List, Optional
+
+from sqlalchemy import Column, Text
+from sqlmodel import Field, Relationship, SQLModel
+
+if TYPE_CHECKING:
+    from .vehicle_document import VehicleDocument
+    from .vehicle_document_chunk import VehicleDocumentChunk
+
+
+class VehicleDocumentPageBase(SQLModel):
+    document_id: int = Field(foreign_key="vehicledocument.id", index=True)
+    page_number: int = Field(index=True)
+    # Whitespace-normalized page text; chunks are offsets into it.
+    text: str = Field(sa_column=Column(Text, nullable=False))
+    # sha256 of text: a page that parses to the same text keeps its chunks on reindex.
+    text_hash: str
+
+
+class VehicleDocumentPage(VehicleDocumentPageBase, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+
+    document: Optional["VehicleDocument"] = Relationship(back_populates="pages")
+    chunks: List["VehicleDocumentChunk"] = Relationship(back_populates="page")
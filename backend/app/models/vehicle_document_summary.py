@@ -0,0 +1,30 @@
+from typing import TYPE_CHECKING, Any, Optional
+
+from sqlalchemy import Column, Text
+from pgvector.sqlalchemy import VECTOR
+from sqlmodel import Field, Relationship, SQLModel
+
+if TYPE_CHECKING:
+    from .vehicle_document import VehicleDocument
+
+
+class VehicleDocumentSummaryBase(SQLModel):
+    document_id: int = Field(foreign_key="vehicledocument.id", index=True)
+    vehicle_id: int = Field(foreign_key="vehicle.id", index=True)
+    # section, chapter or document; a document has exactly one document-level node.
+    level: str = Field(index=True)
+    # Id of the enclosing chapter or document node. Not a foreign key, so a document's
+    # tree can be deleted in any order.
+    parent_id: Optional[int] = Field(default=None, index=True)
+    position: int = Field(default=0)
+    title: Optional[str] = None
+    page_start: Optional[int] = None
+    page_end: Optional[int] = None
+    content: str = Field(sa_column=Column(Text, nullable=False))
+    embedding: Any = Field(sa_type=VECTOR(256))
+
+
+class VehicleDocumentSummary(VehicleDocumentSummaryBase, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+
+    document: Optional["VehicleDocument"] = Relationship(back_populates="summaries")
@@ -0,0 +1,62 @@
+from pydantic import BaseModel
+from typing import List, Optional
+
+
+class TranscribedPage(BaseModel):
+    """Página transcrita por Gemini"""
+    page_number: int
+    text: str
+
+class TranscriptionPayload(BaseModel):
+    """Respuesta de transcripción de un documento o rango de páginas"""
+    pages: List[TranscribedPage] = []
+
+class KnowledgeFactPayload(BaseModel):
+    """Fact técnico extraído de la documentación"""
+    title: str
+    category: str
+    content: str
+    source_excerpt: Optional[str] = None
+    confidence: Optional[float] = None
+
+class KnowledgeFactsPayload(BaseModel):
+    """Respuesta de extracción de facts"""
+    facts: List[KnowledgeFactPayload] = []
+
+class DocumentSummaryPayload(BaseModel):
+    """Resumen de una sección, capítulo o documento"""
+    title: str = ""
+    summary: str
+
+class AnswerCitation(BaseModel):
+    """Cita de una fuente recuperada"""
+    source_id: str
+    quote: str = ""
+
+class ChatAnswerPayload(BaseModel):
+    """Respuesta del chat de un vehículo"""
+    answer: str
+    citations: List[AnswerCitation] = []
+    confidence_note: str = ""
+    conversation_summary: Optional[str] = None
+
+class FleetVehicleAnswer(BaseModel):
+    """Respuesta para un vehículo de la flota"""
+    vehicle_id: int
+    answer: str
+    citations: List[AnswerCitation] = []
+
+class FleetAnswerPayload(BaseModel):
+    """Respuestas por vehículo del chat de flota"""
+    vehicles: List[FleetVehicleAnswer] = []
+    summary: str = ""
+
+class FleetSummaryPayload(BaseModel):
+    """Respuesta combinada para toda la flota"""
+    answer: str
+    confidence_note: str = ""
+
+class QueryExpansionPayload(BaseModel):
+    """Consulta de recuperación reformulada"""
+    retrieval_query: str
+    detected_language: str = "unknown"
@@ -1,13 +1,18 @@
 from __future__ import annotations
 
 import logging
+from typing import Optional
 
 from sqlmodel import Session
 
+from app.core.config import settings
 from app.core.exceptions import DatabaseError, InvoiceProcessingError
 from app.core.gemini_service import GeminiService
+from app.core.ocr_engine import OcrEngine, default_ocr_engine
 from app.models.invoice import Invoice, InvoiceStatus
 from app.schemas.invoice_processing import InvoiceExtractedData
+from app.services.invoice_text_extraction import InvoiceTextExtractor
+from app.services.rag_document_parsers import LocalDocumentParser
 
 logger = logging.getLogger(__name__)
 
@@ -22,8 +27,13 @@ class InvoiceService:
         "gemini-2.5-flash-lite",
     ]
 
-    def __init__(self, gemini_service: GeminiService):
+    def __init__(self, gemini_service: GeminiService, ocr_engine: Optional[OcrEngine] = None):
         self.gemini_service = gemini_service
+        self.ocr_engine = ocr_engine or default_ocr_engine
+        self.text_extractor = InvoiceTextExtractor(
+            local_parser=LocalDocumentParser(page_chars=settings.RAG_LOCAL_PARSER_PAGE_CHARS),
+            ocr_engine=self.ocr_engine,
+        )
 
     async def process_invoice(
         self,
@@ -89,12 +99,30 @@ class InvoiceService:
     ) -> InvoiceExtractedData:
         logger.info("Processing invoice with Gemini", extra={"file_path": file_path, "detailed_mode": detailed_mode})
 
+        # A rejected invoice is re-read from the file: the local text may be what got it wrong.
+        invoice_text = self.text_extractor.extract(file_path) if not detailed_mode else None
+        if invoice_text is not None:
+            logger.info(
+                "Extracting invoice from local text",
+                extra={"file_path": file_path, "source": invoice_text.source, "chars": len(invoice_text.text)},
+            )
+            payload = self.gemini_service.generate_json_payload(
+                prompt=self._build_extraction_prompt(detailed_mode),
+                content=[invoice_text.as_content()],
+                models=self.EXTRACTION_MODELS,
+                api_key=api_key,
+                response_model=InvoiceExtractedData,
+                temperature=0.2,
+            )
+            return InvoiceExtractedData(**payload)
+
         with self.gemini_service.multimodal_content(file_path=file_path, api_key=api_key) as content:
             payload = self.gemini_service.generate_json_payload(
                 prompt=self._build_extraction_prompt(detailed_mode),
                 content=content,
                 models=self.EXTRACTION_MODELS,
                 api_key=api_key,
+                response_model=InvoiceExtractedData,
                 temperature=0.1 if detailed_mode else 0.2,
             )
         return InvoiceExtractedData(**payload)
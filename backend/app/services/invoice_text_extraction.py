@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import logging
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from pypdf import PdfReader
+
+from app.core.ocr_engine import OcrEngine
+from app.services.rag_document_parsers import LocalDocumentParser
+
+logger = logging.getLogger(__name__)
+
+SOURCE_HEADERS = {
+    "pdf": "Texto de la factura extraído del PDF (se conserva la disposición de columnas):",
+    "document": "Texto de la factura:",
+    "ocr": "Texto de la factura obtenido por OCR:",
+}
+
+
+@dataclass(frozen=True)
+class InvoiceText:
+    text: str
+    # pdf (text layer), document (DOCX/XLSX/HTML/TXT), or ocr.
+    source: str
+
+    def as_content(self) -> str:
+        return f"{SOURCE_HEADERS[self.source]}\n{self.text}"
+
+
+class InvoiceTextExtractor:
+    """Reads an invoice's text on the node so extraction can prompt with text instead of uploading the file.
+
+    PDFs use pypdf's layout mode, which keeps table columns aligned; every page
+    must have a usable text layer, otherwise the invoice is treated as a scan.
+    Images only qualify through confident local OCR. ``extract`` returns
+    ``None`` whenever the file has to be read multimodally.
+    """
+
+    MIN_TEXT_CHARS = 40
+    MIN_WORDS = 5
+    # Layout mode pads columns with long space runs; a few spaces keep them apart.
+    MAX_COLUMN_GAP = 4
+
+    def __init__(self, *, local_parser: LocalDocumentParser, ocr_engine: Optional[OcrEngine]) -> None:
+        self.local_parser = local_parser
+        self.ocr_engine = ocr_engine
+
+    def extract(self, file_path: str) -> Optional[InvoiceText]:
+        suffix = Path(file_path).suffix.lower()
+        if suffix == ".pdf":
+            invoice_text = self._extract_pdf(file_path)
+        elif suffix in {".txt", ".md"}:
+            invoice_text = InvoiceText(text=Path(file_path).read_text(encoding="utf-8", errors="ignore").strip(), source="document")
+        elif suffix in self.local_parser.SUFFIXES:
+            try:
+                pages = self.local_parser.parse(file_path)
+            except ValueError:
+                logger.warning("Could not read invoice document locally", extra={"file_path": file_path}, exc_info=True)
+                return None
+            invoice_text = InvoiceText(text="\n\n".join(pages), source="document")
+        elif self.ocr_engine is not None:
+            # OCR output is already gated by the engine's word confidence.
+            result = self.ocr_engine.recognize(file_path)
+            return InvoiceText(text=result.text.strip(), source="ocr") if self.ocr_engine.is_confident(result) else None
+        else:
+            return None
+        if invoice_text is None or not self.is_usable_text(invoice_text.text):
+            return None
+        return invoice_text
+
+    def is_usable_text(self, text: str) -> bool:
+        cleaned = text.strip()
+        if len(cleaned) < self.MIN_TEXT_CHARS:
+            return False
+        visible = [char for char in cleaned if not char.isspace()]
+        alphanumeric_ratio = sum(char.isalnum() for char in visible) / len(visible)
+        if alphanumeric_ratio < 0.6 or cleaned.count("\ufffd") > len(visible) * 0.05:
+            return False
+        # An invoice without any figure is not one pypdf read correctly.
+        return len(re.findall(r"[^\W\d_]{2,}", cleaned)) >= self.MIN_WORDS and bool(re.search(r"\d", cleaned))
+
+    def _extract_pdf(self, file_path: str) -> Optional[InvoiceText]:
+        try:
+            reader = PdfReader(file_path)
+            pages = [self._page_layout_text(page) for page in reader.pages]
+        except Exception:
+            logger.warning("Could not read invoice PDF text layer", extra={"file_path": file_path}, exc_info=True)
+            return None
+        # One page without a text layer (a scanned annex, a photographed receipt) sends the whole invoice multimodal.
+        if not pages or not all(self.is_usable_text(page) for page in pages):
+            return None
+        if len(pages) == 1:
+            return InvoiceText(text=pages[0], source="pdf")
+        return InvoiceText(
+            text="\n\n".join(f"[Página {number}]\n{page}" for number, page in enumerate(pages, start=1)),
+            source="pdf",
+        )
+
+    def _page_layout_text(self, page) -> str:
+        try:
+            text = page.extract_text(extraction_mode="layout") or ""
+        except Exception:
+            text = page.extract_text() or ""
+        column_gap = re.compile(r" {%d,}" % (self.MAX_COLUMN_GAP + 1))
+        lines = [column_gap.sub(" " * self.MAX_COLUMN_GAP, line.rstrip()) for line in text.splitlines()]
+        return re.sub(r"\n{3,}", "\n\n", "\n".join(lines)).strip()
@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, Optional
+
+from app.services.rag_query_expansion import normalize_text
+
+if TYPE_CHECKING:
+    from app.services.vehicle_document_rag_service import RetrievedSource
+
+
+@dataclass
+class ChatConversation:
+    """A chat session's state while one of its questions is answered.
+
+    ``sources`` were retrieved with ``source_scope`` and ``include_invoice_docs``;
+    the most recently retrieved come first.
+    """
+
+    source_scope: str
+    include_invoice_docs: bool
+    summary: str = ""
+    turns: list[dict[str, Any]] = field(default_factory=list)
+    sources: list[RetrievedSource] = field(default_factory=list)
+
+    @property
+    def last_turn(self) -> Optional[dict[str, Any]]:
+        return self.turns[-1] if self.turns else None
+
+
+class ChatMemory:
+    """Follow-up queries, the cached source set and the rolling summary of a chat session.
+
+    The model only ever sees the summary and the previous turn, so prompt size
+    stays flat however long the conversation gets.
+    """
+
+    LAST_ANSWER_CHARS = 400
+    SUMMARY_ANSWER_CHARS = 240
+
+    def __init__(self, *, max_turns: int, max_sources: int, summary_chars: int, follow_up_max_terms: int) -> None:
+        self.max_turns = max_turns
+        self.max_sources = max_sources
+        self.summary_chars = summary_chars
+        self.follow_up_max_terms = follow_up_max_terms
+
+    def follow_up_query(self, conversation: ChatConversation, question: str) -> str:
+        """Short follow-ups ("and the torque for that?") are retrieved together with the previous question."""
+        last_turn = conversation.last_turn
+        if last_turn is None or len(self._terms(question)) > self.follow_up_max_terms:
+            return question
+        return f"{question} {last_turn['question']}"
+
+    def prompt_context(self, conversation: ChatConversation) -> str:
+        lines: list[str] = []
+        if conversation.summary:
+            lines.append(f"Summary: {conversation.summary}")
+        last_turn = conversation.last_turn
+        if last_turn is not None:
+            lines.append(f"Previous question: {last_turn['question']}")
+            lines.append(f"Previous answer: {self._shorten(last_turn['answer'], self.LAST_ANSWER_CHARS)}")
+        return "\n".join(lines)
+
+    def extend_sources(self, conversation: ChatConversation, sources: list[RetrievedSource]) -> None:
+        """Puts freshly retrieved sources first and drops the oldest beyond ``max_sources``."""
+        fresh_ids = {source.source_id for source in sources}
+        kept = [source for source in conversation.sources if source.source_id not in fresh_ids]
+        conversation.sources = [*sources, *kept][: self.max_sources]
+
+    def record_turn(
+        self,
+        conversation: ChatConversation,
+        *,
+        question: str,
+        response: dict[str, Any],
+        summary: Optional[str],
+    ) -> None:
+        """Appends the turn and rolls the summary forward.
+
+        ``summary`` is the model's updated summary; answers that did not come
+        from the model (structured, extractive) extend the previous one locally.
+        """
+        answer = str(response.get("answer") or "")
+        conversation.turns.append(
+            {
+                "question": question,
+                "answer": answer,
+                "answer_type": response.get("answer_type", "generated"),
+                "confidence_note": response.get("confidence_note", ""),
+                "citations": response.get("citations", []),
+                "created_at": datetime.utcnow().isoformat(),
+            }
+        )
+        conversation.turns = conversation.turns[-self.max_turns :]
+        if summary and summary.strip():
+            conversation.summary = summary.strip()[: self.summary_chars]
+        else:
+            conversation.summary = self._extend_summary(conversation.summary, question=question, answer=answer)
+
+    def _extend_summary(self, summary: str, *, question: str, answer: str) -> str:
+        entry = f"Q: {question} A: {self._shorten(answer, self.SUMMARY_ANSWER_CHARS)}"
+        combined = f"{summary}\n{entry}".strip()
+        if len(combined) <= self.summary_chars:
+            return combined
+        # Drop the oldest entries, cutting at an entry boundary when there is one.
+        combined = combined[-self.summary_chars :]
+        boundary = combined.find("\n")
+        return combined[boundary + 1 :] if boundary != -1 else combined
+
+    @staticmethod
+    def _shorten(text: str, limit: int) -> str:
+        text = re.sub(r"\s+", " ", text).strip()
+        return text if len(text) <= limit else text[: limit - 3].rstrip() + "..."
+
+    @staticmethod
+    def _terms(text: str) -> list[str]:
+        return re.findall(r"[a-z0-9]{2,}", normalize_text(text))
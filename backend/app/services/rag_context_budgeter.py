@@ -0,0 +1,191 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, replace
+from typing import TYPE_CHECKING, Callable, List, Optional, Sequence
+
+if TYPE_CHECKING:
+    from app.services.vehicle_document_rag_service import RetrievedSource
+
+Embedder = Callable[[str], List[float]]
+# (start, end) character span of a merged source's best-scoring chunk.
+Span = tuple[int, int]
+
+
+@dataclass
+class AssembledContext:
+    sources: list["RetrievedSource"]
+    input_sources: int = 0
+    merged_sources: int = 0
+    input_tokens: int = 0
+    context_tokens: int = 0
+
+    def as_log_extra(self) -> dict[str, int]:
+        return {
+            "input_sources": self.input_sources,
+            "context_sources": len(self.sources),
+            "merged_sources": self.merged_sources,
+            "input_tokens": self.input_tokens,
+            "context_tokens": self.context_tokens,
+        }
+
+
+class ContextBudgeter:
+    """Builds the answer prompt context from retrieved sources.
+
+    Adjacent chunks of the same document are merged into one source with their
+    shared overlap removed, the result is ordered with maximal marginal relevance so near-duplicate
+    passages do not crowd out other documents, and sources are added until the
+    token budget is spent. A source that does not fit is cut around the span
+    of its best-scoring chunk, so a merged run never loses its primary text.
+    """
+
+    # Rough chars-per-token ratio for Latin-script manuals; only used for budgeting.
+    CHARS_PER_TOKEN = 4
+    # Shortest suffix/prefix match treated as chunk overlap rather than coincidence.
+    MIN_OVERLAP_CHARS = 20
+    # A truncated source shorter than this is not worth a prompt slot.
+    MIN_TRUNCATED_TOKENS = 60
+
+    def __init__(
+        self,
+        *,
+        token_budget: int,
+        max_sources: int,
+        mmr_lambda: float,
+        max_overlap_chars: int,
+        embed: Embedder,
+    ) -> None:
+        self.token_budget = token_budget
+        self.max_sources = max_sources
+        self.mmr_lambda = mmr_lambda
+        self.max_overlap_chars = max_overlap_chars
+        self.embed = embed
+
+    def assemble(self, sources: Sequence["RetrievedSource"]) -> AssembledContext:
+        runs = self._merge_runs(sources)
+        focus = {id(source): span for source, span in runs}
+        ordered = self.diversify([source for source, _ in runs])
+        selected: list[RetrievedSource] = []
+        used_tokens = 0
+        for source in ordered:
+            if len(selected) >= self.max_sources:
+                break
+            remaining = self.token_budget - used_tokens
+            tokens = self.estimate_tokens(source.content)
+            if tokens > remaining:
+                if remaining < self.MIN_TRUNCATED_TOKENS and selected:
+                    continue
+                source = replace(source, content=self._truncate(source.content, remaining, focus=focus.get(id(source))))
+                tokens = self.estimate_tokens(source.content)
+            selected.append(source)
+            used_tokens += tokens
+
+        return AssembledContext(
+            sources=selected,
+            input_sources=len(sources),
+            merged_sources=len(sources) - len(runs),
+            input_tokens=sum(self.estimate_tokens(source.content) for source in sources),
+            context_tokens=used_tokens,
+        )
+
+    def merge_adjacent(self, sources: Sequence["RetrievedSource"]) -> list["RetrievedSource"]:
+        return [source for source, _ in self._merge_runs(sources)]
+
+    def _merge_runs(self, sources: Sequence["RetrievedSource"]) -> list[tuple["RetrievedSource", Span]]:
+        by_document: dict[int, list[RetrievedSource]] = {}
+        passthrough: list[RetrievedSource] = []
+        for source in sources:
+            if source.document_id is None or source.chunk_index is None:
+                passthrough.append(source)
+            else:
+                by_document.setdefault(source.document_id, []).append(source)
+
+        merged: list[tuple[RetrievedSource, Span]] = [(source, (0, len(source.content))) for source in passthrough]
+        for document_sources in by_document.values():
+            document_sources.sort(key=lambda item: item.chunk_index)
+            run = document_sources[0]
+            span = (0, len(run.content))
+            for source in document_sources[1:]:
+                if source.chunk_index <= run.chunk_index + 1:
+                    run, span = self._merge_pair(run, span, source)
+                else:
+                    merged.append((run, span))
+                    run = source
+                    span = (0, len(run.content))
+            merged.append((run, span))
+
+        merged.sort(key=lambda item: item[0].similarity, reverse=True)
+        return merged
+
+    def diversify(self, sources: Sequence["RetrievedSource"]) -> list["RetrievedSource"]:
+        if len(sources) <= 2:
+            return list(sources)
+        vectors = [self.embed(source.content) for source in sources]
+        remaining = list(range(len(sources)))
+        chosen: list[int] = []
+        while remaining:
+            best_index = max(
+                remaining,
+                key=lambda index: self.mmr_lambda * sources[index].similarity
+                - (1 - self.mmr_lambda) * max((self._cosine(vectors[index], vectors[other]) for other in chosen), default=0.0),
+            )
+            chosen.append(best_index)
+            remaining.remove(best_index)
+        return [sources[index] for index in chosen]
+
+    def estimate_tokens(self, text: str) -> int:
+        return max(1, -(-len(text) // self.CHARS_PER_TOKEN))
+
+    def _merge_pair(
+        self, first: "RetrievedSource", first_span: Span, second: "RetrievedSource"
+    ) -> tuple["RetrievedSource", Span]:
+        overlap = self._overlap_length(first.content, second.content)
+        content = f"{first.content}{second.content[overlap:]}" if overlap else f"{first.content} {second.content}"
+        # Keep the id of the best-scoring member so model citations resolve to a real chunk.
+        primary = first if first.similarity >= second.similarity else second
+        span = first_span if primary is first else (len(content) - len(second.content), len(content))
+        page_numbers = [page for page in (first.page_number, second.page_number) if page is not None]
+        return replace(
+            primary,
+            content=content,
+            page_number=min(page_numbers) if page_numbers else None,
+            chunk_index=second.chunk_index,
+            similarity=max(first.similarity, second.similarity),
+        ), span
+
+    def _overlap_length(self, left: str, right: str) -> int:
+        longest = min(len(left), len(right), self.max_overlap_chars)
+        for size in range(longest, self.MIN_OVERLAP_CHARS - 1, -1):
+            if left.endswith(right[:size]):
+                return size
+        return 0
+
+    def _truncate(self, content: str, tokens: int, focus: Optional[Span] = None) -> str:
+        limit = max(1, tokens) * self.CHARS_PER_TOKEN
+        if len(content) <= limit:
+            return content
+        focus_start, focus_end = focus or (0, len(content))
+        # Centre the window on the primary chunk; one that alone exceeds the limit keeps its head.
+        start = max(0, min(focus_start - max(0, limit - (focus_end - focus_start)) // 2, len(content) - limit))
+        if start > 0:
+            return self._truncate_window(content, start, limit)
+        cut = content[: max(0, limit - 3)]
+        sentence_end = max(cut.rfind(". "), cut.rfind("\n"))
+        if sentence_end >= len(cut) // 2:
+            cut = cut[: sentence_end + 1]
+        else:
+            cut = re.sub(r"\s+\S*$", "", cut)
+        return cut.rstrip() + "..."
+
+    def _truncate_window(self, content: str, start: int, limit: int) -> str:
+        end = len(content) if start + limit >= len(content) else start + limit - 3
+        window = re.sub(r"^\S*\s+", "", content[start + 3 : end])
+        if end < len(content):
+            window = re.sub(r"\s+\S*$", "", window).rstrip() + "..."
+        return "..." + window.lstrip()
+
+    @staticmethod
+    def _cosine(left: Sequence[float], right: Sequence[float]) -> float:
+        # Embeddings are L2-normalised, so the dot product is the cosine similarity.
+        return sum(a * b for a, b in zip(left, right))
@@ -0,0 +1,380 @@
+from __future__ import annotations
+
+import codecs
+import posixpath
+import re
+import zipfile
+from html.parser import HTMLParser
+from pathlib import Path
+from typing import IO, Iterable, Iterator, Optional
+from urllib.parse import unquote
+from xml.etree import ElementTree
+
+WORD = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+SHEET = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+PACKAGE_REL = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+OFFICE_REL = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+OPF = "{http://www.idpf.org/2007/opf}"
+CONTAINER = "{urn:oasis:names:tc:opendocument:xmlns:container}"
+
+# Block stream marker for a page boundary the source format defines (Word page break, sheet, EPUB chapter).
+PAGE_BREAK = None
+
+HTML_SKIPPED_TAGS = frozenset({"script", "style", "noscript", "template", "head", "svg"})
+HTML_BLOCK_TAGS = frozenset(
+    {
+        "p", "div", "section", "article", "header", "footer", "aside", "main", "nav", "li", "ul", "ol", "dl",
+        "dt", "dd", "blockquote", "pre", "br", "hr", "figure", "figcaption", "caption", "table",
+        "h1", "h2", "h3", "h4", "h5", "h6",
+    }
+)
+HTML_READ_BYTES = 64 * 1024
+
+
+class TableRenderer:
+    """Turns table rows into self-contained lines.
+
+    When the first row looks like a header, every later row is written as
+    ``Header: value; Header: value.`` so a chunk cut mid-table still says what
+    each value is; otherwise cells are joined with `` | ``.
+    """
+
+    def __init__(self) -> None:
+        self.header: Optional[list[str]] = None
+        self.rows = 0
+
+    def render(self, cells: list[str]) -> str:
+        cells = [re.sub(r"\s+", " ", cell).strip() for cell in cells]
+        while cells and not cells[-1]:
+            cells.pop()
+        if not any(cells):
+            return ""
+        self.rows += 1
+        if self.rows == 1 and self._looks_like_header(cells):
+            self.header = cells
+            return " | ".join(cells) + "."
+        if self.header is not None:
+            pairs = [
+                f"{self.header[index]}: {value}" if index < len(self.header) and self.header[index] else value
+                for index, value in enumerate(cells)
+                if value
+            ]
+            return "; ".join(pairs) + "."
+        return " | ".join(cell for cell in cells if cell) + "."
+
+    @staticmethod
+    def _looks_like_header(cells: list[str]) -> bool:
+        return len(cells) >= 2 and all(cells) and not any(re.fullmatch(r"[\d.,\s%+-]+", cell) for cell in cells)
+
+
+def paginate(blocks: Iterable[Optional[str]], *, page_chars: int) -> list[str]:
+    """Groups text blocks into pages of up to ``page_chars``, starting a new page at every ``PAGE_BREAK``.
+
+    A single block longer than ``page_chars`` stays whole on its own page.
+    """
+    pages: list[str] = []
+    current: list[str] = []
+    size = 0
+    for block in blocks:
+        if block is PAGE_BREAK:
+            if current:
+                pages.append("\n".join(current))
+            current, size = [], 0
+            continue
+        block = block.strip()
+        if not block:
+            continue
+        if current and size + len(block) > page_chars:
+            pages.append("\n".join(current))
+            current, size = [], 0
+        current.append(block)
+        size += len(block) + 1
+    if current:
+        pages.append("\n".join(current))
+    return pages
+
+
+class LocalDocumentParser:
+    """Extracts DOCX, XLSX, HTML and EPUB text on CPU, without model calls.
+
+    Files are read as streams (zip members through ``iterparse``, HTML in
+    fixed-size reads) and elements are dropped once read, so no DOM of the
+    whole document is ever built. Word page
+    breaks, worksheets and EPUB chapters start new pages; pages are also cut at
+    ``page_chars`` so page fetches stay small. Tables keep one line per row.
+    """
+
+    SUFFIXES = frozenset({".docx", ".xlsx", ".html", ".htm", ".epub"})
+
+    def __init__(self, *, page_chars: int) -> None:
+        self.page_chars = page_chars
+
+    def parse(self, file_path: str) -> list[str]:
+        suffix = Path(file_path).suffix.lower()
+        if suffix not in self.SUFFIXES:
+            raise ValueError(f"No local parser for {suffix} files")
+        try:
+            if suffix in {".html", ".htm"}:
+                with open(file_path, "rb") as stream:
+                    blocks = list(self._html_blocks(stream))
+            else:
+                with zipfile.ZipFile(file_path) as archive:
+                    if suffix == ".docx":
+                        blocks = list(self._docx_blocks(archive))
+                    elif suffix == ".xlsx":
+                        blocks = list(self._xlsx_blocks(archive))
+                    else:
+                        blocks = list(self._epub_blocks(archive))
+        except (zipfile.BadZipFile, KeyError, ElementTree.ParseError) as exc:
+            raise ValueError(f"Could not read {suffix} document: {exc}") from exc
+        return paginate(blocks, page_chars=self.page_chars)
+
+    def _docx_blocks(self, archive: zipfile.ZipFile) -> Iterator[Optional[str]]:
+        table_depth = 0
+        table: Optional[TableRenderer] = None
+        cells: list[str] = []
+        with archive.open("word/document.xml") as stream:
+            for event, element in ElementTree.iterparse(stream, events=("start", "end")):
+                tag = element.tag
+                if event == "start":
+                    if tag == f"{WORD}tbl":
+                        table_depth += 1
+                        if table_depth == 1:
+                            table = TableRenderer()
+                    continue
+                if tag == f"{WORD}p" and table_depth == 0:
+                    text, page_break = self._docx_paragraph(element)
+                    if page_break:
+                        yield PAGE_BREAK
+                    yield text
+                    element.clear()
+                elif table_depth == 1 and tag == f"{WORD}tc":
+                    cells.append(" ".join(self._docx_paragraph(paragraph)[0] for paragraph in element.iter(f"{WORD}p")))
+                elif table_depth == 1 and tag == f"{WORD}tr":
+                    yield table.render(cells)
+                    cells = []
+                    element.clear()
+                elif tag == f"{WORD}tbl":
+                    table_depth -= 1
+                    if table_depth == 0:
+                        element.clear()
+
+    @staticmethod
+    def _docx_paragraph(paragraph: ElementTree.Element) -> tuple[str, bool]:
+        """The paragraph's text, with heading styles as Markdown, and whether it starts a new page."""
+        parts: list[str] = []
+        page_break = False
+        for node in paragraph.iter():
+            if node.tag == f"{WORD}t" and node.text:
+                parts.append(node.text)
+            elif node.tag in {f"{WORD}tab", f"{WORD}cr"}:
+                parts.append(" ")
+            elif node.tag == f"{WORD}br":
+                if node.get(f"{WORD}type") == "page":
+                    page_break = True
+                parts.append(" ")
+            elif node.tag == f"{WORD}lastRenderedPageBreak":
+                page_break = True
+        text = "".join(parts).strip()
+        style = paragraph.find(f"{WORD}pPr/{WORD}pStyle")
+        style_id = (style.get(f"{WORD}val") or "").lower() if style is not None else ""
+        # Word's style ids are localized ("Heading2", "Ttulo2").
+        heading = re.fullmatch(r"(?:heading|ttulo|titulo)(\d)", style_id)
+        if text and heading:
+            text = f"{'#' * int(heading.group(1))} {text}"
+        return text, page_break
+
+    def _xlsx_blocks(self, archive: zipfile.ZipFile) -> Iterator[Optional[str]]:
+        shared_strings = self._xlsx_shared_strings(archive)
+        targets = self._relationship_targets(archive, "xl/_rels/workbook.xml.rels", base="xl")
+        with archive.open("xl/workbook.xml") as stream:
+            sheets = [
+                (sheet.get("name") or "", targets.get(sheet.get(f"{OFFICE_REL}id") or ""))
+                for sheet in ElementTree.parse(stream).getroot().iter(f"{SHEET}sheet")
+                if sheet.get("state") not in {"hidden", "veryHidden"}
+            ]
+        for name, target in sheets:
+            if target is None or target not in archive.namelist():
+                continue
+            yield PAGE_BREAK
+            yield f"## {name}"
+            table = TableRenderer()
+            cells: dict[int, str] = {}
+            with archive.open(target) as stream:
+                for _, element in ElementTree.iterparse(stream):
+                    if element.tag == f"{SHEET}c":
+                        value = self._xlsx_cell_value(element, shared_strings)
+                        if value:
+                            cells[self._column_index(element.get("r"), default=len(cells))] = value
+                    elif element.tag == f"{SHEET}row":
+                        if cells:
+                            yield table.render([cells.get(index, "") for index in range(max(cells) + 1)])
+                        cells = {}
+                        element.clear()
+
+    @staticmethod
+    def _xlsx_shared_strings(archive: zipfile.ZipFile) -> list[str]:
+        if "xl/sharedStrings.xml" not in archive.namelist():
+            return []
+        strings: list[str] = []
+        with archive.open("xl/sharedStrings.xml") as stream:
+            for _, element in ElementTree.iterparse(stream):
+                if element.tag == f"{SHEET}si":
+                    # Plain or rich-text runs; phonetic runs (rPh) only repeat the text as a reading guide.
+                    runs = element.findall(f"{SHEET}t") + element.findall(f"{SHEET}r/{SHEET}t")
+                    strings.append("".join(node.text or "" for node in runs))
+                    element.clear()
+        return strings
+
+    @staticmethod
+    def _xlsx_cell_value(cell: ElementTree.Element, shared_strings: list[str]) -> str:
+        cell_type = cell.get("t")
+        if cell_type == "inlineStr":
+            return "".join(node.text or "" for node in cell.iter(f"{SHEET}t"))
+        raw = cell.findtext(f"{SHEET}v")
+        if raw is None or cell_type == "e":
+            return ""
+        if cell_type == "s":
+            index = int(raw)
+            return shared_strings[index] if 0 <= index < len(shared_strings) else ""
+        if cell_type == "b":
+            return "TRUE" if raw == "1" else "FALSE"
+        if cell_type in {"str", "d"}:
+            return raw
+        try:
+            # Drop binary float noise such as 3.3999999999999999.
+            return f"{float(raw):.10g}"
+        except ValueError:
+            return raw
+
+    @staticmethod
+    def _column_index(reference: Optional[str], *, default: int) -> int:
+        letters = re.match(r"[A-Z]+", reference or "")
+        if letters is None:
+            return default
+        index = 0
+        for letter in letters.group(0):
+            index = index * 26 + ord(letter) - ord("A") + 1
+        return index - 1
+
+    def _epub_blocks(self, archive: zipfile.ZipFile) -> Iterator[Optional[str]]:
+        with archive.open("META-INF/container.xml") as stream:
+            rootfile = ElementTree.parse(stream).getroot().find(f"{CONTAINER}rootfiles/{CONTAINER}rootfile")
+        if rootfile is None or not rootfile.get("full-path"):
+            raise KeyError("EPUB container has no rootfile")
+        package_path = rootfile.get("full-path")
+        with archive.open(package_path) as stream:
+            package = ElementTree.parse(stream).getroot()
+        base = posixpath.dirname(package_path)
+        manifest = {
+            item.get("id"): posixpath.normpath(posixpath.join(base, unquote(item.get("href") or "")))
+            for item in package.iter(f"{OPF}item")
+        }
+        names = set(archive.namelist())
+        for itemref in package.iter(f"{OPF}itemref"):
+            chapter = manifest.get(itemref.get("idref"))
+            if chapter is None or chapter not in names:
+                continue
+            yield PAGE_BREAK
+            with archive.open(chapter) as stream:
+                yield from self._html_blocks(stream)
+
+    @staticmethod
+    def _html_blocks(stream: IO[bytes]) -> Iterator[Optional[str]]:
+        parser = HtmlTextParser()
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        while True:
+            data = stream.read(HTML_READ_BYTES)
+            parser.feed(decoder.decode(data, final=not data))
+            yield from parser.drain()
+            if not data:
+                break
+        parser.close()
+        yield from parser.drain()
+
+    @staticmethod
+    def _relationship_targets(archive: zipfile.ZipFile, rels_path: str, *, base: str) -> dict[str, str]:
+        with archive.open(rels_path) as stream:
+            relationships = ElementTree.parse(stream).getroot().iter(f"{PACKAGE_REL}Relationship")
+            return {
+                relationship.get("Id") or "": (
+                    target.lstrip("/") if target.startswith("/") else posixpath.normpath(posixpath.join(base, target))
+                )
+                for relationship in relationships
+                if (target := relationship.get("Target") or "")
+            }
+
+
+class HtmlTextParser(HTMLParser):
+    """Collects HTML text as blocks: one per paragraph-like element and one per table row."""
+
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.blocks: list[str] = []
+        self.buffer: list[str] = []
+        self.heading_level = 0
+        self.skip_depth = 0
+        self.tables: list[TableRenderer] = []
+        self.row: Optional[list[str]] = None
+        self.cell: Optional[list[str]] = None
+
+    def drain(self) -> list[str]:
+        blocks, self.blocks = self.blocks, []
+        return blocks
+
+    def handle_starttag(self, tag: str, attrs) -> None:
+        if tag in HTML_SKIPPED_TAGS:
+            self.skip_depth += 1
+        elif tag == "table":
+            self._flush()
+            self.tables.append(TableRenderer())
+        elif tag == "tr" and self.tables:
+            self.row = []
+        elif tag in {"td", "th"} and self.row is not None:
+            self._end_cell()
+            self.cell = []
+        elif tag in HTML_BLOCK_TAGS and self.cell is None:
+            self._flush()
+            if re.fullmatch(r"h[1-6]", tag):
+                self.heading_level = int(tag[1])
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag in HTML_SKIPPED_TAGS:
+            self.skip_depth = max(0, self.skip_depth - 1)
+        elif tag in {"td", "th"}:
+            self._end_cell()
+        elif tag == "tr":
+            self._end_row()
+        elif tag == "table" and self.tables:
+            self._end_row()
+            self.tables.pop()
+        elif tag in HTML_BLOCK_TAGS and self.cell is None:
+            self._flush()
+
+    def handle_data(self, data: str) -> None:
+        if self.skip_depth:
+            return
+        (self.cell if self.cell is not None else self.buffer).append(data)
+
+    def close(self) -> None:
+        super().close()
+        self._end_row()
+        self._flush()
+
+    def _end_cell(self) -> None:
+        if self.cell is not None and self.row is not None:
+            self.row.append("".join(self.cell))
+        self.cell = None
+
+    def _end_row(self) -> None:
+        self._end_cell()
+        if self.row is not None and self.tables:
+            self.blocks.append(self.tables[-1].render(self.row))
+        self.row = None
+
+    def _flush(self) -> None:
+        text = re.sub(r"\s+", " ", "".join(self.buffer)).strip()
+        if text:
+            self.blocks.append(f"{'#' * self.heading_level} {text}" if self.heading_level else text)
+        self.buffer = []
+        self.heading_level = 0
@@ -0,0 +1,239 @@
+from __future__ import annotations
+
+import logging
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional, Sequence
+
+from app.services.rag_query_expansion import normalize_text
+
+logger = logging.getLogger(__name__)
+
+Summarize = Callable[[str], dict[str, Any]]
+ProgressCallback = Callable[[int, int], None]
+
+SUMMARY_LEVELS = ("section", "chapter", "document")
+
+# Questions asking for an overview rather than one value; they are answered from a summary node.
+BROAD_QUESTION_TERMS = frozenset(
+    {
+        "summarize", "summarise", "summary", "overview", "outline", "schedule", "list", "main", "general",
+        "explain", "describe", "contents", "chapter", "section",
+        "resume", "resumen", "resumir", "resumeme", "esquema", "calendario", "plan", "lista", "todos", "todas",
+        "principales", "explica", "contenido", "capitulo", "seccion", "apartado",
+    }
+)
+
+
+@dataclass
+class SummaryNode:
+    level: str
+    position: int
+    page_start: Optional[int]
+    page_end: Optional[int]
+    # Source text of a section; chapters and the document are summarized from their children.
+    text: str = ""
+    title: str = ""
+    summary: str = ""
+    children: list[SummaryNode] = field(default_factory=list)
+
+    def walk(self) -> list[SummaryNode]:
+        """This node followed by its descendants, parents before children."""
+        nodes = [self]
+        for child in self.children:
+            nodes.extend(child.walk())
+        return nodes
+
+
+def is_broad_question(question: str) -> bool:
+    return bool(set(re.findall(r"[a-z]+", normalize_text(question))) & BROAD_QUESTION_TERMS)
+
+
+def pick_summary_level(candidates: Sequence[tuple[str, float]], *, margin: float) -> Optional[int]:
+    """Index of the broadest candidate scoring at least ``margin`` of the best one.
+
+    ``candidates`` are ``(level, similarity)`` pairs. A document summary that is
+    nearly as close as the best section covers the question with one node; a
+    section that is clearly closer wins over a vaguer document summary.
+    """
+    if not candidates:
+        return None
+    best = max(similarity for _, similarity in candidates)
+    if best <= 0:
+        return None
+    eligible = [index for index, (_, similarity) in enumerate(candidates) if similarity >= margin * best]
+    return max(eligible, key=lambda index: (SUMMARY_LEVELS.index(candidates[index][0]), candidates[index][1]))
+
+
+class DocumentSummaryBuilder:
+    """Builds a document's section -> chapter -> document summary tree.
+
+    Sections are runs of consecutive pages up to ``section_chars``; chapters
+    group ``sections_per_chapter`` sections and are skipped when there would be
+    only one. Every node of a level is summarized concurrently before the level
+    above it. A node whose summary fails is dropped (a failed chapter hands its
+    sections to the document); without a document summary there is no tree.
+    """
+
+    def __init__(self, *, max_workers: int, section_chars: int, sections_per_chapter: int) -> None:
+        self.max_workers = max(1, max_workers)
+        self.section_chars = section_chars
+        self.sections_per_chapter = max(2, sections_per_chapter)
+
+    def build(
+        self,
+        *,
+        document_label: str,
+        pages: Sequence[tuple[int, str]],
+        summarize: Summarize,
+        progress_callback: Optional[ProgressCallback] = None,
+    ) -> Optional[SummaryNode]:
+        sections = self.split_sections(pages)
+        if not sections:
+            return None
+        chapter_count = len(self._group(sections)) if len(sections) > self.sections_per_chapter else 0
+        total = len(sections) + chapter_count + 1
+        completed = 0
+
+        def report(count: int) -> None:
+            nonlocal completed
+            completed += count
+            if progress_callback is not None:
+                progress_callback(completed, total)
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(sections))) as executor:
+            sections = self._summarize_level(
+                executor, sections, document_label=document_label, summarize=summarize, report=report
+            )
+            if not sections:
+                return None
+            children = sections
+            if len(sections) > self.sections_per_chapter:
+                chapters = [
+                    SummaryNode(
+                        level="chapter",
+                        position=position,
+                        page_start=group[0].page_start,
+                        page_end=group[-1].page_end,
+                        children=group,
+                    )
+                    for position, group in enumerate(self._group(sections))
+                ]
+                summarized = self._summarize_level(
+                    executor, chapters, document_label=document_label, summarize=summarize, report=report
+                )
+                kept = {id(chapter) for chapter in summarized}
+                children = []
+                for chapter in chapters:
+                    children.extend([chapter] if id(chapter) in kept else chapter.children)
+
+        root = SummaryNode(
+            level="document",
+            position=0,
+            page_start=sections[0].page_start,
+            page_end=sections[-1].page_end,
+            children=children,
+        )
+        summarized_root = self._summarize_node(root, document_label=document_label, summarize=summarize)
+        # Dropped sections can leave fewer chapters than estimated.
+        report(total - completed)
+        return summarized_root
+
+    def split_sections(self, pages: Sequence[tuple[int, str]]) -> list[SummaryNode]:
+        sections: list[SummaryNode] = []
+        for page_number, text in pages:
+            text = re.sub(r"\s+", " ", text).strip()
+            if not text:
+                continue
+            current = sections[-1] if sections else None
+            if current is not None and len(current.text) + len(text) < self.section_chars:
+                current.text = f"{current.text}\n{text}"
+                current.page_end = page_number
+                continue
+            sections.append(
+                SummaryNode(
+                    level="section",
+                    position=len(sections),
+                    page_start=page_number,
+                    page_end=page_number,
+                    text=text[: self.section_chars],
+                )
+            )
+        return sections
+
+    def _group(self, sections: list[SummaryNode]) -> list[list[SummaryNode]]:
+        size = self.sections_per_chapter
+        return [sections[start : start + size] for start in range(0, len(sections), size)]
+
+    def _summarize_level(
+        self,
+        executor: ThreadPoolExecutor,
+        nodes: list[SummaryNode],
+        *,
+        document_label: str,
+        summarize: Summarize,
+        report: Callable[[int], None],
+    ) -> list[SummaryNode]:
+        """Summarizes ``nodes`` concurrently and returns those that succeeded, in order."""
+        futures = {
+            executor.submit(self._summarize_node, node, document_label=document_label, summarize=summarize): index
+            for index, node in enumerate(nodes)
+        }
+        summarized: dict[int, SummaryNode] = {}
+        # Progress is reported from this thread so callers can safely touch their DB session.
+        for future in as_completed(futures):
+            node = future.result()
+            if node is not None:
+                summarized[futures[future]] = node
+            report(1)
+        return [summarized[index] for index in sorted(summarized)]
+
+    def _summarize_node(self, node: SummaryNode, *, document_label: str, summarize: Summarize) -> Optional[SummaryNode]:
+        try:
+            payload = summarize(self._build_prompt(node, document_label=document_label))
+        except Exception:
+            logger.warning(
+                "Document summary failed",
+                extra={"level": node.level, "page_start": node.page_start, "page_end": node.page_end},
+                exc_info=True,
+            )
+            return None
+        summary = str(payload.get("summary") or "").strip()
+        if not summary:
+            return None
+        node.summary = summary
+        node.title = str(payload.get("title") or "").strip()[:160]
+        return node
+
+    def _build_prompt(self, node: SummaryNode, *, document_label: str) -> str:
+        pages = f"páginas {node.page_start}-{node.page_end}" if node.page_start != node.page_end else f"página {node.page_start}"
+        if node.level == "section":
+            article = "las" if node.page_start != node.page_end else "la"
+            instruction = f'Resume {article} {pages} del documento "{document_label}".'
+            body = node.text
+        else:
+            if node.level == "chapter":
+                instruction = f'Resume el capítulo ({pages}) del documento "{document_label}" a partir de los resúmenes de sus secciones.'
+            else:
+                instruction = f'Resume el documento "{document_label}" completo a partir de los resúmenes de sus partes.'
+            body = "\n\n".join(
+                f"- {child.title or f'Parte {child.position + 1}'} (páginas {child.page_start}-{child.page_end}): {child.summary}"
+                for child in node.children
+            )
+        return f"""
+{instruction}
+Responde SOLO con JSON válido:
+{{
+  "title": "título corto",
+  "summary": "string"
+}}
+
+Reglas:
+- Escribe en el idioma del documento, en un máximo de 250 palabras.
+- Conserva intervalos de mantenimiento, capacidades, especificaciones, pares de apriete y referencias.
+- No inventes contenido que no aparezca en el texto.
+
+Texto:
+{body}
+"""
@@ -0,0 +1,215 @@
+from __future__ import annotations
+
+import re
+import unicodedata
+from typing import Mapping
+
+# Spanish -> English automotive vocabulary; "/" separates English synonyms. Spanish keys
+# keep their accents so the reverse direction emits the spelling used in Spanish
+# manuals; matching ignores them.
+AUTOMOTIVE_TERMS_ES_EN: dict[str, str] = {
+    "par de apriete": "tightening torque",
+    "par de torsión": "torque",
+    "apriete": "tightening",
+    "aceite de motor": "engine oil",
+    "aceite": "oil",
+    "filtro de aceite": "oil filter",
+    "filtro de aire": "air filter",
+    "filtro de combustible": "fuel filter",
+    "filtro de habitáculo": "cabin filter",
+    "combustible": "fuel",
+    "gasolina": "petrol/gasoline",
+    "gasóleo": "diesel",
+    "líquido de frenos": "brake fluid",
+    "líquido refrigerante": "coolant",
+    "refrigerante": "coolant",
+    "anticongelante": "antifreeze",
+    "pastillas de freno": "brake pads",
+    "pastillas": "brake pads",
+    "zapatas": "brake shoes",
+    "disco de freno": "brake disc",
+    "discos": "discs",
+    "pinza de freno": "brake caliper",
+    "pinza": "caliper",
+    "bomba de freno": "brake master cylinder",
+    "freno": "brake",
+    "frenos": "brakes",
+    "embrague": "clutch",
+    "caja de cambios": "gearbox/transmission",
+    "palanca de cambio": "gear lever",
+    "cambiar": "change/replace",
+    "marcha": "gear",
+    "cadena": "chain",
+    "tensión de la cadena": "chain tension",
+    "correa de distribución": "timing belt",
+    "cadena de distribución": "timing chain",
+    "correa": "belt",
+    "piñón": "sprocket",
+    "corona": "rear sprocket",
+    "neumático": "tyre/tire",
+    "neumáticos": "tyres/tires",
+    "presión de los neumáticos": "tyre pressure",
+    "presión": "pressure",
+    "rueda": "wheel",
+    "ruedas": "wheels",
+    "rueda delantera": "front wheel",
+    "rueda trasera": "rear wheel",
+    "llanta": "rim",
+    "eje": "axle",
+    "eje trasero": "rear axle",
+    "eje delantero": "front axle",
+    "tuerca": "nut",
+    "tuercas": "nuts",
+    "tornillo": "bolt/screw",
+    "tornillos": "bolts/screws",
+    "arandela": "washer",
+    "junta": "gasket/seal",
+    "retén": "oil seal",
+    "bujía": "spark plug",
+    "bujías": "spark plugs",
+    "batería": "battery",
+    "fusible": "fuse",
+    "fusibles": "fuses",
+    "alternador": "alternator",
+    "motor de arranque": "starter motor",
+    "arranque": "starter",
+    "motor": "engine",
+    "culata": "cylinder head",
+    "cilindro": "cylinder",
+    "pistón": "piston",
+    "válvula": "valve",
+    "válvulas": "valves",
+    "holgura de válvulas": "valve clearance",
+    "árbol de levas": "camshaft",
+    "cigüeñal": "crankshaft",
+    "inyector": "injector",
+    "inyección": "injection",
+    "acelerador": "throttle",
+    "escape": "exhaust",
+    "radiador": "radiator",
+    "ventilador": "fan",
+    "termostato": "thermostat",
+    "suspensión": "suspension",
+    "horquilla": "fork",
+    "amortiguador": "shock absorber",
+    "muelle": "spring",
+    "precarga": "preload",
+    "dirección": "steering",
+    "manillar": "handlebar",
+    "rodamiento": "bearing",
+    "rodamientos": "bearings",
+    "bastidor": "frame",
+    "chasis": "chassis",
+    "faro": "headlight",
+    "intermitente": "indicator/turn signal",
+    "bombilla": "bulb",
+    "cuadro de instrumentos": "instrument panel/dashboard",
+    "testigo": "warning light",
+    "sensor": "sensor",
+    "capacidad": "capacity",
+    "viscosidad": "viscosity",
+    "nivel": "level",
+    "cambio de aceite": "oil change",
+    "mantenimiento": "maintenance/service",
+    "revisión": "service/inspection",
+    "intervalo": "interval",
+    "intervalos": "intervals",
+    "kilómetros": "kilometres/km",
+    "sustituir": "replace",
+    "sustitución": "replacement",
+    "desmontar": "remove",
+    "montar": "install",
+    "purgar": "bleed",
+    "purga": "bleeding",
+    "ajustar": "adjust",
+    "ajuste": "adjustment",
+    "holgura": "clearance/play",
+    "desgaste": "wear",
+    "especificaciones": "specifications",
+    "manual de taller": "workshop manual",
+    "manual del propietario": "owner manual",
+}
+
+# Function words that almost only occur in one of the two languages.
+SPANISH_MARKERS = frozenset(
+    {
+        "que", "cual", "cuales", "cuanto", "cuanta", "cuantos", "cuantas", "como", "donde", "cuando",
+        "por", "para", "del", "los", "las", "una", "unos", "el", "la", "de", "en", "con", "se", "hay",
+        "debo", "tengo", "puedo", "hace", "lleva", "cada", "mi", "moto", "coche", "es", "son", "hasta",
+    }
+)
+ENGLISH_MARKERS = frozenset(
+    {
+        "what", "which", "how", "when", "where", "why", "the", "is", "are", "does", "do", "should",
+        "can", "my", "of", "for", "to", "and", "with", "much", "many", "often", "every", "bike", "car",
+    }
+)
+SPANISH_ORTHOGRAPHY = re.compile(r"[¿¡ñáéíóúü]")
+
+
+def normalize_text(text: str) -> str:
+    """Lowercases, strips accents and collapses whitespace."""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return re.sub(r"\s+", " ", stripped).strip()
+
+
+class LocalQueryExpander:
+    """Dictionary-based ES<->EN query expansion and language detection.
+
+    The retrieval query is the question followed by the other language's
+    wording for every automotive term it contains, so chunks from Spanish and
+    English manuals both match without a model call.
+    """
+
+    def __init__(self, terms: Mapping[str, str] = AUTOMOTIVE_TERMS_ES_EN) -> None:
+        self.es_to_en = {normalize_text(spanish): english.replace("/", " ") for spanish, english in terms.items()}
+        self.en_to_es: dict[str, str] = {}
+        for spanish, english in terms.items():
+            for synonym in english.split("/"):
+                self.en_to_es.setdefault(normalize_text(synonym), spanish)
+        self._es_pattern = self._compile(self.es_to_en)
+        self._en_pattern = self._compile(self.en_to_es)
+
+    def expand(self, question: str) -> dict[str, str]:
+        language = self.detect_language(question)
+        translations: list[str] = []
+        if language != "en":
+            translations.extend(self.translate_terms(question, source_language="es"))
+        if language != "es":
+            translations.extend(self.translate_terms(question, source_language="en"))
+        retrieval_query = " ".join([question.strip(), *translations])
+        return {"retrieval_query": retrieval_query, "detected_language": language}
+
+    def detect_language(self, text: str) -> str:
+        """Returns ``es``, ``en`` or ``unknown``."""
+        normalized = normalize_text(text)
+        words = re.findall(r"[a-z]+", normalized)
+        spanish_score = sum(word in SPANISH_MARKERS for word in words)
+        english_score = sum(word in ENGLISH_MARKERS for word in words)
+        if SPANISH_ORTHOGRAPHY.search(text.lower()):
+            spanish_score += 2
+        spanish_score += len(self._es_pattern.findall(normalized))
+        english_score += len(self._en_pattern.findall(normalized))
+        if spanish_score > english_score:
+            return "es"
+        if english_score > spanish_score:
+            return "en"
+        return "unknown"
+
+    def translate_terms(self, text: str, *, source_language: str) -> list[str]:
+        pattern, mapping = (
+            (self._es_pattern, self.es_to_en) if source_language == "es" else (self._en_pattern, self.en_to_es)
+        )
+        translations: list[str] = []
+        for match in pattern.finditer(normalize_text(text)):
+            translation = mapping[match.group(0)]
+            if translation not in translations:
+                translations.append(translation)
+        return translations
+
+    @staticmethod
+    def _compile(terms: Mapping[str, str]) -> re.Pattern[str]:
+        # Longest first so "par de apriete" wins over "apriete".
+        alternatives = sorted(terms, key=len, reverse=True)
+        return re.compile(r"\b(?:" + "|".join(re.escape(term) for term in alternatives) + r")\b")
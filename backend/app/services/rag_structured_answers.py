@@ -0,0 +1,288 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from sqlmodel import Session, select
+
+from app.models import VehicleDocument, VehicleKnowledgeFact, VehicleSpecs
+from app.services.rag_query_expansion import LocalQueryExpander, normalize_text
+
+
+def stem(token: str) -> str:
+    """Crude plural folding shared by English and Spanish ("nuts" -> "nut", "tuercas" -> "tuerca")."""
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def stems(*words: str) -> frozenset[str]:
+    return frozenset(stem(word) for word in words)
+
+
+@dataclass(frozen=True)
+class LookupIntent:
+    name: str
+    spec_field: str
+    fact_categories: tuple[str, ...]
+    # Any of these terms marks the question as this lookup...
+    triggers: frozenset[str]
+    # ...every group here must be hit as well (e.g. "size" for tyres)...
+    required: tuple[frozenset[str], ...] = ()
+    # ...and none of these may appear (fork oil is not engine oil).
+    excludes: frozenset[str] = frozenset()
+    labels: tuple[str, str] = ("", "")  # (en, es)
+
+
+# Terms that turn a lookup into a how-to, interval or quantity question the manuals answer better.
+NON_LOOKUP_TERMS = stems(
+    "change", "changing", "replace", "replacing", "interval", "often", "every", "when", "capacity", "how",
+    "much", "many", "level", "check", "drain", "filter", "leak", "procedure", "pressure", "bleed", "charge",
+    "liters", "litres", "cambio", "cambia", "cambiar", "sustituir", "intervalo", "cada", "cuando", "capacidad",
+    "como", "cuanto", "cuanta", "nivel", "comprobar", "vaciar", "filtro", "fuga", "procedimiento", "presion",
+    "purgar", "cargar", "litros",
+)
+TORQUE_TERMS = stems("torque", "tightening", "tighten", "nm", "par", "apriete", "apretar")
+
+LOOKUP_INTENTS: tuple[LookupIntent, ...] = (
+    LookupIntent(
+        name="engine_oil",
+        spec_field="engine_oil_type",
+        fact_categories=("fluids", "specs"),
+        triggers=stems("oil", "aceite", "lubricante"),
+        excludes=stems(
+            "fork", "horquilla", "gearbox", "transmission", "caja", "brake", "freno", "chain", "cadena",
+            "suspension", "shock", "amortiguador", "differential", "diferencial",
+        ),
+        labels=("Engine oil", "Aceite de motor"),
+    ),
+    LookupIntent(
+        name="coolant",
+        spec_field="coolant_type",
+        fact_categories=("fluids", "specs"),
+        triggers=stems("coolant", "antifreeze", "refrigerante", "anticongelante"),
+        labels=("Coolant", "Refrigerante"),
+    ),
+    LookupIntent(
+        name="tire_size",
+        spec_field="tire_size",
+        fact_categories=("specs", "parts"),
+        triggers=stems("tire", "tyre", "neumatico", "rueda"),
+        required=(stems("size", "medida", "tamano", "dimension", "dimensiones"),),
+        labels=("Tyre size", "Medida de neumático"),
+    ),
+    LookupIntent(
+        name="battery",
+        spec_field="battery_type",
+        fact_categories=("specs", "parts"),
+        triggers=stems("battery", "bateria"),
+        labels=("Battery", "Batería"),
+    ),
+    LookupIntent(
+        name="fuel",
+        spec_field="fuel_type",
+        fact_categories=("fluids", "specs"),
+        triggers=stems("fuel", "petrol", "gasoline", "octane", "combustible", "gasolina", "octanos"),
+        excludes=stems("pump", "bomba", "tank", "deposito", "consumption", "consumo", "injector", "inyector"),
+        labels=("Fuel", "Combustible"),
+    ),
+)
+
+CONFIDENCE_NOTES = {
+    "en": "Answered directly from the vehicle's saved specifications and extracted facts.",
+    "es": "Respondido directamente con las especificaciones guardadas y los datos extraídos del vehículo.",
+}
+
+
+@dataclass
+class StructuredAnswer:
+    intent: str
+    answer: str
+    citations: list[dict[str, Any]]
+    confidence_note: str
+
+
+class StructuredAnswerMatcher:
+    """Answers spec lookups (oil, coolant, tyre size, battery, fuel, bolt torques)
+    from ``VehicleSpecs`` and ``VehicleKnowledgeFact`` without a model call.
+
+    Returns ``None`` unless exactly one lookup intent is recognised and a
+    stored value backs it, so anything ambiguous goes through full RAG.
+    """
+
+    # Share of a torque component's or torque fact title's terms that must appear in the question.
+    MIN_TERM_COVERAGE = 0.75
+    # Lower bar for facts once the lookup intent is established ("Coolant type" for "Which coolant?").
+    MIN_INTENT_FACT_COVERAGE = 0.5
+    MIN_FACT_CONFIDENCE = 0.6
+
+    def __init__(self, query_expander: LocalQueryExpander) -> None:
+        self.query_expander = query_expander
+
+    def match(self, *, session: Session, vehicle_id: int, question: str, language: str) -> Optional[StructuredAnswer]:
+        terms = self._question_terms(question)
+        language = language if language in CONFIDENCE_NOTES else "en"
+
+        if terms & TORQUE_TERMS:
+            specs = session.exec(select(VehicleSpecs).where(VehicleSpecs.vehicle_id == vehicle_id)).first()
+            answer = self._match_torque_spec(specs=specs, vehicle_id=vehicle_id, terms=terms, language=language)
+            if answer is None:
+                answer = self._match_fact(
+                    session=session,
+                    vehicle_id=vehicle_id,
+                    terms=terms,
+                    intent_name="torque",
+                    categories=("torque",),
+                    language=language,
+                    min_coverage=self.MIN_TERM_COVERAGE,
+                )
+            return answer
+
+        if terms & NON_LOOKUP_TERMS:
+            return None
+        intents = [intent for intent in LOOKUP_INTENTS if self._matches_intent(intent, terms)]
+        if len(intents) != 1:
+            return None
+        intent = intents[0]
+        specs = session.exec(select(VehicleSpecs).where(VehicleSpecs.vehicle_id == vehicle_id)).first()
+        value = str(getattr(specs, intent.spec_field, None) or "").strip() if specs is not None else ""
+        if value:
+            label = intent.labels[1] if language == "es" else intent.labels[0]
+            return StructuredAnswer(
+                intent=intent.name,
+                answer=f"{label}: {value}.",
+                citations=[self._spec_citation(vehicle_id=vehicle_id, field=intent.spec_field, quote=f"{label}: {value}")],
+                confidence_note=CONFIDENCE_NOTES[language],
+            )
+        # The intent is already established, so a fact titled with one of its terms
+        # (and none of its excludes: "Fork oil grade" is not engine oil) qualifies when
+        # the question covers enough of its title; ties defer to RAG.
+        return self._match_fact(
+            session=session,
+            vehicle_id=vehicle_id,
+            terms=terms,
+            intent_name=intent.name,
+            categories=intent.fact_categories,
+            language=language,
+            min_coverage=self.MIN_INTENT_FACT_COVERAGE,
+            required_terms=intent.triggers,
+            excluded_terms=intent.excludes,
+        )
+
+    def _match_torque_spec(
+        self,
+        *,
+        specs: Optional[VehicleSpecs],
+        vehicle_id: int,
+        terms: set[str],
+        language: str,
+    ) -> Optional[StructuredAnswer]:
+        entries = (specs.torque_specs or []) if specs is not None else []
+        scored: list[tuple[float, int, dict[str, Any]]] = []
+        for index, entry in enumerate(entries):
+            component = str(entry.get("component") or "").strip()
+            torque_nm = entry.get("torque_nm")
+            component_terms = self._content_terms(component)
+            if not component_terms or torque_nm in (None, ""):
+                continue
+            coverage = len(component_terms & terms) / len(component_terms)
+            if coverage >= self.MIN_TERM_COVERAGE:
+                scored.append((coverage, index, entry))
+        if not scored:
+            return None
+        scored.sort(key=lambda item: item[0], reverse=True)
+        if len(scored) > 1 and scored[0][0] == scored[1][0]:
+            return None
+        _, index, entry = scored[0]
+        line = f"{entry['component']}: {entry['torque_nm']} Nm"
+        notes = str(entry.get("notes") or "").strip()
+        answer = f"{line} ({notes})." if notes else f"{line}."
+        return StructuredAnswer(
+            intent="torque",
+            answer=answer,
+            citations=[self._spec_citation(vehicle_id=vehicle_id, field=f"torque_specs.{index}", quote=answer.rstrip("."))],
+            confidence_note=CONFIDENCE_NOTES[language],
+        )
+
+    def _match_fact(
+        self,
+        *,
+        session: Session,
+        vehicle_id: int,
+        terms: set[str],
+        intent_name: str,
+        categories: tuple[str, ...],
+        language: str,
+        min_coverage: float,
+        required_terms: frozenset[str] = frozenset(),
+        excluded_terms: frozenset[str] = frozenset(),
+    ) -> Optional[StructuredAnswer]:
+        rows = session.exec(
+            select(VehicleKnowledgeFact, VehicleDocument)
+            .outerjoin(VehicleDocument, VehicleKnowledgeFact.document_id == VehicleDocument.id)
+            .where(
+                VehicleKnowledgeFact.vehicle_id == vehicle_id,
+                VehicleKnowledgeFact.is_hidden == False,  # noqa: E712
+                VehicleKnowledgeFact.category.in_(categories),
+            )
+        ).all()
+        scored: list[tuple[float, VehicleKnowledgeFact, Optional[VehicleDocument]]] = []
+        for fact, document in rows:
+            if document is not None and not document.included_in_rag:
+                continue
+            if fact.confidence is not None and fact.confidence < self.MIN_FACT_CONFIDENCE:
+                continue
+            title_terms = self._content_terms(fact.title)
+            if not title_terms or (required_terms and not title_terms & required_terms) or title_terms & excluded_terms:
+                continue
+            coverage = len(title_terms & terms) / len(title_terms)
+            if coverage >= min_coverage:
+                scored.append((coverage, fact, document))
+        if not scored:
+            return None
+        scored.sort(key=lambda item: (item[0], item[1].confidence or 0.0), reverse=True)
+        if len(scored) > 1 and scored[0][0] == scored[1][0] and scored[0][1].content != scored[1][1].content:
+            return None
+        _, fact, document = scored[0]
+        return StructuredAnswer(
+            intent=intent_name,
+            answer=fact.content.strip(),
+            citations=[
+                {
+                    "source_id": f"fact:{fact.id}",
+                    "source_label": (document.title or document.file_name) if document is not None else fact.title,
+                    "page_number": None,
+                    "quote": (fact.source_excerpt or fact.content).strip()[:180],
+                    "file_url": document.file_url if document is not None else None,
+                    "source_type": "fact",
+                }
+            ],
+            confidence_note=CONFIDENCE_NOTES[language],
+        )
+
+    def _matches_intent(self, intent: LookupIntent, terms: set[str]) -> bool:
+        if not terms & intent.triggers or terms & intent.excludes:
+            return False
+        return all(terms & group for group in intent.required)
+
+    def _question_terms(self, question: str) -> set[str]:
+        """Normalized question words plus the other-language wording of its automotive terms."""
+        translations = self.query_expander.translate_terms(question, source_language="es")
+        translations += self.query_expander.translate_terms(question, source_language="en")
+        return self._content_terms(" ".join([question, *translations]))
+
+    @staticmethod
+    def _content_terms(text: str) -> set[str]:
+        return {stem(token) for token in re.findall(r"[a-z0-9]+", normalize_text(text)) if len(token) >= 2}
+
+    @staticmethod
+    def _spec_citation(*, vehicle_id: int, field: str, quote: str) -> dict[str, Any]:
+        return {
+            "source_id": f"specs:{vehicle_id}:{field}",
+            "source_label": "Vehicle specs",
+            "page_number": None,
+            "quote": quote,
+            "file_url": None,
+            "source_type": "specs",
+        }
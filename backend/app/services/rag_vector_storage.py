@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+import logging
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+logger = logging.getLogger(__name__)
+
+DIMENSION = 256
+
+# RAG_VECTOR_STORAGE mode -> (index name, indexed expression and opclass). Only the
+# configured mode's index is kept, so inserts maintain a single HNSW graph.
+# halfvec and binary require pgvector >= 0.7.
+VECTOR_STORAGE_INDEXES: dict[str, tuple[str, str]] = {
+    "vector": ("ix_vehicledocumentchunk_embedding_hnsw", "embedding vector_cosine_ops"),
+    "halfvec": (
+        "ix_vehicledocumentchunk_embedding_halfvec_hnsw",
+        f"(embedding::halfvec({DIMENSION})) halfvec_cosine_ops",
+    ),
+    "binary": (
+        "ix_vehicledocumentchunk_embedding_binary_hnsw",
+        f"(binary_quantize(embedding)::bit({DIMENSION})) bit_hamming_ops",
+    ),
+}
+
+
+def resolve_vector_storage(value: str) -> str:
+    mode = value.strip().lower()
+    if mode not in VECTOR_STORAGE_INDEXES:
+        raise ValueError(f"Unsupported RAG_VECTOR_STORAGE: {value!r}. Expected one of {', '.join(VECTOR_STORAGE_INDEXES)}")
+    return mode
+
+
+def apply_vector_storage_index(connection: Connection, mode: str, *, concurrently: bool = False) -> None:
+    """Builds the HNSW index for ``mode`` and then drops the other modes' indexes.
+
+    The new index is created before the old ones are dropped, so retrieval is
+    never left without an index. ``concurrently`` avoids blocking chunk writes
+    but needs a connection in autocommit mode.
+    """
+    mode = resolve_vector_storage(mode)
+    option = " CONCURRENTLY" if concurrently else ""
+    index_name, expression = VECTOR_STORAGE_INDEXES[mode]
+    connection.execute(
+        text(f"CREATE INDEX{option} IF NOT EXISTS {index_name} ON vehicledocumentchunk USING hnsw ({expression})")
+    )
+    for other_mode, (other_name, _) in VECTOR_STORAGE_INDEXES.items():
+        if other_mode != mode:
+            connection.execute(text(f"DROP INDEX{option} IF EXISTS {other_name}"))
+    logger.info("Applied vector storage index", extra={"mode": mode, "index": index_name})
@@ -5,20 +5,76 @@ import json
 import logging
 import os
 import re
-from dataclasses import dataclass
+import time
+from itertools import product
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, replace
 from pathlib import Path
-from typing import Any, List, Optional
+from typing import Any, Callable, Iterator, List, Optional
 
+from pgvector.sqlalchemy import BIT, HALFVEC, VECTOR
 from pypdf import PdfReader
+from sqlalchemy import cast, func, literal
+from sqlalchemy import text as sql_text
+from sqlalchemy.exc import OperationalError
 from sqlmodel import Session, select
 
 from app.core.config import settings
+from app.core.deadline import Deadline, DeadlineExceeded
 from app.core.gemini_service import GeminiService
+from app.core.ocr_engine import OcrEngine, default_ocr_engine
 from app.core.storage import StorageService
-from app.models import Invoice, Vehicle, VehicleDocument, VehicleDocumentChunk, VehicleKnowledgeFact
+from app.database import engine
+from app.models import (
+    Invoice,
+    Vehicle,
+    VehicleChatSession,
+    VehicleDocument,
+    VehicleDocumentChunk,
+    VehicleDocumentPage,
+    VehicleDocumentSummary,
+    VehicleKnowledgeFact,
+)
+from app.schemas.gemini_payloads import (
+    ChatAnswerPayload,
+    DocumentSummaryPayload,
+    FleetAnswerPayload,
+    FleetSummaryPayload,
+    KnowledgeFactsPayload,
+    QueryExpansionPayload,
+    TranscriptionPayload,
+)
+from app.services.rag_chat_memory import ChatConversation, ChatMemory
+from app.services.rag_context_budgeter import ContextBudgeter
+from app.services.rag_document_parsers import LocalDocumentParser
+from app.services.rag_document_summaries import (
+    DocumentSummaryBuilder,
+    SummaryNode,
+    is_broad_question,
+    pick_summary_level,
+)
+from app.services.rag_query_expansion import LocalQueryExpander
+from app.services.rag_structured_answers import StructuredAnswerMatcher
+from app.services.rag_vector_storage import resolve_vector_storage
+from app.services.vehicle_embedding_cache import VehicleEmbeddingCache, VehicleEmbeddingMatrix
 
 logger = logging.getLogger(__name__)
 
+ProgressCallback = Callable[[int, int], None]
+SessionFactory = Callable[[], Session]
+
+default_embedding_cache = (
+    VehicleEmbeddingCache(
+        max_chunks_per_vehicle=settings.RAG_EMBEDDING_CACHE_MAX_CHUNKS_PER_VEHICLE,
+        max_bytes=settings.RAG_EMBEDDING_CACHE_MAX_BYTES,
+        ttl_seconds=settings.RAG_EMBEDDING_CACHE_TTL_SECONDS,
+    )
+    if settings.RAG_EMBEDDING_CACHE_ENABLED
+    else None
+)
+
 
 class DocumentDeletedError(Exception):
     """Raised when a document disappears while an async processor is still running."""
@@ -39,6 +95,8 @@ class RetrievedSource:
     content: str
     file_url: Optional[str]
     similarity: float
+    document_id: Optional[int] = None
+    chunk_index: Optional[int] = None
 
 
 class VehicleDocumentRAGService:
@@ -53,9 +111,22 @@ class VehicleDocumentRAGService:
         "gemini-2.5-flash-lite",
     ]
     EMBEDDING_DIMENSION = 256
+    RETRIEVAL_LIMIT = 8
     MAX_FACTS = 10
     CHUNK_SIZE = 1400
     CHUNK_OVERLAP = 180
+    MIN_PAGE_TEXT_CHARS = 40
+    TRANSCRIPTION_PAGE_BATCH_SIZE = 8
+    TRANSCRIPTION_BATCH_ATTEMPTS = 3
+    TRANSCRIPTION_RETRY_BACKOFF_SECONDS = 2.0
+    # process_document stages in order; each one's output is a checkpoint a retry resumes after.
+    PROCESSING_STAGES = ("parsing", "chunking", "summarizing", "knowledge")
+    STAGE_OUTPUT_MODELS = {
+        "parsing": VehicleDocumentPage,
+        "chunking": VehicleDocumentChunk,
+        "summarizing": VehicleDocumentSummary,
+        "knowledge": VehicleKnowledgeFact,
+    }
     FALLBACK_MESSAGES = {
         "en": {
             "answer": "I couldn't find enough indexed documentation for that question yet. Upload a manual or include invoice sources and try again.",
@@ -67,9 +138,77 @@ class VehicleDocumentRAGService:
         },
     }
 
-    def __init__(self, gemini_service: Optional[GeminiService] = None) -> None:
-        self.storage_service = StorageService(upload_dir="media/vehicle-documents")
+    EXTRACTIVE_MESSAGES = {
+        "en": {
+            "intro": "The answer could not be generated in time. These are the most relevant passages from your documents:",
+            "empty": "The answer could not be generated in time. Please try again.",
+            "confidence_note": "Extractive answer: quoted passages, not a generated answer.",
+        },
+        "es": {
+            "intro": "No se pudo generar la respuesta a tiempo. Estos son los fragmentos más relevantes de tus documentos:",
+            "empty": "No se pudo generar la respuesta a tiempo. Vuelve a intentarlo.",
+            "confidence_note": "Respuesta extractiva: fragmentos citados, no una respuesta generada.",
+        },
+    }
+    EXTRACTIVE_MAX_PASSAGES = 3
+    SUMMARY_CANDIDATES = 8
+    FLEET_MESSAGES = {
+        "en": {
+            "no_sources": "No indexed source for this vehicle matched the question.",
+            "missing": "No answer was generated for this vehicle.",
+            "confidence_note": "Per-vehicle answers listed without a generated summary.",
+        },
+        "es": {
+            "no_sources": "Ninguna fuente indexada de este vehículo coincidió con la pregunta.",
+            "missing": "No se generó una respuesta para este vehículo.",
+            "confidence_note": "Respuestas por vehículo listadas sin un resumen generado.",
+        },
+    }
+
+    def __init__(
+        self,
+        gemini_service: Optional[GeminiService] = None,
+        embedding_cache: Optional[VehicleEmbeddingCache] = None,
+        session_factory: Optional[SessionFactory] = None,
+        ocr_engine: Optional[OcrEngine] = None,
+    ) -> None:
+        # Only vehicle documents accept the formats LocalDocumentParser reads; invoices keep the base list.
+        self.storage_service = StorageService(
+            upload_dir="media/vehicle-documents",
+            allowed_extensions=StorageService.ALLOWED_EXTENSIONS | LocalDocumentParser.SUFFIXES,
+        )
         self.gemini_service = gemini_service or GeminiService()
+        self.ocr_engine = ocr_engine or default_ocr_engine
+        self.embedding_cache = embedding_cache or default_embedding_cache
+        self.session_factory = session_factory or (lambda: Session(engine))
+        self.query_expander = LocalQueryExpander()
+        self.structured_answers = StructuredAnswerMatcher(self.query_expander)
+        self.chat_memory = ChatMemory(
+            max_turns=settings.RAG_CHAT_SESSION_MAX_TURNS,
+            max_sources=settings.RAG_CHAT_SESSION_MAX_SOURCES,
+            summary_chars=settings.RAG_CHAT_SESSION_SUMMARY_CHARS,
+            follow_up_max_terms=settings.RAG_CHAT_FOLLOW_UP_MAX_TERMS,
+        )
+        self.context_budgeter = ContextBudgeter(
+            token_budget=settings.RAG_CONTEXT_TOKEN_BUDGET,
+            max_sources=settings.RAG_CONTEXT_MAX_SOURCES,
+            mmr_lambda=settings.RAG_CONTEXT_MMR_LAMBDA,
+            max_overlap_chars=2 * self.CHUNK_OVERLAP,
+            embed=self.embed_text,
+        )
+        self.local_parser = LocalDocumentParser(page_chars=settings.RAG_LOCAL_PARSER_PAGE_CHARS)
+        self.summary_builder = DocumentSummaryBuilder(
+            max_workers=settings.GEMINI_MAX_CONCURRENT_REQUESTS,
+            section_chars=settings.RAG_SUMMARY_SECTION_CHARS,
+            sections_per_chapter=settings.RAG_SUMMARY_SECTIONS_PER_CHAPTER,
+        )
+        self.fleet_context_budgeter = ContextBudgeter(
+            token_budget=settings.RAG_CHAT_FLEET_TOKENS_PER_VEHICLE,
+            max_sources=settings.RAG_CHAT_FLEET_SOURCES_PER_VEHICLE,
+            mmr_lambda=settings.RAG_CONTEXT_MMR_LAMBDA,
+            max_overlap_chars=2 * self.CHUNK_OVERLAP,
+            embed=self.embed_text,
+        )
 
     def resolve_gemini_api_key(self, current_user: Any) -> str:
         user_settings = getattr(current_user, "settings", None)
@@ -77,7 +216,20 @@ class VehicleDocumentRAGService:
             return user_settings.gemini_api_key
         return settings.GEMINI_API_KEY
 
-    def process_document(self, *, session: Session, document_id: int, gemini_api_key: str) -> VehicleDocument | None:
+    def process_document(
+        self,
+        *,
+        session: Session,
+        document_id: int,
+        gemini_api_key: str,
+        restart_from: Optional[str] = None,
+    ) -> VehicleDocument | None:
+        """Parses, chunks, summarizes and extracts facts, checkpointing after each stage.
+
+        Runs from ``restart_from`` when given, otherwise from the stage after the
+        document's ``checkpoint_stage`` (a fully processed document starts over).
+        A stage is never skipped unless the checkpoint it depends on is stored.
+        """
         try:
             document = self._update_document_processing_state(
                 session=session,
@@ -88,45 +240,133 @@ class VehicleDocumentRAGService:
                 detail="Preparing document for indexing.",
                 error_message=None,
             )
-            file_path = self.resolve_file_path(document.file_url)
-            pages = self.parse_document(file_path=file_path, mime_type=document.mime_type, api_key=gemini_api_key)
-            self._update_document_processing_state(
-                session=session,
-                document_id=document_id,
-                status="indexing",
-                progress=45,
-                stage="extracting_text",
-                detail="Text extracted. Preparing chunks for retrieval.",
+            stored_pages = self._load_pages(session=session, document_id=document_id)
+            first_stage = self.PROCESSING_STAGES.index(
+                self._resume_stage(document, restart_from, has_pages=bool(stored_pages))
             )
-            extracted_text = "\n\n".join(
-                f"[Page {page.page_number}]\n{page.text.strip()}" for page in pages if page.text.strip()
-            ).strip()
-            if not extracted_text:
-                raise ValueError("No usable text extracted from document")
+            # Until the first stage completes again, its older output is no longer a valid checkpoint.
+            document.checkpoint_stage = self.PROCESSING_STAGES[first_stage - 1] if first_stage else None
+            session.add(document)
+            session.commit()
+            if first_stage > 0:
+                logger.info(
+                    "Resuming vehicle document processing",
+                    extra={"document_id": document_id, "stage": self.PROCESSING_STAGES[first_stage]},
+                )
 
-            self._delete_existing_chunks_and_facts(session=session, document_id=document.id)
+            if first_stage <= self.PROCESSING_STAGES.index("parsing"):
+                file_path = self.resolve_file_path(document.file_url)
+
+                def report_transcription_progress(completed: int, total: int) -> None:
+                    self._update_document_processing_state(
+                        session=session,
+                        document_id=document_id,
+                        status="indexing",
+                        progress=5 + (40 * completed) // max(1, total),
+                        stage="transcribing",
+                        detail=f"Transcribed {completed} of {total} page ranges.",
+                    )
 
-            document = self._get_document_or_raise(session=session, document_id=document_id)
-            chunks = self._build_chunks(document=document, pages=pages)
-            for chunk in chunks:
-                session.add(chunk)
-            session.commit()
+                pages = self.parse_document(
+                    file_path=file_path,
+                    mime_type=document.mime_type,
+                    api_key=gemini_api_key,
+                    progress_callback=report_transcription_progress,
+                )
+                self._update_document_processing_state(
+                    session=session,
+                    document_id=document_id,
+                    status="indexing",
+                    progress=45,
+                    stage="extracting_text",
+                    detail="Text extracted. Preparing chunks for retrieval.",
+                )
+                if not any(page.text.strip() for page in pages):
+                    raise ValueError("No usable text extracted from document")
+                self._get_document_or_raise(session=session, document_id=document_id)
+                changed_pages = self._sync_pages(session=session, document_id=document_id, pages=pages)
+                logger.info(
+                    "Stored vehicle document pages",
+                    extra={"document_id": document_id, "pages": len(pages), "changed_pages": changed_pages},
+                )
+                stored_pages = self._load_pages(session=session, document_id=document_id)
+                document = self._get_document_or_raise(session=session, document_id=document_id)
+                self._complete_stage(session=session, document=document, stage="parsing")
+            pages = [ParsedDocumentPage(page_number=page.page_number, text=page.text) for page in stored_pages]
+            extracted_text = "\n\n".join(f"[Page {page.page_number}]\n{page.text}" for page in pages).strip()
+
+            if first_stage <= self.PROCESSING_STAGES.index("chunking"):
+                if first_stage == self.PROCESSING_STAGES.index("chunking"):
+                    # Resumed or forced chunking rebuilds every page; after parsing only changed pages are chunked.
+                    self._delete_stage_outputs(session=session, document_id=document_id, stage="chunking")
+                chunked_page_ids = set(
+                    session.exec(
+                        select(VehicleDocumentChunk.page_id).where(VehicleDocumentChunk.document_id == document_id).distinct()
+                    ).all()
+                )
 
-            self._update_document_processing_state(
-                session=session,
-                document_id=document_id,
-                status="indexing",
-                progress=78,
-                stage="chunking",
-                detail=f"{len(chunks)} chunks indexed. Finalizing document knowledge.",
-            )
+                document = self._get_document_or_raise(session=session, document_id=document_id)
+                chunks = self._build_chunks(
+                    document=document,
+                    pages=[page for page in stored_pages if page.id not in chunked_page_ids],
+                )
+                for chunk in chunks:
+                    session.add(chunk)
+                session.commit()
+                chunk_count = self._renumber_chunks(session=session, document_id=document_id) if chunked_page_ids else len(chunks)
 
-            document = self._get_document_or_raise(session=session, document_id=document_id)
-            document.extracted_text = extracted_text
-            document.chunk_count = len(chunks)
-            session.add(document)
-            session.commit()
+                self._update_document_processing_state(
+                    session=session,
+                    document_id=document_id,
+                    status="indexing",
+                    progress=78,
+                    stage="chunking",
+                    detail=(
+                        f"{len(chunks)} chunks indexed"
+                        + (f", {chunk_count - len(chunks)} kept from unchanged pages" if chunk_count > len(chunks) else "")
+                        + ". Finalizing document knowledge."
+                    ),
+                )
+
+                document = self._get_document_or_raise(session=session, document_id=document_id)
+                document.chunk_count = chunk_count
+                self._complete_stage(session=session, document=document, stage="chunking")
+
+            if first_stage <= self.PROCESSING_STAGES.index("summarizing"):
+                self._delete_stage_outputs(session=session, document_id=document_id, stage="summarizing")
+                if gemini_api_key and settings.RAG_HIERARCHICAL_SUMMARIES_ENABLED:
+                    self._update_document_processing_state(
+                        session=session,
+                        document_id=document_id,
+                        status="indexing",
+                        progress=80,
+                        stage="summarizing",
+                        detail="Summarizing sections, chapters and the whole document.",
+                    )
+
+                    def report_summary_progress(completed: int, total: int) -> None:
+                        self._update_document_processing_state(
+                            session=session,
+                            document_id=document_id,
+                            status="indexing",
+                            progress=80 + (8 * completed) // max(1, total),
+                            stage="summarizing",
+                            detail=f"Summarized {completed} of {total} sections and chapters.",
+                        )
+
+                    summary_tree = self.build_document_summaries(
+                        document=document,
+                        pages=pages,
+                        api_key=gemini_api_key,
+                        progress_callback=report_summary_progress,
+                    )
+                    document = self._get_document_or_raise(session=session, document_id=document_id)
+                    if summary_tree is not None:
+                        self._store_document_summaries(session=session, document=document, root=summary_tree)
+                document = self._get_document_or_raise(session=session, document_id=document_id)
+                self._complete_stage(session=session, document=document, stage="summarizing")
 
+            self._delete_stage_outputs(session=session, document_id=document_id, stage="knowledge")
             if gemini_api_key:
                 self._update_document_processing_state(
                     session=session,
@@ -151,6 +391,8 @@ class VehicleDocumentRAGService:
                     "Skipping knowledge fact extraction because Gemini API key is not configured",
                     extra={"document_id": document.id},
                 )
+            document = self._get_document_or_raise(session=session, document_id=document_id)
+            self._complete_stage(session=session, document=document, stage="knowledge")
             document = self._update_document_processing_state(
                 session=session,
                 document_id=document_id,
@@ -164,6 +406,7 @@ class VehicleDocumentRAGService:
             session.add(document)
             session.commit()
             session.refresh(document)
+            self.invalidate_embedding_cache(document.vehicle_id)
             return document
         except DocumentDeletedError:
             session.rollback()
@@ -186,16 +429,216 @@ class VehicleDocumentRAGService:
             logger.exception("Vehicle document processing failed", extra={"document_id": document_id})
             raise
 
-    def parse_document(self, *, file_path: str, mime_type: Optional[str], api_key: str) -> List[ParsedDocumentPage]:
+    def parse_document(
+        self,
+        *,
+        file_path: str,
+        mime_type: Optional[str],
+        api_key: str,
+        progress_callback: Optional[ProgressCallback] = None,
+    ) -> List[ParsedDocumentPage]:
         suffix = Path(file_path).suffix.lower()
         if suffix in {".txt", ".md"}:
             text = Path(file_path).read_text(encoding="utf-8", errors="ignore")
             return [ParsedDocumentPage(page_number=1, text=text)]
+        if suffix in self.local_parser.SUFFIXES:
+            return [
+                ParsedDocumentPage(page_number=page_number, text=text)
+                for page_number, text in enumerate(self.local_parser.parse(file_path), start=1)
+            ]
         if suffix == ".pdf":
-            pages = self._parse_pdf_locally(file_path)
+            return self._parse_pdf(
+                file_path=file_path,
+                mime_type=mime_type,
+                api_key=api_key,
+                progress_callback=progress_callback,
+            )
+
+        ocr_result = self.ocr_engine.recognize(file_path) if self.ocr_engine is not None else None
+        ocr_text = ocr_result.text.strip() if ocr_result is not None else ""
+        if ocr_text and (self.ocr_engine.is_confident(ocr_result) or not api_key) and self._is_usable_page_text(ocr_text):
+            # Without an API key, lower-confidence OCR still beats failing the document.
+            logger.info(
+                "Transcribed image document with local OCR",
+                extra={"file_path": file_path, "confidence": round(ocr_result.confidence, 3)},
+            )
+            return [ParsedDocumentPage(page_number=1, text=ocr_text)]
+
+        with self.gemini_service.multimodal_content(
+            file_path=file_path,
+            api_key=api_key,
+            mime_type=mime_type,
+        ) as content:
+            payload = self.gemini_service.generate_json_payload(
+                prompt=self._build_transcription_prompt(),
+                content=content,
+                models=self.TRANSCRIPTION_MODELS,
+                api_key=api_key,
+                response_model=TranscriptionPayload,
+                allow_partial_json=False,
+                validator=self._has_non_empty_page_text,
+                fallback_resolver=lambda _exc: self._image_transcription_fallback_payload(
+                    content=content,
+                    api_key=api_key,
+                    ocr_text=ocr_text,
+                ),
+            )
+        return [
+            ParsedDocumentPage(page_number=page_number, text=text)
+            for page_number, text in sorted(self._pages_from_payload(payload).items())
+        ]
+
+    def _parse_pdf(
+        self,
+        *,
+        file_path: str,
+        mime_type: Optional[str],
+        api_key: str,
+        progress_callback: Optional[ProgressCallback] = None,
+    ) -> List[ParsedDocumentPage]:
+        local_pages = self._parse_pdf_locally(file_path)
+        usable_pages = {page.page_number: page.text for page in local_pages if self._is_usable_page_text(page.text)}
+        missing_pages = [page.page_number for page in local_pages if page.page_number not in usable_pages]
+        if missing_pages and (api_key or not usable_pages):
+            logger.info(
+                "Transcribing PDF pages without a usable text layer",
+                extra={"file_path": file_path, "local_pages": len(usable_pages), "ocr_pages": len(missing_pages)},
+            )
+            transcribed_pages = self._transcribe_pdf_pages(
+                file_path=file_path,
+                mime_type=mime_type,
+                api_key=api_key,
+                page_numbers=missing_pages,
+                progress_callback=progress_callback,
+            )
+        else:
+            transcribed_pages = {}
+
+        merged: list[ParsedDocumentPage] = []
+        for page in local_pages:
+            # Prefer the local text layer, then the transcription, then whatever pypdf salvaged.
+            text = usable_pages.get(page.page_number) or transcribed_pages.get(page.page_number) or page.text.strip()
+            if text:
+                merged.append(ParsedDocumentPage(page_number=page.page_number, text=text))
+        return merged
+
+    def _transcribe_pdf_pages(
+        self,
+        *,
+        file_path: str,
+        mime_type: Optional[str],
+        api_key: str,
+        page_numbers: list[int],
+        progress_callback: Optional[ProgressCallback] = None,
+    ) -> dict[int, str]:
+        batches = self._build_page_batches(page_numbers)
+        transcribed: dict[int, str] = {}
+        completed = 0
+        with ThreadPoolExecutor(max_workers=max(1, min(len(batches), settings.GEMINI_MAX_CONCURRENT_REQUESTS))) as executor:
+            futures = [
+                executor.submit(
+                    self._transcribe_pdf_page_batch,
+                    file_path=file_path,
+                    mime_type=mime_type,
+                    api_key=api_key,
+                    page_numbers=batch,
+                )
+                for batch in batches
+            ]
+            # Progress is reported from this thread so callers can safely touch their DB session.
+            for future in as_completed(futures):
+                transcribed.update(future.result())
+                completed += 1
+                if progress_callback is not None:
+                    progress_callback(completed, len(batches))
+        return transcribed
+
+    def _transcribe_pdf_page_batch(
+        self,
+        *,
+        file_path: str,
+        mime_type: Optional[str],
+        api_key: str,
+        page_numbers: list[int],
+    ) -> dict[int, str]:
+        for attempt in range(1, self.TRANSCRIPTION_BATCH_ATTEMPTS + 1):
+            with self.gemini_service.multimodal_content(
+                file_path=file_path,
+                api_key=api_key,
+                mime_type=mime_type,
+                page_numbers=page_numbers,
+            ) as content:
+                payload = self.gemini_service.generate_json_payload(
+                    prompt=self._build_transcription_prompt(page_numbers),
+                    content=content,
+                    models=self.TRANSCRIPTION_MODELS,
+                    api_key=api_key,
+                    response_model=TranscriptionPayload,
+                    # A cut-off batch would index its last page half transcribed and drop the rest.
+                    allow_partial_json=False,
+                    validator=self._has_non_empty_page_text,
+                    fallback_resolver=lambda _exc: self._empty_pages_payload(),
+                )
+            pages = self._pages_from_payload(payload, expected_pages=page_numbers)
             if pages:
                 return pages
+            if attempt < self.TRANSCRIPTION_BATCH_ATTEMPTS:
+                time.sleep(self.TRANSCRIPTION_RETRY_BACKOFF_SECONDS * 2 ** (attempt - 1))
+
+        logger.warning(
+            "Giving up on PDF page range transcription",
+            extra={"file_path": file_path, "first_page": page_numbers[0], "last_page": page_numbers[-1]},
+        )
+        return {}
+
+    def _build_page_batches(self, page_numbers: list[int]) -> list[list[int]]:
+        batches: list[list[int]] = []
+        for page_number in sorted(set(page_numbers)):
+            current = batches[-1] if batches else None
+            if current and current[-1] == page_number - 1 and len(current) < self.TRANSCRIPTION_PAGE_BATCH_SIZE:
+                current.append(page_number)
+            else:
+                batches.append([page_number])
+        return batches
+
+    def _pages_from_payload(
+        self,
+        payload: dict[str, Any],
+        *,
+        expected_pages: Optional[list[int]] = None,
+    ) -> dict[int, str]:
+        entries: list[tuple[int, str]] = []
+        for index, item in enumerate(payload.get("pages") or []):
+            if not isinstance(item, dict):
+                continue
+            try:
+                page_number = int(item.get("page_number") or index + 1)
+            except (TypeError, ValueError):
+                page_number = index + 1
+            entries.append((page_number, str(item.get("text") or "").strip()))
+
+        if expected_pages is not None and any(page_number not in expected_pages for page_number, _ in entries):
+            # Models sometimes renumber a batch from 1; map by position within the batch instead.
+            entries = list(zip(expected_pages, (text for _, text in entries)))
+
+        pages: dict[int, str] = {}
+        for page_number, text in entries:
+            if text:
+                pages.setdefault(max(1, page_number), text)
+        return pages
 
+    def _is_usable_page_text(self, text: str) -> bool:
+        cleaned = text.strip()
+        if len(cleaned) < self.MIN_PAGE_TEXT_CHARS:
+            return False
+        visible = [char for char in cleaned if not char.isspace()]
+        alphanumeric_ratio = sum(char.isalnum() for char in visible) / len(visible)
+        if alphanumeric_ratio < 0.6 or cleaned.count("\ufffd") > len(visible) * 0.05:
+            return False
+        words = re.findall(r"[^\W\d_]{2,}", cleaned)
+        return len(words) >= 5
+
+    def _build_transcription_prompt(self, page_numbers: Optional[list[int]] = None) -> str:
         prompt = """
 Convierte este documento del vehículo en texto estructurado y limpio.
 Responde SOLO con JSON válido con este formato:
@@ -213,33 +656,13 @@ Reglas:
 - No inventes contenido que no aparezca en el documento.
 - Si una página es casi ilegible, devuelve el texto más fiable posible.
 """
-        with self.gemini_service.multimodal_content(
-            file_path=file_path,
-            api_key=api_key,
-            mime_type=mime_type,
-        ) as content:
-            payload = self.gemini_service.generate_json_payload(
-                prompt=prompt,
-                content=content,
-                models=self.TRANSCRIPTION_MODELS,
-                api_key=api_key,
-                validator=self._has_non_empty_page_text,
-                fallback_resolver=(
-                    lambda _exc: self._image_transcription_fallback_payload(content=content, api_key=api_key)
-                    if suffix != ".pdf"
-                    else self._empty_pages_payload()
-                ),
+        if page_numbers:
+            listed_pages = ", ".join(str(page) for page in page_numbers)
+            prompt += (
+                f"- Transcribe solo las páginas {listed_pages} del documento original y usa esos números en page_number.\n"
+                "- Si recibes imágenes, corresponden a esas páginas en el mismo orden.\n"
             )
-            pages = payload.get("pages") or []
-            parsed_pages = [
-                ParsedDocumentPage(
-                    page_number=max(1, int(page.get("page_number") or index + 1)),
-                    text=str(page.get("text") or "").strip(),
-                )
-                for index, page in enumerate(pages)
-                if str(page.get("text") or "").strip()
-            ]
-            return parsed_pages
+        return prompt
 
     def _parse_pdf_locally(self, file_path: str) -> List[ParsedDocumentPage]:
         reader = PdfReader(file_path)
@@ -250,9 +673,7 @@ Reglas:
             except Exception:
                 logger.warning("Failed to extract text from PDF page", extra={"file_path": file_path, "page": index}, exc_info=True)
                 text = ""
-            cleaned = text.strip()
-            if cleaned:
-                pages.append(ParsedDocumentPage(page_number=index, text=cleaned))
+            pages.append(ParsedDocumentPage(page_number=index, text=text.strip()))
         return pages
 
     def extract_knowledge_facts(
@@ -291,6 +712,7 @@ Texto:
             models=self.ANSWER_MODELS,
             api_key=api_key,
             fallback_resolver=lambda _exc: {"facts": []},
+            response_model=KnowledgeFactsPayload,
         )
         facts = []
         for item in payload.get("facts") or []:
@@ -311,24 +733,169 @@ Texto:
             )
         return facts
 
+    def build_document_summaries(
+        self,
+        *,
+        document: VehicleDocument,
+        pages: List[ParsedDocumentPage],
+        api_key: str,
+        progress_callback: Optional[ProgressCallback] = None,
+    ) -> Optional[SummaryNode]:
+        """Summary tree of the document, or ``None`` when its top-level summary could not be generated."""
+        return self.summary_builder.build(
+            document_label=document.title or document.file_name or f"Document #{document.id}",
+            pages=[(page.page_number, page.text) for page in pages],
+            summarize=lambda prompt: self.gemini_service.generate_json_payload(
+                prompt=prompt,
+                content=[],
+                models=self.ANSWER_MODELS,
+                api_key=api_key,
+                fallback_resolver=lambda _exc: {},
+                response_model=DocumentSummaryPayload,
+            ),
+            progress_callback=progress_callback,
+        )
+
+    def _store_document_summaries(self, *, session: Session, document: VehicleDocument, root: SummaryNode) -> None:
+        """Stores the tree parents first, so every node can point at its parent's id."""
+        rows: dict[int, VehicleDocumentSummary] = {}
+        parents: dict[int, SummaryNode] = {}
+        for node in root.walk():
+            parent = parents.get(id(node))
+            row = VehicleDocumentSummary(
+                document_id=document.id,
+                vehicle_id=document.vehicle_id,
+                level=node.level,
+                parent_id=rows[id(parent)].id if parent is not None else None,
+                position=node.position,
+                title=node.title or None,
+                page_start=node.page_start,
+                page_end=node.page_end,
+                content=node.summary,
+                embedding=self.embed_text(f"{node.title}\n{node.summary}"),
+            )
+            session.add(row)
+            if node.children:
+                session.flush()
+                rows[id(node)] = row
+                parents.update({id(child): node for child in node.children})
+        session.commit()
+
     def answer_question(
         self,
         *,
-        session: Session,
+        session: Optional[Session] = None,
         vehicle: Vehicle,
         question: str,
         source_scope: str,
         include_invoice_docs: bool,
         api_key: str,
+        deadline: Optional[Deadline] = None,
+        conversation: Optional[ChatConversation] = None,
     ) -> dict[str, Any]:
-        expanded_query = self.expand_query_for_retrieval(question=question, api_key=api_key)
-        sources = self.retrieve_sources(
+        """Answers from retrieved sources.
+
+        Without ``session``, retrieval runs in its own short-lived session so no
+        pooled connection is held while the model calls before and after it run.
+        Spec lookups backed by stored specs or facts are answered without retrieval.
+        Expansion and retrieval get their share of ``deadline`` (default
+        ``RAG_CHAT_DEADLINE_SECONDS``) and generation the rest; once it runs
+        out the answer is extractive, quoting the top sources.
+
+        With a ``conversation`` (a chat session), follow-ups are answered from
+        its cached sources when they cover the question, the prompt carries its
+        rolling summary instead of the transcript, and the turn is recorded on it.
+        """
+        response = self._answer_question(
             session=session,
             vehicle=vehicle,
-            question=expanded_query["retrieval_query"],
+            question=question,
             source_scope=source_scope,
             include_invoice_docs=include_invoice_docs,
+            api_key=api_key,
+            deadline=deadline or Deadline(settings.RAG_CHAT_DEADLINE_SECONDS),
+            conversation=conversation,
         )
+        summary = response.pop("conversation_summary", None)
+        if conversation is not None:
+            self.chat_memory.record_turn(conversation, question=question, response=response, summary=summary)
+        return response
+
+    def _answer_question(
+        self,
+        *,
+        session: Optional[Session],
+        vehicle: Vehicle,
+        question: str,
+        source_scope: str,
+        include_invoice_docs: bool,
+        api_key: str,
+        deadline: Deadline,
+        conversation: Optional[ChatConversation],
+    ) -> dict[str, Any]:
+        if settings.RAG_STRUCTURED_ANSWERS_ENABLED and source_scope == "all_documents":
+            with self._scoped_session(session) as lookup_session:
+                structured = self._structured_response(session=lookup_session, vehicle=vehicle, question=question)
+            if structured is not None:
+                return structured
+
+        retrieval_kwargs = {
+            "session": session,
+            "vehicle": vehicle,
+            "question": question,
+            "source_scope": source_scope,
+            "include_invoice_docs": include_invoice_docs,
+            "api_key": api_key,
+            "deadline": deadline,
+        }
+        try:
+            if conversation is not None:
+                expanded_query, sources = self._retrieve_for_conversation(conversation=conversation, **retrieval_kwargs)
+            else:
+                expanded_query, sources = self._retrieve_with_query_expansion(**retrieval_kwargs)
+        except DeadlineExceeded:
+            logger.warning("Chat deadline exceeded during retrieval")
+            return self._build_extractive_response(question=question, sources=[])
+        return self._answer_from_sources(
+            vehicle=vehicle,
+            question=question,
+            expanded_query=expanded_query,
+            sources=sources,
+            api_key=api_key,
+            deadline=deadline,
+            conversation=conversation,
+        )
+
+    def _structured_response(self, *, session: Session, vehicle: Vehicle, question: str) -> Optional[dict[str, Any]]:
+        structured = self.structured_answers.match(
+            session=session,
+            vehicle_id=vehicle.id,
+            question=question,
+            language=self._infer_language_from_question(question),
+        )
+        if structured is None:
+            return None
+        logger.info("Answered from structured vehicle data", extra={"intent": structured.intent})
+        return {
+            "answer": structured.answer,
+            "citations": structured.citations,
+            "used_documents": self._build_used_documents(citations=structured.citations, fallback_sources=[]),
+            "confidence_note": structured.confidence_note,
+            "answer_type": "structured",
+        }
+
+    def _answer_from_sources(
+        self,
+        *,
+        vehicle: Vehicle,
+        question: str,
+        expanded_query: dict[str, str],
+        sources: List[RetrievedSource],
+        api_key: str,
+        deadline: Deadline,
+        conversation: Optional[ChatConversation] = None,
+    ) -> dict[str, Any]:
+        """Budgets the context and generates the answer; extractive once ``deadline`` runs out."""
         if not sources:
             localized_fallback = self._localized_no_sources_response(expanded_query.get("detected_language"), question)
             return {
@@ -336,15 +903,31 @@ Texto:
                 "citations": [],
                 "used_documents": [],
                 "confidence_note": localized_fallback["confidence_note"],
+                "answer_type": "generated",
             }
 
+        context = self.context_budgeter.assemble(sources)
+        logger.info("Assembled answer context", extra=context.as_log_extra())
         context_blocks = []
-        for source in sources[:6]:
+        for source in context.sources:
             page_text = f"page {source.page_number}" if source.page_number else "unpaged"
             context_blocks.append(
                 f"[{source.source_id}] {source.source_label} ({page_text})\n{source.content}"
             )
 
+        conversation_context = self.chat_memory.prompt_context(conversation) if conversation is not None else ""
+        summary_field = ""
+        conversation_block = ""
+        if conversation is not None:
+            summary_field = (
+                ',\n  "conversation_summary": "the conversation so far including this answer, '
+                f'at most {settings.RAG_CHAT_SESSION_SUMMARY_CHARS} characters"'
+            )
+        if conversation_context:
+            conversation_block = (
+                "\nConversation so far (use it to resolve references such as \"that\" or \"it\"; "
+                f"answer only the new question):\n{conversation_context}\n"
+            )
         prompt = f"""
 You are answering questions about a specific vehicle using only the retrieved sources below.
 If the answer is uncertain, say so clearly.
@@ -357,7 +940,7 @@ Return ONLY valid JSON with this shape:
       "quote": "short supporting quote"
     }}
   ],
-  "confidence_note": "string"
+  "confidence_note": "string"{summary_field}
 }}
 
 Vehicle:
@@ -365,7 +948,7 @@ Vehicle:
 - Model: {vehicle.model}
 - Year: {vehicle.year}
 - Plate: {vehicle.license_plate}
-
+{conversation_block}
 Question:
 {question}
 
@@ -374,33 +957,300 @@ Respond in the same language as the user's question. Do not switch to the source
 Sources:
 {chr(10).join(context_blocks)}
 """
-        payload = self.gemini_service.generate_json_payload(
-            prompt=prompt,
-            content=[],
-            models=self.ANSWER_MODELS,
-            api_key=api_key,
-            fallback_resolver=lambda _exc: {
-                "answer": "",
-                "citations": [],
-                "confidence_note": "",
-            },
-        )
-        source_map = {source.source_id: source for source in sources}
+        if deadline.expired:
+            logger.warning("Chat deadline exceeded before answer generation")
+            return self._build_extractive_response(question=question, sources=context.sources)
+
+        def resolve_answer_failure(exc: Exception) -> dict[str, Any]:
+            if isinstance(exc, DeadlineExceeded):
+                raise exc
+            return {"answer": "", "citations": [], "confidence_note": ""}
+
+        try:
+            payload = self.gemini_service.generate_json_payload(
+                prompt=prompt,
+                content=[],
+                models=self.ANSWER_MODELS,
+                api_key=api_key,
+                fallback_resolver=resolve_answer_failure,
+                deadline=deadline,
+                response_model=ChatAnswerPayload,
+            )
+        except DeadlineExceeded:
+            logger.warning("Chat deadline exceeded during answer generation")
+            return self._build_extractive_response(question=question, sources=context.sources)
+        source_map = {source.source_id: source for source in context.sources}
         citations = self._build_citations_from_payload(
             source_map=source_map,
             payload_citations=payload.get("citations") or [],
         )
         if not citations:
-            citations = self._build_fallback_citations(sources=sources)
-        used_documents = self._build_used_documents(citations=citations, fallback_sources=sources)
+            citations = self._build_fallback_citations(sources=context.sources)
+        used_documents = self._build_used_documents(citations=citations, fallback_sources=context.sources)
 
         return {
             "answer": str(payload.get("answer") or "").strip(),
             "citations": citations,
             "used_documents": used_documents,
             "confidence_note": str(payload.get("confidence_note") or "").strip(),
+            "answer_type": "generated",
+            "conversation_summary": str(payload.get("conversation_summary") or "").strip() or None,
+        }
+
+    def _build_extractive_response(self, *, question: str, sources: List[RetrievedSource]) -> dict[str, Any]:
+        """Quotes the sentence of each top source that best matches the question."""
+        messages = self.EXTRACTIVE_MESSAGES[self._infer_language_from_question(question)]
+        question_terms = set(self.tokenize(question))
+        lines: list[str] = []
+        citations: list[dict[str, Any]] = []
+        for source in sources[: self.EXTRACTIVE_MAX_PASSAGES]:
+            passage = self._build_source_excerpt(self._best_matching_sentence(source.content, question_terms))
+            page_text = f", p. {source.page_number}" if source.page_number else ""
+            lines.append(f"- {passage} ({source.source_label}{page_text})")
+            citations.append(
+                {
+                    "source_id": source.source_id,
+                    "source_label": source.source_label,
+                    "page_number": source.page_number,
+                    "quote": passage,
+                    "file_url": source.file_url,
+                    "source_type": source.source_type,
+                }
+            )
+        return {
+            "answer": "\n".join([messages["intro"], *lines]) if lines else messages["empty"],
+            "citations": citations,
+            "used_documents": self._build_used_documents(citations=citations, fallback_sources=[]),
+            "confidence_note": messages["confidence_note"],
+            "answer_type": "extractive",
         }
 
+    def _best_matching_sentence(self, content: str, question_terms: set[str]) -> str:
+        sentences = [sentence.strip() for sentence in re.split(r"(?<=[.!?])\s+|\n+", content) if sentence.strip()]
+        if not sentences:
+            return content
+        # max() keeps the earliest sentence on ties, which is usually the section lead.
+        return max(sentences, key=lambda sentence: len(question_terms.intersection(self.tokenize(sentence))))
+
+    def _stage_deadline(self, deadline: Deadline, share: float) -> Deadline:
+        return deadline.child(settings.RAG_CHAT_DEADLINE_SECONDS * share)
+
+    def _retrieve_with_query_expansion(
+        self,
+        *,
+        session: Optional[Session],
+        vehicle: Vehicle,
+        question: str,
+        source_scope: str,
+        include_invoice_docs: bool,
+        api_key: str,
+        deadline: Deadline,
+    ) -> tuple[dict[str, str], List[RetrievedSource]]:
+        """Returns the expanded query and the sources to answer from.
+
+        With speculative retrieval the raw question is retrieved (chunks and
+        invoices) while the expansion call is in flight. If the best chunk
+        already covers the question, or the expansion overruns its budget, the
+        expansion is not waited for; otherwise the expanded query is retrieved
+        too and both result sets are merged.
+        """
+        retrieval_kwargs = {
+            "vehicle": vehicle,
+            "source_scope": source_scope,
+            "include_invoice_docs": include_invoice_docs,
+        }
+        expansion_deadline = self._stage_deadline(deadline, settings.RAG_CHAT_EXPANSION_SHARE)
+        # Local expansion is instant, so there is nothing to overlap retrieval with.
+        if settings.RAG_QUERY_EXPANSION != "llm" or not settings.RAG_SPECULATIVE_RETRIEVAL_ENABLED:
+            expanded_query = self.expand_query_for_retrieval(
+                question=question,
+                api_key=api_key,
+                deadline=expansion_deadline,
+            )
+            with self._scoped_session(session) as retrieval_session:
+                sources = self.retrieve_sources(
+                    session=retrieval_session,
+                    question=expanded_query["retrieval_query"],
+                    deadline=self._stage_deadline(deadline, settings.RAG_CHAT_RETRIEVAL_SHARE),
+                    **retrieval_kwargs,
+                )
+            return expanded_query, sources
+
+        executor = ThreadPoolExecutor(max_workers=1)
+        try:
+            expansion = executor.submit(
+                self.expand_query_for_retrieval,
+                question=question,
+                api_key=api_key,
+                deadline=expansion_deadline,
+            )
+            with self._scoped_session(session) as retrieval_session:
+                speculative_sources = self.retrieve_sources(
+                    session=retrieval_session,
+                    question=question,
+                    deadline=self._stage_deadline(deadline, settings.RAG_CHAT_RETRIEVAL_SHARE),
+                    **retrieval_kwargs,
+                )
+            skipped_expansion = {"retrieval_query": question, "detected_language": "unknown"}
+            coverage = self._question_coverage(question=question, sources=speculative_sources)
+            if coverage >= settings.RAG_SPECULATIVE_SKIP_COVERAGE and not expansion.done():
+                expansion.cancel()
+                logger.info("Skipped query expansion", extra={"question_coverage": round(coverage, 3)})
+                return skipped_expansion, speculative_sources
+            try:
+                expanded_query = expansion.result(timeout=expansion_deadline.remaining())
+            except FutureTimeoutError:
+                logger.warning("Query expansion exceeded its time budget")
+                return skipped_expansion, speculative_sources
+        finally:
+            # An abandoned expansion finishes in the background; its result is discarded.
+            executor.shutdown(wait=False)
+
+        retrieval_query = expanded_query["retrieval_query"]
+        if not retrieval_query or retrieval_query == question:
+            return expanded_query, speculative_sources
+        try:
+            with self._scoped_session(session) as retrieval_session:
+                expanded_sources = self.retrieve_sources(
+                    session=retrieval_session,
+                    question=retrieval_query,
+                    deadline=self._stage_deadline(deadline, settings.RAG_CHAT_RETRIEVAL_SHARE),
+                    **retrieval_kwargs,
+                )
+        except DeadlineExceeded:
+            logger.warning("Expanded retrieval exceeded its time budget")
+            return expanded_query, speculative_sources
+        return expanded_query, self._merge_sources(speculative_sources, expanded_sources)
+
+    def _question_coverage(self, *, question: str, sources: List[RetrievedSource]) -> float:
+        """Share of the question's terms (3+ chars) found in the best document chunk."""
+        terms = {token for token in self.tokenize(question) if len(token) >= 3}
+        best_chunk = next((source for source in sources if source.source_type == "document"), None)
+        if not terms or best_chunk is None:
+            return 0.0
+        return len(terms.intersection(self.tokenize(best_chunk.content))) / len(terms)
+
+    def _merge_sources(self, *source_lists: List[RetrievedSource]) -> List[RetrievedSource]:
+        merged: dict[str, RetrievedSource] = {}
+        for sources in source_lists:
+            for source in sources:
+                current = merged.get(source.source_id)
+                if current is None or source.similarity > current.similarity:
+                    merged[source.source_id] = source
+        return sorted(merged.values(), key=lambda item: item.similarity, reverse=True)[: self.RETRIEVAL_LIMIT]
+
+    def _retrieve_for_conversation(
+        self,
+        *,
+        conversation: ChatConversation,
+        session: Optional[Session],
+        vehicle: Vehicle,
+        question: str,
+        source_scope: str,
+        include_invoice_docs: bool,
+        api_key: str,
+        deadline: Deadline,
+    ) -> tuple[dict[str, str], List[RetrievedSource]]:
+        """Answers a follow-up from the session's cached sources when they cover it.
+
+        Cached sources are re-scored locally against the follow-up query. When
+        the best of them contains ``RAG_CHAT_SESSION_REUSE_COVERAGE`` of the
+        question's terms there is no expansion or retrieval at all; otherwise
+        the follow-up is retrieved as usual and the new sources extend the cache.
+        """
+        retrieval_query = self.chat_memory.follow_up_query(conversation, question)
+        cached: List[RetrievedSource] = []
+        if conversation.sources:
+            with self._scoped_session(session) as lookup_session:
+                cached = self._drop_stale_sources(session=lookup_session, sources=conversation.sources)
+            cached = self._rescore_sources(query=retrieval_query, sources=cached)
+            coverage = self._question_coverage(question=question, sources=cached)
+            if coverage >= settings.RAG_CHAT_SESSION_REUSE_COVERAGE:
+                logger.info(
+                    "Reused chat session sources",
+                    extra={"question_coverage": round(coverage, 3), "cached_sources": len(cached)},
+                )
+                conversation.sources = cached
+                expanded_query = {
+                    "retrieval_query": retrieval_query,
+                    "detected_language": self._infer_language_from_question(question),
+                }
+                return expanded_query, cached[: self.RETRIEVAL_LIMIT]
+
+        expanded_query, sources = self._retrieve_with_query_expansion(
+            session=session,
+            vehicle=vehicle,
+            question=retrieval_query,
+            source_scope=source_scope,
+            include_invoice_docs=include_invoice_docs,
+            api_key=api_key,
+            deadline=deadline,
+        )
+        conversation.sources = cached
+        self.chat_memory.extend_sources(conversation, sources)
+        return expanded_query, self._merge_sources(sources, cached)
+
+    def _rescore_sources(self, *, query: str, sources: List[RetrievedSource]) -> List[RetrievedSource]:
+        """Scores cached sources for ``query`` the way retrieval would, without the database."""
+        query_embedding = self.embed_text(query)
+        query_tokens = set(self.tokenize(query))
+        rescored: list[RetrievedSource] = []
+        for source in sources:
+            if source.source_type == "invoice":
+                overlap = len(query_tokens.intersection(self.tokenize(source.content)))
+                similarity = overlap / max(1, len(query_tokens))
+            else:
+                embedding = self.embed_text(source.content)
+                similarity = sum(left * right for left, right in zip(query_embedding, embedding))
+            rescored.append(replace(source, similarity=similarity))
+        return sorted(rescored, key=lambda item: item.similarity, reverse=True)
+
+    def _drop_stale_sources(self, *, session: Session, sources: List[RetrievedSource]) -> List[RetrievedSource]:
+        """Removes cached chunks whose document was deleted, excluded from RAG or is being reindexed."""
+        document_ids = {source.document_id for source in sources if source.document_id is not None}
+        if not document_ids:
+            return list(sources)
+        live_ids = set(
+            session.exec(
+                select(VehicleDocument.id).where(
+                    VehicleDocument.id.in_(document_ids),
+                    VehicleDocument.status == "ready",
+                    VehicleDocument.included_in_rag == True,  # noqa: E712
+                    VehicleDocument.deletion_requested == False,  # noqa: E712
+                )
+            ).all()
+        )
+        return [source for source in sources if source.document_id is None or source.document_id in live_ids]
+
+    def load_conversation(
+        self,
+        chat_session: VehicleChatSession,
+        *,
+        source_scope: str,
+        include_invoice_docs: bool,
+    ) -> ChatConversation:
+        """Cached sources are only reused with the retrieval settings they were gathered with."""
+        same_scope = (
+            chat_session.source_scope == source_scope and chat_session.include_invoice_docs == include_invoice_docs
+        )
+        return ChatConversation(
+            source_scope=source_scope,
+            include_invoice_docs=include_invoice_docs,
+            summary=chat_session.summary or "",
+            turns=list(chat_session.turns or []),
+            sources=[RetrievedSource(**item) for item in chat_session.sources or []] if same_scope else [],
+        )
+
+    def store_conversation(self, chat_session: VehicleChatSession, conversation: ChatConversation) -> None:
+        chat_session.source_scope = conversation.source_scope
+        chat_session.include_invoice_docs = conversation.include_invoice_docs
+        chat_session.summary = conversation.summary or None
+        chat_session.turns = list(conversation.turns)
+        chat_session.sources = [asdict(source) for source in conversation.sources]
+        if not chat_session.title and conversation.turns:
+            chat_session.title = conversation.turns[0]["question"].strip()[:80]
+        chat_session.updated_at = self._utcnow()
+
     def retrieve_sources(
         self,
         *,
@@ -409,33 +1259,74 @@ Sources:
         question: str,
         source_scope: str,
         include_invoice_docs: bool,
+        ef_search: Optional[int] = None,
+        deadline: Optional[Deadline] = None,
     ) -> List[RetrievedSource]:
-        query_embedding = self.embed_text(question)
+        """Top chunks (and matching invoices) for ``question``.
 
-        statement = (
-            select(
-                VehicleDocumentChunk,
-                VehicleDocument,
-                VehicleDocumentChunk.embedding.cosine_distance(query_embedding).label("distance"),
+        A ``deadline`` becomes the transaction's ``statement_timeout``; a query
+        cancelled by it raises ``DeadlineExceeded``.
+        """
+        if deadline is None:
+            return self._retrieve_sources(
+                session=session,
+                vehicle=vehicle,
+                question=question,
+                source_scope=source_scope,
+                include_invoice_docs=include_invoice_docs,
+                ef_search=ef_search,
             )
-            .join(VehicleDocument, VehicleDocumentChunk.document_id == VehicleDocument.id)
-            .where(
-                VehicleDocument.vehicle_id == vehicle.id,
-                VehicleDocument.status == "ready",
-                VehicleDocument.included_in_rag == True,  # noqa: E712
+        deadline.check("retrieval")
+        try:
+            self._set_statement_timeout(session=session, seconds=deadline.remaining())
+            return self._retrieve_sources(
+                session=session,
+                vehicle=vehicle,
+                question=question,
+                source_scope=source_scope,
+                include_invoice_docs=include_invoice_docs,
+                ef_search=ef_search,
             )
+        except OperationalError as exc:
+            if "statement timeout" not in str(exc):
+                raise
+            raise DeadlineExceeded("Deadline exceeded during retrieval") from exc
+
+    def _retrieve_sources(
+        self,
+        *,
+        session: Session,
+        vehicle: Vehicle,
+        question: str,
+        source_scope: str,
+        include_invoice_docs: bool,
+        ef_search: Optional[int],
+    ) -> List[RetrievedSource]:
+        query_embedding = self.embed_text(question)
+        manuals_only = source_scope == "manuals_only"
+        matrix = (
+            self.embedding_cache.get_or_load(session=session, vehicle_id=vehicle.id)
+            if self.embedding_cache is not None
+            else None
         )
-        if source_scope == "manuals_only":
-            statement = statement.where(
-                VehicleDocument.document_type.in_(["owner_manual", "workshop_manual"])
+        if matrix is not None:
+            rows = self._retrieve_chunk_rows_from_matrix(
+                session=session,
+                matrix=matrix,
+                query_embedding=query_embedding,
+                manuals_only=manuals_only,
+            )
+        else:
+            rows = self._retrieve_chunk_rows_from_index(
+                session=session,
+                vehicle=vehicle,
+                query_embedding=query_embedding,
+                manuals_only=manuals_only,
+                ef_search=ef_search,
             )
-        statement = statement.order_by(
-            VehicleDocumentChunk.embedding.cosine_distance(query_embedding)
-        ).limit(8)
 
         retrieved: list[RetrievedSource] = []
-        rows = session.exec(statement).all()
-        for chunk, document, distance in rows:
+        for chunk, document, content, distance in rows:
             similarity = self._distance_to_similarity(distance)
             if similarity <= 0:
                 continue
@@ -445,9 +1336,11 @@ Sources:
                     source_type="document",
                     source_label=document.title or document.file_name or f"Document #{document.id}",
                     page_number=chunk.page_number,
-                    content=chunk.content,
+                    content=content,
                     file_url=document.file_url,
                     similarity=similarity,
+                    document_id=document.id,
+                    chunk_index=chunk.chunk_index,
                 )
             )
 
@@ -455,7 +1348,693 @@ Sources:
             retrieved.extend(self._retrieve_invoice_sources(session=session, vehicle=vehicle, question=question))
 
         retrieved.sort(key=lambda item: item.similarity, reverse=True)
-        return retrieved[:8]
+        if settings.RAG_HIERARCHICAL_SUMMARIES_ENABLED and is_broad_question(question):
+            summary = self._retrieve_summary_source(
+                session=session,
+                vehicle=vehicle,
+                query_embedding=query_embedding,
+                manuals_only=manuals_only,
+            )
+            if summary is not None:
+                # Ranked first so context budgeting keeps it; the chunks fill in details.
+                top_similarity = retrieved[0].similarity if retrieved else summary.similarity
+                summary = replace(summary, similarity=max(summary.similarity, top_similarity))
+                return [summary, *retrieved[: self.RETRIEVAL_LIMIT - 1]]
+        return retrieved[: self.RETRIEVAL_LIMIT]
+
+    def _retrieve_summary_source(
+        self,
+        *,
+        session: Session,
+        vehicle: Vehicle,
+        query_embedding: List[float],
+        manuals_only: bool,
+    ) -> Optional[RetrievedSource]:
+        """The summary node at the right level of detail for a broad question."""
+        distance = VehicleDocumentSummary.embedding.cosine_distance(query_embedding)
+        filters = [
+            VehicleDocument.vehicle_id == vehicle.id,
+            VehicleDocument.status == "ready",
+            VehicleDocument.included_in_rag == True,  # noqa: E712
+        ]
+        if manuals_only:
+            filters.append(VehicleDocument.document_type.in_(["owner_manual", "workshop_manual"]))
+        rows = session.exec(
+            select(VehicleDocumentSummary, VehicleDocument, distance.label("distance"))
+            .join(VehicleDocument, VehicleDocumentSummary.document_id == VehicleDocument.id)
+            .where(*filters)
+            .order_by(distance)
+            .limit(self.SUMMARY_CANDIDATES)
+        ).all()
+        candidates = [(summary, document, self._distance_to_similarity(distance)) for summary, document, distance in rows]
+        index = pick_summary_level(
+            [(summary.level, similarity) for summary, _, similarity in candidates],
+            margin=settings.RAG_SUMMARY_LEVEL_MARGIN,
+        )
+        if index is None:
+            return None
+        summary, document, similarity = candidates[index]
+        label = document.title or document.file_name or f"Document #{document.id}"
+        logger.info("Retrieved document summary", extra={"summary_level": summary.level, "summary_id": summary.id})
+        return RetrievedSource(
+            source_id=f"summary:{summary.id}",
+            source_type="summary",
+            source_label=f"{label}: {summary.title}" if summary.title else label,
+            page_number=summary.page_start,
+            content=summary.content,
+            file_url=document.file_url,
+            similarity=similarity,
+            document_id=document.id,
+        )
+
+    def answer_questions_batch(
+        self,
+        *,
+        vehicles: List[Vehicle],
+        questions: List[str],
+        source_scope: str,
+        include_invoice_docs: bool,
+        api_key: str,
+        deadline: Optional[Deadline] = None,
+    ) -> Iterator[dict[str, Any]]:
+        """Answers every question for every vehicle, yielding each result as soon as it is ready.
+
+        Each question is expanded once, structured lookups answer what they
+        can, and everything else is retrieved with one query for all
+        (vehicle, question) pairs. The database session is closed before the
+        answers are generated concurrently under the Gemini request limiter.
+        Results carry ``index``, their position in the vehicle-major product.
+        """
+        deadline = deadline or Deadline(settings.RAG_CHAT_BATCH_DEADLINE_SECONDS)
+        items = list(enumerate(product(vehicles, questions)))
+        expanded_queries = self._expand_batch_questions(
+            questions=questions,
+            api_key=api_key,
+            deadline=deadline.child(settings.RAG_CHAT_BATCH_DEADLINE_SECONDS * settings.RAG_CHAT_EXPANSION_SHARE),
+        )
+        ready: list[dict[str, Any]] = []
+        pending: list[tuple[int, Vehicle, str]] = []
+        source_lists: Optional[list[List[RetrievedSource]]] = None
+        with self.session_factory() as session:
+            for index, (vehicle, question) in items:
+                structured = None
+                if settings.RAG_STRUCTURED_ANSWERS_ENABLED and source_scope == "all_documents":
+                    structured = self._structured_response(session=session, vehicle=vehicle, question=question)
+                if structured is not None:
+                    ready.append(self._batch_result(index=index, vehicle=vehicle, question=question, response=structured))
+                else:
+                    pending.append((index, vehicle, question))
+            if pending:
+                try:
+                    source_lists = self.retrieve_sources_batch(
+                        session=session,
+                        queries=[
+                            (vehicle.id, expanded_queries[question]["retrieval_query"])
+                            for _, vehicle, question in pending
+                        ],
+                        source_scope=source_scope,
+                        include_invoice_docs=include_invoice_docs,
+                        deadline=deadline.child(settings.RAG_CHAT_BATCH_DEADLINE_SECONDS * settings.RAG_CHAT_RETRIEVAL_SHARE),
+                    )
+                except DeadlineExceeded:
+                    logger.warning("Batch chat deadline exceeded during retrieval")
+
+        yield from ready
+        if source_lists is None:
+            for index, vehicle, question in pending:
+                response = self._build_extractive_response(question=question, sources=[])
+                yield self._batch_result(index=index, vehicle=vehicle, question=question, response=response)
+            return
+
+        executor = ThreadPoolExecutor(max_workers=max(1, settings.GEMINI_MAX_CONCURRENT_REQUESTS))
+        try:
+            futures = {
+                executor.submit(
+                    self._answer_from_sources,
+                    vehicle=vehicle,
+                    question=question,
+                    expanded_query=expanded_queries[question],
+                    sources=sources,
+                    api_key=api_key,
+                    deadline=deadline,
+                ): (index, vehicle, question, sources)
+                for (index, vehicle, question), sources in zip(pending, source_lists)
+            }
+            for future in as_completed(futures):
+                index, vehicle, question, sources = futures[future]
+                try:
+                    response = future.result()
+                except Exception:
+                    # One failed question must not sink the rest of the batch.
+                    logger.exception("Batch chat answer failed", extra={"vehicle_id": vehicle.id})
+                    response = self._build_extractive_response(question=question, sources=sources)
+                yield self._batch_result(index=index, vehicle=vehicle, question=question, response=response)
+        finally:
+            # A client that stops reading a streamed batch should not keep the model calls going.
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _expand_batch_questions(self, *, questions: List[str], api_key: str, deadline: Deadline) -> dict[str, dict[str, str]]:
+        """Expands each distinct question once; ``deadline`` is the expansion stage's budget."""
+        unique_questions = list(dict.fromkeys(questions))
+
+        def expand(question: str) -> dict[str, str]:
+            try:
+                return self.expand_query_for_retrieval(question=question, api_key=api_key, deadline=deadline)
+            except DeadlineExceeded:
+                return {"retrieval_query": question, "detected_language": "unknown"}
+
+        if settings.RAG_QUERY_EXPANSION != "llm":
+            return {question: expand(question) for question in unique_questions}
+        with ThreadPoolExecutor(max_workers=max(1, settings.GEMINI_MAX_CONCURRENT_REQUESTS)) as executor:
+            return dict(zip(unique_questions, executor.map(expand, unique_questions)))
+
+    def _batch_result(self, *, index: int, vehicle: Vehicle, question: str, response: dict[str, Any]) -> dict[str, Any]:
+        response = {key: value for key, value in response.items() if key != "conversation_summary"}
+        return {"index": index, "vehicle_id": vehicle.id, "question": question, **response}
+
+    def answer_fleet_question(
+        self,
+        *,
+        vehicles: List[Vehicle],
+        question: str,
+        source_scope: str,
+        include_invoice_docs: bool,
+        api_key: str,
+        deadline: Optional[Deadline] = None,
+    ) -> dict[str, Any]:
+        """Answers one question across many vehicles ("which of my cars use 5W-30?").
+
+        Stored specs answer per vehicle where they can; the rest share a single
+        LATERAL retrieval with ``RAG_CHAT_FLEET_SOURCES_PER_VEHICLE`` sources
+        each. Vehicles are then answered in groups of
+        ``RAG_CHAT_FLEET_VEHICLES_PER_CALL`` per model call, and the per-vehicle
+        sub-answers are summarised into one fleet answer.
+        """
+        deadline = deadline or Deadline(settings.RAG_CHAT_FLEET_DEADLINE_SECONDS)
+        language = self._infer_language_from_question(question)
+        messages = self.FLEET_MESSAGES[language]
+        expanded_query = self._expand_batch_questions(
+            questions=[question],
+            api_key=api_key,
+            deadline=deadline.child(settings.RAG_CHAT_FLEET_DEADLINE_SECONDS * settings.RAG_CHAT_EXPANSION_SHARE),
+        )[question]
+        sub_answers: dict[int, dict[str, Any]] = {}
+        pending: list[Vehicle] = []
+        source_lists: list[List[RetrievedSource]] = []
+        with self.session_factory() as session:
+            for vehicle in vehicles:
+                structured = None
+                if settings.RAG_STRUCTURED_ANSWERS_ENABLED and source_scope == "all_documents":
+                    structured = self._structured_response(session=session, vehicle=vehicle, question=question)
+                if structured is not None:
+                    sub_answers[vehicle.id] = self._fleet_sub_answer(vehicle=vehicle, response=structured)
+                else:
+                    pending.append(vehicle)
+            try:
+                source_lists = self.retrieve_sources_batch(
+                    session=session,
+                    queries=[(vehicle.id, expanded_query["retrieval_query"]) for vehicle in pending],
+                    source_scope=source_scope,
+                    include_invoice_docs=include_invoice_docs,
+                    deadline=deadline.child(settings.RAG_CHAT_FLEET_DEADLINE_SECONDS * settings.RAG_CHAT_RETRIEVAL_SHARE),
+                    limit=settings.RAG_CHAT_FLEET_SOURCES_PER_VEHICLE,
+                )
+            except DeadlineExceeded:
+                logger.warning("Fleet chat deadline exceeded during retrieval")
+                source_lists = [[] for _ in pending]
+
+        contexts: list[tuple[Vehicle, List[RetrievedSource]]] = []
+        for vehicle, sources in zip(pending, source_lists):
+            if sources:
+                contexts.append((vehicle, self.fleet_context_budgeter.assemble(sources).sources))
+            else:
+                sub_answers[vehicle.id] = {
+                    **self._fleet_vehicle_fields(vehicle),
+                    "answer": messages["no_sources"],
+                    "answer_type": "no_sources",
+                    "citations": [],
+                }
+
+        group_size = max(1, settings.RAG_CHAT_FLEET_VEHICLES_PER_CALL)
+        groups = [contexts[start : start + group_size] for start in range(0, len(contexts), group_size)]
+        summaries: list[str] = []
+        if groups:
+            with ThreadPoolExecutor(max_workers=max(1, settings.GEMINI_MAX_CONCURRENT_REQUESTS)) as executor:
+                for group_answers, summary in executor.map(
+                    lambda group: self._answer_fleet_group(
+                        group=group, question=question, api_key=api_key, deadline=deadline, messages=messages
+                    ),
+                    groups,
+                ):
+                    sub_answers.update(group_answers)
+                    if summary:
+                        summaries.append(summary)
+
+        ordered = [sub_answers[vehicle.id] for vehicle in vehicles]
+        answer, confidence_note, answer_type = self._summarize_fleet_answers(
+            question=question,
+            sub_answers=ordered,
+            group_summaries=summaries,
+            all_from_one_call=len(groups) == 1 and len(contexts) == len(vehicles),
+            api_key=api_key,
+            deadline=deadline,
+            messages=messages,
+        )
+        return {
+            "answer": answer,
+            "confidence_note": confidence_note,
+            "answer_type": answer_type,
+            "vehicles": ordered,
+        }
+
+    def _answer_fleet_group(
+        self,
+        *,
+        group: list[tuple[Vehicle, List[RetrievedSource]]],
+        question: str,
+        api_key: str,
+        deadline: Deadline,
+        messages: dict[str, str],
+    ) -> tuple[dict[int, dict[str, Any]], str]:
+        """One model call for up to ``RAG_CHAT_FLEET_VEHICLES_PER_CALL`` vehicles; extractive per vehicle on failure."""
+        vehicle_blocks = []
+        for vehicle, sources in group:
+            source_blocks = [
+                f"[{source.source_id}] {source.source_label} "
+                f"({f'page {source.page_number}' if source.page_number else 'unpaged'})\n{source.content}"
+                for source in sources
+            ]
+            vehicle_blocks.append(
+                f"Vehicle {vehicle.id}: {vehicle.brand} {vehicle.model} ({vehicle.year}, {vehicle.license_plate})\n"
+                + "\n".join(source_blocks)
+            )
+        prompt = f"""
+You are answering one question for each of several vehicles, using only the sources listed under each vehicle.
+A vehicle's answer may only rely on its own sources. If they do not answer the question, say so for that vehicle.
+Return ONLY valid JSON with this shape:
+{{
+  "vehicles": [
+    {{
+      "vehicle_id": 0,
+      "answer": "string",
+      "citations": [
+        {{
+          "source_id": "string",
+          "quote": "short supporting quote"
+        }}
+      ]
+    }}
+  ],
+  "summary": "one answer to the question across these vehicles"
+}}
+
+Question:
+{question}
+
+Respond in the same language as the user's question. Do not switch to the source language unless quoting.
+
+{chr(10).join(vehicle_blocks)}
+"""
+
+        def resolve_answer_failure(exc: Exception) -> dict[str, Any]:
+            if isinstance(exc, DeadlineExceeded):
+                raise exc
+            return {"vehicles": [], "summary": ""}
+
+        payload: dict[str, Any] = {"vehicles": [], "summary": ""}
+        if not deadline.expired:
+            try:
+                payload = self.gemini_service.generate_json_payload(
+                    prompt=prompt,
+                    content=[],
+                    models=self.ANSWER_MODELS,
+                    api_key=api_key,
+                    fallback_resolver=resolve_answer_failure,
+                    deadline=deadline,
+                    response_model=FleetAnswerPayload,
+                )
+            except DeadlineExceeded:
+                logger.warning("Fleet chat deadline exceeded during answer generation")
+        payload_by_vehicle: dict[int, dict[str, Any]] = {}
+        for item in payload.get("vehicles") or []:
+            try:
+                payload_by_vehicle[int(item.get("vehicle_id"))] = item
+            except (TypeError, ValueError, AttributeError):
+                continue
+
+        answers: dict[int, dict[str, Any]] = {}
+        for vehicle, sources in group:
+            item = payload_by_vehicle.get(vehicle.id)
+            answer = str((item or {}).get("answer") or "").strip()
+            if not answer:
+                extractive = self._build_extractive_response(question=question, sources=sources)
+                answers[vehicle.id] = self._fleet_sub_answer(vehicle=vehicle, response=extractive)
+                continue
+            citations = self._build_citations_from_payload(
+                source_map={source.source_id: source for source in sources},
+                payload_citations=item.get("citations") or [],
+            )
+            answers[vehicle.id] = {
+                **self._fleet_vehicle_fields(vehicle),
+                "answer": answer,
+                "answer_type": "generated",
+                "citations": citations or self._build_fallback_citations(sources=sources),
+            }
+        return answers, str(payload.get("summary") or "").strip()
+
+    def _summarize_fleet_answers(
+        self,
+        *,
+        question: str,
+        sub_answers: list[dict[str, Any]],
+        group_summaries: list[str],
+        all_from_one_call: bool,
+        api_key: str,
+        deadline: Deadline,
+        messages: dict[str, str],
+    ) -> tuple[str, str, str]:
+        """Returns ``(answer, confidence_note, answer_type)`` for the whole fleet.
+
+        A single group's summary already covers every vehicle; otherwise a
+        short call combines the sub-answers, and without one (or when it
+        fails) the sub-answers are listed as they are.
+        """
+        if all_from_one_call and group_summaries:
+            return group_summaries[0], "", "generated"
+        listed = "\n".join(f"- {item['vehicle_label']}: {item['answer']}" for item in sub_answers)
+        if any(item["answer_type"] == "generated" for item in sub_answers) and not deadline.expired:
+            prompt = f"""
+Combine these per-vehicle answers into one answer to the question for the whole fleet.
+Name the vehicles each statement applies to and do not add facts that are not in the answers.
+Return ONLY valid JSON with this shape:
+{{
+  "answer": "string",
+  "confidence_note": "string"
+}}
+
+Question:
+{question}
+
+Respond in the same language as the user's question.
+
+Per-vehicle answers:
+{listed}
+"""
+            try:
+                payload = self.gemini_service.generate_json_payload(
+                    prompt=prompt,
+                    content=[],
+                    models=self.ANSWER_MODELS,
+                    api_key=api_key,
+                    fallback_resolver=lambda exc: {"answer": "", "confidence_note": ""},
+                    deadline=deadline,
+                    response_model=FleetSummaryPayload,
+                )
+            except DeadlineExceeded:
+                payload = {}
+            answer = str(payload.get("answer") or "").strip()
+            if answer:
+                return answer, str(payload.get("confidence_note") or "").strip(), "generated"
+        return listed, messages["confidence_note"], "extractive"
+
+    def _fleet_sub_answer(self, *, vehicle: Vehicle, response: dict[str, Any]) -> dict[str, Any]:
+        return {
+            **self._fleet_vehicle_fields(vehicle),
+            "answer": response["answer"],
+            "answer_type": response["answer_type"],
+            "citations": response["citations"],
+        }
+
+    def _fleet_vehicle_fields(self, vehicle: Vehicle) -> dict[str, Any]:
+        label = " ".join(str(part) for part in (vehicle.brand, vehicle.model) if part)
+        if vehicle.license_plate:
+            label = f"{label} ({vehicle.license_plate})"
+        return {"vehicle_id": vehicle.id, "vehicle_label": label}
+
+    def retrieve_sources_batch(
+        self,
+        *,
+        session: Session,
+        queries: List[tuple[int, str]],
+        source_scope: str,
+        include_invoice_docs: bool,
+        deadline: Optional[Deadline] = None,
+        limit: Optional[int] = None,
+    ) -> list[List[RetrievedSource]]:
+        """Top ``limit`` sources for many ``(vehicle_id, query)`` pairs with a single chunk query.
+
+        The query vectors are unnested into rows and a LATERAL subquery picks
+        each row's nearest chunks within its vehicle, so every pair uses the
+        HNSW index in one round trip. Invoices are loaded once per vehicle.
+        """
+        if not queries:
+            return []
+        limit = limit or self.RETRIEVAL_LIMIT
+        try:
+            if deadline is not None:
+                deadline.check("retrieval")
+                self._set_statement_timeout(session=session, seconds=deadline.remaining())
+            chunk_rows = self._retrieve_chunk_rows_batch(
+                session=session,
+                queries=queries,
+                manuals_only=source_scope == "manuals_only",
+                limit=limit,
+            )
+            invoice_texts = (
+                self._load_invoice_texts(session=session, vehicle_ids=sorted({vehicle_id for vehicle_id, _ in queries}))
+                if include_invoice_docs
+                else {}
+            )
+        except OperationalError as exc:
+            if "statement timeout" not in str(exc):
+                raise
+            raise DeadlineExceeded("Deadline exceeded during batch retrieval") from exc
+
+        results: list[List[RetrievedSource]] = []
+        for position, (vehicle_id, query) in enumerate(queries):
+            retrieved = [
+                RetrievedSource(
+                    source_id=f"document:{row.document_id}:chunk:{row.chunk_id}",
+                    source_type="document",
+                    source_label=row.title or row.file_name or f"Document #{row.document_id}",
+                    page_number=row.page_number,
+                    content=row.content,
+                    file_url=row.file_url,
+                    similarity=similarity,
+                    document_id=row.document_id,
+                    chunk_index=row.chunk_index,
+                )
+                for row in chunk_rows.get(position, [])
+                if (similarity := self._distance_to_similarity(row.distance)) > 0
+            ]
+            retrieved.extend(self._score_invoice_sources(invoice_texts.get(vehicle_id, []), question=query))
+            retrieved.sort(key=lambda item: item.similarity, reverse=True)
+            results.append(retrieved[:limit])
+        return results
+
+    def _retrieve_chunk_rows_batch(
+        self,
+        *,
+        session: Session,
+        queries: List[tuple[int, str]],
+        manuals_only: bool,
+        limit: int,
+    ) -> dict[int, list[Any]]:
+        """Nearest chunks per query position; distances are exact cosine whatever index picked them."""
+        self._set_hnsw_ef_search(session=session, ef_search=None)
+        dimension = self.EMBEDDING_DIMENSION
+        storage = resolve_vector_storage(settings.RAG_VECTOR_STORAGE)
+        candidate_limit = limit
+        # Orderings must match the expression indexes in rag_vector_storage.
+        if storage == "halfvec":
+            ordering = f"c.embedding::halfvec({dimension}) <=> CAST(q.embedding AS halfvec({dimension}))"
+        elif storage == "binary":
+            ordering = (
+                f"binary_quantize(c.embedding)::bit({dimension}) "
+                f"<~> binary_quantize(CAST(q.embedding AS vector({dimension})))::bit({dimension})"
+            )
+            candidate_limit = limit * max(1, settings.RAG_BINARY_RERANK_FACTOR)
+        else:
+            ordering = "c.embedding <=> CAST(q.embedding AS vector)"
+        manuals_filter = "AND d.document_type IN ('owner_manual', 'workshop_manual')" if manuals_only else ""
+        statement = sql_text(
+            f"""
+            SELECT q.ord, hits.*
+            FROM unnest(CAST(:vehicle_ids AS integer[]), CAST(:embeddings AS text[]))
+                WITH ORDINALITY AS q(vehicle_id, embedding, ord)
+            CROSS JOIN LATERAL (
+                SELECT
+                    c.id AS chunk_id,
+                    c.chunk_index,
+                    c.page_number,
+                    substr(p.text, c.start_offset + 1, c.end_offset - c.start_offset) AS content,
+                    d.id AS document_id,
+                    d.title,
+                    d.file_name,
+                    d.file_url,
+                    c.embedding <=> CAST(q.embedding AS vector) AS distance
+                FROM vehicledocumentchunk c
+                JOIN vehicledocument d ON d.id = c.document_id
+                JOIN vehicledocumentpage p ON p.id = c.page_id
+                WHERE d.vehicle_id = q.vehicle_id
+                    AND d.status = 'ready'
+                    AND d.included_in_rag
+                    {manuals_filter}
+                ORDER BY {ordering}
+                LIMIT :candidate_limit
+            ) hits
+            """
+        )
+        embeddings: dict[str, str] = {}
+        for _, query in queries:
+            if query not in embeddings:
+                embeddings[query] = "[" + ",".join(str(value) for value in self.embed_text(query)) + "]"
+        rows = session.execute(
+            statement,
+            {
+                "vehicle_ids": [vehicle_id for vehicle_id, _ in queries],
+                "embeddings": [embeddings[query] for _, query in queries],
+                "candidate_limit": candidate_limit,
+            },
+        ).all()
+        by_position: dict[int, list[Any]] = {}
+        for row in rows:
+            # ORDINALITY is 1-based.
+            by_position.setdefault(row.ord - 1, []).append(row)
+        for position, position_rows in by_position.items():
+            position_rows.sort(key=lambda row: row.distance)
+            del position_rows[limit:]
+        return by_position
+
+    @contextmanager
+    def _scoped_session(self, session: Optional[Session]) -> Iterator[Session]:
+        if session is not None:
+            yield session
+            return
+        with self.session_factory() as scoped:
+            yield scoped
+
+    def warm_embedding_cache(self, *, session: Session, vehicle_id: int) -> Optional[int]:
+        """Loads the vehicle's embedding matrix if it is small enough; returns its chunk count."""
+        if self.embedding_cache is None:
+            return None
+        matrix = self.embedding_cache.get_or_load(session=session, vehicle_id=vehicle_id)
+        return len(matrix.chunk_ids) if matrix is not None else None
+
+    def invalidate_embedding_cache(self, vehicle_id: Optional[int]) -> None:
+        if self.embedding_cache is not None and vehicle_id is not None:
+            self.embedding_cache.invalidate(vehicle_id)
+
+    def _retrieve_chunk_rows_from_matrix(
+        self,
+        *,
+        session: Session,
+        matrix: VehicleEmbeddingMatrix,
+        query_embedding: List[float],
+        manuals_only: bool,
+    ) -> list[tuple[VehicleDocumentChunk, VehicleDocument, str, float]]:
+        hits = matrix.search(query_embedding, limit=self.RETRIEVAL_LIMIT, manuals_only=manuals_only)
+        if not hits:
+            return []
+        # Re-check document state so chunks toggled out or deleted since the load never leak.
+        loaded = session.exec(
+            select(VehicleDocumentChunk, VehicleDocument, self._chunk_content())
+            .join(VehicleDocument, VehicleDocumentChunk.document_id == VehicleDocument.id)
+            .join(VehicleDocumentPage, VehicleDocumentChunk.page_id == VehicleDocumentPage.id)
+            .where(
+                VehicleDocumentChunk.id.in_([chunk_id for chunk_id, _ in hits]),
+                VehicleDocument.status == "ready",
+                VehicleDocument.included_in_rag == True,  # noqa: E712
+            )
+        ).all()
+        by_chunk_id = {chunk.id: (chunk, document, content) for chunk, document, content in loaded}
+        return [
+            (*by_chunk_id[chunk_id], 1.0 - similarity)
+            for chunk_id, similarity in hits
+            if chunk_id in by_chunk_id
+        ]
+
+    def _retrieve_chunk_rows_from_index(
+        self,
+        *,
+        session: Session,
+        vehicle: Vehicle,
+        query_embedding: List[float],
+        manuals_only: bool,
+        ef_search: Optional[int],
+    ) -> list[tuple[VehicleDocumentChunk, VehicleDocument, str, float]]:
+        self._set_hnsw_ef_search(session=session, ef_search=ef_search)
+        storage = resolve_vector_storage(settings.RAG_VECTOR_STORAGE)
+        exact_distance = VehicleDocumentChunk.embedding.cosine_distance(query_embedding)
+        if storage == "halfvec":
+            index_distance = self._halfvec_distance(query_embedding)
+            candidate_limit = self.RETRIEVAL_LIMIT
+        elif storage == "binary":
+            index_distance = self._binary_hamming_distance(query_embedding)
+            candidate_limit = self.RETRIEVAL_LIMIT * max(1, settings.RAG_BINARY_RERANK_FACTOR)
+        else:
+            index_distance = None
+
+        filters = [
+            VehicleDocument.vehicle_id == vehicle.id,
+            VehicleDocument.status == "ready",
+            VehicleDocument.included_in_rag == True,  # noqa: E712
+        ]
+        if manuals_only:
+            filters.append(VehicleDocument.document_type.in_(["owner_manual", "workshop_manual"]))
+        if index_distance is None:
+            statement = (
+                select(VehicleDocumentChunk, VehicleDocument, self._chunk_content(), exact_distance.label("distance"))
+                .join(VehicleDocument, VehicleDocumentChunk.document_id == VehicleDocument.id)
+                .join(VehicleDocumentPage, VehicleDocumentChunk.page_id == VehicleDocumentPage.id)
+                .where(*filters)
+                .order_by(exact_distance)
+                .limit(self.RETRIEVAL_LIMIT)
+            )
+            return session.exec(statement).all()
+
+        # Compact indexes only pick candidates; returned distances are exact cosine on the full vector.
+        candidates = (
+            select(VehicleDocumentChunk.id)
+            .join(VehicleDocument, VehicleDocumentChunk.document_id == VehicleDocument.id)
+            .where(*filters)
+            .order_by(index_distance)
+            .limit(candidate_limit)
+            .subquery()
+        )
+        ranked = (
+            select(VehicleDocumentChunk, VehicleDocument, self._chunk_content(), exact_distance.label("distance"))
+            .join(VehicleDocument, VehicleDocumentChunk.document_id == VehicleDocument.id)
+            .join(VehicleDocumentPage, VehicleDocumentChunk.page_id == VehicleDocumentPage.id)
+            .where(VehicleDocumentChunk.id.in_(select(candidates.c.id)))
+            .order_by(exact_distance)
+            .limit(self.RETRIEVAL_LIMIT)
+        )
+        return session.exec(ranked).all()
+
+    def _halfvec_distance(self, query_embedding: List[float]):
+        # Must match the expression index in rag_vector_storage.
+        dimension = self.EMBEDDING_DIMENSION
+        return cast(VehicleDocumentChunk.embedding, HALFVEC(dimension)).cosine_distance(query_embedding)
+
+    def _binary_hamming_distance(self, query_embedding: List[float]):
+        # Must match the expression index in rag_vector_storage.
+        dimension = self.EMBEDDING_DIMENSION
+        query_vector = cast(literal(query_embedding, VECTOR(dimension)), VECTOR(dimension))
+        return cast(func.binary_quantize(VehicleDocumentChunk.embedding), BIT(dimension)).hamming_distance(
+            cast(func.binary_quantize(query_vector), BIT(dimension))
+        )
+
+    def _set_statement_timeout(self, *, session: Session, seconds: float) -> None:
+        # At least 1 ms: statement_timeout = 0 would disable the limit.
+        session.execute(sql_text(f"SET LOCAL statement_timeout = {max(1, int(seconds * 1000))}"))
+
+    def _set_hnsw_ef_search(self, *, session: Session, ef_search: Optional[int]) -> None:
+        resolved = settings.RAG_HNSW_EF_SEARCH if ef_search is None else ef_search
+        if resolved <= 0:
+            return
+        # SET cannot take bind parameters; SET LOCAL scopes the value to the retrieval transaction.
+        session.execute(sql_text(f"SET LOCAL hnsw.ef_search = {int(resolved)}"))
 
     def embed_text(self, text: str) -> List[float]:
         vector = [0.0] * self.EMBEDDING_DIMENSION
@@ -474,23 +2053,33 @@ Sources:
         return self.storage_service.resolve_file_path(file_url)
 
     def delete_document_artifacts(self, *, session: Session, document_id: int) -> None:
-        self._delete_existing_chunks_and_facts(session=session, document_id=document_id)
+        # Later stages first: chunks reference pages.
+        for stage in reversed(self.PROCESSING_STAGES):
+            self._delete_stage_outputs(session=session, document_id=document_id, stage=stage)
+
+    def get_document_page(self, *, session: Session, document_id: int, page_number: int) -> Optional[VehicleDocumentPage]:
+        return session.exec(
+            select(VehicleDocumentPage).where(
+                VehicleDocumentPage.document_id == document_id,
+                VehicleDocumentPage.page_number == page_number,
+            )
+        ).first()
 
     def tokenize(self, text: str) -> List[str]:
         return re.findall(r"[a-zA-Z0-9]{2,}", text.lower())
 
-    def _build_chunks(self, *, document: VehicleDocument, pages: List[ParsedDocumentPage]) -> List[VehicleDocumentChunk]:
+    def _build_chunks(self, *, document: VehicleDocument, pages: List[VehicleDocumentPage]) -> List[VehicleDocumentChunk]:
         chunks: list[VehicleDocumentChunk] = []
         chunk_index = 0
         for page in pages:
-            page_text = re.sub(r"\s+", " ", page.text).strip()
-            if not page_text:
-                continue
+            page_text = page.text
             start = 0
             while start < len(page_text):
                 end = min(len(page_text), start + self.CHUNK_SIZE)
-                slice_text = page_text[start:end].strip()
+                raw_slice = page_text[start:end]
+                slice_text = raw_slice.strip()
                 if slice_text:
+                    start_offset = start + len(raw_slice) - len(raw_slice.lstrip())
                     chunks.append(
                         VehicleDocumentChunk(
                             document_id=document.id or 0,
@@ -498,7 +2087,9 @@ Sources:
                             chunk_index=chunk_index,
                             page_number=page.page_number,
                             source_label=document.title or document.file_name,
-                            content=slice_text,
+                            page_id=page.id,
+                            start_offset=start_offset,
+                            end_offset=start_offset + len(slice_text),
                             embedding=self.embed_text(slice_text),
                         )
                     )
@@ -508,16 +2099,124 @@ Sources:
                 start = max(end - self.CHUNK_OVERLAP, start + 1)
         return chunks
 
-    def _delete_existing_chunks_and_facts(self, *, session: Session, document_id: int) -> None:
-        chunk_rows = session.exec(
-            select(VehicleDocumentChunk).where(VehicleDocumentChunk.document_id == document_id)
-        ).all()
-        fact_rows = session.exec(
-            select(VehicleKnowledgeFact).where(VehicleKnowledgeFact.document_id == document_id)
-        ).all()
-        for row in chunk_rows + fact_rows:
+    def _chunk_content(self):
+        """SQL expression for a chunk's text; queries selecting it must join ``VehicleDocumentPage``."""
+        return func.substr(
+            VehicleDocumentPage.text,
+            VehicleDocumentChunk.start_offset + 1,
+            VehicleDocumentChunk.end_offset - VehicleDocumentChunk.start_offset,
+        ).label("content")
+
+    def _load_pages(self, *, session: Session, document_id: int) -> List[VehicleDocumentPage]:
+        return list(
+            session.exec(
+                select(VehicleDocumentPage)
+                .where(VehicleDocumentPage.document_id == document_id)
+                .order_by(VehicleDocumentPage.page_number)
+            ).all()
+        )
+
+    def _sync_pages(self, *, session: Session, document_id: int, pages: List[ParsedDocumentPage]) -> int:
+        """Stores parsed pages, keeping unchanged ones (and their chunks) as they are.
+
+        A page whose text changed loses its chunks, so chunking rebuilds only
+        that page; pages that disappeared are deleted. Returns how many pages
+        were added, changed or removed.
+        """
+        existing = {page.page_number: page for page in self._load_pages(session=session, document_id=document_id)}
+        stale_page_ids: list[int] = []
+        removed: list[VehicleDocumentPage] = []
+        changed = 0
+        seen: set[int] = set()
+        for parsed in pages:
+            text = re.sub(r"\s+", " ", parsed.text).strip()
+            if not text or parsed.page_number in seen:
+                continue
+            seen.add(parsed.page_number)
+            text_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+            page = existing.pop(parsed.page_number, None)
+            if page is not None and page.text_hash == text_hash:
+                continue
+            changed += 1
+            if page is None:
+                page = VehicleDocumentPage(document_id=document_id, page_number=parsed.page_number, text=text, text_hash=text_hash)
+            else:
+                stale_page_ids.append(page.id)
+                page.text = text
+                page.text_hash = text_hash
+            session.add(page)
+        for page in existing.values():
+            stale_page_ids.append(page.id)
+            removed.append(page)
+        stale_chunks = (
+            session.exec(select(VehicleDocumentChunk).where(VehicleDocumentChunk.page_id.in_(stale_page_ids))).all()
+            if stale_page_ids
+            else []
+        )
+        for chunk in stale_chunks:
+            session.delete(chunk)
+        if stale_chunks:
+            session.flush()
+        for page in removed:
+            session.delete(page)
+        session.commit()
+        if stale_chunks:
+            self.invalidate_embedding_cache(stale_chunks[0].vehicle_id)
+        return changed + len(removed)
+
+    def _renumber_chunks(self, *, session: Session, document_id: int) -> int:
+        """Restores consecutive chunk_index values in page order after an incremental rebuild; returns the chunk count."""
+        session.execute(
+            sql_text(
+                """
+                UPDATE vehicledocumentchunk c
+                SET chunk_index = ordered.position
+                FROM (
+                    SELECT id, row_number() OVER (ORDER BY page_number, start_offset) - 1 AS position
+                    FROM vehicledocumentchunk
+                    WHERE document_id = :document_id
+                ) ordered
+                WHERE c.id = ordered.id AND c.chunk_index <> ordered.position
+                """
+            ),
+            {"document_id": document_id},
+        )
+        session.commit()
+        return session.exec(
+            select(func.count(VehicleDocumentChunk.id)).where(VehicleDocumentChunk.document_id == document_id)
+        ).one()
+
+    def _delete_stage_outputs(self, *, session: Session, document_id: int, stage: str) -> None:
+        model = self.STAGE_OUTPUT_MODELS[stage]
+        rows = session.exec(select(model).where(model.document_id == document_id)).all()
+        for row in rows:
             session.delete(row)
         session.commit()
+        if model is VehicleDocumentChunk and rows:
+            self.invalidate_embedding_cache(rows[0].vehicle_id)
+
+    def _resume_stage(self, document: VehicleDocument, restart_from: Optional[str], *, has_pages: bool) -> str:
+        """First stage to run: ``restart_from`` or the one after the checkpoint, but never
+        past the earliest stage whose input checkpoint is missing."""
+        stages = self.PROCESSING_STAGES
+        if restart_from is not None and restart_from not in stages:
+            raise ValueError(f"Unknown processing stage: {restart_from}")
+        completed = stages.index(document.checkpoint_stage) if document.checkpoint_stage in stages else -1
+        if restart_from is not None:
+            first = stages.index(restart_from)
+        elif completed == len(stages) - 1:
+            first = 0
+        else:
+            first = completed + 1
+        if not has_pages:
+            return stages[0]
+        return stages[min(first, completed + 1)]
+
+    def _complete_stage(self, *, session: Session, document: VehicleDocument, stage: str) -> None:
+        document.checkpoint_stage = stage
+        document.updated_at = self._utcnow()
+        session.add(document)
+        session.commit()
 
     def _get_document_or_raise(self, *, session: Session, document_id: int) -> VehicleDocument:
         document = session.get(VehicleDocument, document_id)
@@ -553,15 +2252,24 @@ Sources:
         return document
 
     def _retrieve_invoice_sources(self, *, session: Session, vehicle: Vehicle, question: str) -> List[RetrievedSource]:
+        invoice_texts = self._load_invoice_texts(session=session, vehicle_ids=[vehicle.id])
+        return self._score_invoice_sources(invoice_texts.get(vehicle.id, []), question=question)
+
+    def _load_invoice_texts(self, *, session: Session, vehicle_ids: list[int]) -> dict[int, list[tuple[Invoice, str]]]:
         invoices = session.exec(
-            select(Invoice).where(Invoice.vehicle_id == vehicle.id, Invoice.extracted_data.is_not(None))
+            select(Invoice).where(Invoice.vehicle_id.in_(vehicle_ids), Invoice.extracted_data.is_not(None))
         ).all()
-        query_tokens = set(self.tokenize(question))
-        results: list[RetrievedSource] = []
+        by_vehicle: dict[int, list[tuple[Invoice, str]]] = {}
         for invoice in invoices:
             text = self._invoice_to_text(invoice)
-            if not text:
-                continue
+            if text:
+                by_vehicle.setdefault(invoice.vehicle_id, []).append((invoice, text))
+        return by_vehicle
+
+    def _score_invoice_sources(self, invoice_texts: list[tuple[Invoice, str]], *, question: str) -> List[RetrievedSource]:
+        query_tokens = set(self.tokenize(question))
+        results: list[RetrievedSource] = []
+        for invoice, text in invoice_texts:
             tokens = set(self.tokenize(text))
             overlap = len(tokens & query_tokens)
             if overlap == 0:
@@ -682,7 +2390,18 @@ Sources:
             return normalized
         return normalized[:177].rstrip() + "..."
 
-    def expand_query_for_retrieval(self, *, question: str, api_key: str) -> dict[str, str]:
+    def expand_query_for_retrieval(
+        self,
+        *,
+        question: str,
+        api_key: str,
+        deadline: Optional[Deadline] = None,
+    ) -> dict[str, str]:
+        if settings.RAG_QUERY_EXPANSION != "llm":
+            return self.query_expander.expand(question)
+        return self._expand_query_with_model(question=question, api_key=api_key, deadline=deadline)
+
+    def _expand_query_with_model(self, *, question: str, api_key: str, deadline: Optional[Deadline] = None) -> dict[str, str]:
         prompt = f"""
 You are preparing a multilingual search query for vehicle documentation retrieval.
 Return ONLY valid JSON with this shape:
@@ -710,6 +2429,8 @@ Question:
                 "retrieval_query": question,
                 "detected_language": "unknown",
             },
+            deadline=deadline,
+            response_model=QueryExpansionPayload,
         )
         retrieval_query = str(payload.get("retrieval_query") or "").strip()
         detected_language = str(payload.get("detected_language") or "").strip() or "unknown"
@@ -740,22 +2461,8 @@ Question:
         return None
 
     def _infer_language_from_question(self, question: str) -> str:
-        lowered = question.lower()
-        spanish_markers = (
-            "¿",
-            "qué",
-            "como ",
-            "cuál",
-            "cuanto",
-            "dónde",
-            "rueda",
-            "tuerca",
-            "apriete",
-            "manual",
-        )
-        if any(marker in lowered for marker in spanish_markers):
-            return "es"
-        return "en"
+        language = self.query_expander.detect_language(question)
+        return language if language != "unknown" else "en"
 
     def _invoice_to_text(self, invoice: Invoice) -> str:
         fields = [
@@ -796,7 +2503,10 @@ Question:
         pages = payload.get("pages") or []
         return any(str(page.get("text") or "").strip() for page in pages if isinstance(page, dict))
 
-    def _image_transcription_fallback_payload(self, *, content: list[Any], api_key: str) -> dict[str, Any]:
+    def _image_transcription_fallback_payload(self, *, content: list[Any], api_key: str, ocr_text: str = "") -> dict[str, Any]:
+        if self._is_usable_page_text(ocr_text):
+            # Low-confidence OCR text is still a better fallback than a second model call.
+            return {"pages": [{"page_number": 1, "text": ocr_text}]}
         fallback_text = self.gemini_service.generate_text_content(
             prompt="Transcribe this vehicle document image faithfully in plain text.",
             content=content,
@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import func
+from sqlmodel import Session, select
+
+from app.models import VehicleDocument, VehicleDocumentChunk
+
+logger = logging.getLogger(__name__)
+
+MANUAL_DOCUMENT_TYPES = ("owner_manual", "workshop_manual")
+
+
+@dataclass
+class VehicleEmbeddingMatrix:
+    vehicle_id: int
+    chunk_ids: np.ndarray
+    manual_mask: np.ndarray
+    embeddings: np.ndarray
+    loaded_at: float
+
+    @property
+    def nbytes(self) -> int:
+        return self.chunk_ids.nbytes + self.manual_mask.nbytes + self.embeddings.nbytes
+
+    def search(self, query: Sequence[float], *, limit: int, manuals_only: bool) -> list[tuple[int, float]]:
+        """Returns ``(chunk_id, cosine_similarity)`` pairs, best first."""
+        scores = self.embeddings @ np.asarray(query, dtype=np.float32)
+        if manuals_only:
+            scores = np.where(self.manual_mask, scores, -np.inf)
+        if scores.size > limit:
+            candidates = np.argpartition(-scores, limit)[:limit]
+        else:
+            candidates = np.arange(scores.size)
+        ordered = candidates[np.argsort(-scores[candidates])]
+        return [
+            (int(self.chunk_ids[index]), float(scores[index]))
+            for index in ordered
+            if np.isfinite(scores[index])
+        ]
+
+
+class VehicleEmbeddingCache:
+    """Per-vehicle float32 matrices of retrievable chunk embeddings for brute-force search.
+
+    Only vehicles with at most ``max_chunks_per_vehicle`` chunks are cached; larger
+    corpora stay on pgvector. Entries are evicted least-recently-used once
+    ``max_bytes`` is exceeded and expire after ``ttl_seconds`` so other worker
+    processes, which do not see local invalidations, converge on fresh data.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_chunks_per_vehicle: int,
+        max_bytes: int,
+        ttl_seconds: float,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_chunks_per_vehicle = max_chunks_per_vehicle
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries: OrderedDict[int, VehicleEmbeddingMatrix] = OrderedDict()
+        self._oversized: dict[int, float] = {}
+        self._generations: dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def nbytes(self) -> int:
+        with self._lock:
+            return sum(entry.nbytes for entry in self._entries.values())
+
+    def get(self, vehicle_id: int) -> Optional[VehicleEmbeddingMatrix]:
+        with self._lock:
+            entry = self._entries.get(vehicle_id)
+            if entry is None:
+                return None
+            if self._clock() - entry.loaded_at >= self.ttl_seconds:
+                self._entries.pop(vehicle_id, None)
+                return None
+            self._entries.move_to_end(vehicle_id)
+            return entry
+
+    def get_or_load(self, *, session: Session, vehicle_id: int) -> Optional[VehicleEmbeddingMatrix]:
+        """Returns the cached matrix, loading it when the corpus is small enough, else ``None``."""
+        entry = self.get(vehicle_id)
+        if entry is not None:
+            return entry
+        with self._lock:
+            oversized_at = self._oversized.get(vehicle_id)
+            if oversized_at is not None and self._clock() - oversized_at < self.ttl_seconds:
+                return None
+            generation = self._generations.get(vehicle_id, 0)
+
+        chunk_count = session.exec(
+            self._retrievable_chunks(select(func.count(VehicleDocumentChunk.id)), vehicle_id)
+        ).one()
+        if chunk_count == 0 or chunk_count > self.max_chunks_per_vehicle:
+            if chunk_count:
+                with self._lock:
+                    self._oversized[vehicle_id] = self._clock()
+            return None
+
+        rows = session.exec(
+            self._retrievable_chunks(
+                select(VehicleDocumentChunk.id, VehicleDocument.document_type, VehicleDocumentChunk.embedding),
+                vehicle_id,
+            )
+        ).all()
+        entry = VehicleEmbeddingMatrix(
+            vehicle_id=vehicle_id,
+            chunk_ids=np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows)),
+            manual_mask=np.fromiter((row[1] in MANUAL_DOCUMENT_TYPES for row in rows), dtype=bool, count=len(rows)),
+            embeddings=np.vstack([np.asarray(row[2], dtype=np.float32) for row in rows]),
+            loaded_at=self._clock(),
+        )
+        with self._lock:
+            # An invalidation raced with the load; serve this result once but do not keep it.
+            if self._generations.get(vehicle_id, 0) != generation:
+                return entry
+            self._entries[vehicle_id] = entry
+            self._entries.move_to_end(vehicle_id)
+            self._evict_over_budget()
+        logger.info(
+            "Loaded vehicle embedding matrix",
+            extra={"vehicle_id": vehicle_id, "chunks": len(rows), "matrix_bytes": entry.nbytes},
+        )
+        return entry
+
+    def invalidate(self, vehicle_id: int) -> None:
+        with self._lock:
+            self._entries.pop(vehicle_id, None)
+            self._oversized.pop(vehicle_id, None)
+            self._generations[vehicle_id] = self._generations.get(vehicle_id, 0) + 1
+
+    def clear(self) -> None:
+        with self._lock:
+            for vehicle_id in list(self._entries) + list(self._oversized):
+                self._generations[vehicle_id] = self._generations.get(vehicle_id, 0) + 1
+            self._entries.clear()
+            self._oversized.clear()
+
+    def _evict_over_budget(self) -> None:
+        total = sum(entry.nbytes for entry in self._entries.values())
+        while self._entries and total > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            total -= evicted.nbytes
+
+    def _retrievable_chunks(self, statement, vehicle_id: int):
+        return (
+            statement.select_from(VehicleDocumentChunk)
+            .join(VehicleDocument, VehicleDocumentChunk.document_id == VehicleDocument.id)
+            .where(
+                VehicleDocument.vehicle_id == vehicle_id,
+                VehicleDocument.status == "ready",
+                VehicleDocument.included_in_rag == True,  # noqa: E712
+            )
+        )
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""Switch the chunk HNSW index to a RAG_VECTOR_STORAGE mode.
+
+Builds the index for ``--mode`` with ``CREATE INDEX CONCURRENTLY`` and then drops
+the other modes' indexes, so chunk writes are not blocked and retrieval always
+has an index. Set ``RAG_VECTOR_STORAGE`` to the same mode once it finishes.
+halfvec and binary require pgvector >= 0.7.
+
+Run from ``backend/``:
+
+    python -m scripts.apply_vector_storage --mode binary
+"""
+from __future__ import annotations
+
+import argparse
+
+from app.core.config import settings
+from app.database import engine
+from app.services.rag_vector_storage import VECTOR_STORAGE_INDEXES, apply_vector_storage_index
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mode", choices=sorted(VECTOR_STORAGE_INDEXES), default=settings.RAG_VECTOR_STORAGE.strip().lower())
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    # CONCURRENTLY cannot run inside a transaction block.
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        apply_vector_storage_index(connection, args.mode, concurrently=True)
+    print(f"Chunk HNSW index now matches RAG_VECTOR_STORAGE={args.mode}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,552 @@
+#!/usr/bin/env python3
+"""Benchmark the vehicle document RAG pipeline against synthetic manuals.
+
+Ingest: generates text-layer PDF manuals and runs ``process_document`` on them,
+timing parse, chunk, embed, facts and database writes separately.
+Query: grows a synthetic corpus on a dedicated benchmark vehicle and records
+p50/p95/p99 of ``retrieve_sources`` and end-to-end ``answer_question`` at each
+corpus size. The model is always the local Gemini stand-in.
+
+Requires a PostgreSQL database with pgvector and migrations applied. Run from
+``backend/``:
+
+    python scripts/benchmark_rag_pipeline.py --pages 10 100 1000 --corpus-sizes 1 100 10000 100000
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import math
+import random
+import statistics
+import subprocess
+import time
+import uuid
+import zlib
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Iterable, Optional
+
+from sqlalchemy import delete, insert, select
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.core.gemini_service import GeminiService, default_json_metrics
+from app.core.gemini_stand_in import FakeGeminiBackend
+from app.database import engine
+from app.models import (
+    Vehicle,
+    VehicleDocument,
+    VehicleDocumentChunk,
+    VehicleDocumentPage,
+    VehicleDocumentSummary,
+    VehicleKnowledgeFact,
+)
+from app.services.vehicle_document_rag_service import VehicleDocumentRAGService
+
+BENCHMARK_API_KEY = "benchmark-stand-in"
+MANUAL_DIR = Path("media/vehicle-documents/benchmark")
+SEED_BATCH_DOCUMENTS = 500
+LINES_PER_PAGE = 32
+
+TOPICS = [
+    ("Engine oil", "Use {grade} fully synthetic engine oil. Capacity with filter change is {litres} litres."),
+    ("Coolant", "Fill the cooling system with {coolant} coolant mixed 50/50 with demineralised water."),
+    ("Tyre pressure", "Front tyre pressure {front} bar, rear tyre pressure {rear} bar when cold."),
+    ("Wheel torque", "Tighten the rear axle nut to {torque} Nm in two stages using a calibrated wrench."),
+    ("Brake fluid", "Replace DOT {dot} brake fluid every {months} months and bleed both circuits."),
+    ("Spark plugs", "Spark plug gap {gap} mm. Tighten spark plugs to {plug_torque} Nm."),
+    ("Chain", "Chain slack must stay between {slack_min} and {slack_max} mm measured at mid span."),
+    ("Service interval", "Perform the major service every {interval} km or {years} years, whichever comes first."),
+]
+
+QUESTIONS = [
+    "What engine oil grade should I use?",
+    "How much oil does the engine take with a filter change?",
+    "What torque for the rear axle nut?",
+    "Que presion deben llevar los neumaticos traseros?",
+    "Cada cuanto se cambia el liquido de frenos?",
+    "What is the spark plug gap?",
+    "How much chain slack is allowed?",
+    "When is the major service due?",
+]
+
+
+@dataclass
+class StageTimer:
+    """Accumulates wall time per pipeline stage by wrapping service methods."""
+
+    totals_ms: dict[str, float] = field(default_factory=lambda: defaultdict(float))
+    calls: dict[str, int] = field(default_factory=lambda: defaultdict(int))
+
+    def wrap(self, stage: str, function: Callable[..., Any]) -> Callable[..., Any]:
+        def timed(*args: Any, **kwargs: Any) -> Any:
+            started_at = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.totals_ms[stage] += (time.perf_counter() - started_at) * 1000
+                self.calls[stage] += 1
+
+        return timed
+
+    def reset(self) -> None:
+        self.totals_ms.clear()
+        self.calls.clear()
+
+
+def percentile(samples: list[float], fraction: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(fraction * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def summarize_latencies(samples: list[float]) -> dict[str, float]:
+    return {
+        "count": len(samples),
+        "mean_ms": round(statistics.fmean(samples), 3) if samples else 0.0,
+        "p50_ms": round(percentile(samples, 0.50), 3),
+        "p95_ms": round(percentile(samples, 0.95), 3),
+        "p99_ms": round(percentile(samples, 0.99), 3),
+        "max_ms": round(max(samples), 3) if samples else 0.0,
+    }
+
+
+def synthetic_page_text(*, page_number: int, rng: random.Random) -> str:
+    lines = [f"Section {page_number // 12 + 1}.{page_number % 12 + 1} - page {page_number}"]
+    while len(lines) < LINES_PER_PAGE:
+        title, template = rng.choice(TOPICS)
+        sentence = template.format(
+            grade=rng.choice(["5W-30", "10W-40", "15W-50", "0W-20"]),
+            litres=rng.choice(["3.2", "3.8", "4.2", "5.5"]),
+            coolant=rng.choice(["ethylene glycol", "OAT", "HOAT"]),
+            front=rng.choice(["2.1", "2.3", "2.5"]),
+            rear=rng.choice(["2.4", "2.6", "2.9"]),
+            torque=rng.choice([95, 120, 150, 230]),
+            dot=rng.choice([4, "5.1"]),
+            months=rng.choice([12, 24]),
+            gap=rng.choice(["0.6", "0.7", "0.8"]),
+            plug_torque=rng.choice([11, 12, 20]),
+            slack_min=rng.choice([25, 30]),
+            slack_max=rng.choice([35, 40]),
+            interval=rng.choice([15000, 24000, 30000]),
+            years=rng.choice([1, 2]),
+        )
+        lines.append(f"{title}: {sentence}")
+    return "\n".join(lines)
+
+
+def write_synthetic_manual_pdf(path: Path, *, pages: int, seed: int) -> None:
+    """Writes a minimal text-layer PDF so local extraction handles every page."""
+    rng = random.Random(seed)
+    page_ids = [4 + index * 2 for index in range(pages)]
+    objects: dict[int, bytes] = {
+        1: b"<< /Type /Catalog /Pages 2 0 R >>",
+        2: (
+            f"<< /Type /Pages /Count {pages} /Kids [{' '.join(f'{page_id} 0 R' for page_id in page_ids)}] >>"
+        ).encode("ascii"),
+        3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    }
+    for index, page_id in enumerate(page_ids, start=1):
+        text_lines = synthetic_page_text(page_number=index, rng=rng).splitlines()
+        operations = ["BT", "/F1 9 Tf", "11 TL", "40 800 Td"]
+        for line in text_lines:
+            escaped = line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+            operations.append(f"({escaped}) Tj T*")
+        operations.append("ET")
+        stream = zlib.compress("\n".join(operations).encode("latin-1"))
+        objects[page_id] = (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {page_id + 1} 0 R >>"
+        ).encode("ascii")
+        objects[page_id + 1] = (
+            f"<< /Length {len(stream)} /Filter /FlateDecode >>\nstream\n".encode("ascii") + stream + b"\nendstream"
+        )
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets: dict[int, int] = {}
+    for object_id in sorted(objects):
+        offsets[object_id] = len(output)
+        output += f"{object_id} 0 obj\n".encode("ascii") + objects[object_id] + b"\nendobj\n"
+    xref_offset = len(output)
+    size = max(objects) + 1
+    output += f"xref\n0 {size}\n0000000000 65535 f \n".encode("ascii")
+    for object_id in range(1, size):
+        output += f"{offsets[object_id]:010d} 00000 n \n".encode("ascii")
+    output += f"trailer\n<< /Size {size} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode("ascii")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(bytes(output))
+
+
+def build_stand_in_rag_service(*, latency: str, seed: int, invalid_json_ratio: float = 0.0) -> VehicleDocumentRAGService:
+    backend = FakeGeminiBackend(latency=latency, invalid_json_ratio=invalid_json_ratio, seed=seed)
+    return VehicleDocumentRAGService(gemini_service=GeminiService(backend=backend))
+
+
+def create_benchmark_vehicle(session: Session) -> Vehicle:
+    vehicle = Vehicle(
+        brand="Benchmark",
+        model="Synthetic",
+        year=2026,
+        license_plate=f"BENCH-{uuid.uuid4().hex[:8].upper()}",
+    )
+    session.add(vehicle)
+    session.commit()
+    session.refresh(vehicle)
+    return vehicle
+
+
+def delete_benchmark_documents(session: Session, vehicle_id: int) -> None:
+    # Children before parents: chunks reference pages, pages and summaries reference documents.
+    document_ids = select(VehicleDocument.id).where(VehicleDocument.vehicle_id == vehicle_id)
+    session.execute(delete(VehicleKnowledgeFact).where(VehicleKnowledgeFact.vehicle_id == vehicle_id))
+    session.execute(delete(VehicleDocumentSummary).where(VehicleDocumentSummary.vehicle_id == vehicle_id))
+    session.execute(delete(VehicleDocumentChunk).where(VehicleDocumentChunk.vehicle_id == vehicle_id))
+    session.execute(delete(VehicleDocumentPage).where(VehicleDocumentPage.document_id.in_(document_ids)))
+    session.execute(delete(VehicleDocument).where(VehicleDocument.vehicle_id == vehicle_id))
+
+
+def delete_benchmark_vehicle(session: Session, vehicle_id: int) -> None:
+    delete_benchmark_documents(session, vehicle_id)
+    session.execute(delete(Vehicle).where(Vehicle.id == vehicle_id))
+    session.commit()
+
+
+def run_ingest_benchmark(
+    *,
+    session: Session,
+    vehicle: Vehicle,
+    page_counts: Iterable[int],
+    documents_per_size: int,
+    latency: str,
+    seed: int,
+    invalid_json_ratio: float = 0.0,
+) -> list[dict[str, Any]]:
+    service = build_stand_in_rag_service(latency=latency, seed=seed, invalid_json_ratio=invalid_json_ratio)
+    timer = StageTimer()
+    service.parse_document = timer.wrap("parse", service.parse_document)
+    service.embed_text = timer.wrap("embed", service.embed_text)
+    service._build_chunks = timer.wrap("chunk", service._build_chunks)
+    service.extract_knowledge_facts = timer.wrap("facts", service.extract_knowledge_facts)
+
+    results: list[dict[str, Any]] = []
+    for pages in page_counts:
+        timer.reset()
+        total_ms = 0.0
+        chunk_count = 0
+        for index in range(documents_per_size):
+            file_name = f"manual-{pages}p-{seed}-{index}.pdf"
+            write_synthetic_manual_pdf(MANUAL_DIR / file_name, pages=pages, seed=seed + index)
+            document = VehicleDocument(
+                vehicle_id=vehicle.id,
+                title=f"Synthetic manual {pages}p #{index}",
+                document_type="workshop_manual",
+                mime_type="application/pdf",
+                file_url=f"/{MANUAL_DIR.as_posix()}/{file_name}",
+                file_name=file_name,
+            )
+            session.add(document)
+            session.commit()
+            session.refresh(document)
+
+            started_at = time.perf_counter()
+            processed = service.process_document(
+                session=session,
+                document_id=document.id,
+                gemini_api_key=BENCHMARK_API_KEY,
+            )
+            total_ms += (time.perf_counter() - started_at) * 1000
+            chunk_count += processed.chunk_count if processed else 0
+
+        # Chunking time includes the embedding calls made while building chunks.
+        stage_ms = dict(timer.totals_ms)
+        stage_ms["chunk"] = stage_ms.get("chunk", 0.0) - stage_ms.get("embed", 0.0)
+        stage_ms["insert"] = total_ms - sum(stage_ms.get(stage, 0.0) for stage in ("parse", "chunk", "embed", "facts"))
+        total_pages = pages * documents_per_size
+        results.append(
+            {
+                "pages_per_document": pages,
+                "documents": documents_per_size,
+                "chunks": chunk_count,
+                "total_ms": round(total_ms, 3),
+                "stage_ms": {stage: round(value, 3) for stage, value in sorted(stage_ms.items())},
+                "throughput": {
+                    "documents_per_second": _rate(documents_per_size, total_ms),
+                    "pages_per_second": _rate(total_pages, total_ms),
+                    "parse_pages_per_second": _rate(total_pages, stage_ms.get("parse", 0.0)),
+                    "chunks_per_second": _rate(chunk_count, stage_ms.get("chunk", 0.0)),
+                    "embeddings_per_second": _rate(timer.calls.get("embed", 0), stage_ms.get("embed", 0.0)),
+                    "inserted_chunks_per_second": _rate(chunk_count, stage_ms["insert"]),
+                },
+            }
+        )
+        print(f"ingest pages={pages}: {results[-1]['throughput']}")
+    return results
+
+
+def seed_corpus(
+    *,
+    session: Session,
+    service: VehicleDocumentRAGService,
+    vehicle: Vehicle,
+    start: int,
+    target: int,
+    chunks_per_document: int,
+    rng: random.Random,
+) -> int:
+    """Bulk-inserts ready documents with one synthetic chunk per page until the corpus has ``target`` documents."""
+    inserted_chunks = 0
+    for batch_start in range(start, target, SEED_BATCH_DOCUMENTS):
+        batch_end = min(target, batch_start + SEED_BATCH_DOCUMENTS)
+        documents = [
+            VehicleDocument(
+                vehicle_id=vehicle.id,
+                title=f"Seeded manual #{index}",
+                document_type="workshop_manual",
+                mime_type="application/pdf",
+                file_url=f"/{MANUAL_DIR.as_posix()}/seeded-{index}.pdf",
+                file_name=f"seeded-{index}.pdf",
+                status="ready",
+                chunk_count=chunks_per_document,
+                processing_progress=100,
+                processing_stage="ready",
+            )
+            for index in range(batch_start, batch_end)
+        ]
+        session.add_all(documents)
+        session.flush()
+        page_rows = []
+        for document in documents:
+            for page_number in range(1, chunks_per_document + 1):
+                text = " ".join(synthetic_page_text(page_number=page_number, rng=rng).split())[: service.CHUNK_SIZE]
+                page_rows.append(
+                    {
+                        "document_id": document.id,
+                        "page_number": page_number,
+                        "text": text,
+                        "text_hash": hashlib.sha256(text.encode("utf-8")).hexdigest(),
+                    }
+                )
+        pages = session.execute(
+            insert(VehicleDocumentPage).returning(
+                VehicleDocumentPage.id, VehicleDocumentPage.document_id, sort_by_parameter_order=True
+            ),
+            page_rows,
+        ).all()
+        titles = {document.id: document.title for document in documents}
+        rows = []
+        for (page_id, document_id), page in zip(pages, page_rows):
+            rows.append(
+                {
+                    "document_id": document_id,
+                    "vehicle_id": vehicle.id,
+                    "chunk_index": page["page_number"] - 1,
+                    "page_number": page["page_number"],
+                    "source_label": titles[document_id],
+                    "page_id": page_id,
+                    "start_offset": 0,
+                    "end_offset": len(page["text"]),
+                    "embedding": service.embed_text(page["text"]),
+                }
+            )
+        session.execute(insert(VehicleDocumentChunk), rows)
+        session.commit()
+        inserted_chunks += len(rows)
+    return inserted_chunks
+
+
+def run_query_benchmark(
+    *,
+    session: Session,
+    vehicle: Vehicle,
+    corpus_sizes: Iterable[int],
+    chunks_per_document: int,
+    queries: int,
+    latency: str,
+    seed: int,
+    invalid_json_ratio: float = 0.0,
+) -> list[dict[str, Any]]:
+    service = build_stand_in_rag_service(latency=latency, seed=seed, invalid_json_ratio=invalid_json_ratio)
+    rng = random.Random(seed)
+    results: list[dict[str, Any]] = []
+    seeded_documents = 0
+    seeded_chunks = 0
+    for corpus_size in sorted(set(corpus_sizes)):
+        seed_started_at = time.perf_counter()
+        seeded_chunks += seed_corpus(
+            session=session,
+            service=service,
+            vehicle=vehicle,
+            start=seeded_documents,
+            target=corpus_size,
+            chunks_per_document=chunks_per_document,
+            rng=rng,
+        )
+        seed_ms = (time.perf_counter() - seed_started_at) * 1000
+        seeded_documents = max(seeded_documents, corpus_size)
+        # Seeding bypasses process_document, so drop any matrix cached at the previous size.
+        service.invalidate_embedding_cache(vehicle.id)
+        cached_chunks = service.warm_embedding_cache(session=session, vehicle_id=vehicle.id)
+        session.execute(delete(VehicleKnowledgeFact).where(VehicleKnowledgeFact.vehicle_id == vehicle.id))
+        session.commit()
+
+        retrieve_samples: list[float] = []
+        answer_samples: list[float] = []
+        for index in range(queries):
+            question = QUESTIONS[index % len(QUESTIONS)]
+            started_at = time.perf_counter()
+            service.retrieve_sources(
+                session=session,
+                vehicle=vehicle,
+                question=question,
+                source_scope="all",
+                include_invoice_docs=False,
+            )
+            retrieve_samples.append((time.perf_counter() - started_at) * 1000)
+
+            started_at = time.perf_counter()
+            service.answer_question(
+                session=session,
+                vehicle=vehicle,
+                question=question,
+                source_scope="all",
+                include_invoice_docs=False,
+                api_key=BENCHMARK_API_KEY,
+            )
+            answer_samples.append((time.perf_counter() - started_at) * 1000)
+
+        results.append(
+            {
+                "corpus_documents": seeded_documents,
+                "corpus_chunks": seeded_chunks,
+                "seed_ms": round(seed_ms, 3),
+                "retrieval_path": "in_memory" if cached_chunks is not None else "pgvector",
+                "retrieve_sources": summarize_latencies(retrieve_samples),
+                "answer_question": summarize_latencies(answer_samples),
+            }
+        )
+        print(
+            f"query corpus={seeded_documents}: retrieve p95={results[-1]['retrieve_sources']['p95_ms']}ms "
+            f"answer p95={results[-1]['answer_question']['p95_ms']}ms"
+        )
+    return results
+
+
+def _rate(count: int, elapsed_ms: float) -> float:
+    if elapsed_ms <= 0:
+        return 0.0
+    return round(count / (elapsed_ms / 1000), 3)
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 100, 1000], help="Pages per synthetic manual.")
+    parser.add_argument("--documents-per-size", type=int, default=3, help="Manuals ingested per page count.")
+    parser.add_argument(
+        "--corpus-sizes",
+        type=int,
+        nargs="+",
+        default=[1, 10, 100, 1000, 10000, 100000],
+        help="Corpus sizes (documents) at which query latency is measured.",
+    )
+    parser.add_argument("--chunks-per-document", type=int, default=4, help="Chunks per seeded corpus document.")
+    parser.add_argument("--queries", type=int, default=50, help="Queries per corpus size.")
+    parser.add_argument(
+        "--model-latency",
+        default=settings.GEMINI_FAKE_LATENCY,
+        help="Stand-in latency spec, e.g. fixed:0 or lognormal:800,0.4.",
+    )
+    parser.add_argument(
+        "--invalid-json-ratio",
+        type=float,
+        default=settings.GEMINI_FAKE_INVALID_JSON_RATIO,
+        help="Share of stand-in JSON responses cut off mid-payload, to measure JSON repair.",
+    )
+    parser.add_argument("--seed", type=int, default=settings.GEMINI_FAKE_SEED)
+    parser.add_argument("--skip-ingest", action="store_true")
+    parser.add_argument("--skip-query", action="store_true")
+    parser.add_argument("--keep-data", action="store_true", help="Keep the benchmark vehicle and its corpus.")
+    parser.add_argument("--output", default=None, help="JSON results path (default: benchmark-results/rag-<ts>.json).")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    started_at = datetime.now(timezone.utc)
+    report: dict[str, Any] = {
+        "benchmark": "rag_pipeline",
+        "started_at": started_at.isoformat(),
+        "git_revision": _git_revision(),
+        "config": {
+            "pages": args.pages,
+            "documents_per_size": args.documents_per_size,
+            "corpus_sizes": args.corpus_sizes,
+            "chunks_per_document": args.chunks_per_document,
+            "queries": args.queries,
+            "model_latency": args.model_latency,
+            "invalid_json_ratio": args.invalid_json_ratio,
+            "seed": args.seed,
+        },
+        "ingest": [],
+        "query": [],
+    }
+
+    with Session(engine) as session:
+        vehicle = create_benchmark_vehicle(session)
+        try:
+            if not args.skip_ingest:
+                report["ingest"] = run_ingest_benchmark(
+                    session=session,
+                    vehicle=vehicle,
+                    page_counts=args.pages,
+                    documents_per_size=args.documents_per_size,
+                    latency=args.model_latency,
+                    seed=args.seed,
+                    invalid_json_ratio=args.invalid_json_ratio,
+                )
+                # Query runs start from an empty corpus so sizes are exact.
+                delete_benchmark_documents(session, vehicle.id)
+                session.commit()
+            if not args.skip_query:
+                report["query"] = run_query_benchmark(
+                    session=session,
+                    vehicle=vehicle,
+                    corpus_sizes=args.corpus_sizes,
+                    chunks_per_document=args.chunks_per_document,
+                    queries=args.queries,
+                    latency=args.model_latency,
+                    seed=args.seed,
+                    invalid_json_ratio=args.invalid_json_ratio,
+                )
+        finally:
+            if not args.keep_data:
+                delete_benchmark_vehicle(session, vehicle.id)
+
+    # How many model responses were valid JSON, repaired whole, kept cut off or still failed over.
+    report["gemini_json"] = default_json_metrics.snapshot()
+    report["duration_seconds"] = round((datetime.now(timezone.utc) - started_at).total_seconds(), 3)
+    output = Path(args.output or f"benchmark-results/rag-{started_at.strftime('%Y%m%dT%H%M%SZ')}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""Compare dense, halfvec, sparsevec and binary-quantized chunk embeddings.
+
+Uses the same scratch-table approach as ``tune_hnsw_index``: for each storage
+mode it builds the matching HNSW expression index, then reports build time,
+index size, average per-row value size, recall@k against exact dense search
+and query latency. Binary mode re-ranks ``k * rerank_factor`` Hamming
+candidates with exact cosine, as ``retrieve_sources`` does.
+
+Run from ``backend/``:
+
+    python -m scripts.benchmark_vector_storage --queries 200 --rerank-factor 4
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from app.database import engine
+from app.services.vehicle_document_rag_service import VehicleDocumentRAGService
+from scripts.benchmark_rag_pipeline import _git_revision, summarize_latencies
+from scripts.tune_hnsw_index import (
+    SCRATCH_INDEX,
+    SCRATCH_TABLE,
+    create_scratch_table,
+    recall_at_k,
+    run_queries,
+    sample_queries,
+)
+
+DIMENSION = 256
+
+# mode -> (indexed expression, opclass, query ordering expression)
+STORAGE_MODES: dict[str, tuple[str, str, str]] = {
+    "vector": (
+        "embedding",
+        "vector_cosine_ops",
+        "embedding <=> CAST(:query AS vector)",
+    ),
+    "halfvec": (
+        f"(embedding::halfvec({DIMENSION}))",
+        "halfvec_cosine_ops",
+        f"embedding::halfvec({DIMENSION}) <=> CAST(:query AS halfvec({DIMENSION}))",
+    ),
+    "sparsevec": (
+        f"(embedding::sparsevec({DIMENSION}))",
+        "sparsevec_cosine_ops",
+        f"embedding::sparsevec({DIMENSION}) <=> CAST(CAST(:query AS vector({DIMENSION})) AS sparsevec({DIMENSION}))",
+    ),
+    "binary": (
+        f"(binary_quantize(embedding)::bit({DIMENSION}))",
+        "bit_hamming_ops",
+        f"binary_quantize(embedding)::bit({DIMENSION}) <~> binary_quantize(CAST(:query AS vector({DIMENSION})))::bit({DIMENSION})",
+    ),
+}
+
+VALUE_SIZE_SQL: dict[str, str] = {
+    "vector": "embedding",
+    "halfvec": f"embedding::halfvec({DIMENSION})",
+    "sparsevec": f"embedding::sparsevec({DIMENSION})",
+    "binary": f"binary_quantize(embedding)::bit({DIMENSION})",
+}
+
+
+def build_query_sql(mode: str) -> str:
+    _, _, ordering = STORAGE_MODES[mode]
+    if mode != "binary":
+        return f"SELECT id FROM {SCRATCH_TABLE} WHERE vehicle_id = :vehicle_id ORDER BY {ordering} LIMIT :k"
+    return f"""
+        SELECT id FROM (
+            SELECT id, embedding FROM {SCRATCH_TABLE}
+            WHERE vehicle_id = :vehicle_id
+            ORDER BY {ordering}
+            LIMIT :candidates
+        ) candidates
+        ORDER BY embedding <=> CAST(:query AS vector)
+        LIMIT :k
+    """
+
+
+def measure_mode(
+    connection: Connection,
+    *,
+    mode: str,
+    queries: list[tuple[int, str]],
+    exact: list[list[int]],
+    k: int,
+    rerank_factor: int,
+    ef_search: int,
+) -> dict[str, Any]:
+    expression, opclass, _ = STORAGE_MODES[mode]
+    with connection.begin():
+        value_bytes = connection.execute(
+            text(f"SELECT avg(pg_column_size({VALUE_SIZE_SQL[mode]})) FROM {SCRATCH_TABLE}")
+        ).scalar_one()
+        started_at = time.perf_counter()
+        connection.execute(
+            text(f"CREATE INDEX {SCRATCH_INDEX} ON {SCRATCH_TABLE} USING hnsw ({expression} {opclass})")
+        )
+        build_seconds = time.perf_counter() - started_at
+        index_bytes = connection.execute(
+            text("SELECT pg_relation_size(CAST(:index AS regclass))"),
+            {"index": SCRATCH_INDEX},
+        ).scalar_one()
+    try:
+        found, latencies = run_queries(
+            connection,
+            queries=queries,
+            k=k,
+            settings_sql=["SET LOCAL enable_seqscan = off", f"SET LOCAL hnsw.ef_search = {int(ef_search)}"],
+            query_sql=build_query_sql(mode),
+            extra_params={"candidates": k * max(1, rerank_factor)},
+        )
+    finally:
+        with connection.begin():
+            connection.execute(text(f"DROP INDEX IF EXISTS {SCRATCH_INDEX}"))
+    recalls = [recall_at_k(expected, approximate, k) for expected, approximate in zip(exact, found)]
+    return {
+        "mode": mode,
+        "avg_value_bytes": round(float(value_bytes or 0), 1),
+        "index_bytes": index_bytes,
+        "build_seconds": round(build_seconds, 3),
+        "recall_at_k": round(sum(recalls) / max(1, len(recalls)), 4),
+        "latency": summarize_latencies(latencies),
+    }
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", nargs="+", choices=sorted(STORAGE_MODES), default=list(STORAGE_MODES))
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=8)
+    parser.add_argument("--rerank-factor", type=int, default=4, help="Binary mode candidates per result.")
+    parser.add_argument("--ef-search", type=int, default=100, help="hnsw.ef_search for every mode.")
+    parser.add_argument("--vehicle-id", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="JSON results path (default: benchmark-results/vector-storage-<ts>.json).")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    started_at = datetime.now(timezone.utc)
+    service = VehicleDocumentRAGService()
+    with engine.connect() as connection:
+        with connection.begin():
+            chunk_count = create_scratch_table(connection, vehicle_id=args.vehicle_id)
+            queries = sample_queries(connection, service=service, count=args.queries, seed=args.seed)
+        try:
+            exact, exact_latencies = run_queries(connection, queries=queries, k=args.k, settings_sql=[])
+            modes = []
+            for mode in args.modes:
+                modes.append(
+                    measure_mode(
+                        connection,
+                        mode=mode,
+                        queries=queries,
+                        exact=exact,
+                        k=args.k,
+                        rerank_factor=args.rerank_factor,
+                        ef_search=args.ef_search,
+                    )
+                )
+                print(
+                    f"{mode}: index={modes[-1]['index_bytes']}B build={modes[-1]['build_seconds']}s "
+                    f"recall@{args.k}={modes[-1]['recall_at_k']} p95={modes[-1]['latency']['p95_ms']}ms"
+                )
+        finally:
+            with connection.begin():
+                connection.execute(text(f"DROP TABLE IF EXISTS {SCRATCH_TABLE}"))
+
+    report = {
+        "benchmark": "vector_storage",
+        "started_at": started_at.isoformat(),
+        "git_revision": _git_revision(),
+        "config": {
+            "queries": len(queries),
+            "k": args.k,
+            "chunks": chunk_count,
+            "rerank_factor": args.rerank_factor,
+            "ef_search": args.ef_search,
+            "vehicle_id": args.vehicle_id,
+            "seed": args.seed,
+        },
+        "exact_scan": summarize_latencies(exact_latencies),
+        "modes": modes,
+    }
+    output = Path(args.output or f"benchmark-results/vector-storage-{started_at.strftime('%Y%m%dT%H%M%SZ')}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
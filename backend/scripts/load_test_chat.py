@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""Concurrent load test for ``/chat/ask`` against a running API.
+
+Sends ``--concurrency`` chat questions at a time while a probe thread keeps
+calling a cheap DB-backed endpoint (the vehicle's document list). If chat
+requests held their pooled connection while waiting on the model, the probe
+latency would climb towards the pool timeout as soon as concurrency exceeds
+the pool size; with scoped sessions it should stay flat.
+
+Start the server with ``GEMINI_BACKEND=fake`` (and ``GEMINI_FAKE_LATENCY`` to
+simulate slow model calls), then run from ``backend/``:
+
+    python -m scripts.load_test_chat --vehicle-id 1 --email me@example.com --password secret \\
+        --concurrency 40 --requests 200
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Optional
+
+import requests
+
+from scripts.benchmark_rag_pipeline import _git_revision, summarize_latencies
+
+QUESTIONS = (
+    "What is the rear axle torque?",
+    "¿Cuál es la presión de los neumáticos?",
+    "Which engine oil should I use?",
+    "¿Cada cuántos kilómetros se cambia el filtro de aire?",
+)
+
+
+def login(base_url: str, *, email: str, password: str) -> str:
+    response = requests.post(
+        f"{base_url}/auth/login/access-token",
+        data={"username": email, "password": password},
+        timeout=30,
+    )
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+def timed_request(session: requests.Session, method: str, url: str, **kwargs: Any) -> tuple[float, Optional[int]]:
+    started_at = time.perf_counter()
+    try:
+        status_code: Optional[int] = session.request(method, url, **kwargs).status_code
+    except requests.RequestException:
+        status_code = None
+    return (time.perf_counter() - started_at) * 1000, status_code
+
+
+def probe_loop(
+    base_url: str,
+    *,
+    headers: dict[str, str],
+    vehicle_id: int,
+    interval: float,
+    stop: threading.Event,
+    results: list[tuple[float, Optional[int]]],
+) -> None:
+    with requests.Session() as session:
+        session.headers.update(headers)
+        while not stop.is_set():
+            results.append(timed_request(session, "GET", f"{base_url}/vehicles/{vehicle_id}/documents", timeout=60))
+            stop.wait(interval)
+
+
+def run_load(
+    base_url: str,
+    *,
+    headers: dict[str, str],
+    vehicle_id: int,
+    concurrency: int,
+    total_requests: int,
+    probe_interval: float,
+) -> dict[str, Any]:
+    probe_results: list[tuple[float, Optional[int]]] = []
+    stop = threading.Event()
+    probe = threading.Thread(
+        target=probe_loop,
+        kwargs={
+            "base_url": base_url,
+            "headers": headers,
+            "vehicle_id": vehicle_id,
+            "interval": probe_interval,
+            "stop": stop,
+            "results": probe_results,
+        },
+        daemon=True,
+    )
+    local = threading.local()
+
+    def ask(index: int) -> tuple[float, Optional[int]]:
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+            local.session.headers.update(headers)
+        return timed_request(
+            local.session,
+            "POST",
+            f"{base_url}/vehicles/{vehicle_id}/chat/ask",
+            json={"question": QUESTIONS[index % len(QUESTIONS)]},
+            timeout=300,
+        )
+
+    probe.start()
+    started_at = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            chat_results = list(executor.map(ask, range(total_requests)))
+    finally:
+        stop.set()
+        probe.join()
+    elapsed = time.perf_counter() - started_at
+
+    return {
+        "elapsed_seconds": round(elapsed, 3),
+        "chat": _summarize(chat_results, elapsed),
+        "probe": _summarize(probe_results, elapsed),
+    }
+
+
+def _summarize(results: list[tuple[float, Optional[int]]], elapsed: float) -> dict[str, Any]:
+    status_codes: dict[str, int] = {}
+    for _, status_code in results:
+        key = str(status_code) if status_code is not None else "error"
+        status_codes[key] = status_codes.get(key, 0) + 1
+    return {
+        "requests_per_second": round(len(results) / elapsed, 2) if elapsed > 0 else None,
+        "status_codes": status_codes,
+        "latency": summarize_latencies([latency for latency, _ in results]),
+    }
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000/api/v1")
+    parser.add_argument("--vehicle-id", type=int, required=True)
+    parser.add_argument("--token", default=None, help="Bearer token; alternatively pass --email/--password.")
+    parser.add_argument("--email", default=None)
+    parser.add_argument("--password", default=None)
+    parser.add_argument("--concurrency", type=int, default=40)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--probe-interval", type=float, default=0.1, help="Seconds between probe requests.")
+    parser.add_argument("--output", default=None, help="JSON results path (default: benchmark-results/chat-load-<ts>.json).")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    if args.token:
+        token = args.token
+    elif args.email and args.password:
+        token = login(args.base_url, email=args.email, password=args.password)
+    else:
+        raise SystemExit("Pass --token or --email and --password")
+    started_at = datetime.now(timezone.utc)
+    results = run_load(
+        args.base_url,
+        headers={"Authorization": f"Bearer {token}"},
+        vehicle_id=args.vehicle_id,
+        concurrency=args.concurrency,
+        total_requests=args.requests,
+        probe_interval=args.probe_interval,
+    )
+    report = {
+        "benchmark": "chat_load",
+        "started_at": started_at.isoformat(),
+        "git_revision": _git_revision(),
+        "config": {
+            "base_url": args.base_url,
+            "vehicle_id": args.vehicle_id,
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "probe_interval": args.probe_interval,
+        },
+        **results,
+    }
+    print(
+        f"chat p95={results['chat']['latency']['p95_ms']}ms rps={results['chat']['requests_per_second']} | "
+        f"probe p95={results['probe']['latency']['p95_ms']}ms status={results['probe']['status_codes']}"
+    )
+    output = Path(args.output or f"benchmark-results/chat-load-{started_at.strftime('%Y%m%dT%H%M%SZ')}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""Recall-vs-latency sweep for the chunk HNSW index.
+
+Copies the retrievable chunk embeddings into an unlogged scratch table, computes
+exact top-k with a sequential scan for a sample of queries, then builds HNSW
+indexes for each ``m``/``ef_construction`` pair and measures recall@k and
+latency for each ``hnsw.ef_search``. The production table and its index are
+never modified. Queries keep the per-vehicle filter used by ``retrieve_sources``.
+
+Requires PostgreSQL with pgvector and an indexed corpus (for example one seeded
+with ``benchmark_rag_pipeline.py --keep-data``). Run from ``backend/``:
+
+    python -m scripts.tune_hnsw_index --m 8 16 32 --ef-construction 64 128 --ef-search 20 40 80 160
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Iterable, Optional, Sequence
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from app.database import engine
+from app.services.vehicle_document_rag_service import VehicleDocumentRAGService
+from scripts.benchmark_rag_pipeline import _git_revision, summarize_latencies
+
+SCRATCH_TABLE = "hnsw_tuning_chunk"
+SCRATCH_INDEX = "ix_hnsw_tuning_chunk_embedding"
+QUERY_TEXT_CHARS = 120
+NEAREST_CHUNKS_SQL = f"""
+    SELECT id FROM {SCRATCH_TABLE}
+    WHERE vehicle_id = :vehicle_id
+    ORDER BY embedding <=> CAST(:query AS vector)
+    LIMIT :k
+"""
+
+
+def recall_at_k(exact_ids: Sequence[int], approximate_ids: Sequence[int], k: int) -> float:
+    expected = set(exact_ids[:k])
+    if not expected:
+        return 1.0
+    return len(expected.intersection(approximate_ids[:k])) / len(expected)
+
+
+def pick_operating_point(curves: list[dict[str, Any]], *, target_recall: float) -> Optional[dict[str, Any]]:
+    """Returns the lowest-p95 point whose mean recall reaches ``target_recall``."""
+    candidates = [
+        {"m": curve["m"], "ef_construction": curve["ef_construction"], **point}
+        for curve in curves
+        for point in curve["points"]
+        if point["recall_at_k"] >= target_recall
+    ]
+    if not candidates:
+        return None
+    return min(candidates, key=lambda point: (point["latency"]["p95_ms"], point["ef_search"]))
+
+
+def create_scratch_table(connection: Connection, *, vehicle_id: Optional[int]) -> int:
+    connection.execute(text(f"DROP TABLE IF EXISTS {SCRATCH_TABLE}"))
+    vehicle_filter = "AND d.vehicle_id = :vehicle_id" if vehicle_id is not None else ""
+    connection.execute(
+        text(
+            f"""
+            CREATE UNLOGGED TABLE {SCRATCH_TABLE} AS
+            SELECT c.id, c.vehicle_id, c.embedding
+            FROM vehicledocumentchunk c
+            JOIN vehicledocument d ON d.id = c.document_id
+            WHERE d.status = 'ready' AND d.included_in_rag {vehicle_filter}
+            """
+        ),
+        {"vehicle_id": vehicle_id} if vehicle_id is not None else {},
+    )
+    connection.execute(text(f"ANALYZE {SCRATCH_TABLE}"))
+    return connection.execute(text(f"SELECT count(*) FROM {SCRATCH_TABLE}")).scalar_one()
+
+
+def sample_queries(
+    connection: Connection,
+    *,
+    service: VehicleDocumentRAGService,
+    count: int,
+    seed: int,
+) -> list[tuple[int, str]]:
+    """Embeds short excerpts of random chunks so queries look like questions, not whole chunks."""
+    connection.execute(text("SELECT setseed(:seed)"), {"seed": random.Random(seed).random() * 2 - 1})
+    rows = connection.execute(
+        text(
+            f"""
+            SELECT t.vehicle_id, substr(p.text, c.start_offset + 1, c.end_offset - c.start_offset) AS content
+            FROM {SCRATCH_TABLE} t
+            JOIN vehicledocumentchunk c ON c.id = t.id
+            JOIN vehicledocumentpage p ON p.id = c.page_id
+            ORDER BY random()
+            LIMIT :count
+            """
+        ),
+        {"count": count},
+    ).all()
+    return [(vehicle_id, _vector_literal(service.embed_text(content[:QUERY_TEXT_CHARS]))) for vehicle_id, content in rows]
+
+
+def run_queries(
+    connection: Connection,
+    *,
+    queries: Iterable[tuple[int, str]],
+    k: int,
+    settings_sql: Sequence[str],
+    query_sql: str = NEAREST_CHUNKS_SQL,
+    extra_params: Optional[dict[str, Any]] = None,
+) -> tuple[list[list[int]], list[float]]:
+    results: list[list[int]] = []
+    latencies: list[float] = []
+    for vehicle_id, vector in queries:
+        with connection.begin():
+            for statement in settings_sql:
+                connection.execute(text(statement))
+            started_at = time.perf_counter()
+            ids = connection.execute(
+                text(query_sql),
+                {"vehicle_id": vehicle_id, "query": vector, "k": k, **(extra_params or {})},
+            ).scalars().all()
+            latencies.append((time.perf_counter() - started_at) * 1000)
+        results.append(list(ids))
+    return results, latencies
+
+
+def sweep(
+    connection: Connection,
+    *,
+    queries: list[tuple[int, str]],
+    exact: list[list[int]],
+    k: int,
+    m_values: Iterable[int],
+    ef_construction_values: Iterable[int],
+    ef_search_values: Iterable[int],
+) -> list[dict[str, Any]]:
+    curves: list[dict[str, Any]] = []
+    for m in m_values:
+        for ef_construction in ef_construction_values:
+            if ef_construction < 2 * m:
+                # pgvector rejects ef_construction below 2 * m.
+                continue
+            with connection.begin():
+                started_at = time.perf_counter()
+                connection.execute(
+                    text(
+                        f"CREATE INDEX {SCRATCH_INDEX} ON {SCRATCH_TABLE} "
+                        f"USING hnsw (embedding vector_cosine_ops) WITH (m = {int(m)}, ef_construction = {int(ef_construction)})"
+                    )
+                )
+                build_seconds = time.perf_counter() - started_at
+                index_bytes = connection.execute(
+                    text("SELECT pg_relation_size(CAST(:index AS regclass))"),
+                    {"index": SCRATCH_INDEX},
+                ).scalar_one()
+            points = []
+            for ef_search in ef_search_values:
+                approximate, latencies = run_queries(
+                    connection,
+                    queries=queries,
+                    k=k,
+                    settings_sql=["SET LOCAL enable_seqscan = off", f"SET LOCAL hnsw.ef_search = {int(ef_search)}"],
+                )
+                recalls = [recall_at_k(expected, found, k) for expected, found in zip(exact, approximate)]
+                points.append(
+                    {
+                        "ef_search": ef_search,
+                        "recall_at_k": round(sum(recalls) / max(1, len(recalls)), 4),
+                        "min_recall_at_k": round(min(recalls, default=1.0), 4),
+                        "latency": summarize_latencies(latencies),
+                    }
+                )
+                print(
+                    f"m={m} ef_construction={ef_construction} ef_search={ef_search}: "
+                    f"recall@{k}={points[-1]['recall_at_k']} p95={points[-1]['latency']['p95_ms']}ms"
+                )
+            with connection.begin():
+                connection.execute(text(f"DROP INDEX {SCRATCH_INDEX}"))
+            curves.append(
+                {
+                    "m": m,
+                    "ef_construction": ef_construction,
+                    "build_seconds": round(build_seconds, 3),
+                    "index_bytes": index_bytes,
+                    "points": points,
+                }
+            )
+    return curves
+
+
+def _vector_literal(values: Sequence[float]) -> str:
+    return "[" + ",".join(f"{value:.6f}" for value in values) + "]"
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=200, help="Sampled queries.")
+    parser.add_argument("--k", type=int, default=8, help="Neighbours per query (retrieve_sources uses 8).")
+    parser.add_argument("--m", type=int, nargs="+", default=[8, 16, 32])
+    parser.add_argument("--ef-construction", type=int, nargs="+", default=[64, 128, 256])
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[10, 20, 40, 80, 160, 320])
+    parser.add_argument("--target-recall", type=float, default=0.95)
+    parser.add_argument("--vehicle-id", type=int, default=None, help="Restrict the corpus to one vehicle.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="JSON results path (default: benchmark-results/hnsw-<ts>.json).")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    started_at = datetime.now(timezone.utc)
+    service = VehicleDocumentRAGService()
+    with engine.connect() as connection:
+        with connection.begin():
+            chunk_count = create_scratch_table(connection, vehicle_id=args.vehicle_id)
+            queries = sample_queries(connection, service=service, count=args.queries, seed=args.seed)
+        try:
+            # No index exists on the scratch table yet, so this is an exact sequential scan.
+            exact, exact_latencies = run_queries(connection, queries=queries, k=args.k, settings_sql=[])
+            curves = sweep(
+                connection,
+                queries=queries,
+                exact=exact,
+                k=args.k,
+                m_values=args.m,
+                ef_construction_values=args.ef_construction,
+                ef_search_values=args.ef_search,
+            )
+        finally:
+            with connection.begin():
+                connection.execute(text(f"DROP TABLE IF EXISTS {SCRATCH_TABLE}"))
+
+    report = {
+        "benchmark": "hnsw_recall_latency",
+        "started_at": started_at.isoformat(),
+        "git_revision": _git_revision(),
+        "config": {
+            "queries": len(queries),
+            "k": args.k,
+            "chunks": chunk_count,
+            "vehicle_id": args.vehicle_id,
+            "target_recall": args.target_recall,
+            "seed": args.seed,
+        },
+        "exact_scan": summarize_latencies(exact_latencies),
+        "curves": curves,
+        "operating_point": pick_operating_point(curves, target_recall=args.target_recall),
+    }
+    output = Path(args.output or f"benchmark-results/hnsw-{started_at.strftime('%Y%m%dT%H%M%SZ')}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"Operating point: {report['operating_point']}")
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+from scripts.benchmark_rag_pipeline import (
+    StageTimer,
+    build_stand_in_rag_service,
+    summarize_latencies,
+    write_synthetic_manual_pdf,
+)
+
+
+def test_synthetic_manual_is_parsed_locally_without_model_calls(tmp_path):
+    manual_path = tmp_path / "manual.pdf"
+    write_synthetic_manual_pdf(manual_path, pages=12, seed=7)
+    service = build_stand_in_rag_service(latency="fixed:0", seed=7)
+    timer = StageTimer()
+    parse = timer.wrap("parse", service.parse_document)
+
+    pages = parse(file_path=str(manual_path), mime_type="application/pdf", api_key="benchmark-stand-in")
+
+    assert [page.page_number for page in pages] == list(range(1, 13))
+    assert all(service._is_usable_page_text(page.text) for page in pages)
+    assert "Nm" in " ".join(page.text for page in pages)
+    assert service.gemini_service.backend.calls == 0
+    assert timer.calls["parse"] == 1 and timer.totals_ms["parse"] > 0
+
+
+def test_summarize_latencies_reports_nearest_rank_percentiles():
+    summary = summarize_latencies([float(value) for value in range(1, 101)])
+
+    assert summary["count"] == 100
+    assert summary["p50_ms"] == 50.0
+    assert summary["p95_ms"] == 95.0
+    assert summary["p99_ms"] == 99.0
+    assert summary["max_ms"] == 100.0
@@ -0,0 +1,94 @@
+from app.core.gemini_file_cache import GeminiFileCache
+from app.core.gemini_service import GeminiService
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeUploadedFile:
+    def __init__(self, name):
+        self.name = name
+        self.deleted = False
+
+    def delete(self):
+        self.deleted = True
+
+
+def test_multimodal_content_uploads_same_pdf_once_across_chained_calls(tmp_path, monkeypatch):
+    pdf_path = tmp_path / "manual.pdf"
+    pdf_path.write_bytes(b"%PDF-1.4 fake manual")
+    clock = FakeClock()
+    cache = GeminiFileCache(ttl_seconds=3600, idle_seconds=60, clock=clock)
+    service = GeminiService(file_cache=cache)
+    uploads: list[FakeUploadedFile] = []
+
+    def fake_upload_file(path, mime_type=None):
+        uploaded = FakeUploadedFile(f"files/{len(uploads)}")
+        uploads.append(uploaded)
+        return uploaded
+
+    monkeypatch.setattr("app.core.gemini_backend.genai.configure", lambda **kwargs: None)
+    monkeypatch.setattr("app.core.gemini_backend.genai.upload_file", fake_upload_file)
+
+    with service.multimodal_content(file_path=str(pdf_path), api_key="fake-key") as first:
+        with service.multimodal_content(file_path=str(pdf_path), api_key="fake-key") as nested:
+            assert nested == first
+    with service.multimodal_content(file_path=str(pdf_path), api_key="fake-key") as retry:
+        assert retry == first
+
+    assert len(uploads) == 1
+    assert uploads[0].deleted is False
+
+    clock.now = 61
+    cache.purge_expired()
+
+    assert uploads[0].deleted is True
+
+
+def test_file_cache_reuploads_after_ttl_and_deletes_retired_handle_on_release():
+    clock = FakeClock()
+    cache = GeminiFileCache(ttl_seconds=100, idle_seconds=60, clock=clock)
+    uploads: list[FakeUploadedFile] = []
+
+    def uploader():
+        uploaded = FakeUploadedFile(f"files/{len(uploads)}")
+        uploads.append(uploaded)
+        return uploaded
+
+    first = cache.acquire("key", uploader)
+    clock.now = 150
+    second = cache.acquire("key", uploader)
+
+    assert second is not first
+    assert first.deleted is False
+
+    cache.release("key", first)
+    assert first.deleted is True
+
+    cache.release("key", second)
+    assert second.deleted is False
+
+
+def test_file_cache_purges_idle_uploads_on_acquire_and_drops_unused_key_locks():
+    clock = FakeClock()
+    cache = GeminiFileCache(ttl_seconds=3600, idle_seconds=60, clock=clock)
+
+    idle = cache.acquire("idle", lambda: FakeUploadedFile("files/idle"))
+    cache.release("idle", idle)
+    clock.now = 61
+    other = cache.acquire("other", lambda: FakeUploadedFile("files/other"))
+
+    assert idle.deleted is True
+    assert set(cache._key_locks) == {"other"}
+
+    cache.release("other", other)
+    clock.now = 200
+    cache.purge_expired()
+
+    assert other.deleted is True
+    assert cache._key_locks == {}
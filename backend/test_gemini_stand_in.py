@@ -0,0 +1,127 @@
+import pytest
+
+from app.core.deadline import Deadline, DeadlineExceeded
+from app.core.gemini_backend import GeminiBackend
+from app.core.gemini_service import GeminiService
+from app.core.gemini_stand_in import FakeGeminiBackend, LatencyDistribution, RecordingGeminiBackend, ReplayGeminiBackend
+from app.core.json_repair import JsonRepairMetrics
+from app.schemas.gemini_payloads import ChatAnswerPayload
+from app.schemas.invoice_processing import InvoiceExtractedData
+
+
+ANSWER_PROMPT = """
+Return ONLY valid JSON with this shape:
+{"answer": "string", "citations": [], "confidence_note": "string"}
+
+Sources:
+[document:7:chunk:1] Workshop Manual (page 42)
+Rear axle torque is 230 Nm.
+"""
+
+
+def test_fake_backend_answers_with_shape_valid_payload_citing_prompt_sources():
+    service = GeminiService(backend=FakeGeminiBackend(seed=1))
+
+    payload = service.generate_json_payload(
+        prompt=ANSWER_PROMPT,
+        content=[],
+        models=["model-a"],
+        api_key="offline",
+    )
+
+    assert payload["citations"] == [{"source_id": "document:7:chunk:1", "quote": ""}]
+    assert payload["answer"]
+
+
+def test_fake_backend_injected_failures_cascade_through_model_fallback():
+    service = GeminiService(backend=FakeGeminiBackend(rate_limit_ratio=1.0))
+
+    with pytest.raises(ValueError, match="All Gemini models failed"):
+        service.generate_json_content(prompt=ANSWER_PROMPT, content=[], models=["model-a", "model-b"], api_key="offline")
+
+    # A truncated invoice cannot be repaired into a valid InvoiceExtractedData (total_amount is cut off).
+    invalid_json_backend = FakeGeminiBackend(invalid_json_ratio=1.0)
+    payload = GeminiService(backend=invalid_json_backend, json_metrics=JsonRepairMetrics()).generate_json_payload(
+        prompt='Return the invoice as JSON with "total_amount".',
+        content=[],
+        models=["model-a", "model-b"],
+        api_key="offline",
+        fallback_resolver=lambda _exc: {"fallback": True},
+        response_model=InvoiceExtractedData,
+    )
+
+    assert payload == {"fallback": True}
+    assert invalid_json_backend.calls == 2
+
+
+def test_truncated_json_is_repaired_instead_of_falling_back_to_the_next_model():
+    backend = FakeGeminiBackend(invalid_json_ratio=1.0)
+    metrics = JsonRepairMetrics()
+    service = GeminiService(backend=backend, json_metrics=metrics)
+
+    payload = service.generate_json_payload(
+        prompt=ANSWER_PROMPT,
+        content=[],
+        models=["model-a", "model-b"],
+        api_key="offline",
+        response_model=ChatAnswerPayload,
+    )
+
+    assert payload == {
+        "answer": "Stand-in answer grounded on 1 sources.",
+        "citations": [{"source_id": "document:7:chunk:1", "quote": ""}],
+    }
+    assert backend.calls == 1
+    assert metrics.snapshot() == {"parsed": 0, "repaired": 0, "partial": 1, "unrecoverable": 0}
+
+
+def test_deadline_stops_model_fallbacks_once_the_budget_is_spent():
+    backend = FakeGeminiBackend(latency="fixed:200")
+    service = GeminiService(backend=backend)
+
+    with pytest.raises(DeadlineExceeded):
+        service.generate_json_content(
+            prompt=ANSWER_PROMPT,
+            content=[],
+            models=["model-a", "model-b"],
+            api_key="offline",
+            deadline=Deadline(0.05),
+        )
+
+    assert backend.calls == 1
+
+
+def test_latency_distribution_is_reproducible_for_a_seed():
+    import random
+
+    first = LatencyDistribution("lognormal:800,0.4", rng=random.Random(7))
+    second = LatencyDistribution("lognormal:800,0.4", rng=random.Random(7))
+
+    assert [first.sample_ms() for _ in range(5)] == [second.sample_ms() for _ in range(5)]
+    with pytest.raises(ValueError):
+        LatencyDistribution("poisson:3", rng=random.Random(7))
+
+
+def test_record_then_replay_serves_captured_responses_offline(tmp_path):
+    recorder = GeminiService(backend=RecordingGeminiBackend(FakeGeminiBackend(), fixtures_dir=str(tmp_path)))
+    recorded = recorder.generate_json_content(prompt=ANSWER_PROMPT, content=[], models=["model-a"], api_key="key")
+
+    replayer = GeminiService(backend=ReplayGeminiBackend(fixtures_dir=str(tmp_path)))
+    replayed = replayer.generate_json_content(prompt=ANSWER_PROMPT, content=[], models=["model-a"], api_key="key")
+
+    assert replayed == recorded
+    assert len(list(tmp_path.glob("*.json"))) == 1
+    with pytest.raises(ValueError, match="No recorded Gemini fixture"):
+        replayer.generate_json_content(prompt="unseen prompt", content=[], models=["model-a"], api_key="key")
+
+
+def test_incomplete_backend_fails_when_created():
+    class NoUploadBackend(GeminiBackend):
+        def configure(self, *, api_key):
+            return None
+
+        def generate_content(self, **kwargs):
+            return "{}"
+
+    with pytest.raises(TypeError, match="upload_file"):
+        NoUploadBackend()
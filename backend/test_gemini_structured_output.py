@@ -0,0 +1,78 @@
+from types import SimpleNamespace
+
+from app.core.gemini_response_schema import response_schema_for
+from app.core.gemini_service import GeminiService
+from app.core.json_repair import JsonRepairMetrics, repair_json
+from app.schemas.gemini_payloads import TranscriptionPayload
+from app.schemas.invoice_processing import InvoiceExtractedData
+
+
+def test_repair_fixes_fences_trailing_commas_and_raw_newlines():
+    raw_text = 'Here it is:\n```json\n{"answer": "Line one\nline two", "citations": [{"source_id": "a",},],}\n```'
+
+    assert repair_json(raw_text) == ({"answer": "Line one\nline two", "citations": [{"source_id": "a"}]}, False)
+
+
+def test_repair_keeps_a_truncated_string_and_drops_dangling_members():
+    truncated_page = '{"pages": [{"page_number": 1, "text": "Rear axle nut torque 120 N'
+    dangling_member = '{"pages": [{"page_number": 1, "text": "Oil 5W-30"}, {"page_num'
+
+    assert repair_json(truncated_page) == ({"pages": [{"page_number": 1, "text": "Rear axle nut torque 120 N"}]}, True)
+    assert repair_json(dangling_member) == ({"pages": [{"page_number": 1, "text": "Oil 5W-30"}]}, True)
+    assert repair_json('{"answer": ') == (None, False)
+    assert repair_json("I cannot read this document.") == (None, False)
+
+
+def test_response_schema_inlines_models_and_marks_optional_fields_nullable():
+    schema = response_schema_for(InvoiceExtractedData)
+
+    assert schema["required"] == ["total_amount", "confidence"]
+    assert schema["properties"]["invoice_number"] == {"type": "string", "nullable": True}
+    assert schema["properties"]["invoice_date"]["description"] == "ISO 8601 date (YYYY-MM-DD)."
+    part = schema["properties"]["maintenances"]["items"]["properties"]["parts"]["items"]
+    assert part["required"] == ["name", "unit_price", "total_price"]
+    assert "title" not in part and "default" not in part["properties"]["quantity"]
+
+
+def test_structured_output_schema_reaches_the_model_and_partial_repairs_are_opt_out(monkeypatch):
+    calls = []
+
+    class FakeModel:
+        def __init__(self, model_name):
+            self.model_name = model_name
+
+        def generate_content(self, content, generation_config=None):
+            calls.append((self.model_name, generation_config.response_schema))
+            return SimpleNamespace(text='{"pages": [{"page_number": 1, "text": "Engine oil 5W-30, capacity 4.2 l')
+
+    monkeypatch.setattr("app.core.gemini_backend.genai.GenerativeModel", FakeModel)
+    metrics = JsonRepairMetrics()
+    service = GeminiService(json_metrics=metrics)
+
+    payload = service.generate_json_payload(
+        prompt="prompt",
+        content=[],
+        models=["model-a", "model-b"],
+        api_key="fake-key",
+        response_model=TranscriptionPayload,
+    )
+
+    assert payload == {"pages": [{"page_number": 1, "text": "Engine oil 5W-30, capacity 4.2 l"}]}
+    assert calls == [("model-a", response_schema_for(TranscriptionPayload))]
+    assert metrics.snapshot() == {"parsed": 0, "repaired": 0, "partial": 1, "unrecoverable": 0}
+
+    # Transcription refuses partial repairs: a cut-off batch moves on instead of losing its last pages.
+    calls.clear()
+    payload = service.generate_json_payload(
+        prompt="prompt",
+        content=[],
+        models=["model-a", "model-b"],
+        api_key="fake-key",
+        fallback_resolver=lambda _exc: {"pages": []},
+        response_model=TranscriptionPayload,
+        allow_partial_json=False,
+    )
+
+    assert payload == {"pages": []}
+    assert [model_name for model_name, _ in calls] == ["model-a", "model-b"]
+    assert metrics.snapshot() == {"parsed": 0, "repaired": 0, "partial": 1, "unrecoverable": 2}
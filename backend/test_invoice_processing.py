@@ -4,6 +4,8 @@ from contextlib import contextmanager
 from dotenv import load_dotenv
 
 from app.core.gemini_service import GeminiService
+from app.core.ocr_engine import OcrResult
+from app.services import invoice_text_extraction
 from app.services.invoice_service import InvoiceService
 
 
@@ -46,7 +48,7 @@ def test_invoice_service_keeps_prompt_in_domain_and_delegates_generation():
             captured["mime_type"] = mime_type
             yield ["fake-content"]
 
-        def generate_json_payload(self, *, prompt, content, models, api_key, temperature=0.1):
+        def generate_json_payload(self, *, prompt, content, models, api_key, temperature=0.1, **kwargs):
             captured["prompt"] = prompt
             captured["content"] = content
             captured["models"] = models
@@ -84,6 +86,97 @@ def test_invoice_service_keeps_prompt_in_domain_and_delegates_generation():
     assert captured["generation_api_key"] == "fake-key"
 
 
+def test_invoice_service_sends_confident_ocr_text_instead_of_the_image():
+    captured = {}
+
+    class FakeGeminiService:
+        @contextmanager
+        def multimodal_content(self, **kwargs):
+            raise AssertionError("image upload not expected")
+
+        def generate_json_payload(self, *, prompt, content, models, api_key, temperature=0.1, **kwargs):
+            captured["content"] = content
+            return {"invoice_number": "INV-7", "total_amount": 42.0, "is_maintenance": True, "confidence": 0.9}
+
+    class FakeOcrEngine:
+        def recognize(self, file_path):
+            return OcrResult(text="Factura INV-7 Total 42,00", confidence=0.93)
+
+        def is_confident(self, result):
+            return result.confidence >= 0.85
+
+    service = InvoiceService(FakeGeminiService(), ocr_engine=FakeOcrEngine())
+
+    result = service.extract_invoice_data(file_path="/tmp/invoice.jpg", api_key="fake-key")
+
+    assert result.invoice_number == "INV-7"
+    assert captured["content"] == ["Texto de la factura obtenido por OCR:\nFactura INV-7 Total 42,00"]
+
+
+class FakePdfPage:
+    def __init__(self, text):
+        self.text = text
+
+    def extract_text(self, extraction_mode="plain"):
+        return self.text
+
+
+def _fake_pdf_reader(*page_texts):
+    return lambda file_path: type("FakePdfReader", (), {"pages": [FakePdfPage(text) for text in page_texts]})()
+
+
+def test_invoice_service_prompts_with_the_pdf_text_layer_keeping_columns(monkeypatch):
+    captured = {}
+
+    class FakeGeminiService:
+        @contextmanager
+        def multimodal_content(self, **kwargs):
+            raise AssertionError("PDF upload not expected")
+
+        def generate_json_payload(self, *, prompt, content, models, api_key, temperature=0.1, **kwargs):
+            captured["content"] = content
+            return {"invoice_number": "F-2026-31", "total_amount": 96.8, "is_maintenance": True, "confidence": 0.9}
+
+    monkeypatch.setattr(
+        invoice_text_extraction,
+        "PdfReader",
+        _fake_pdf_reader("Taller Moto Sur          Factura F-2026-31\n\n\n\nAceite 10W40      2     40,00\nTotal              96,80   "),
+    )
+    service = InvoiceService(FakeGeminiService(), ocr_engine=None)
+
+    result = service.extract_invoice_data(file_path="/tmp/invoice.pdf", api_key="fake-key")
+
+    assert result.invoice_number == "F-2026-31"
+    assert captured["content"] == [
+        "Texto de la factura extraído del PDF (se conserva la disposición de columnas):\n"
+        "Taller Moto Sur    Factura F-2026-31\n\nAceite 10W40    2    40,00\nTotal    96,80"
+    ]
+
+
+def test_invoice_service_uploads_pdfs_with_a_scanned_page(monkeypatch):
+    captured = {}
+
+    class FakeGeminiService:
+        @contextmanager
+        def multimodal_content(self, **kwargs):
+            yield ["uploaded-pdf"]
+
+        def generate_json_payload(self, *, prompt, content, models, api_key, temperature=0.1, **kwargs):
+            captured["content"] = content
+            return {"invoice_number": "F-2026-32", "total_amount": 12.0, "is_maintenance": False, "confidence": 0.8}
+
+    monkeypatch.setattr(
+        invoice_text_extraction,
+        "PdfReader",
+        _fake_pdf_reader("Taller Moto Sur Factura F-2026-32 Fecha 19/10/2026 Total 12,00", ""),
+    )
+    service = InvoiceService(FakeGeminiService(), ocr_engine=None)
+
+    service.extract_invoice_data(file_path="/tmp/invoice.pdf", api_key="fake-key")
+
+    assert captured["content"] == ["uploaded-pdf"]
+
+
 def test_gemini_service_can_resolve_json_fallback_from_proxy():
     service = GeminiService()
 
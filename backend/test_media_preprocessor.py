@@ -0,0 +1,50 @@
+from PIL import Image
+
+from app.core.gemini_service import GeminiService
+from app.core.media_preprocessor import MediaPreprocessor
+
+
+def test_prepare_image_downscales_grayscales_and_reports_savings(tmp_path):
+    photo_path = tmp_path / "invoice.jpg"
+    Image.new("RGB", (4000, 3000), color=(200, 120, 40)).save(photo_path, quality=95)
+    preprocessor = MediaPreprocessor(target_dpi=150, jpeg_quality=80, grayscale=True)
+
+    prepared = preprocessor.prepare_image(str(photo_path))
+
+    assert len(prepared.parts) == 1
+    assert prepared.parts[0]["mime_type"] == "image/jpeg"
+    assert prepared.prepared_tokens < prepared.original_tokens
+    assert prepared.as_log_extra()["saved_tokens"] == prepared.original_tokens - prepared.prepared_tokens
+    with Image.open(tmp_path / "invoice.jpg") as original:
+        assert original.size == (4000, 3000)
+
+
+def test_rasterize_pdf_pages_only_renders_requested_ranges(tmp_path, monkeypatch):
+    pdf_path = tmp_path / "manual.pdf"
+    pdf_path.write_bytes(b"%PDF-1.4 fake")
+    rendered_ranges: list[tuple[int, int]] = []
+
+    def fake_convert_from_path(path, dpi, first_page, last_page, grayscale):
+        rendered_ranges.append((first_page, last_page))
+        return [Image.new("L", (1240, 1754), color=255) for _ in range(first_page, last_page + 1)]
+
+    monkeypatch.setattr("app.core.media_preprocessor.convert_from_path", fake_convert_from_path)
+    preprocessor = MediaPreprocessor(target_dpi=150)
+
+    prepared = preprocessor.rasterize_pdf_pages(str(pdf_path), [7, 2, 3, 99], total_pages=10)
+
+    assert rendered_ranges == [(2, 3), (7, 7)]
+    assert prepared.page_numbers == [2, 3, 7]
+    assert len(prepared.parts) == 3
+    assert prepared.original_tokens == 10 * MediaPreprocessor.TOKENS_PER_TILE
+
+
+def test_multimodal_content_sends_prepared_image_blob(tmp_path, monkeypatch):
+    photo_path = tmp_path / "invoice.png"
+    Image.new("RGB", (3000, 2000), color=(255, 255, 255)).save(photo_path)
+    monkeypatch.setattr("app.core.gemini_backend.genai.configure", lambda **kwargs: None)
+    service = GeminiService(media_preprocessor=MediaPreprocessor(target_dpi=100))
+
+    with service.multimodal_content(file_path=str(photo_path), api_key="fake-key") as content:
+        assert content[0]["mime_type"] == "image/jpeg"
+        assert isinstance(content[0]["data"], bytes)
@@ -0,0 +1,63 @@
+import sys
+from types import SimpleNamespace
+
+from PIL import Image
+
+from app.core import ocr_engine
+from app.core.ocr_engine import OcrEngine, OcrResult, TesseractOcrBackend
+
+
+def _inline_engine(monkeypatch, backend, *, min_confidence=0.85):
+    monkeypatch.setattr(ocr_engine, "_worker_backend", None)
+    monkeypatch.setattr(ocr_engine, "build_ocr_backend", lambda name, *, languages: backend)
+    return OcrEngine(
+        backend_name="fake",
+        languages="spa+eng",
+        max_workers=0,
+        timeout_seconds=5,
+        min_confidence=min_confidence,
+    )
+
+
+def test_recognize_only_reads_images_and_swallows_backend_failures(monkeypatch):
+    calls = []
+
+    class FlakyBackend:
+        def recognize(self, file_path):
+            calls.append(file_path)
+            if "broken" in file_path:
+                raise RuntimeError("tesseract crashed")
+            return OcrResult(text="Total 42,00 EUR", confidence=0.91)
+
+    engine = _inline_engine(monkeypatch, FlakyBackend())
+
+    result = engine.recognize("/tmp/invoice.JPG")
+
+    assert result == OcrResult(text="Total 42,00 EUR", confidence=0.91)
+    assert engine.is_confident(result)
+    assert not engine.is_confident(OcrResult(text="Total", confidence=0.5))
+    assert engine.recognize("/tmp/manual.pdf") is None
+    assert engine.recognize("/tmp/broken.png") is None
+    assert calls == ["/tmp/invoice.JPG", "/tmp/broken.png"]
+
+
+def test_tesseract_backend_groups_words_into_lines_and_weights_confidence(tmp_path, monkeypatch):
+    image_path = tmp_path / "scan.png"
+    Image.new("RGB", (20, 10), "white").save(image_path)
+    data = {
+        "text": ["", "Oil", "5W-30", "", "Qty", "3"],
+        "conf": ["-1", "90", "80", "-1", "100", "40"],
+        "block_num": [1, 1, 1, 1, 1, 1],
+        "par_num": [1, 1, 1, 1, 1, 1],
+        "line_num": [0, 1, 1, 1, 2, 2],
+    }
+    fake_pytesseract = SimpleNamespace(
+        Output=SimpleNamespace(DICT="dict"),
+        image_to_data=lambda image, lang, output_type: data,
+    )
+    monkeypatch.setitem(sys.modules, "pytesseract", fake_pytesseract)
+
+    result = TesseractOcrBackend(languages="spa+eng").recognize(str(image_path))
+
+    assert result.text == "Oil 5W-30\nQty 3"
+    assert round(result.confidence, 4) == round((90 * 3 + 80 * 5 + 100 * 3 + 40 * 1) / 12 / 100, 4)
@@ -0,0 +1,68 @@
+from app.services.rag_chat_memory import ChatConversation, ChatMemory
+from app.services.vehicle_document_rag_service import RetrievedSource
+
+
+def _memory(**overrides):
+    options = {"max_turns": 2, "max_sources": 3, "summary_chars": 80, "follow_up_max_terms": 4}
+    options.update(overrides)
+    return ChatMemory(**options)
+
+
+def _source(source_id):
+    return RetrievedSource(
+        source_id=source_id,
+        source_type="document",
+        source_label="Manual",
+        page_number=None,
+        content="",
+        file_url=None,
+        similarity=0.5,
+    )
+
+
+def test_follow_up_query_appends_previous_question_only_to_short_questions():
+    memory = _memory()
+    conversation = ChatConversation(source_scope="all_documents", include_invoice_docs=True)
+
+    assert memory.follow_up_query(conversation, "¿Y el par?") == "¿Y el par?"
+
+    memory.record_turn(conversation, question="Par del eje trasero", response={"answer": "230 Nm"}, summary=None)
+
+    assert memory.follow_up_query(conversation, "¿Y el delantero?") == "¿Y el delantero? Par del eje trasero"
+    long_question = "Which engine oil grade should I use in winter?"
+    assert memory.follow_up_query(conversation, long_question) == long_question
+
+
+def test_record_turn_rolls_local_summary_and_caps_turns():
+    memory = _memory(summary_chars=100)
+    conversation = ChatConversation(source_scope="all_documents", include_invoice_docs=True)
+
+    for index in range(3):
+        memory.record_turn(
+            conversation,
+            question=f"Question {index}?",
+            response={"answer": f"Answer {index} " + "x" * 20, "answer_type": "structured"},
+            summary=None,
+        )
+
+    assert [turn["question"] for turn in conversation.turns] == ["Question 1?", "Question 2?"]
+    assert len(conversation.summary) <= 100
+    assert conversation.summary.startswith("Q: Question 1?")
+    assert conversation.summary.endswith(f"Q: Question 2? A: Answer 2 {'x' * 20}")
+
+    memory.record_turn(conversation, question="Q?", response={"answer": "A"}, summary=" " + "s" * 120)
+
+    assert conversation.summary == "s" * 100
+
+
+def test_extend_sources_puts_fresh_sources_first_and_drops_oldest():
+    memory = _memory()
+    conversation = ChatConversation(
+        source_scope="all_documents",
+        include_invoice_docs=True,
+        sources=[_source("a"), _source("b"), _source("c")],
+    )
+
+    memory.extend_sources(conversation, [_source("d"), _source("b")])
+
+    assert [source.source_id for source in conversation.sources] == ["d", "b", "a"]
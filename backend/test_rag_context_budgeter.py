@@ -0,0 +1,75 @@
+from app.services.rag_context_budgeter import ContextBudgeter
+from app.services.vehicle_document_rag_service import RetrievedSource, VehicleDocumentRAGService
+
+
+def build_source(document_id, chunk_index, content, similarity, page_number=1):
+    return RetrievedSource(
+        source_id=f"document:{document_id}:chunk:{chunk_index + 100}",
+        source_type="document",
+        source_label=f"Manual {document_id}",
+        page_number=page_number,
+        content=content,
+        file_url=None,
+        similarity=similarity,
+        document_id=document_id,
+        chunk_index=chunk_index,
+    )
+
+
+def build_budgeter(**overrides):
+    options = {
+        "token_budget": 1600,
+        "max_sources": 8,
+        "mmr_lambda": 0.7,
+        "max_overlap_chars": 360,
+        "embed": VehicleDocumentRAGService().embed_text,
+    }
+    options.update(overrides)
+    return ContextBudgeter(**options)
+
+
+def test_assemble_merges_adjacent_overlapping_chunks_and_keeps_best_source_id():
+    overlap = "Tighten the rear axle nut to 120 Nm in two stages."
+    first = build_source(7, 3, f"Remove the rear wheel cover. {overlap}", 0.7, page_number=12)
+    second = build_source(7, 4, f"{overlap} Refit the split pin afterwards.", 0.9, page_number=12)
+    unrelated = build_source(9, 0, "Coolant capacity is 2.1 litres of OAT coolant.", 0.5)
+
+    context = build_budgeter().assemble([second, first, unrelated])
+
+    assert context.merged_sources == 1
+    assert [source.source_id for source in context.sources] == [second.source_id, unrelated.source_id]
+    merged = context.sources[0]
+    assert merged.content == f"Remove the rear wheel cover. {overlap} Refit the split pin afterwards."
+    assert merged.content.count(overlap) == 1
+    assert merged.similarity == 0.9
+
+
+def test_assemble_prefers_distinct_sources_and_respects_token_budget():
+    oil = "Engine oil 5W-30 fully synthetic, capacity 4.2 litres with filter. " * 8
+    near_duplicate = "Engine oil 5W-30 fully synthetic, capacity 4.2 litres with filter change. " * 8
+    brakes = "Replace DOT 4 brake fluid every 24 months and bleed both circuits. " * 8
+    sources = [
+        build_source(1, 0, oil, 0.92),
+        build_source(2, 5, near_duplicate, 0.91),
+        build_source(3, 2, brakes, 0.80),
+    ]
+
+    context = build_budgeter(token_budget=200, mmr_lambda=0.5).assemble(sources)
+
+    assert [source.document_id for source in context.sources][:2] == [1, 3]
+    assert context.context_tokens <= 200
+    assert context.sources[-1].content.endswith("...")
+
+
+def test_truncation_keeps_the_best_chunk_of_a_merged_run():
+    intro = build_source(4, 0, "General safety notes for working on the chassis. " * 6, 0.4)
+    middle = build_source(4, 1, "Lift the bike on a paddock stand before any work. " * 6, 0.45)
+    torque = build_source(4, 2, "Swingarm pivot bolt torque is 95 Nm with thread lock.", 0.95)
+
+    context = build_budgeter(token_budget=90).assemble([intro, middle, torque])
+
+    [source] = context.sources
+    assert source.source_id == torque.source_id
+    assert "Swingarm pivot bolt torque is 95 Nm with thread lock." in source.content
+    assert source.content.startswith("...")
+    assert context.context_tokens <= 90
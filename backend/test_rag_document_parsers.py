@@ -0,0 +1,131 @@
+import zipfile
+
+from app.services.rag_document_parsers import LocalDocumentParser, paginate
+from app.services.vehicle_document_rag_service import VehicleDocumentRAGService
+
+WORD_NS = 'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"'
+
+
+def _write_zip(path, members):
+    with zipfile.ZipFile(path, "w") as archive:
+        for name, content in members.items():
+            archive.writestr(name, content)
+    return str(path)
+
+
+def _word_paragraph(text, *, style=None, page_break=False):
+    properties = f'<w:pPr><w:pStyle w:val="{style}"/></w:pPr>' if style else ""
+    brk = "<w:r><w:lastRenderedPageBreak/></w:r>" if page_break else ""
+    return f"<w:p>{properties}{brk}<w:r><w:t>{text}</w:t></w:r></w:p>"
+
+
+def _word_row(*cells):
+    return "<w:tr>" + "".join(f"<w:tc>{_word_paragraph(cell)}</w:tc>" for cell in cells) + "</w:tr>"
+
+
+def test_docx_keeps_page_breaks_headings_and_table_rows(tmp_path):
+    body = "".join(
+        [
+            _word_paragraph("Service bulletin 12", style="Heading1"),
+            _word_paragraph("Replace the rear axle nut."),
+            "<w:tbl>" + _word_row("Component", "Torque (Nm)") + _word_row("Rear axle nut", "120") + "</w:tbl>",
+            _word_paragraph("Check the chain tension.", page_break=True),
+        ]
+    )
+    path = _write_zip(
+        tmp_path / "bulletin.docx",
+        {"word/document.xml": f"<w:document {WORD_NS}><w:body>{body}</w:body></w:document>"},
+    )
+
+    pages = LocalDocumentParser(page_chars=6000).parse(path)
+
+    assert pages == [
+        "# Service bulletin 12\nReplace the rear axle nut.\nComponent | Torque (Nm).\nComponent: Rear axle nut; Torque (Nm): 120.",
+        "Check the chain tension.",
+    ]
+
+
+def test_xlsx_reads_shared_and_inline_strings_one_page_per_visible_sheet(tmp_path):
+    sheet_ns = 'xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"'
+    rel_ns = 'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"'
+    path = _write_zip(
+        tmp_path / "torques.xlsx",
+        {
+            "xl/workbook.xml": (
+                f"<workbook {sheet_ns} {rel_ns}><sheets>"
+                '<sheet name="Torques" sheetId="1" r:id="rId1"/>'
+                '<sheet name="Lookup" sheetId="2" state="hidden" r:id="rId2"/>'
+                "</sheets></workbook>"
+            ),
+            "xl/_rels/workbook.xml.rels": (
+                '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+                '<Relationship Id="rId1" Target="worksheets/sheet1.xml"/>'
+                '<Relationship Id="rId2" Target="worksheets/sheet2.xml"/>'
+                "</Relationships>"
+            ),
+            "xl/sharedStrings.xml": (
+                f"<sst {sheet_ns}><si><t>Component</t></si><si><r><t>Torque </t></r><r><t>(Nm)</t></r></si>"
+                "<si><t>Front axle</t></si></sst>"
+            ),
+            "xl/worksheets/sheet1.xml": (
+                f"<worksheet {sheet_ns}><sheetData>"
+                '<row r="1"><c r="A1" t="s"><v>0</v></c><c r="B1" t="s"><v>1</v></c></row>'
+                '<row r="2"><c r="A2" t="s"><v>2</v></c><c r="B2"><v>87.000000000000014</v></c></row>'
+                '<row r="3"><c r="A3" t="inlineStr"><is><t>Rear axle</t></is></c><c r="C3"><v>2</v></c></row>'
+                "</sheetData></worksheet>"
+            ),
+            "xl/worksheets/sheet2.xml": f"<worksheet {sheet_ns}><sheetData/></worksheet>",
+        },
+    )
+
+    pages = LocalDocumentParser(page_chars=6000).parse(path)
+
+    assert pages == [
+        "## Torques\nComponent | Torque (Nm).\nComponent: Front axle; Torque (Nm): 87.\nComponent: Rear axle; 2."
+    ]
+
+
+def test_epub_reads_spine_chapters_as_pages_and_html_tables(tmp_path):
+    path = _write_zip(
+        tmp_path / "manual.epub",
+        {
+            "META-INF/container.xml": (
+                '<container xmlns="urn:oasis:names:tc:opendocument:xmlns:container"><rootfiles>'
+                '<rootfile full-path="OEBPS/content.opf"/></rootfiles></container>'
+            ),
+            "OEBPS/content.opf": (
+                '<package xmlns="http://www.idpf.org/2007/opf"><manifest>'
+                '<item id="c1" href="text/chapter%201.xhtml"/><item id="c2" href="text/chapter2.xhtml"/>'
+                '</manifest><spine><itemref idref="c2"/><itemref idref="c1"/></spine></package>'
+            ),
+            "OEBPS/text/chapter 1.xhtml": "<html><body><h2>Brakes</h2><p>Bleed &amp; refill.</p></body></html>",
+            "OEBPS/text/chapter2.xhtml": (
+                "<html><head><style>p {}</style></head><body><table>"
+                "<tr><th>Fluid</th><th>Capacity</th></tr><tr><td>Engine oil</td><td>3.4 l</td></tr>"
+                "</table><script>ignored()</script></body></html>"
+            ),
+        },
+    )
+
+    pages = LocalDocumentParser(page_chars=6000).parse(path)
+
+    assert pages == ["Fluid | Capacity.\nFluid: Engine oil; Capacity: 3.4 l.", "## Brakes\nBleed & refill."]
+
+
+def test_paginate_cuts_at_page_chars_and_breaks():
+    assert paginate(["a" * 4, "b" * 4, None, "c" * 9, "d"], page_chars=8) == ["a" * 4, "b" * 4, "c" * 9, "d"]
+
+
+def test_parse_document_uses_the_local_parser_without_model_calls(tmp_path, monkeypatch):
+    service = VehicleDocumentRAGService()
+    path = tmp_path / "bulletin.html"
+    path.write_text("<p>Torque the caliper bolts to 25 Nm.</p>", encoding="utf-8")
+
+    def fail(**kwargs):
+        raise AssertionError("no model call expected")
+
+    monkeypatch.setattr(service.gemini_service, "generate_json_payload", fail)
+
+    pages = service.parse_document(file_path=str(path), mime_type="text/html", api_key="fake-key")
+
+    assert [(page.page_number, page.text) for page in pages] == [(1, "Torque the caliper bolts to 25 Nm.")]
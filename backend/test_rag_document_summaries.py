@@ -0,0 +1,74 @@
+import threading
+
+from app.services.rag_document_summaries import DocumentSummaryBuilder, is_broad_question, pick_summary_level
+
+
+def _pages(count):
+    return [(number, f"Page {number} maintenance interval text " * 3) for number in range(1, count + 1)]
+
+
+def test_build_summarizes_sections_then_chapters_then_document_concurrently():
+    builder = DocumentSummaryBuilder(max_workers=4, section_chars=150, sections_per_chapter=2)
+    prompts = []
+    threads = set()
+    lock = threading.Lock()
+    progress = []
+
+    def summarize(prompt):
+        with lock:
+            prompts.append(prompt)
+            threads.add(threading.get_ident())
+        level = "document" if "completo" in prompt else "chapter" if "capítulo" in prompt else "section"
+        return {"title": f"{level} title", "summary": f"{level} summary"}
+
+    root = builder.build(
+        document_label="Manual",
+        pages=_pages(5),
+        summarize=summarize,
+        progress_callback=lambda completed, total: progress.append((completed, total)),
+    )
+
+    # 5 one-page sections, 3 chapters (2 + 2 + 1) and the document.
+    assert len(prompts) == 9
+    assert [node.level for node in root.walk()].count("section") == 5
+    assert [(chapter.level, chapter.page_start, chapter.page_end) for chapter in root.children] == [
+        ("chapter", 1, 2),
+        ("chapter", 3, 4),
+        ("chapter", 5, 5),
+    ]
+    assert root.level == "document" and root.summary == "document summary"
+    assert "section summary" in prompts[-1] or "chapter summary" in prompts[-1]
+    assert progress[-1] == (9, 9)
+
+
+def test_build_drops_failed_nodes_and_hands_sections_of_a_failed_chapter_to_the_document():
+    builder = DocumentSummaryBuilder(max_workers=2, section_chars=150, sections_per_chapter=2)
+
+    def summarize(prompt):
+        if "Resume la página 2 " in prompt:
+            raise RuntimeError("model down")
+        if "capítulo (páginas 4-5)" in prompt:
+            return {}
+        return {"title": "t", "summary": "s"}
+
+    root = builder.build(document_label="Manual", pages=_pages(5), summarize=summarize)
+
+    # Section 2 is dropped before chapters are formed, so the first chapter spans pages 1 and 3.
+    assert [(node.level, node.page_start) for node in root.children] == [
+        ("chapter", 1),
+        ("section", 4),
+        ("section", 5),
+    ]
+    assert [section.page_start for section in root.children[0].children] == [1, 3]
+    assert builder.build(document_label="Manual", pages=_pages(2), summarize=lambda prompt: {}) is None
+
+
+def test_broad_questions_pick_the_broadest_close_enough_summary():
+    assert is_broad_question("Summarize the maintenance schedule")
+    assert is_broad_question("Resúmeme el capítulo de frenos")
+    assert not is_broad_question("What is the rear axle torque?")
+
+    candidates = [("section", 0.9), ("chapter", 0.8), ("document", 0.7)]
+    assert pick_summary_level(candidates, margin=0.8) == 1
+    assert pick_summary_level(candidates, margin=0.75) == 2
+    assert pick_summary_level([("section", 0.0)], margin=0.8) is None
@@ -0,0 +1,19 @@
+from app.services.rag_query_expansion import LocalQueryExpander, normalize_text
+
+
+def test_normalize_text_strips_accents_and_case():
+    assert normalize_text("  Presión  de los NEUMÁTICOS ") == "presion de los neumaticos"
+
+
+def test_local_expander_detects_language_and_translates_both_ways():
+    expander = LocalQueryExpander()
+
+    spanish = expander.expand("Cada cuantos km cambio las pastillas de freno")
+    english = expander.expand("What tyre pressure should I use?")
+    unknown = expander.expand("230 Nm")
+
+    assert spanish["detected_language"] == "es"
+    assert spanish["retrieval_query"].endswith("brake pads")
+    assert english["detected_language"] == "en"
+    assert english["retrieval_query"] == "What tyre pressure should I use? presión de los neumáticos"
+    assert unknown == {"retrieval_query": "230 Nm", "detected_language": "unknown"}
@@ -0,0 +1,123 @@
+from types import SimpleNamespace
+
+from app.services.rag_query_expansion import LocalQueryExpander
+from app.services.rag_structured_answers import StructuredAnswerMatcher
+
+
+class FakeExecResult:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def first(self):
+        return self.rows[0] if self.rows else None
+
+    def all(self):
+        return self.rows
+
+
+class LookupSession:
+    """Returns the specs row for ``first()`` lookups and fact rows for ``all()`` lookups."""
+
+    def __init__(self, *, specs=None, facts=()):
+        self.specs = specs
+        self.facts = list(facts)
+
+    def exec(self, statement):
+        if "vehiclespecs" in str(statement):
+            return FakeExecResult([self.specs] if self.specs is not None else [])
+        return FakeExecResult(self.facts)
+
+
+def build_specs(**overrides):
+    values = {
+        "engine_oil_type": "10W-40 synthetic",
+        "coolant_type": None,
+        "tire_size": "120/70 ZR17",
+        "battery_type": None,
+        "fuel_type": None,
+        "torque_specs": [
+            {"component": "Rear Axle Nut", "torque_nm": 230, "notes": ""},
+            {"component": "Wheel Nuts", "torque_nm": 110, "notes": "Tighten in star pattern"},
+        ],
+    }
+    values.update(overrides)
+    return SimpleNamespace(**values)
+
+
+def test_matcher_answers_spec_and_torque_lookups_in_either_language():
+    matcher = StructuredAnswerMatcher(LocalQueryExpander())
+    session = LookupSession(specs=build_specs())
+
+    oil = matcher.match(session=session, vehicle_id=3, question="¿Qué aceite lleva la moto?", language="es")
+    torque = matcher.match(
+        session=session,
+        vehicle_id=3,
+        question="¿Qué par de apriete llevan las tuercas de las ruedas?",
+        language="es",
+    )
+
+    assert oil.answer == "Aceite de motor: 10W-40 synthetic."
+    assert oil.citations[0]["source_id"] == "specs:3:engine_oil_type"
+    assert torque.answer == "Wheel Nuts: 110 Nm (Tighten in star pattern)."
+    assert torque.citations[0]["source_id"] == "specs:3:torque_specs.1"
+
+
+def test_matcher_defers_procedures_and_ambiguous_questions_to_rag():
+    matcher = StructuredAnswerMatcher(LocalQueryExpander())
+    session = LookupSession(specs=build_specs())
+
+    assert matcher.match(session=session, vehicle_id=3, question="How often should I change the oil?", language="en") is None
+    assert matcher.match(session=session, vehicle_id=3, question="Which fork oil should I use?", language="en") is None
+    assert matcher.match(session=session, vehicle_id=3, question="What torque for the nut?", language="en") is None
+
+
+def test_matcher_falls_back_to_knowledge_facts_with_document_citation():
+    matcher = StructuredAnswerMatcher(LocalQueryExpander())
+    fact = SimpleNamespace(
+        id=11,
+        title="Coolant type",
+        content="Use ethylene-glycol coolant mixed 50/50 with distilled water.",
+        source_excerpt="ethylene-glycol coolant 50/50",
+        confidence=0.9,
+    )
+    document = SimpleNamespace(
+        title="Owner Manual",
+        file_name="owner.pdf",
+        file_url="/media/vehicle-documents/owner.pdf",
+        included_in_rag=True,
+    )
+    session = LookupSession(specs=build_specs(), facts=[(fact, document)])
+
+    answer = matcher.match(session=session, vehicle_id=3, question="Which coolant does it use?", language="en")
+
+    assert answer.answer == "Use ethylene-glycol coolant mixed 50/50 with distilled water."
+    assert answer.citations == [
+        {
+            "source_id": "fact:11",
+            "source_label": "Owner Manual",
+            "page_number": None,
+            "quote": "ethylene-glycol coolant 50/50",
+            "file_url": "/media/vehicle-documents/owner.pdf",
+            "source_type": "fact",
+        }
+    ]
+
+
+def test_matcher_skips_facts_about_excluded_components_and_weakly_covered_titles():
+    matcher = StructuredAnswerMatcher(LocalQueryExpander())
+    document = SimpleNamespace(title="Owner Manual", file_name="owner.pdf", file_url=None, included_in_rag=True)
+    fork_oil = SimpleNamespace(
+        id=12, title="Fork oil grade", content="Use SAE 10W fork oil.", source_excerpt=None, confidence=0.9
+    )
+    oil_filter = SimpleNamespace(
+        id=13,
+        title="Oil filter part number and drain plug washer",
+        content="Oil filter HF204, drain plug washer 94109-12000.",
+        source_excerpt=None,
+        confidence=0.9,
+    )
+    session = LookupSession(specs=build_specs(engine_oil_type=None), facts=[(fork_oil, document), (oil_filter, document)])
+
+    answer = matcher.match(session=session, vehicle_id=3, question="What engine oil does my bike use?", language="en")
+
+    assert answer is None
@@ -27,3 +27,19 @@ def test_resolve_file_path_maps_legacy_upload_urls_to_media(tmp_path, monkeypatc
     resolved = service.resolve_file_path("/uploads/invoices/legacy.pdf")
 
     assert resolved == str(tmp_path / "media" / "invoices" / "legacy.pdf")
+
+
+@pytest.mark.asyncio
+async def test_only_stores_with_widened_extensions_accept_office_documents(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    invoices = StorageService()
+    documents = StorageService(
+        upload_dir="media/vehicle-documents",
+        allowed_extensions=StorageService.ALLOWED_EXTENSIONS | {".docx"},
+    )
+
+    with pytest.raises(ValueError, match="File type not allowed: .docx"):
+        await invoices.save_file(UploadFile(filename="invoice.docx", file=BytesIO(b"test-bytes")))
+    file_path, _ = await documents.save_file(UploadFile(filename="manual.docx", file=BytesIO(b"test-bytes")))
+
+    assert Path(file_path).parts[:2] == ("media", "vehicle-documents")
@@ -0,0 +1,27 @@
+from scripts.tune_hnsw_index import pick_operating_point, recall_at_k
+
+
+def test_recall_at_k_and_operating_point_selection():
+    assert recall_at_k([1, 2, 3, 4], [4, 3, 9, 8], k=4) == 0.5
+    assert recall_at_k([], [1], k=8) == 1.0
+
+    curves = [
+        {
+            "m": 16,
+            "ef_construction": 64,
+            "points": [
+                {"ef_search": 40, "recall_at_k": 0.91, "latency": {"p95_ms": 1.2}},
+                {"ef_search": 80, "recall_at_k": 0.97, "latency": {"p95_ms": 2.0}},
+            ],
+        },
+        {
+            "m": 32,
+            "ef_construction": 128,
+            "points": [{"ef_search": 40, "recall_at_k": 0.96, "latency": {"p95_ms": 1.6}}],
+        },
+    ]
+
+    point = pick_operating_point(curves, target_recall=0.95)
+
+    assert (point["m"], point["ef_construction"], point["ef_search"]) == (32, 128, 40)
+    assert pick_operating_point(curves, target_recall=0.99) is None
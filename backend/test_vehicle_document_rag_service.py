@@ -1,12 +1,22 @@
+import hashlib
+import threading
+from contextlib import contextmanager
 from types import SimpleNamespace
 
+import pytest
+
+from app.core.deadline import DeadlineExceeded
 from app.core.gemini_service import GeminiService
+from app.core.ocr_engine import OcrResult
+from app.services.rag_chat_memory import ChatConversation
+from app.services.rag_structured_answers import StructuredAnswer
+from app.services.rag_vector_storage import apply_vector_storage_index
 from app.services.vehicle_document_rag_service import ParsedDocumentPage, RetrievedSource, VehicleDocumentRAGService
 
 
 def test_answer_question_returns_spanish_fallback_when_no_sources(monkeypatch):
     service = VehicleDocumentRAGService()
-    vehicle = SimpleNamespace(brand="Ducati", model="Panigale 1299 S", year=2015, license_plate="TEST123")
+    vehicle = SimpleNamespace(id=1, brand="Ducati", model="Panigale 1299 S", year=2015, license_plate="TEST123")
 
     monkeypatch.setattr(
         service,
@@ -17,6 +27,7 @@ def test_answer_question_returns_spanish_fallback_when_no_sources(monkeypatch):
         },
     )
     monkeypatch.setattr(service, "retrieve_sources", lambda **kwargs: [])
+    monkeypatch.setattr(service.structured_answers, "match", lambda **kwargs: None)
 
     response = service.answer_question(
         session=None,
@@ -35,7 +46,7 @@ def test_answer_question_returns_spanish_fallback_when_no_sources(monkeypatch):
 
 def test_answer_question_falls_back_to_english_when_language_is_unknown(monkeypatch):
     service = VehicleDocumentRAGService()
-    vehicle = SimpleNamespace(brand="Ducati", model="Panigale 1299 S", year=2015, license_plate="TEST123")
+    vehicle = SimpleNamespace(id=1, brand="Ducati", model="Panigale 1299 S", year=2015, license_plate="TEST123")
 
     monkeypatch.setattr(
         service,
@@ -46,6 +57,7 @@ def test_answer_question_falls_back_to_english_when_language_is_unknown(monkeypa
         },
     )
     monkeypatch.setattr(service, "retrieve_sources", lambda **kwargs: [])
+    monkeypatch.setattr(service.structured_answers, "match", lambda **kwargs: None)
 
     response = service.answer_question(
         session=None,
@@ -62,7 +74,7 @@ def test_answer_question_falls_back_to_english_when_language_is_unknown(monkeypa
 
 def test_answer_question_uses_retrieved_sources_when_model_returns_no_citations(monkeypatch):
     service = VehicleDocumentRAGService()
-    vehicle = SimpleNamespace(brand="Ducati", model="Panigale V4", year=2023, license_plate="TEST123")
+    vehicle = SimpleNamespace(id=1, brand="Ducati", model="Panigale V4", year=2023, license_plate="TEST123")
     retrieved_source = RetrievedSource(
         source_id="document:7:chunk:1",
         source_type="document",
@@ -82,6 +94,7 @@ def test_answer_question_uses_retrieved_sources_when_model_returns_no_citations(
         },
     )
     monkeypatch.setattr(service, "retrieve_sources", lambda **kwargs: [retrieved_source])
+    monkeypatch.setattr(service.structured_answers, "match", lambda **kwargs: None)
     monkeypatch.setattr(
         service.gemini_service,
         "generate_json_payload",
@@ -121,7 +134,277 @@ def test_answer_question_uses_retrieved_sources_when_model_returns_no_citations(
     ]
 
 
+class TrackedSession:
+    def __init__(self, log):
+        self.log = log
+
+    def __enter__(self):
+        self.log.append("open")
+        return self
+
+    def __exit__(self, *exc_info):
+        self.log.append("close")
+        return False
+
+
+def _stub_answer_dependencies(monkeypatch, service, *, sources_by_query, log, expanded_query):
+    monkeypatch.setattr("app.services.vehicle_document_rag_service.settings.RAG_QUERY_EXPANSION", "llm")
+
+    def fake_expand(**kwargs):
+        log.append("expand")
+        return {"retrieval_query": expanded_query, "detected_language": "es"}
+
+    def fake_retrieve(**kwargs):
+        assert isinstance(kwargs["session"], TrackedSession)
+        log.append(f"retrieve:{kwargs['question']}")
+        return sources_by_query[kwargs["question"]]
+
+    def fake_generate_json_payload(**kwargs):
+        log.append("answer")
+        return {"answer": "ok", "citations": [], "confidence_note": ""}
+
+    monkeypatch.setattr(service, "expand_query_for_retrieval", fake_expand)
+    monkeypatch.setattr(service, "retrieve_sources", fake_retrieve)
+    monkeypatch.setattr(service.structured_answers, "match", lambda **kwargs: None)
+    monkeypatch.setattr(service.gemini_service, "generate_json_payload", fake_generate_json_payload)
+
+
+def _chunk_source(chunk_id, content, similarity):
+    return RetrievedSource(
+        source_id=f"document:7:chunk:{chunk_id}",
+        source_type="document",
+        source_label="Workshop Manual",
+        page_number=chunk_id,
+        content=content,
+        file_url="/media/vehicle-documents/workshop-manual.pdf",
+        similarity=similarity,
+    )
+
+
+def test_answer_question_holds_no_session_during_model_calls(monkeypatch):
+    log = []
+    service = VehicleDocumentRAGService(session_factory=lambda: TrackedSession(log))
+    vehicle = SimpleNamespace(id=1, brand="Ducati", model="Panigale V4", year=2023, license_plate="TEST123")
+    question = "¿Qué par lleva el eje trasero?"
+    _stub_answer_dependencies(
+        monkeypatch,
+        service,
+        sources_by_query={question: [], "rear axle torque": [_chunk_source(1, "Rear axle torque is 230 Nm.", 0.9)]},
+        log=log,
+        expanded_query="rear axle torque",
+    )
+
+    service.answer_question(
+        vehicle=vehicle,
+        question=question,
+        source_scope="all_documents",
+        include_invoice_docs=False,
+        api_key="fake-key",
+    )
+
+    assert log.count("open") == log.count("close")
+    answer_index = log.index("answer")
+    assert log[:answer_index].count("open") == log[:answer_index].count("close")
+    assert log.index("expand") < log.index("retrieve:rear axle torque")
+
+
+def test_answer_question_skips_expansion_when_raw_retrieval_covers_question(monkeypatch):
+    log = []
+    service = VehicleDocumentRAGService(session_factory=lambda: TrackedSession(log))
+    vehicle = SimpleNamespace(id=1, brand="Ducati", model="Panigale V4", year=2023, license_plate="TEST123")
+    question = "What is the rear axle torque?"
+    release_expansion = threading.Event()
+
+    _stub_answer_dependencies(
+        monkeypatch,
+        service,
+        sources_by_query={question: [_chunk_source(1, "What is the rear axle torque? It is 230 Nm.", 0.9)]},
+        log=log,
+        expanded_query="unused",
+    )
+
+    def slow_expand(**kwargs):
+        release_expansion.wait(5)
+        return {"retrieval_query": "unused", "detected_language": "en"}
+
+    monkeypatch.setattr(service, "expand_query_for_retrieval", slow_expand)
+    try:
+        response = service.answer_question(
+            vehicle=vehicle,
+            question=question,
+            source_scope="all_documents",
+            include_invoice_docs=False,
+            api_key="fake-key",
+        )
+    finally:
+        release_expansion.set()
+
+    assert response["citations"][0]["source_id"] == "document:7:chunk:1"
+    assert "retrieve:unused" not in log
+
+
+def test_answer_question_merges_raw_and_expanded_retrieval(monkeypatch):
+    log = []
+    service = VehicleDocumentRAGService(session_factory=lambda: TrackedSession(log))
+    vehicle = SimpleNamespace(id=1, brand="Ducati", model="Panigale V4", year=2023, license_plate="TEST123")
+    question = "¿Qué par lleva el eje trasero?"
+    _stub_answer_dependencies(
+        monkeypatch,
+        service,
+        sources_by_query={
+            question: [_chunk_source(1, "Eje trasero: ver capítulo 4.", 0.4), _chunk_source(2, "Rear axle 230 Nm.", 0.3)],
+            "rear axle torque": [_chunk_source(2, "Rear axle 230 Nm.", 0.8)],
+        },
+        log=log,
+        expanded_query="rear axle torque",
+    )
+
+    response = service.answer_question(
+        vehicle=vehicle,
+        question=question,
+        source_scope="all_documents",
+        include_invoice_docs=False,
+        api_key="fake-key",
+    )
+
+    assert [citation["source_id"] for citation in response["citations"]] == [
+        "document:7:chunk:2",
+        "document:7:chunk:1",
+    ]
+
+
+def test_answer_question_returns_flagged_extractive_answer_when_deadline_runs_out(monkeypatch):
+    log = []
+    service = VehicleDocumentRAGService(session_factory=lambda: TrackedSession(log))
+    vehicle = SimpleNamespace(id=1, brand="Ducati", model="Panigale V4", year=2023, license_plate="TEST123")
+    question = "What is the rear axle torque?"
+    _stub_answer_dependencies(
+        monkeypatch,
+        service,
+        sources_by_query={
+            question: [
+                _chunk_source(4, "Remove the chain guard. Tighten the rear axle nut to 230 Nm. Refit the guard.", 0.9),
+            ],
+        },
+        log=log,
+        expanded_query=question,
+    )
+
+    def out_of_time(**kwargs):
+        return kwargs["fallback_resolver"](DeadlineExceeded("Deadline exceeded while waiting for model-a"))
+
+    monkeypatch.setattr(service.gemini_service, "generate_json_payload", out_of_time)
+
+    response = service.answer_question(
+        vehicle=vehicle,
+        question=question,
+        source_scope="all_documents",
+        include_invoice_docs=False,
+        api_key="fake-key",
+    )
+
+    assert response["answer_type"] == "extractive"
+    assert response["answer"].splitlines()[1] == "- Tighten the rear axle nut to 230 Nm. (Workshop Manual, p. 4)"
+    assert response["citations"][0]["source_id"] == "document:7:chunk:4"
+    assert response["confidence_note"] == "Extractive answer: quoted passages, not a generated answer."
+
+
+def _stub_conversation_dependencies(monkeypatch, service, *, sources_by_query, log, prompts):
+    _stub_answer_dependencies(monkeypatch, service, sources_by_query=sources_by_query, log=log, expanded_query="")
+    monkeypatch.setattr("app.services.vehicle_document_rag_service.settings.RAG_QUERY_EXPANSION", "local")
+    monkeypatch.setattr(
+        service,
+        "expand_query_for_retrieval",
+        lambda **kwargs: {"retrieval_query": kwargs["question"], "detected_language": "en"},
+    )
+
+    def fake_generate_json_payload(**kwargs):
+        prompts.append(kwargs["prompt"])
+        return {"answer": f"answer {len(prompts)}", "citations": [], "confidence_note": "", "conversation_summary": f"summary {len(prompts)}"}
+
+    monkeypatch.setattr(service.gemini_service, "generate_json_payload", fake_generate_json_payload)
+
+
+def test_answer_question_reuses_session_sources_for_covered_follow_up(monkeypatch):
+    log = []
+    prompts = []
+    service = VehicleDocumentRAGService(session_factory=lambda: TrackedSession(log))
+    vehicle = SimpleNamespace(id=1, brand="Ducati", model="Panigale V4", year=2023, license_plate="TEST123")
+    first_question = "What is the rear axle torque?"
+    axle_chunk = _chunk_source(3, "The rear axle torque is 230 Nm and the front axle torque is 90 Nm.", 0.9)
+    _stub_conversation_dependencies(
+        monkeypatch,
+        service,
+        sources_by_query={first_question: [axle_chunk]},
+        log=log,
+        prompts=prompts,
+    )
+    conversation = ChatConversation(source_scope="all_documents", include_invoice_docs=False)
+    ask = dict(vehicle=vehicle, source_scope="all_documents", include_invoice_docs=False, api_key="fake-key")
+
+    service.answer_question(question=first_question, conversation=conversation, **ask)
+    response = service.answer_question(question="And the front axle torque?", conversation=conversation, **ask)
+
+    assert [entry for entry in log if entry.startswith("retrieve:")] == [f"retrieve:{first_question}"]
+    assert response["citations"][0]["source_id"] == "document:7:chunk:3"
+    assert "conversation_summary" not in response
+    assert "Summary: summary 1" in prompts[1]
+    assert f"Previous question: {first_question}" in prompts[1]
+    assert [turn["question"] for turn in conversation.turns] == [first_question, "And the front axle torque?"]
+    assert conversation.summary == "summary 2"
+
+
+def test_answer_question_extends_session_sources_for_uncovered_follow_up(monkeypatch):
+    log = []
+    prompts = []
+    service = VehicleDocumentRAGService(session_factory=lambda: TrackedSession(log))
+    vehicle = SimpleNamespace(id=1, brand="Ducati", model="Panigale V4", year=2023, license_plate="TEST123")
+    first_question = "What is the rear axle torque?"
+    follow_up = "What about the chain?"
+    axle_chunk = _chunk_source(3, "Rear axle torque: 230 Nm.", 0.9)
+    chain_chunk = _chunk_source(8, "Chain slack: 25-35 mm at the midpoint.", 0.7)
+    _stub_conversation_dependencies(
+        monkeypatch,
+        service,
+        sources_by_query={
+            first_question: [axle_chunk],
+            f"{follow_up} {first_question}": [chain_chunk],
+        },
+        log=log,
+        prompts=prompts,
+    )
+    conversation = ChatConversation(source_scope="all_documents", include_invoice_docs=False)
+    ask = dict(vehicle=vehicle, source_scope="all_documents", include_invoice_docs=False, api_key="fake-key")
+
+    service.answer_question(question=first_question, conversation=conversation, **ask)
+    response = service.answer_question(question=follow_up, conversation=conversation, **ask)
+
+    assert log.count(f"retrieve:{follow_up} {first_question}") == 1
+    assert [source.source_id for source in conversation.sources] == ["document:7:chunk:8", "document:7:chunk:3"]
+    assert {citation["source_id"] for citation in response["citations"]} == {"document:7:chunk:8", "document:7:chunk:3"}
+
+
+def test_expand_query_uses_local_dictionary_without_model_call(monkeypatch):
+    service = VehicleDocumentRAGService()
+
+    def fail_generate_json_payload(**kwargs):
+        raise AssertionError("local expansion must not call the model")
+
+    monkeypatch.setattr(service.gemini_service, "generate_json_payload", fail_generate_json_payload)
+
+    response = service.expand_query_for_retrieval(
+        question="¿Qué par de apriete lleva la tuerca de la rueda trasera?",
+        api_key="fake-key",
+    )
+
+    assert response == {
+        "retrieval_query": "¿Qué par de apriete lleva la tuerca de la rueda trasera? tightening torque nut rear wheel",
+        "detected_language": "es",
+    }
+
+
 def test_expand_query_uses_gemini_service_fallback_payload(monkeypatch):
+    monkeypatch.setattr("app.services.vehicle_document_rag_service.settings.RAG_QUERY_EXPANSION", "llm")
     service = VehicleDocumentRAGService()
 
     def fake_generate_json_payload(**kwargs):
@@ -173,7 +456,7 @@ def test_gemini_service_generate_json_content_falls_back_after_rate_limit(monkey
                 raise Exception("429 ResourceExhausted")
             return SimpleNamespace(text='{"answer":"ok"}')
 
-    monkeypatch.setattr("app.core.gemini_service.genai.GenerativeModel", FakeModel)
+    monkeypatch.setattr("app.core.gemini_backend.genai.GenerativeModel", FakeModel)
 
     raw_text = service.generate_json_content(
         prompt="prompt",
@@ -200,7 +483,7 @@ def test_gemini_service_generate_json_content_falls_back_after_invalid_json(monk
                 return SimpleNamespace(text='{"answer": ')
             return SimpleNamespace(text='{"answer":"ok"}')
 
-    monkeypatch.setattr("app.core.gemini_service.genai.GenerativeModel", FakeModel)
+    monkeypatch.setattr("app.core.gemini_backend.genai.GenerativeModel", FakeModel)
 
     raw_text = service.generate_json_content(
         prompt="prompt",
@@ -257,7 +540,6 @@ def test_process_document_stops_cleanly_when_document_is_deleted_mid_processing(
         status="uploaded",
         error_message=None,
         updated_at=None,
-        extracted_text=None,
         chunk_count=0,
         indexed_at=None,
         processing_progress=0,
@@ -265,6 +547,7 @@ def test_process_document_stops_cleanly_when_document_is_deleted_mid_processing(
         processing_detail="Upload complete. Waiting for indexing to start.",
         title="Manual",
         file_name="manual.pdf",
+        checkpoint_stage=None,
     )
     session = FakeSession(document)
 
@@ -280,3 +563,570 @@ def test_process_document_stops_cleanly_when_document_is_deleted_mid_processing(
     result = service.process_document(session=session, document_id=document.id, gemini_api_key="fake-key")
 
     assert result is None
+
+
+def _checkpointed_document(checkpoint_stage):
+    return SimpleNamespace(
+        id=7,
+        vehicle_id=5,
+        file_url="/media/vehicle-documents/manual.pdf",
+        mime_type="application/pdf",
+        status="failed",
+        error_message="pod restarted",
+        updated_at=None,
+        chunk_count=1,
+        indexed_at=None,
+        processing_progress=90,
+        processing_stage="failed",
+        processing_detail=None,
+        title="Manual",
+        file_name="manual.pdf",
+        checkpoint_stage=checkpoint_stage,
+    )
+
+
+def test_process_document_resumes_after_the_last_checkpoint(monkeypatch):
+    service = VehicleDocumentRAGService()
+    document = _checkpointed_document("summarizing")
+    session = FakeSession(document)
+    ran = []
+    stored_page = SimpleNamespace(id=11, page_number=1, text="Torque spec 120 Nm")
+
+    monkeypatch.setattr(service, "_load_pages", lambda **kwargs: [stored_page])
+    monkeypatch.setattr(service, "_sync_pages", lambda **kwargs: 0)
+    monkeypatch.setattr(
+        service,
+        "parse_document",
+        lambda **kwargs: ran.append("parsing") or [ParsedDocumentPage(page_number=1, text="Torque spec 120 Nm")],
+    )
+    monkeypatch.setattr(service, "_build_chunks", lambda **kwargs: ran.append("chunking") or [])
+    monkeypatch.setattr(service, "build_document_summaries", lambda **kwargs: ran.append("summarizing"))
+    monkeypatch.setattr(
+        service,
+        "extract_knowledge_facts",
+        lambda **kwargs: ran.append(("knowledge", kwargs["extracted_text"])) or [],
+    )
+
+    result = service.process_document(session=session, document_id=document.id, gemini_api_key="fake-key")
+
+    assert result is document
+    assert ran == [("knowledge", "[Page 1]\nTorque spec 120 Nm")]
+    assert document.status == "ready"
+    assert document.checkpoint_stage == "knowledge"
+
+    # A finished document starts over; an explicit stage reruns from there.
+    ran.clear()
+    service.process_document(session=session, document_id=document.id, gemini_api_key="")
+    assert ran == ["parsing", "chunking"]
+    ran.clear()
+    document.status = "ready"
+    document.checkpoint_stage = "knowledge"
+    service.process_document(session=session, document_id=document.id, gemini_api_key="fake-key", restart_from="chunking")
+    assert [step if isinstance(step, str) else step[0] for step in ran] == ["chunking", "summarizing", "knowledge"]
+
+
+def test_resume_stage_never_skips_a_missing_checkpoint():
+    service = VehicleDocumentRAGService()
+
+    assert service._resume_stage(_checkpointed_document(None), None, has_pages=True) == "parsing"
+    assert service._resume_stage(_checkpointed_document("parsing"), None, has_pages=True) == "chunking"
+    assert service._resume_stage(_checkpointed_document("chunking"), "knowledge", has_pages=True) == "summarizing"
+    assert service._resume_stage(_checkpointed_document("knowledge"), "summarizing", has_pages=True) == "summarizing"
+    assert service._resume_stage(_checkpointed_document("chunking"), "knowledge", has_pages=False) == "parsing"
+
+
+def _sha256(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class PageSyncSession(FakeSession):
+    def __init__(self, pages, chunks):
+        super().__init__(SimpleNamespace(id=7))
+        self.results = [pages, chunks]
+        self.added = []
+        self.removed = []
+
+    def exec(self, statement):
+        return SimpleNamespace(all=lambda: self.results.pop(0))
+
+    def add(self, obj):
+        self.added.append(obj)
+
+    def delete(self, obj):
+        self.removed.append(obj)
+
+    def flush(self):
+        return None
+
+
+def test_sync_pages_only_replaces_pages_whose_text_changed(monkeypatch):
+    service = VehicleDocumentRAGService()
+    stale_chunk = SimpleNamespace(id=30, page_id=2, vehicle_id=5)
+    pages = [
+        SimpleNamespace(id=1, page_number=1, text="Oil 3.4 l", text_hash=_sha256("Oil 3.4 l")),
+        SimpleNamespace(id=2, page_number=2, text="Old torque 90 Nm", text_hash=_sha256("Old torque 90 Nm")),
+        SimpleNamespace(id=3, page_number=3, text="Removed page", text_hash=_sha256("Removed page")),
+    ]
+    session = PageSyncSession(pages, [stale_chunk])
+
+    changed = service._sync_pages(
+        session=session,
+        document_id=7,
+        pages=[
+            ParsedDocumentPage(page_number=1, text="Oil  3.4 l\n"),
+            ParsedDocumentPage(page_number=2, text="New torque 120 Nm"),
+            ParsedDocumentPage(page_number=4, text="Added page"),
+        ],
+    )
+
+    assert changed == 3
+    assert pages[1].text == "New torque 120 Nm"
+    assert [page.page_number for page in session.added] == [2, 4]
+    assert session.removed == [stale_chunk, pages[2]]
+
+
+def test_build_chunks_stores_offsets_into_the_page_text():
+    service = VehicleDocumentRAGService()
+    text = " ".join(f"word{index}" for index in range(600))
+    page = SimpleNamespace(id=11, page_number=3, text=text)
+    document = SimpleNamespace(id=7, vehicle_id=5, title="Manual", file_name="manual.pdf")
+
+    chunks = service._build_chunks(document=document, pages=[page])
+
+    assert len(chunks) > 1
+    assert [chunk.chunk_index for chunk in chunks] == list(range(len(chunks)))
+    for chunk in chunks:
+        content = text[chunk.start_offset : chunk.end_offset]
+        assert chunk.page_id == 11 and content == content.strip() and content
+    assert chunks[0].start_offset == 0 and chunks[-1].end_offset == len(text)
+
+
+def test_parse_document_only_transcribes_pdf_pages_without_usable_text(monkeypatch):
+    service = VehicleDocumentRAGService()
+    readable = "Engine oil capacity is 3.4 litres with filter replacement every service interval."
+    requested_batches: list[list[int]] = []
+
+    monkeypatch.setattr(
+        service,
+        "_parse_pdf_locally",
+        lambda file_path: [
+            ParsedDocumentPage(page_number=1, text=readable),
+            ParsedDocumentPage(page_number=2, text=""),
+            ParsedDocumentPage(page_number=3, text="@@ ## %% 12"),
+            ParsedDocumentPage(page_number=4, text=readable),
+            ParsedDocumentPage(page_number=5, text=""),
+        ],
+    )
+
+    @contextmanager
+    def fake_multimodal_content(**kwargs):
+        requested_batches.append(kwargs["page_numbers"])
+        yield ["rendered-pages"]
+
+    def fake_generate_json_payload(**kwargs):
+        # Simulate a model that renumbers the batch from 1.
+        return {"pages": [{"page_number": 1, "text": f"scanned {kwargs['prompt'].count('páginas')}"}, {"page_number": 2, "text": "second"}]}
+
+    monkeypatch.setattr(service.gemini_service, "multimodal_content", fake_multimodal_content)
+    monkeypatch.setattr(service.gemini_service, "generate_json_payload", fake_generate_json_payload)
+
+    pages = service.parse_document(file_path="/tmp/manual.pdf", mime_type="application/pdf", api_key="fake-key")
+
+    assert sorted(requested_batches) == [[2, 3], [5]]
+    assert [page.page_number for page in pages] == [1, 2, 3, 4, 5]
+    assert pages[0].text == readable
+    assert pages[1].text.startswith("scanned")
+    assert pages[2].text == "second"
+    assert pages[4].text.startswith("scanned")
+
+
+def test_parse_document_uses_confident_local_ocr_for_images(monkeypatch):
+    results = {
+        "/tmp/clean.png": OcrResult(text="Rear axle nut torque 120 Nm, replace every service.", confidence=0.94),
+        "/tmp/blurry.png": OcrResult(text="Rear axle nut torque 12O Nm, rep1ace every service.", confidence=0.52),
+    }
+    engine = SimpleNamespace(recognize=results.get, is_confident=lambda result: result.confidence >= 0.85)
+    service = VehicleDocumentRAGService(ocr_engine=engine)
+    model_calls = []
+
+    @contextmanager
+    def fake_multimodal_content(**kwargs):
+        yield ["image"]
+
+    def fake_generate_json_payload(**kwargs):
+        model_calls.append(kwargs["content"])
+        return kwargs["fallback_resolver"](ValueError("invalid json"))
+
+    monkeypatch.setattr(service.gemini_service, "multimodal_content", fake_multimodal_content)
+    monkeypatch.setattr(service.gemini_service, "generate_json_payload", fake_generate_json_payload)
+
+    clean = service.parse_document(file_path="/tmp/clean.png", mime_type="image/png", api_key="fake-key")
+    blurry = service.parse_document(file_path="/tmp/blurry.png", mime_type="image/png", api_key="fake-key")
+
+    assert clean[0].text.startswith("Rear axle nut torque 120 Nm")
+    # Low confidence goes to Gemini, and the OCR text is only the fallback.
+    assert model_calls == [["image"]]
+    assert blurry[0].text.startswith("Rear axle nut torque 12O Nm")
+
+
+def test_parse_document_retries_failed_page_ranges_and_reports_progress(monkeypatch):
+    service = VehicleDocumentRAGService()
+    attempts: dict[int, int] = {}
+    progress: list[tuple[int, int]] = []
+    sleeps: list[float] = []
+
+    monkeypatch.setattr(
+        service,
+        "_parse_pdf_locally",
+        lambda file_path: [ParsedDocumentPage(page_number=number, text="") for number in range(1, 21)],
+    )
+
+    @contextmanager
+    def fake_multimodal_content(**kwargs):
+        yield [kwargs["page_numbers"]]
+
+    def fake_generate_json_payload(**kwargs):
+        batch = kwargs["content"][0]
+        attempts[batch[0]] = attempts.get(batch[0], 0) + 1
+        if batch[0] == 9 and attempts[batch[0]] == 1:
+            return kwargs["fallback_resolver"](ValueError("429 ResourceExhausted"))
+        return {"pages": [{"page_number": number, "text": f"page {number}"} for number in batch]}
+
+    monkeypatch.setattr(service.gemini_service, "multimodal_content", fake_multimodal_content)
+    monkeypatch.setattr(service.gemini_service, "generate_json_payload", fake_generate_json_payload)
+    monkeypatch.setattr("app.services.vehicle_document_rag_service.time.sleep", sleeps.append)
+
+    pages = service.parse_document(
+        file_path="/tmp/scanned.pdf",
+        mime_type="application/pdf",
+        api_key="fake-key",
+        progress_callback=lambda completed, total: progress.append((completed, total)),
+    )
+
+    assert [page.page_number for page in pages] == list(range(1, 21))
+    assert attempts == {1: 1, 9: 2, 17: 1}
+    assert sleeps == [VehicleDocumentRAGService.TRANSCRIPTION_RETRY_BACKOFF_SECONDS]
+    assert progress == [(1, 3), (2, 3), (3, 3)]
+
+
+class RecordingRetrievalSession:
+    def __init__(self):
+        self.statements: list[str] = []
+
+    def execute(self, statement):
+        self.statements.append(str(statement))
+
+    def exec(self, statement):
+        self.statements.append("select")
+        return FakeExecResult()
+
+
+def test_retrieve_sources_sets_hnsw_ef_search_from_config_or_override(monkeypatch):
+    service = VehicleDocumentRAGService()
+    service.embedding_cache = None
+    vehicle = SimpleNamespace(id=3)
+    monkeypatch.setattr("app.services.vehicle_document_rag_service.settings.RAG_HNSW_EF_SEARCH", 100)
+
+    session = RecordingRetrievalSession()
+    service.retrieve_sources(session=session, vehicle=vehicle, question="torque", source_scope="all", include_invoice_docs=False)
+    assert session.statements == ["SET LOCAL hnsw.ef_search = 100", "select"]
+
+    session = RecordingRetrievalSession()
+    service.retrieve_sources(
+        session=session,
+        vehicle=vehicle,
+        question="torque",
+        source_scope="all",
+        include_invoice_docs=False,
+        ef_search=0,
+    )
+    assert session.statements == ["select"]
+
+
+def test_retrieve_sources_uses_compact_index_candidates_with_exact_rerank(monkeypatch):
+    from sqlalchemy.dialects import postgresql
+
+    service = VehicleDocumentRAGService()
+    service.embedding_cache = None
+    monkeypatch.setattr("app.services.vehicle_document_rag_service.settings.RAG_VECTOR_STORAGE", "binary")
+    monkeypatch.setattr("app.services.vehicle_document_rag_service.settings.RAG_BINARY_RERANK_FACTOR", 4)
+    captured = []
+
+    class CapturingSession:
+        def exec(self, statement):
+            captured.append(statement.compile(dialect=postgresql.dialect()))
+            return FakeExecResult()
+
+    service.retrieve_sources(
+        session=CapturingSession(),
+        vehicle=SimpleNamespace(id=3),
+        question="rear axle torque",
+        source_scope="all",
+        include_invoice_docs=False,
+        ef_search=0,
+    )
+
+    compiled = captured[0]
+    assert "CAST(binary_quantize(vehicledocumentchunk.embedding) AS BIT(256)) <~>" in str(compiled)
+    assert "ORDER BY vehicledocumentchunk.embedding <=>" in str(compiled)
+    assert sorted(value for value in compiled.params.values() if isinstance(value, int)) == [1, 3, 8, 32]
+
+
+def test_retrieve_sources_rejects_unknown_vector_storage(monkeypatch):
+    service = VehicleDocumentRAGService()
+    service.embedding_cache = None
+    monkeypatch.setattr("app.services.vehicle_document_rag_service.settings.RAG_VECTOR_STORAGE", "halfvecs")
+
+    class NoQuerySession:
+        def exec(self, statement):
+            raise AssertionError("no query expected")
+
+        def execute(self, statement, params=None):
+            raise AssertionError("no query expected")
+
+    with pytest.raises(ValueError, match="Unsupported RAG_VECTOR_STORAGE"):
+        service._retrieve_chunk_rows_from_index(
+            session=NoQuerySession(),
+            vehicle=SimpleNamespace(id=3),
+            query_embedding=[0.0] * 256,
+            manuals_only=False,
+            ef_search=0,
+        )
+
+
+def test_apply_vector_storage_index_builds_only_the_configured_index():
+    statements = []
+
+    class RecordingConnection:
+        def execute(self, statement):
+            statements.append(str(statement))
+
+    apply_vector_storage_index(RecordingConnection(), "binary", concurrently=True)
+
+    assert statements == [
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_vehicledocumentchunk_embedding_binary_hnsw ON vehicledocumentchunk "
+        "USING hnsw ((binary_quantize(embedding)::bit(256)) bit_hamming_ops)",
+        "DROP INDEX CONCURRENTLY IF EXISTS ix_vehicledocumentchunk_embedding_hnsw",
+        "DROP INDEX CONCURRENTLY IF EXISTS ix_vehicledocumentchunk_embedding_halfvec_hnsw",
+    ]
+
+
+def test_retrieve_sources_answers_broad_questions_from_one_summary_node(monkeypatch):
+    service = VehicleDocumentRAGService()
+    service.embedding_cache = None
+    document = SimpleNamespace(id=4, title="Owner manual", file_name="manual.pdf", file_url="/media/manual.pdf")
+    chunk = SimpleNamespace(id=11, page_number=12, chunk_index=3)
+    monkeypatch.setattr(
+        service,
+        "_retrieve_chunk_rows_from_index",
+        lambda **kwargs: [(chunk, document, "Replace the air filter every 12000 km.", 0.2)],
+    )
+
+    def summary(summary_id, level):
+        return SimpleNamespace(id=summary_id, level=level, title=f"{level} summary", page_start=1, content=f"{level} text")
+
+    summary_rows = [
+        (summary(1, "section"), document, 0.3),
+        (summary(2, "document"), document, 0.4),
+        (summary(3, "chapter"), document, 0.45),
+    ]
+    queried = []
+
+    class SummarySession:
+        def exec(self, statement):
+            queried.append(statement)
+            return SimpleNamespace(all=lambda: summary_rows)
+
+    kwargs = {"vehicle": SimpleNamespace(id=3), "source_scope": "all", "include_invoice_docs": False}
+    sources = service.retrieve_sources(session=SummarySession(), question="Summarize the maintenance schedule", **kwargs)
+
+    # The document node (0.6) is within the 0.8 margin of the best section (0.7); the chapter (0.55) is not needed.
+    assert [source.source_id for source in sources] == ["summary:2", "document:4:chunk:11"]
+    assert sources[0].source_type == "summary"
+    assert sources[0].source_label == "Owner manual: document summary"
+    assert sources[0].similarity >= sources[1].similarity
+
+    queried.clear()
+    sources = service.retrieve_sources(session=SummarySession(), question="What is the air filter interval?", **kwargs)
+    assert queried == []
+    assert [source.source_id for source in sources] == ["document:4:chunk:11"]
+
+
+def test_retrieve_sources_batch_runs_one_lateral_query_for_all_pairs(monkeypatch):
+    service = VehicleDocumentRAGService()
+    monkeypatch.setattr("app.services.vehicle_document_rag_service.settings.RAG_VECTOR_STORAGE", "binary")
+    monkeypatch.setattr("app.services.vehicle_document_rag_service.settings.RAG_HNSW_EF_SEARCH", 0)
+    executed = []
+
+    def row(ord, chunk_id, distance):
+        return SimpleNamespace(
+            ord=ord,
+            chunk_id=chunk_id,
+            chunk_index=0,
+            page_number=chunk_id,
+            content=f"chunk {chunk_id}",
+            document_id=7,
+            title="Workshop Manual",
+            file_name=None,
+            file_url="/media/vehicle-documents/workshop-manual.pdf",
+            distance=distance,
+        )
+
+    class CapturingSession:
+        def execute(self, statement, params=None):
+            executed.append((str(statement), params))
+            rows = [row(1, 10 + index, 0.5 - index / 100) for index in range(12)] + [row(3, 40, 1.2), row(3, 41, 0.1)]
+            return SimpleNamespace(all=lambda: rows)
+
+    results = service.retrieve_sources_batch(
+        session=CapturingSession(),
+        queries=[(3, "rear axle torque"), (3, "chain slack"), (5, "rear axle torque")],
+        source_scope="manuals_only",
+        include_invoice_docs=False,
+    )
+
+    assert len(executed) == 1
+    statement, params = executed[0]
+    assert "CROSS JOIN LATERAL" in statement
+    assert "<~>" in statement and "d.document_type IN ('owner_manual', 'workshop_manual')" in statement
+    assert params["vehicle_ids"] == [3, 3, 5]
+    assert params["embeddings"][0] == params["embeddings"][2] != params["embeddings"][1]
+    assert params["candidate_limit"] == 32
+    assert [source.page_number for source in results[0]] == [21, 20, 19, 18, 17, 16, 15, 14]
+    assert results[1] == []
+    assert [source.source_id for source in results[2]] == ["document:7:chunk:41"]
+
+
+def test_answer_questions_batch_yields_every_pair_and_survives_failures(monkeypatch):
+    log = []
+    service = VehicleDocumentRAGService(session_factory=lambda: TrackedSession(log))
+    vehicles = [
+        SimpleNamespace(id=1, brand="Ducati", model="Panigale V4", year=2023, license_plate="TEST123"),
+        SimpleNamespace(id=2, brand="Honda", model="CBR600RR", year=2021, license_plate="TEST456"),
+    ]
+    questions = ["Which engine oil?", "What is the rear axle torque?"]
+    retrieved_queries = []
+
+    def fake_match(*, vehicle_id, question, **kwargs):
+        if question == "Which engine oil?" and vehicle_id == 1:
+            return StructuredAnswer(intent="engine_oil", answer="Engine oil: 15W-50.", citations=[], confidence_note="specs")
+        return None
+
+    def fake_retrieve_batch(*, queries, **kwargs):
+        retrieved_queries.append(queries)
+        return [[_chunk_source(vehicle_id, f"Rear axle torque is {vehicle_id}00 Nm.", 0.9)] for vehicle_id, _ in queries]
+
+    def fake_generate_json_payload(*, prompt, **kwargs):
+        if "Honda" in prompt and "engine oil" in prompt:
+            raise RuntimeError("model unavailable")
+        return {"answer": "ok", "citations": [], "confidence_note": ""}
+
+    monkeypatch.setattr(service.structured_answers, "match", fake_match)
+    monkeypatch.setattr(service, "retrieve_sources_batch", fake_retrieve_batch)
+    monkeypatch.setattr(service.gemini_service, "generate_json_payload", fake_generate_json_payload)
+
+    results = list(
+        service.answer_questions_batch(
+            vehicles=vehicles,
+            questions=questions,
+            source_scope="all_documents",
+            include_invoice_docs=False,
+            api_key="fake-key",
+        )
+    )
+
+    by_index = {result["index"]: result for result in results}
+    assert sorted(by_index) == [0, 1, 2, 3]
+    assert by_index[0]["answer_type"] == "structured"
+    assert by_index[2]["vehicle_id"] == 2 and by_index[2]["answer_type"] == "extractive"
+    assert by_index[3]["answer"] == "ok"
+    assert "conversation_summary" not in by_index[3]
+    assert len(retrieved_queries) == 1
+    assert [vehicle_id for vehicle_id, _ in retrieved_queries[0]] == [1, 2, 2]
+    assert log == ["open", "close"]
+
+
+def _fleet_vehicles():
+    return [
+        SimpleNamespace(id=1, brand="Ducati", model="Panigale V4", year=2023, license_plate="AAA111"),
+        SimpleNamespace(id=2, brand="Honda", model="CBR600RR", year=2021, license_plate="BBB222"),
+        SimpleNamespace(id=3, brand="Yamaha", model="R1", year=2020, license_plate="CCC333"),
+    ]
+
+
+def test_answer_fleet_question_retrieves_once_and_aggregates_sub_answers(monkeypatch):
+    log = []
+    service = VehicleDocumentRAGService(session_factory=lambda: TrackedSession(log))
+    retrievals = []
+    prompts = []
+
+    def fake_match(*, vehicle_id, **kwargs):
+        if vehicle_id == 1:
+            return StructuredAnswer(intent="engine_oil", answer="Engine oil: 15W-50.", citations=[], confidence_note="")
+        return None
+
+    def fake_retrieve_batch(*, queries, limit, **kwargs):
+        retrievals.append(([vehicle_id for vehicle_id, _ in queries], limit))
+        return [[_chunk_source(5, "Use SAE 5W-30 engine oil.", 0.8)] if vehicle_id == 2 else [] for vehicle_id, _ in queries]
+
+    def fake_generate_json_payload(*, prompt, **kwargs):
+        prompts.append(prompt)
+        if "Combine these per-vehicle answers" in prompt:
+            return {"answer": "Only the Honda uses 5W-30.", "confidence_note": "From manuals and specs."}
+        return {
+            "vehicles": [{"vehicle_id": 2, "answer": "Yes, 5W-30.", "citations": [{"source_id": "document:7:chunk:5"}]}],
+            "summary": "The Honda uses 5W-30.",
+        }
+
+    monkeypatch.setattr(service.structured_answers, "match", fake_match)
+    monkeypatch.setattr(service, "retrieve_sources_batch", fake_retrieve_batch)
+    monkeypatch.setattr(service.gemini_service, "generate_json_payload", fake_generate_json_payload)
+
+    response = service.answer_fleet_question(
+        vehicles=_fleet_vehicles(),
+        question="Which of my bikes use 5W-30 oil?",
+        source_scope="all_documents",
+        include_invoice_docs=False,
+        api_key="fake-key",
+    )
+
+    assert retrievals == [([2, 3], 3)]
+    assert len(prompts) == 2
+    assert "Vehicle 2: Honda CBR600RR" in prompts[0] and "Vehicle 3" not in prompts[0]
+    assert response["answer"] == "Only the Honda uses 5W-30."
+    assert response["answer_type"] == "generated"
+    assert [item["answer_type"] for item in response["vehicles"]] == ["structured", "generated", "no_sources"]
+    assert response["vehicles"][1]["citations"][0]["source_id"] == "document:7:chunk:5"
+    assert response["vehicles"][1]["vehicle_label"] == "Honda CBR600RR (BBB222)"
+
+
+def test_answer_fleet_question_lists_sub_answers_when_model_fails(monkeypatch):
+    service = VehicleDocumentRAGService(session_factory=lambda: TrackedSession([]))
+    monkeypatch.setattr("app.services.vehicle_document_rag_service.settings.RAG_CHAT_FLEET_VEHICLES_PER_CALL", 1)
+    monkeypatch.setattr(service.structured_answers, "match", lambda **kwargs: None)
+    monkeypatch.setattr(
+        service,
+        "retrieve_sources_batch",
+        lambda *, queries, **kwargs: [[_chunk_source(vehicle_id, "Use SAE 5W-30 engine oil.", 0.8)] for vehicle_id, _ in queries],
+    )
+    calls = []
+
+    def failing_generate_json_payload(*, fallback_resolver, **kwargs):
+        calls.append(kwargs["prompt"])
+        return fallback_resolver(RuntimeError("model unavailable"))
+
+    monkeypatch.setattr(service.gemini_service, "generate_json_payload", failing_generate_json_payload)
+
+    response = service.answer_fleet_question(
+        vehicles=_fleet_vehicles()[:2],
+        question="Which of my bikes use 5W-30 oil?",
+        source_scope="all_documents",
+        include_invoice_docs=False,
+        api_key="fake-key",
+    )
+
+    assert len(calls) == 2
+    assert response["answer_type"] == "extractive"
+    assert [item["answer_type"] for item in response["vehicles"]] == ["extractive", "extractive"]
+    assert response["answer"].splitlines()[0].startswith("- Ducati Panigale V4 (AAA111): ")
+    assert response["confidence_note"] == "Per-vehicle answers listed without a generated summary."
@@ -0,0 +1,109 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from app.services.vehicle_document_rag_service import VehicleDocumentRAGService
+from app.services.vehicle_embedding_cache import VehicleEmbeddingCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeResult:
+    def __init__(self, value):
+        self.value = value
+
+    def one(self):
+        return self.value
+
+    def all(self):
+        return self.value
+
+
+class ScriptedSession:
+    """Returns queued results for each ``exec`` call in order."""
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.calls = 0
+
+    def exec(self, statement):
+        self.calls += 1
+        return FakeResult(self.results.pop(0))
+
+
+def unit_vector(index, dimension=256):
+    vector = np.zeros(dimension, dtype=np.float32)
+    vector[index] = 1.0
+    return vector
+
+
+def build_cache(clock, **overrides):
+    options = {"max_chunks_per_vehicle": 100, "max_bytes": 10 * 1024 * 1024, "ttl_seconds": 300, "clock": clock}
+    options.update(overrides)
+    return VehicleEmbeddingCache(**options)
+
+
+def test_cache_loads_small_corpus_once_and_skips_oversized_vehicles():
+    clock = FakeClock()
+    cache = build_cache(clock, max_chunks_per_vehicle=2)
+    rows = [(11, "owner_manual", unit_vector(0)), (12, "other", unit_vector(1))]
+    session = ScriptedSession(2, rows)
+
+    matrix = cache.get_or_load(session=session, vehicle_id=5)
+    assert cache.get_or_load(session=session, vehicle_id=5) is matrix
+    assert session.calls == 2
+    assert matrix.search(unit_vector(1), limit=8, manuals_only=False)[0] == (12, 1.0)
+    assert [chunk_id for chunk_id, _ in matrix.search(unit_vector(1), limit=8, manuals_only=True)] == [11]
+
+    oversized = ScriptedSession(3)
+    assert cache.get_or_load(session=oversized, vehicle_id=6) is None
+    assert cache.get_or_load(session=oversized, vehicle_id=6) is None
+    assert oversized.calls == 1
+
+    cache.invalidate(5)
+    clock.now = 301
+    assert cache.get(5) is None
+    assert cache.get_or_load(session=ScriptedSession(3), vehicle_id=6) is None
+
+
+def test_cache_evicts_least_recently_used_vehicle_over_memory_budget():
+    clock = FakeClock()
+    one_vehicle_bytes = 8 + 1 + 256 * 4
+    cache = build_cache(clock, max_bytes=2 * one_vehicle_bytes)
+    for vehicle_id in (1, 2):
+        cache.get_or_load(session=ScriptedSession(1, [(vehicle_id, "other", unit_vector(vehicle_id))]), vehicle_id=vehicle_id)
+    cache.get(1)
+    cache.get_or_load(session=ScriptedSession(1, [(3, "other", unit_vector(3))]), vehicle_id=3)
+
+    assert cache.get(2) is None
+    assert cache.get(1) is not None and cache.get(3) is not None
+    assert cache.nbytes <= 2 * one_vehicle_bytes
+
+
+def test_retrieve_sources_uses_cached_matrix_and_drops_stale_chunks():
+    service = VehicleDocumentRAGService(embedding_cache=build_cache(FakeClock()))
+    query_vector = service.embed_text("rear axle torque")
+    document = SimpleNamespace(id=4, title="Workshop manual", file_name="manual.pdf", file_url="/media/manual.pdf")
+    chunk = SimpleNamespace(id=21, page_number=9, chunk_index=3)
+    session = ScriptedSession(
+        2,
+        [(21, "workshop_manual", np.asarray(query_vector)), (22, "workshop_manual", unit_vector(7))],
+        [(chunk, document, "Rear axle torque 120 Nm")],
+    )
+
+    sources = service.retrieve_sources(
+        session=session,
+        vehicle=SimpleNamespace(id=5),
+        question="rear axle torque",
+        source_scope="all",
+        include_invoice_docs=False,
+    )
+
+    assert [source.source_id for source in sources] == ["document:4:chunk:21"]
+    assert sources[0].similarity > 0.99
@@ -13,6 +13,8 @@ export type VehicleDocumentType =
 
 export type VehicleDocumentStatus = 'uploaded' | 'indexing' | 'ready' | 'failed';
 
+export type VehicleDocumentProcessingStage = 'parsing' | 'chunking' | 'summarizing' | 'knowledge';
+
 export interface VehicleDocument {
     id: number;
     vehicle_id: number;
@@ -28,11 +30,18 @@ export interface VehicleDocument {
     processing_progress: number;
     processing_stage?: string | null;
     processing_detail?: string | null;
+    checkpoint_stage?: VehicleDocumentProcessingStage | null;
     indexed_at?: string | null;
     created_at: string;
     updated_at: string;
 }
 
+export interface VehicleDocumentPage {
+    document_id: number;
+    page_number: number;
+    text: string;
+}
+
 export type VehicleDocumentUploadEvent =
     | { type: 'progress'; progress: number }
     | { type: 'completed'; document: VehicleDocument };
@@ -72,12 +81,39 @@ export interface VehicleChatResponse {
     citations: VehicleChatCitation[];
     used_documents: VehicleChatUsedDocument[];
     confidence_note: string;
+    answer_type?: 'generated' | 'structured' | 'extractive';
+    session_id?: number | null;
+}
+
+export interface VehicleChatWarmResponse {
+    in_memory: boolean;
+    cached_chunks: number;
 }
 
 export interface VehicleChatRequest {
     question: string;
     source_scope: 'all_documents' | 'manuals_only';
     include_invoice_docs: boolean;
+    session_id?: number | null;
+}
+
+export interface VehicleChatTurn {
+    question: string;
+    answer: string;
+    answer_type: string;
+    confidence_note: string;
+    citations: VehicleChatCitation[];
+    created_at?: string | null;
+}
+
+export interface VehicleChatSession {
+    id: number;
+    vehicle_id: number;
+    title?: string | null;
+    turn_count: number;
+    created_at: string;
+    updated_at: string;
+    turns?: VehicleChatTurn[];
 }
 
 @Injectable({
@@ -165,8 +201,13 @@ export class VehicleRagService {
         return this.http.delete<{ message: string }>(`${this.apiUrl}/vehicle-documents/${documentId}`);
     }
 
-    reindexDocument(documentId: number): Observable<VehicleDocument> {
-        return this.http.post<VehicleDocument>(`${this.apiUrl}/vehicle-documents/${documentId}/reindex`, {});
+    reindexDocument(documentId: number, fromStage?: VehicleDocumentProcessingStage): Observable<VehicleDocument> {
+        const options = fromStage ? { params: { from_stage: fromStage } } : {};
+        return this.http.post<VehicleDocument>(`${this.apiUrl}/vehicle-documents/${documentId}/reindex`, {}, options);
+    }
+
+    getDocumentPage(documentId: number, pageNumber: number): Observable<VehicleDocumentPage> {
+        return this.http.get<VehicleDocumentPage>(`${this.apiUrl}/vehicle-documents/${documentId}/pages/${pageNumber}`);
     }
 
     listKnowledge(vehicleId: number, includeHidden = false): Observable<VehicleKnowledgeFact[]> {
@@ -184,10 +225,30 @@ export class VehicleRagService {
         return this.http.delete<{ message: string }>(`${this.apiUrl}/vehicle-knowledge/${factId}`);
     }
 
+    warmChat(vehicleId: number): Observable<VehicleChatWarmResponse> {
+        return this.http.post<VehicleChatWarmResponse>(`${this.apiUrl}/vehicles/${vehicleId}/chat/warm`, {});
+    }
+
     ask(vehicleId: number, payload: VehicleChatRequest): Observable<VehicleChatResponse> {
         return this.http.post<VehicleChatResponse>(`${this.apiUrl}/vehicles/${vehicleId}/chat/ask`, payload);
     }
 
+    createChatSession(vehicleId: number, title?: string | null): Observable<VehicleChatSession> {
+        return this.http.post<VehicleChatSession>(`${this.apiUrl}/vehicles/${vehicleId}/chat/sessions`, { title: title ?? null });
+    }
+
+    listChatSessions(vehicleId: number): Observable<VehicleChatSession[]> {
+        return this.http.get<VehicleChatSession[]>(`${this.apiUrl}/vehicles/${vehicleId}/chat/sessions`);
+    }
+
+    getChatSession(vehicleId: number, sessionId: number): Observable<VehicleChatSession> {
+        return this.http.get<VehicleChatSession>(`${this.apiUrl}/vehicles/${vehicleId}/chat/sessions/${sessionId}`);
+    }
+
+    deleteChatSession(vehicleId: number, sessionId: number): Observable<{ message: string }> {
+        return this.http.delete<{ message: string }>(`${this.apiUrl}/vehicles/${vehicleId}/chat/sessions/${sessionId}`);
+    }
+
     private resolveAccessToken(): string | null {
         const rawToken = localStorage.getItem('access_token');
         if (!rawToken) {
@@ -32,7 +32,9 @@ describe('VehicleDocsAiComponent', () => {
     let component: VehicleDocsAiComponent;
     let ragService: {
         listDocuments: ReturnType<typeof vi.fn>;
+        warmChat: ReturnType<typeof vi.fn>;
         ask: ReturnType<typeof vi.fn>;
+        createChatSession: ReturnType<typeof vi.fn>;
         uploadDocument: ReturnType<typeof vi.fn>;
         updateDocument: ReturnType<typeof vi.fn>;
         deleteDocument: ReturnType<typeof vi.fn>;
@@ -47,7 +49,16 @@ describe('VehicleDocsAiComponent', () => {
     beforeEach(async () => {
         ragService = {
             listDocuments: vi.fn().mockReturnValue(of([])),
+            warmChat: vi.fn().mockReturnValue(of({ in_memory: true, cached_chunks: 0 })),
             ask: vi.fn(),
+            createChatSession: vi.fn().mockReturnValue(of({
+                id: 11,
+                vehicle_id: 2,
+                title: null,
+                turn_count: 0,
+                created_at: '2026-10-19T10:00:00',
+                updated_at: '2026-10-19T10:00:00',
+            })),
             uploadDocument: vi.fn(),
             updateDocument: vi.fn(),
             deleteDocument: vi.fn(),
@@ -118,6 +129,27 @@ describe('VehicleDocsAiComponent', () => {
         expect(fixture.nativeElement.textContent).toContain('Retry answer');
     });
 
+    it('sends follow-up questions through a single chat session', () => {
+        ragService.listDocuments.mockReturnValue(of([readyDocument]));
+        ragService.ask.mockReturnValue(of({
+            answer: '230 Nm',
+            citations: [],
+            used_documents: [],
+            confidence_note: '',
+            session_id: 11,
+        }));
+
+        createComponent();
+        component.chatQuestion = 'What is the rear axle torque?';
+        component.askQuestion();
+        component.chatQuestion = 'And the front one?';
+        component.askQuestion();
+
+        expect(ragService.createChatSession).toHaveBeenCalledTimes(1);
+        expect(ragService.ask).toHaveBeenCalledTimes(2);
+        expect(ragService.ask.mock.calls[1][1]).toEqual(expect.objectContaining({ question: 'And the front one?', session_id: 11 }));
+    });
+
     it('stops rearming voice recognition when microphone permission is denied', () => {
         ragService.listDocuments.mockReturnValue(of([readyDocument]));
 
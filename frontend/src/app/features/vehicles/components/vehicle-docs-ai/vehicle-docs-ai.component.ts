@@ -12,7 +12,7 @@ import { MatSlideToggleModule } from '@angular/material/slide-toggle';
 import { MatSnackBarModule } from '@angular/material/snack-bar';
 import { MatTabsModule } from '@angular/material/tabs';
 import { MatTooltipModule } from '@angular/material/tooltip';
-import { finalize, interval, Subscription } from 'rxjs';
+import { finalize, interval, map, Observable, of, Subscription, switchMap } from 'rxjs';
 
 import { LoggerService } from '../../../../core/services/logger.service';
 import { ToastService, ToastTone } from '../../../../core/services/toast.service';
@@ -131,6 +131,8 @@ export class VehicleDocsAiComponent implements OnInit, OnDestroy {
     private voiceInterimTranscript = '';
     private shouldRestartVoiceRecognition = false;
     private voiceCancelledByUser = false;
+    // Server-side chat session so follow-up questions reuse the retrieved sources.
+    private chatSessionId: number | null = null;
     private voiceRearmTimer?: ReturnType<typeof setTimeout>;
     private availableSpeechVoices: SpeechSynthesisVoice[] = [];
     private readonly handleVoicesChanged = () => {
@@ -176,6 +178,7 @@ export class VehicleDocsAiComponent implements OnInit, OnDestroy {
 
     ngOnInit(): void {
         this.loadDocuments();
+        this.warmChat();
         this.startPolling();
         this.availableSpeechVoices = this.resolveSpeechVoices();
         if (typeof speechSynthesis !== 'undefined') {
@@ -194,6 +197,13 @@ export class VehicleDocsAiComponent implements OnInit, OnDestroy {
         }
     }
 
+    private warmChat(): void {
+        // Best effort: preloads the vehicle's embeddings so the first question skips the load.
+        this.ragService.warmChat(this.vehicleId).subscribe({
+            error: (error) => this.logger.warn('Vehicle chat warm-up failed', error)
+        });
+    }
+
     loadDocuments(options: { silent?: boolean; merge?: boolean } = {}): void {
         if (!options.silent) {
             this.loadingDocuments = true;
@@ -355,11 +365,13 @@ export class VehicleDocsAiComponent implements OnInit, OnDestroy {
         this.stopVoiceListening({ finalize: false, resetTo: this.canUseVoiceInput ? 'idle' : 'unsupported' });
         this.askErrorMessage = '';
         this.asking = true;
-        this.ragService.ask(this.vehicleId, {
-            question,
-            source_scope: this.chatScope,
-            include_invoice_docs: this.includeInvoiceDocs
-        }).pipe(
+        this.ensureChatSession().pipe(
+            switchMap((sessionId) => this.ragService.ask(this.vehicleId, {
+                question,
+                source_scope: this.chatScope,
+                include_invoice_docs: this.includeInvoiceDocs,
+                session_id: sessionId
+            })),
             finalize(() => {
                 this.asking = false;
                 if (this.selectedTabIndex === VehicleDocsAiComponent.ASK_TAB_INDEX && !this.voiceCancelledByUser) {
@@ -387,6 +399,18 @@ export class VehicleDocsAiComponent implements OnInit, OnDestroy {
         });
     }
 
+    private ensureChatSession(): Observable<number | null> {
+        if (this.chatSessionId !== null) {
+            return of(this.chatSessionId);
+        }
+        return this.ragService.createChatSession(this.vehicleId).pipe(
+            map((session) => {
+                this.chatSessionId = session.id;
+                return session.id;
+            })
+        );
+    }
+
     openSource(fileUrl?: string | null): void {
         if (!fileUrl) {
             return;
@@ -496,8 +520,10 @@ export class VehicleDocsAiComponent implements OnInit, OnDestroy {
         const labels: Record<string, string> = {
             uploaded: 'Uploaded',
             starting: 'Starting',
+            transcribing: 'Transcribing pages',
             extracting_text: 'Extracting text',
             chunking: 'Building chunks',
+            summarizing: 'Summarizing',
             knowledge: 'Extracting knowledge',
             ready: 'Ready',
             failed: 'Failed'